@@ -120,6 +120,7 @@ elif page == "Upload Data":
         st.info("Lottie animation could not be loaded.")
 
     from db_handler import DBHandler
+    from series_cache import invalidate_farms
 
     # Farm selection
     try:
@@ -208,28 +209,30 @@ elif page == "Upload Data":
                             "INSERT INTO agri_metrics (farm_id, date, daily_gdd, effective_rainfall, cumulative_gdd) VALUES (?, ?, ?, ?, ?)",
                             (farm_id, row["date"], row["daily_gdd"], row["effective_rainfall"], row["cumulative_gdd"])
                         )
+                    invalidate_farms([farm_id])
                     st.success("Demo farm and sample data added! Go to the Prediction page, select 'DemoLocation', and try a prediction.")
         st.subheader("Upload CSV File")
         uploaded_file = st.file_uploader("Choose a CSV file", type=["csv"])
         if uploaded_file is not None:
             import pandas as pd
-            df = pd.read_csv(uploaded_file)
-            st.write("Preview of uploaded data:")
-            st.dataframe(df.head(10))
+            from validation import normalize_columns
+            # Only parse the first rows for the preview; the import streams the file in chunks
+            preview_rows = 10
+            df = pd.read_csv(uploaded_file, nrows=preview_rows, dtype={"date": str})
+            uploaded_file.seek(0)
+            st.write(f"Preview of uploaded data (first {preview_rows} rows):")
+            st.dataframe(df)
             # Add a button to delete all data for this farm before import
             if st.button("Delete ALL Data for This Farm Before Import", key="delete_farm_data"):
                 with DBHandler() as db:
                     db.delete_farm(farm_obj["id"])
                 st.success("All data for this farm has been deleted. You can now import fresh data.")
             if st.button("Import Data to Database"):
-                # Accept both eff_rain/cum_gdd and effective_rainfall/cumulative_gdd
+                # Agri metrics (eff_rain/cum_gdd or effective_rainfall/cumulative_gdd) are
+                # optional; missing values are derived from the climate columns
                 required_climate = ["date", "temp_max", "temp_min", "rainfall"]
-                required_agri = ["date", "daily_gdd", "effective_rainfall", "cumulative_gdd"]
                 # Map legacy columns if present
-                if "eff_rain" in df.columns:
-                    df["effective_rainfall"] = df["eff_rain"]
-                if "cum_gdd" in df.columns:
-                    df["cumulative_gdd"] = df["cum_gdd"]
+                df = normalize_columns(df)
                 # Auto-create farm if missing
                 farm_name = farm_obj["name"] if "name" in farm_obj else None
                 location = farm_obj["location"] if "location" in farm_obj else None
@@ -247,29 +250,58 @@ elif page == "Upload Data":
                             farms = db.get_farms()
                             farm_db = next((f for f in farms if f["name"] == farm_name and f["location"] == location), None)
                         farm_id = farm_db["id"] if farm_db else None
-                        if not farm_id:
-                            st.error("Could not create or find the farm in the database.")
+                    if not farm_id:
+                        st.error("Could not create or find the farm in the database.")
+                    else:
+                        # Check for all required columns
+                        missing_climate = [col for col in required_climate if col not in df.columns]
+                        if not missing_climate:
+                            import io
+                            from validation import ChunkValidator
+                            from import_utils import read_chunks, import_chunks, is_multi_farm
+                            # Stream the upload in chunks, one transaction per chunk; rows that
+                            # fail validation go to a downloadable rejects CSV
+                            rejects_buf = io.StringIO()
+                            total_bytes = max(getattr(uploaded_file, "size", 0), 1)
+                            progress_bar = st.progress(0.0, text="Importing...")
+
+                            def show_progress(done):
+                                fraction = min(uploaded_file.tell() / total_bytes, 1.0)
+                                progress_bar.progress(fraction, text=f"Importing... {done:,} rows processed")
+
+                            # A farm_name column routes each row to its own farm (created
+                            # or updated with location, base temperature and coordinates)
+                            multi_farm = is_multi_farm(df.columns)
+                            uploaded_file.seek(0)
+                            with ChunkValidator(rejects=rejects_buf) as validator:
+                                summary = import_chunks(
+                                    read_chunks(uploaded_file),
+                                    farm_id=None if multi_farm else farm_id,
+                                    validator=validator,
+                                    progress=show_progress,
+                                    atomic=False,
+                                    on_conflict="IGNORE",
+                                )
+                            progress_bar.progress(1.0, text=f"Done: {summary['rows']:,} rows processed")
+                            st.success("Data imported successfully!")
+                            st.markdown("**Import Summary**")
+                            st.write(f"Inserted: {summary['inserted']:,}")
+                            st.write(f"Skipped (already in database): {summary['skipped']:,}")
+                            st.write(f"Rejected (failed validation): {summary['rejected']:,}")
+                            if summary["rejected"]:
+                                st.download_button(
+                                    label="Download Rejected Rows (CSV)",
+                                    data=rejects_buf.getvalue().encode("utf-8"),
+                                    file_name=f"{os.path.splitext(uploaded_file.name)[0]}_rejects.csv",
+                                    mime="text/csv"
+                                )
                         else:
-                            # Check for all required columns
-                            missing_climate = [col for col in required_climate if col not in df.columns]
-                            missing_agri = [col for col in required_agri if col not in df.columns]
-                            if not missing_climate and not missing_agri:
-                                for _, row in df.iterrows():
-                                    db.execute_query(
-                                        "INSERT OR IGNORE INTO climate_data (farm_id, date, temp_max, temp_min, rainfall) VALUES (?, ?, ?, ?, ?)",
-                                        (farm_id, row["date"], row["temp_max"], row["temp_min"], row["rainfall"])
-                                    )
-                                    db.execute_query(
-                                        "INSERT OR IGNORE INTO agri_metrics (farm_id, date, daily_gdd, effective_rainfall, cumulative_gdd) VALUES (?, ?, ?, ?, ?)",
-                                        (farm_id, row["date"], row["daily_gdd"], row["effective_rainfall"], row["cumulative_gdd"])
-                                    )
-                                st.success("Data imported successfully!")
-                            else:
-                                st.error(f"CSV must contain columns: {', '.join(required_climate + required_agri)}")
+                            st.error(f"CSV must contain columns: {', '.join(required_climate)}")
                 else:
                     st.error("Farm name or location missing. Please check your farm selection and CSV.")
 elif page == "Visualization":
     import numpy as np
+    from downsample import select_indices
     st.title("Visualization")
     lottie = cached_load_lottie(lottie_visualization_url)
     if lottie:
@@ -292,16 +324,19 @@ elif page == "Visualization":
 
         # Find all farms at selected locations
         location_farms = [f for f in farms if f["location"] in selected_locations]
-        # For map: get lat/lon if available, else use dummy coordinates
-        map_data = []
-        for f in location_farms:
-            lat = f.get("lat", 20.0 + hash(f["location"]) % 30)
-            lon = f.get("lon", 70.0 + hash(f["location"]) % 30)
-            map_data.append({"lat": lat, "lon": lon, "location": f["location"]})
+        # For map: farms stored with coordinates (imported from lat/lon columns)
+        map_data = [
+            {"lat": f["lat"], "lon": f["lon"], "location": f["location"]}
+            for f in location_farms
+            if f.get("lat") is not None and f.get("lon") is not None
+        ]
         import pandas as pd
         if map_data:
             map_df = pd.DataFrame(map_data)
             st.map(map_df)
+        missing_coords = len(location_farms) - len(map_data)
+        if missing_coords:
+            st.caption(f"{missing_coords} farm(s) have no coordinates; import a file with lat/lon columns to place them on the map.")
 
         # For comparison, show metrics for each location
         metrics_by_location = {}
@@ -384,18 +419,21 @@ elif page == "Visualization":
                 st.subheader(f"{metric} Trend for {loc}")
                 if metric in df.columns:
                     fig2, ax2 = plt.subplots(figsize=(8,3))
-                    y = df[metric].to_numpy()
-                    x = np.arange(len(y))
+                    y_all = df[metric].to_numpy(dtype=float)
+                    # about one point per pixel of the 8in plot; icons and ticks only on a readable subset
+                    idx = select_indices(np.arange(len(y_all)), y_all, int(fig2.get_figwidth() * fig2.dpi))
+                    x, y = idx, y_all[idx]
                     ax2.plot(x, y, color="#2563eb", linewidth=2)
                     if metric in ["temp_max", "temp_min"]:
-                        mean_val = np.mean(y)
-                        for i, val in enumerate(y):
+                        mean_val = np.nanmean(y_all)
+                        for i, val in zip(x[::max(1, len(x) // 60)], y[::max(1, len(x) // 60)]):
                             if val < mean_val:
                                 ax2.text(i, val, "☔", fontsize=14, ha='center', va='bottom')
                             else:
                                 ax2.text(i, val, "☀", fontsize=14, ha='center', va='bottom')
-                    ax2.set_xticks(x)
-                    ax2.set_xticklabels(df["date"], rotation=45, fontsize=8)
+                    ticks = x[::max(1, len(x) // 20)]
+                    ax2.set_xticks(ticks)
+                    ax2.set_xticklabels(df["date"].to_numpy()[ticks], rotation=45, fontsize=8)
                     ax2.set_xlabel("Date")
                     ax2.set_ylabel(metric)
                     ax2.set_title(f"{metric} Trend (Wavy)")
@@ -511,6 +549,7 @@ elif page == "Prediction":
     from db_handler import DBHandler
     import pandas as pd
     import numpy as np
+    from downsample import downsample
     from sklearn.linear_model import LinearRegression
     from sklearn.metrics import mean_squared_error
 
@@ -617,8 +656,8 @@ elif page == "Prediction":
             st.subheader("Prediction vs Actual (Training Data)")
             import matplotlib.pyplot as plt
             fig, ax = plt.subplots(figsize=(8,4))
-            ax.plot(df["date"].to_numpy(), y, label="Actual", color="#2563eb")
-            ax.plot(df["date"].to_numpy(), y_pred, label="Predicted", color="#ff4b4b", linestyle="--")
+            ax.plot(*downsample(df["date"].to_numpy(), y), label="Actual", color="#2563eb")
+            ax.plot(*downsample(df["date"].to_numpy(), y_pred), label="Predicted", color="#ff4b4b", linestyle="--")
             ax.set_xlabel("Date")
             ax.set_ylabel("Max Temp (°C)")
             ax.set_title("AI Regression Prediction vs Actual")
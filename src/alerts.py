@@ -0,0 +1,280 @@
+"""
+alerts.py
+Rule-based farm alerts, evaluated incrementally as data is written.
+
+Rules are plain dicts (DEFAULT_RULES, or a JSON list in alert_rules.json next
+to the app) of four kinds:
+
+    threshold    - a day's value compared with a limit
+                   {"name": "heat", "kind": "threshold", "metric": "temp_max", "op": ">", "value": 35}
+    consecutive  - the limit held for ``days`` days in a row (fires on the day the run reaches it)
+                   {"name": "heatwave", "kind": "consecutive", "metric": "temp_max", "op": ">", "value": 32, "days": 3}
+    rolling_sum  - the sum over the trailing ``days`` calendar days compared with a
+                   limit (fires when it starts to hold, e.g. a rain deficit)
+                   {"name": "rain_deficit", "kind": "rolling_sum", "metric": "effective_rainfall", "op": "<",
+                    "value": 20, "days": 30}
+    milestone    - a running total reaching each of ``values``
+                   {"name": "gdd", "kind": "milestone", "metric": "cumulative_gdd", "values": [500, 1000]}
+
+An optional "message" format string may use {farm}, {date}, {value}, {limit}
+and {days}.
+
+Ingest paths (import_chunks, the IoT writer, row deletes) note the earliest
+written date per farm with an AlertUpdater, like the lod_pyramid LodUpdater.
+finish() then re-evaluates each farm from that date only, reading just enough
+earlier rows for the rules' windows, so the cost follows the new data rather
+than the history. Results are kept in the alerts table (one row per farm, rule
+and day); alerts that no longer hold after a correction are removed. New alerts
+are pushed through notifications.notify by publish() once the transaction has
+committed.
+
+Usage:
+    updater = AlertUpdater()
+    with db.transaction():
+        write(chunk)
+        updater.note(chunk, farm_id)
+        updater.finish(db)
+    publish(updater.new)
+"""
+
+import json
+import operator
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from lod_pyramid import LodUpdater
+from notifications import notify
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alert_rules.json")
+KINDS = ("threshold", "consecutive", "rolling_sum", "milestone")
+OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+# Columns rules can watch, by table
+METRIC_COLUMNS = {
+    "temp_max": "c.temp_max", "temp_min": "c.temp_min", "rainfall": "c.rainfall",
+    "daily_gdd": "m.daily_gdd", "effective_rainfall": "m.effective_rainfall", "cumulative_gdd": "m.cumulative_gdd",
+}
+# More new alerts than this in one batch are announced as a single summary
+MAX_NOTIFICATIONS = 5
+
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    {"name": "heat", "kind": "threshold", "metric": "temp_max", "op": ">", "value": 35.0,
+     "message": "{farm}: high temperature {value:.1f}°C on {date} (> {limit}°C)"},
+    {"name": "frost", "kind": "threshold", "metric": "temp_min", "op": "<", "value": 0.0,
+     "message": "{farm}: frost {value:.1f}°C on {date}"},
+    {"name": "heatwave", "kind": "consecutive", "metric": "temp_max", "op": ">", "value": 32.0, "days": 3,
+     "message": "{farm}: {days} days in a row above {limit}°C up to {date}"},
+    {"name": "dry_spell", "kind": "consecutive", "metric": "rainfall", "op": "<", "value": 1.0, "days": 14,
+     "message": "{farm}: {days} dry days in a row up to {date}"},
+    {"name": "rain_deficit", "kind": "rolling_sum", "metric": "effective_rainfall", "op": "<", "value": 20.0,
+     "days": 30, "message": "{farm}: only {value:.1f} mm effective rainfall in the {days} days to {date}"},
+    {"name": "gdd_milestone", "kind": "milestone", "metric": "cumulative_gdd",
+     "values": [500.0, 1000.0, 1500.0, 2000.0, 2500.0],
+     "message": "{farm}: cumulative GDD reached {limit:g} on {date}"},
+]
+
+
+def check_rule(rule: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a rule dict; raises ValueError naming the problem."""
+    name = rule.get("name")
+    if not name:
+        raise ValueError(f"Alert rule without a name: {rule!r}")
+    if rule.get("kind") not in KINDS:
+        raise ValueError(f"Alert rule {name!r}: unknown kind {rule.get('kind')!r} (expected one of {', '.join(KINDS)})")
+    if rule.get("metric") not in METRIC_COLUMNS:
+        raise ValueError(f"Alert rule {name!r}: unknown metric {rule.get('metric')!r}")
+    if rule["kind"] == "milestone":
+        if not rule.get("values"):
+            raise ValueError(f"Alert rule {name!r}: milestone rules need 'values'")
+    else:
+        if rule.get("op") not in OPS:
+            raise ValueError(f"Alert rule {name!r}: unknown op {rule.get('op')!r}")
+        if rule.get("value") is None:
+            raise ValueError(f"Alert rule {name!r}: missing 'value'")
+    if rule["kind"] in ("consecutive", "rolling_sum") and int(rule.get("days") or 0) < 1:
+        raise ValueError(f"Alert rule {name!r}: 'days' must be at least 1")
+    return rule
+
+
+def load_rules(path: str = RULES_FILE) -> List[Dict[str, Any]]:
+    """Rules from a JSON list in ``path`` if it exists, else DEFAULT_RULES."""
+    if not os.path.exists(path):
+        return DEFAULT_RULES
+    with open(path, encoding="utf-8") as f:
+        return [check_rule(rule) for rule in json.load(f)]
+
+
+def lookback_days(rules: Sequence[Dict[str, Any]]) -> int:
+    """Days before the first changed date the rules need to see."""
+    days = 0
+    for rule in rules:
+        if rule["kind"] == "consecutive":
+            days = max(days, int(rule["days"]))
+        elif rule["kind"] == "rolling_sum":
+            # The previous day's window too, to tell when the condition started
+            days = max(days, 2 * int(rule["days"]))
+    return days
+
+
+def _compare(rule, values: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore"):
+        return OPS[rule["op"]](values, float(rule["value"])) & ~np.isnan(values)
+
+
+def _fired(rule: Dict[str, Any], days: np.ndarray, values: np.ndarray):
+    """(mask of firing rows, value per row, limit per row) of one rule over a farm's rows in date order."""
+    n = len(values)
+    limit = np.full(n, float(rule.get("value") or 0.0))
+    if rule["kind"] == "threshold":
+        return _compare(rule, values), values, limit
+    if rule["kind"] == "consecutive":
+        cond = _compare(rule, values)
+        index = np.arange(n)
+        # A run starts where the condition begins to hold or a day is missing
+        starts = cond & np.r_[True, ~cond[:-1] | (np.diff(days) != 1)]
+        first = np.maximum.accumulate(np.where(starts, index, -1))
+        run = np.where(cond, index - first + 1, 0)
+        return run == int(rule["days"]), values, limit
+    if rule["kind"] == "rolling_sum":
+        window = int(rule["days"])
+        total = np.r_[0.0, np.cumsum(np.nan_to_num(values))]
+        lo = np.searchsorted(days, days - (window - 1))
+        sums = total[1:] - total[lo]
+        # Only whole windows (every day present) count
+        cond = ((np.arange(n) - lo + 1) == window) & _compare(rule, sums)
+        return cond & ~np.r_[False, cond[:-1]], sums, limit
+    # milestone: the highest value crossed since the previous row
+    prev = np.r_[-np.inf, values[:-1]]
+    fired = np.zeros(n, dtype=bool)
+    for target in sorted(float(v) for v in rule["values"]):
+        with np.errstate(invalid="ignore"):
+            crossed = (prev < target) & (values >= target)
+        fired |= crossed
+        limit = np.where(crossed, target, limit)
+    return fired, values, limit
+
+
+def _message(rule: Dict[str, Any], farm: str, day: str, value: float, limit: float) -> str:
+    template = rule.get("message") or "{farm}: " + rule["name"] + " on {date} ({value:.1f})"
+    try:
+        return template.format(farm=farm, date=day, value=value, limit=limit, days=rule.get("days", ""))
+    except (KeyError, IndexError, ValueError):
+        return f"{farm}: {rule['name']} on {day}"
+
+
+def evaluate(db, farm_id: Any, since: str = "", rules: Optional[Sequence[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Re-evaluate ``rules`` for one farm's days from ``since`` ('' = all) and
+    update its stored alerts in that range. Does not commit; call inside
+    db.transaction(). Returns the alerts that are new.
+    """
+    rules = load_rules() if rules is None else rules
+    conn = db.conn
+    start = ""
+    if since:
+        start = (date.fromisoformat(since[:10]) - timedelta(days=lookback_days(rules))).isoformat()
+    metrics = sorted({rule["metric"] for rule in rules})
+    columns = ", ".join(f"{METRIC_COLUMNS[m]} AS {m}" for m in metrics)
+    # One row before the window as well, for milestones and rule transitions
+    rows = conn.execute(
+        f"""
+        SELECT c.date, {columns}
+        FROM climate_data c
+        LEFT JOIN agri_metrics m ON c.farm_id = m.farm_id AND c.date = m.date
+        WHERE c.farm_id = ? AND c.date >= COALESCE(
+            (SELECT MAX(date) FROM climate_data WHERE farm_id = ? AND date < ?), ?)
+        ORDER BY c.date
+        """,
+        (farm_id, farm_id, start, start)
+    ).fetchall()
+    fired: Dict[tuple, Dict[str, Any]] = {}
+    if rows:
+        dates = [r[0] for r in rows]
+        days = pd.to_datetime(pd.Series(dates), errors="coerce").to_numpy(dtype="datetime64[D]").astype(np.int64)
+        keep = np.array([d >= since for d in dates]) if since else np.ones(len(dates), dtype=bool)
+        name_row = conn.execute("SELECT name FROM farms WHERE id=?", (farm_id,)).fetchone()
+        farm = name_row[0] if name_row and name_row[0] else f"Farm {farm_id}"
+        for rule in rules:
+            values = np.array([r[1 + metrics.index(rule["metric"])] for r in rows], dtype=float)
+            mask, shown, limits = _fired(rule, days, values)
+            for i in np.flatnonzero(mask & keep):
+                fired[(rule["name"], dates[i])] = {
+                    "farm_id": farm_id, "rule": rule["name"], "date": dates[i], "value": float(shown[i]),
+                    "message": _message(rule, farm, dates[i], float(shown[i]), float(limits[i])),
+                }
+    stored = {(r[0], r[1]) for r in conn.execute(
+        "SELECT rule, date FROM alerts WHERE farm_id = ? AND date >= ?", (farm_id, since)
+    ).fetchall()}
+    stale = [(farm_id, rule, day) for rule, day in stored - fired.keys()]
+    if stale:
+        conn.executemany("DELETE FROM alerts WHERE farm_id = ? AND rule = ? AND date = ?", stale)
+    new = [alert for key, alert in fired.items() if key not in stored]
+    now = datetime.now().isoformat(timespec="seconds")
+    conn.executemany(
+        "INSERT INTO alerts (farm_id, rule, date, value, message, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        [(a["farm_id"], a["rule"], a["date"], a["value"], a["message"], now) for a in new]
+    )
+    conn.execute("INSERT OR REPLACE INTO alert_checks (farm_id, checked_at) VALUES (?, ?)", (farm_id, now))
+    return new
+
+
+class AlertUpdater:
+    """
+    Track the earliest written date per farm during an ingest and evaluate the
+    alert rules from there afterwards (in the same transaction as the writes).
+    New alerts collect in ``new`` for publish() after the commit.
+    """
+
+    def __init__(self, rules: Optional[Sequence[Dict[str, Any]]] = None):
+        self.rules = rules
+        self.new: List[Dict[str, Any]] = []
+        self._dates = LodUpdater()
+
+    def note(self, df: pd.DataFrame, farm_id: Any = None) -> None:
+        self._dates.note(df, farm_id)
+
+    def note_date(self, farm_id: Any, day: str) -> None:
+        earliest = self._dates.earliest
+        if farm_id not in earliest or day < earliest[farm_id]:
+            earliest[farm_id] = day
+
+    def finish(self, db) -> List[Dict[str, Any]]:
+        """Evaluate the recorded farms. Returns (and keeps) the new alerts."""
+        rules = load_rules() if self.rules is None else self.rules
+        for farm, since in self._dates.earliest.items():
+            self.new.extend(evaluate(db, farm, since, rules))
+        self._dates.earliest = {}
+        return self.new
+
+
+def ensure_evaluated(db, farm_id: Any) -> List[Dict[str, Any]]:
+    """Evaluate a farm's whole history once if it was never checked (data from before alerting)."""
+    if db.conn.execute("SELECT 1 FROM alert_checks WHERE farm_id=?", (farm_id,)).fetchone():
+        return []
+    with db.transaction():
+        return evaluate(db, farm_id)
+
+
+def farm_alerts(db, farm_id: Any, limit: int = 50) -> List[Dict[str, Any]]:
+    """Latest stored alerts of a farm, newest day first."""
+    rows = db.conn.execute(
+        "SELECT rule, date, value, message FROM alerts WHERE farm_id=? ORDER BY date DESC, rule LIMIT ?",
+        (farm_id, limit)
+    ).fetchall()
+    return [{"rule": r[0], "date": r[1], "value": r[2], "message": r[3]} for r in rows]
+
+
+def publish(new: Sequence[Dict[str, Any]]) -> None:
+    """Push new alerts to notification subscribers (a summary if there are many)."""
+    if not new:
+        return
+    if len(new) <= MAX_NOTIFICATIONS:
+        for alert in new:
+            notify("alert", alert["message"])
+        return
+    farms = len({a["farm_id"] for a in new})
+    latest = max(a["date"] for a in new)
+    notify("alert", f"{len(new)} new alerts on {farms} farm(s), latest {latest}. See Alerts on the Dashboard.")
@@ -0,0 +1,381 @@
+"""
+chart_export.py
+High-DPI chart export in worker processes, off the Tk thread.
+
+Saving a figure at print DPI on the Tk thread froze the UI for seconds. Pages
+instead take a snapshot() of what their figure shows: per axes the title,
+labels, limits and every line, scatter, bar/patch, shaded band and text, as
+plain arrays. An ExportService renders snapshots in a process pool with the
+Agg backend (matplotlib.figure.Figure, no pyplot or Tk) and saves PNG, PDF or
+SVG by file extension. Downsampled chart lines are exported from their
+full-resolution data, reduced to the pixel width of the export.
+
+Batch exports render one chart per farm (farm_tasks) or per metric
+(metric_tasks). Each worker queries its own farm, so the database reads also
+run in parallel.
+
+Usage:
+    job = get_service().submit(
+        [snapshot_task(fig, "chart.png", layer=chart)],
+        progress=lambda done, total, path, error: ...,   # collector thread
+        done=lambda job: ...,                            # collector thread
+    )
+    job.cancel()
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from downsample import downsample
+
+DEFAULT_DPI = 300
+DEFAULT_SIZE = (10.0, 5.0)
+
+_DATE_FORMATTERS = ("AutoDateFormatter", "ConciseDateFormatter", "DateFormatter")
+
+
+# --- Snapshots (Tk thread) ---
+
+def _color(value):
+    """A single RGBA tuple from an artist colour (first entry of colour arrays)."""
+    arr = np.asarray(value, dtype=float)
+    if arr.ndim == 2:
+        return tuple(arr[0]) if len(arr) else None
+    return tuple(arr) if arr.size else None
+
+
+def _label(artist) -> Optional[str]:
+    label = str(artist.get_label())
+    return None if label.startswith("_") else label
+
+
+def _snapshot_axes(fig, ax, layer) -> Dict[str, Any]:
+    from matplotlib.collections import PathCollection, PolyCollection
+    from matplotlib.patches import Rectangle
+
+    lines = []
+    for line in ax.lines:
+        full = layer.full_data(line) if layer is not None else None
+        if full is not None:
+            x, y, method = full
+        else:
+            xy = np.asarray(line.get_xydata(), dtype=float)
+            x, y, method = xy[:, 0], xy[:, 1], None
+        lines.append({
+            "x": np.asarray(x, dtype=float), "y": np.asarray(y, dtype=float), "downsample": method,
+            "label": _label(line), "color": line.get_color(), "linestyle": line.get_linestyle(),
+            "linewidth": line.get_linewidth(), "marker": line.get_marker(),
+            "markersize": line.get_markersize(), "alpha": line.get_alpha(),
+        })
+    scatters, polys = [], []
+    for coll in ax.collections:
+        if isinstance(coll, PathCollection):
+            full = layer.full_data(coll) if layer is not None else None
+            if full is not None:
+                x, y, method = full
+            else:
+                offsets = np.asarray(coll.get_offsets(), dtype=float)
+                x, y, method = offsets[:, 0], offsets[:, 1], None
+            sizes = coll.get_sizes()
+            scatters.append({
+                "x": np.asarray(x, dtype=float), "y": np.asarray(y, dtype=float), "downsample": method,
+                "label": _label(coll), "color": _color(coll.get_facecolor()),
+                "size": float(sizes[0]) if len(sizes) else None, "alpha": coll.get_alpha(),
+            })
+        elif isinstance(coll, PolyCollection):
+            for path in coll.get_paths():
+                polys.append({"vertices": np.asarray(path.vertices, dtype=float), "label": _label(coll),
+                              "color": _color(coll.get_facecolor()), "alpha": coll.get_alpha()})
+    bars: Dict[str, List] = {"x": [], "y": [], "width": [], "height": [], "color": []}
+    for patch in ax.patches:
+        if isinstance(patch, Rectangle):
+            bars["x"].append(patch.get_x())
+            bars["y"].append(patch.get_y())
+            bars["width"].append(patch.get_width())
+            bars["height"].append(patch.get_height())
+            bars["color"].append(tuple(patch.get_facecolor()))
+        else:
+            polys.append({"vertices": np.asarray(patch.get_path().vertices, dtype=float), "label": None,
+                          "color": tuple(patch.get_facecolor()), "alpha": patch.get_alpha()})
+    texts = [{"x": t.get_position()[0], "y": t.get_position()[1], "text": t.get_text(),
+              "axes": t.get_transform() == ax.transAxes, "ha": t.get_ha(), "va": t.get_va(),
+              "fontsize": t.get_fontsize()} for t in ax.texts]
+    ticks = ax.get_xticklabels()
+    return {
+        "position": tuple(ax.get_position().bounds),
+        "title": ax.get_title(), "xlabel": ax.get_xlabel(), "ylabel": ax.get_ylabel(),
+        "xlim": tuple(ax.get_xlim()), "ylim": tuple(ax.get_ylim()),
+        "dates": type(ax.xaxis.get_major_formatter()).__name__ in _DATE_FORMATTERS,
+        "xrotation": ticks[0].get_rotation() if ticks else 0.0,
+        "legend": ax.get_legend() is not None,
+        "lines": lines, "scatters": scatters, "polys": polys, "bars": bars, "texts": texts,
+    }
+
+
+def snapshot(fig, layer=None) -> Dict[str, Any]:
+    """
+    Picklable description of what ``fig`` shows. With the figure's ChartLayer,
+    downsampled series are taken at full resolution (overlays included).
+    """
+    return {"size": tuple(fig.get_size_inches()), "axes": [_snapshot_axes(fig, ax, layer) for ax in fig.axes]}
+
+
+def snapshot_task(fig, path: str, layer=None, dpi: int = DEFAULT_DPI) -> Dict[str, Any]:
+    """An export task rendering a snapshot of ``fig`` to ``path``."""
+    return {"path": path, "dpi": dpi, "spec": snapshot(fig, layer)}
+
+
+# --- Rendering (worker processes) ---
+
+def render(spec: Dict[str, Any], path: str, dpi: int = DEFAULT_DPI, fig=None) -> str:
+    """
+    Draw a snapshot with Agg and save it (format from the extension). Returns ``path``.
+    ``fig`` (an Agg figure) is cleared and reused instead of creating a new one.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    if fig is None:
+        fig = Figure(figsize=spec.get("size", DEFAULT_SIZE), dpi=dpi)
+        FigureCanvasAgg(fig)
+    else:
+        fig.clf()
+        fig.set_size_inches(spec.get("size", DEFAULT_SIZE))
+        fig.set_dpi(dpi)
+    width_px = int(fig.get_figwidth() * dpi)
+    for a in spec["axes"]:
+        ax = fig.add_axes(a["position"])
+        for p in a["polys"]:
+            ax.fill(p["vertices"][:, 0], p["vertices"][:, 1], color=p["color"], alpha=p["alpha"],
+                    linewidth=0, label=p["label"] or "_nolegend_")
+        bars = a["bars"]
+        if bars["x"]:
+            ax.bar(bars["x"], bars["height"], width=bars["width"], bottom=bars["y"], color=bars["color"],
+                   align="edge")
+        for s in a["scatters"]:
+            x, y = (downsample(s["x"], s["y"], width_px, s["downsample"]) if s["downsample"]
+                    else (s["x"], s["y"]))
+            ax.scatter(x, y, s=s["size"], color=[s["color"]] if s["color"] else None, alpha=s["alpha"],
+                       label=s["label"] or "_nolegend_")
+        for ln in a["lines"]:
+            x, y = (downsample(ln["x"], ln["y"], width_px, ln["downsample"]) if ln["downsample"]
+                    else (ln["x"], ln["y"]))
+            ax.plot(x, y, color=ln["color"], linestyle=ln["linestyle"], linewidth=ln["linewidth"],
+                    marker=ln["marker"], markersize=ln["markersize"], alpha=ln["alpha"],
+                    label=ln["label"] or "_nolegend_")
+        for t in a["texts"]:
+            ax.text(t["x"], t["y"], t["text"], ha=t["ha"], va=t["va"], fontsize=t["fontsize"],
+                    transform=ax.transAxes if t["axes"] else ax.transData)
+        if a["dates"]:
+            ax.xaxis_date()
+        ax.set_xlim(a["xlim"])
+        ax.set_ylim(a["ylim"])
+        ax.set_title(a["title"])
+        ax.set_xlabel(a["xlabel"])
+        ax.set_ylabel(a["ylabel"])
+        if a["xrotation"]:
+            ax.tick_params(axis="x", labelrotation=a["xrotation"])
+        if a["legend"]:
+            ax.legend()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fig.savefig(path, dpi=dpi)
+    return path
+
+
+def line_axes(x, lines: Sequence[Dict[str, Any]], position: Tuple[float, float, float, float], title: str,
+              xlabel: str = "Date", ylabel: str = "Value") -> Dict[str, Any]:
+    """
+    Axes spec of daily lines over date numbers ``x``. Each entry of ``lines``
+    needs ``y`` and may set label, color, marker, linestyle and linewidth; lines
+    are downsampled (LTTB) to the export width.
+    """
+    x = np.asarray(x, dtype=float)
+    specs = [{"x": x, "y": np.asarray(ln["y"], dtype=float), "downsample": "lttb", "label": ln.get("label"),
+              "color": ln.get("color"), "linestyle": ln.get("linestyle", "-"), "linewidth": ln.get("linewidth", 1.5),
+              "marker": ln.get("marker", ""), "markersize": ln.get("markersize", 3.0), "alpha": None}
+             for ln in lines]
+    values = [ln["y"][np.isfinite(ln["y"])] for ln in specs]
+    values = [v for v in values if len(v)]
+    ylim = (min(v.min() for v in values), max(v.max() for v in values)) if values else (0.0, 1.0)
+    pad = (ylim[1] - ylim[0]) * 0.05 or 1.0
+    texts = [] if len(x) else [{"x": 0.5, "y": 0.5, "text": "No data", "axes": True, "ha": "center",
+                                "va": "center", "fontsize": 12}]
+    return {
+        "position": position, "title": title, "xlabel": xlabel, "ylabel": ylabel,
+        "xlim": (x[0], x[-1]) if len(x) > 1 else (0.0, 1.0), "ylim": (ylim[0] - pad, ylim[1] + pad),
+        "dates": bool(len(x)), "xrotation": 25.0, "legend": sum(1 for ln in specs if ln["label"]) > 1,
+        "lines": specs, "scatters": [], "polys": [], "bars": {"x": []}, "texts": texts,
+    }
+
+
+def date_numbers(dates) -> np.ndarray:
+    """datetime64 dates as matplotlib date numbers."""
+    from matplotlib import dates as mdates
+
+    return np.asarray(mdates.date2num(dates), dtype=float) if len(dates) else np.array([], dtype=float)
+
+
+def series_spec(db, farm_id, metrics: Sequence[str], start: str = "", end: str = "",
+                title: Optional[str] = None, size: Tuple[float, float] = DEFAULT_SIZE) -> Dict[str, Any]:
+    """Snapshot-style spec of a farm's daily metrics straight from the database."""
+    from series_cache import load_series
+
+    series = load_series(db, farm_id, start, end)
+    axes = line_axes(date_numbers(series.dates), [{"y": series.columns[m], "label": m} for m in metrics],
+                     (0.08, 0.15, 0.88, 0.75), title or f"{', '.join(metrics)} for farm {farm_id}",
+                     ylabel=metrics[0] if len(metrics) == 1 else "Value")
+    return {"size": size, "axes": [axes]}
+
+
+def _run_task(task: Dict[str, Any]) -> str:
+    """Worker entry point: render a snapshot, or query a farm and render its chart."""
+    spec = task.get("spec")
+    if spec is None:
+        from db_handler import DBHandler
+        with DBHandler(task.get("db_path")) as db:
+            spec = series_spec(db, task["farm_id"], task["metrics"], task.get("start", ""),
+                               task.get("end", ""), task.get("title"))
+    return render(spec, task["path"], task.get("dpi", DEFAULT_DPI))
+
+
+def _farm_task(farm_id, metrics, path, start, end, dpi, db_path, title=None) -> Dict[str, Any]:
+    return {"farm_id": farm_id, "metrics": list(metrics), "path": path, "start": start, "end": end,
+            "dpi": dpi, "db_path": db_path, "title": title}
+
+
+def farm_tasks(farms: Sequence[Tuple[Any, str]], metric: str, out_dir: str, start: str = "", end: str = "",
+               dpi: int = DEFAULT_DPI, fmt: str = "png", db_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """One chart of ``metric`` per (farm_id, farm_name)."""
+    return [_farm_task(fid, [metric], os.path.join(out_dir, f"{file_slug(name)}_{metric}.{fmt}"), start, end, dpi,
+                       db_path, f"{metric} for {name}")
+            for fid, name in farms]
+
+
+def metric_tasks(farm: Tuple[Any, str], metrics: Sequence[str], out_dir: str, start: str = "", end: str = "",
+                 dpi: int = DEFAULT_DPI, fmt: str = "png", db_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """One chart per metric of a single (farm_id, farm_name)."""
+    fid, name = farm
+    return [_farm_task(fid, [m], os.path.join(out_dir, f"{file_slug(name)}_{m}.{fmt}"), start, end, dpi,
+                       db_path, f"{m} for {name}")
+            for m in metrics]
+
+
+def file_slug(name) -> str:
+    """A file-name-safe form of a farm name."""
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in str(name)).strip("_") or "farm"
+
+
+# --- Process pool ---
+
+class ExportJob:
+    """Progress and results of one submit(): ``results`` holds (path, error or None)."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.completed = 0
+        self.results: List[Tuple[str, Optional[str]]] = []
+        self.cancelled = False
+        self.finished = threading.Event()
+        self._futures: List = []
+
+    @property
+    def errors(self) -> List[Tuple[str, str]]:
+        return [(p, e) for p, e in self.results if e]
+
+    def cancel(self) -> None:
+        """Drop the exports that have not started yet."""
+        self.cancelled = True
+        for future in self._futures:
+            future.cancel()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.finished.wait(timeout)
+
+
+class ExportService:
+    """
+    Renders export tasks in a pool of worker processes (started on first use with
+    'spawn', so workers never inherit the Tk process state).
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def submit(self, tasks: Sequence[Dict[str, Any]],
+               progress: Optional[Callable[[int, int, str, Optional[str]], None]] = None,
+               done: Optional[Callable[[ExportJob], None]] = None) -> ExportJob:
+        """
+        Start rendering ``tasks`` (snapshot_task/farm_tasks/metric_tasks dicts).
+        ``progress(completed, total, path, error)`` and ``done(job)`` are called
+        from a collector thread; UI code should hand them to the Tk thread.
+        """
+        job = ExportJob(len(tasks))
+        pool = self._executor()
+        futures = {pool.submit(_run_task, task): task["path"] for task in tasks}
+        job._futures = list(futures)
+        threading.Thread(target=self._collect, args=(job, futures, progress, done), daemon=True,
+                         name="chart-export").start()
+        return job
+
+    @staticmethod
+    def _collect(job: ExportJob, futures: Dict, progress, done) -> None:
+        try:
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    future.result()
+                    error = None
+                except CancelledError:
+                    continue
+                except Exception as e:
+                    error = str(e) or type(e).__name__
+                job.results.append((path, error))
+                job.completed += 1
+                if progress is not None:
+                    try:
+                        progress(job.completed, job.total, path, error)
+                    except Exception:
+                        pass
+        finally:
+            job.finished.set()
+            if done is not None:
+                try:
+                    done(job)
+                except Exception:
+                    pass
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_service: Optional[ExportService] = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> ExportService:
+    """The process-wide export service (shut down at exit)."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ExportService()
+            atexit.register(_service.shutdown)
+        return _service
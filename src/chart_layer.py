@@ -0,0 +1,501 @@
+"""
+chart_layer.py
+Persistent-artist chart updates shared by the Tk chart pages.
+
+Pages used to ax.clear() and rebuild every artist on each interaction, then
+run a full canvas.draw() and fig.autofmt_xdate(). A ChartLayer keeps one
+artist per named series and updates it in place (Line2D.set_data,
+PathCollection.set_offsets, bar heights). At the end of an update pass it
+decides how much to redraw:
+
+    - layout change (series added/removed, new title/labels, new axis limits):
+      full redraw, with autofmt_xdate for date axes
+    - base series data changed on the same layout: canvas redraw only
+    - only overlays changed (overlay series, trendlines, legends of axes with
+      overlays) and the limits still hold them: restore the cached background
+      and blit the overlay artists
+
+Overlay artists are animated, so they are left out of normal figure draws;
+wrap exports in ``with layer.static():`` to include them.
+
+Long series can be drawn downsampled (``downsample="lttb"`` for lines,
+``"minmax"`` to keep every spike): the artist holds about one point per
+pixel of axes width, and zooming or panning re-picks the points from the
+full-resolution data of the visible range. Pages that fetch data per range
+(e.g. a coarser aggregate level) register with watch_view() to hear about
+zoom and pan.
+
+Usage:
+    layer = ChartLayer(fig, canvas)
+    layer.begin()
+    layer.line("tmax", dates, values, ax=ax, marker="o", label="Max Temp")
+    layer.line("trend", dates, trend, ax=ax, overlay=True, label="Trendline")
+    layer.line("daily", dates, values, ax=ax2, downsample="lttb")
+    layer.labels(ax, "Temperature", "Date", "°C")
+    layer.end()
+"""
+
+import contextlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from matplotlib import dates as mdates
+
+from downsample import DEFAULT_WIDTH_PX, select_indices, visible_slice
+
+
+class _Entry:
+    __slots__ = ("ax", "kind", "artist", "overlay", "x", "full")
+
+    def __init__(self, ax, kind, artist, overlay, x=None, full=None):
+        self.ax = ax
+        self.kind = kind
+        self.artist = artist
+        self.overlay = overlay
+        self.x = x
+        self.full = full
+
+
+class _Full:
+    """Full-resolution data behind a downsampled artist (xu: x in axis units)."""
+    __slots__ = ("x", "y", "xu", "method")
+
+    def __init__(self, x, y, method):
+        self.x = np.asarray(x)
+        self.y = np.asarray(y, dtype=float)
+        self.xu = _axis_units(self.x)
+        self.method = method
+
+
+def _axis_units(x: np.ndarray) -> np.ndarray:
+    """x as the floats matplotlib puts on the axis (date numbers for dates)."""
+    if np.issubdtype(x.dtype, np.datetime64) or x.dtype == object:
+        try:
+            return np.asarray(mdates.date2num(x), dtype=float)
+        except Exception:
+            pass
+    return x.astype(float)
+
+
+def _same(a, b) -> bool:
+    """Element-wise equal arrays (NaN equal to NaN)."""
+    try:
+        a, b = np.asarray(a), np.asarray(b)
+        if a.shape != b.shape:
+            return False
+        if a.dtype.kind in "fc" and b.dtype.kind in "fc":
+            return bool(np.array_equal(a, b, equal_nan=True))
+        return bool(np.array_equal(a, b))
+    except Exception:
+        return False
+
+
+class ChartLayer:
+    """Named, persistent artists on one figure's axes with minimal redraws."""
+
+    def __init__(self, fig, canvas=None):
+        self.fig = fig
+        self.canvas = canvas
+        self.full_draws = 0
+        self.data_draws = 0
+        self.blits = 0
+        self.resamples = 0
+        self._entries: Dict[str, _Entry] = {}
+        self._touched: set = set()
+        self._labels: Dict[Any, Tuple] = {}
+        self._limits: Dict[Any, Tuple] = {}
+        self._legend_labels: Dict[Any, List[str]] = {}
+        self._date_axes: set = set()
+        self._layout_changed = False
+        self._data_changed = False
+        self._overlay_changed = False
+        self._background = None
+        self._draw_pending = False
+        self._autoscaling = False
+        self._updating = False
+        self._zoom_axes: set = set()
+        self._view_callbacks: Dict[Any, List] = {}
+        self._blit = canvas is not None and getattr(canvas, "supports_blit", False)
+        if canvas is not None:
+            self._cid = canvas.mpl_connect("draw_event", self._on_draw)
+
+    # --- Update pass ---
+
+    def begin(self) -> None:
+        """Start an update pass; series not set again before end() are removed."""
+        self._touched = set()
+        self._updating = True
+
+    def _axes(self, ax):
+        return ax if ax is not None else self.fig.axes[0]
+
+    def _add(self, name, ax, kind, artist, overlay, x=None, full=None) -> None:
+        if overlay and self._blit:
+            artist.set_animated(True)
+        self._entries[name] = _Entry(ax, kind, artist, overlay, x, full)
+        if full is not None:
+            self._watch(ax)
+        self._mark(overlay, layout=not overlay)
+
+    def _mark(self, overlay: bool, layout: bool = False) -> None:
+        if layout:
+            self._layout_changed = True
+        elif overlay:
+            self._overlay_changed = True
+        else:
+            self._data_changed = True
+
+    def _reuse(self, name, ax, kind) -> Optional[_Entry]:
+        self._touched.add(name)
+        entry = self._entries.get(name)
+        if entry is not None and (entry.kind != kind or entry.ax is not ax):
+            self._remove(name)
+            entry = None
+        return entry
+
+    def line(self, name: str, x, y, ax=None, overlay: bool = False,
+             downsample: Optional[str] = None, **style) -> None:
+        """Line series; ``downsample`` ('lttb' or 'minmax') reduces it to the axes width."""
+        ax = self._axes(ax)
+        entry = self._reuse(name, ax, "line")
+        if entry is not None and "label" in style and entry.artist.get_label() != style["label"]:
+            entry.artist.set_label(style["label"])
+        if entry is not None and self._unchanged(entry, x, y, downsample):
+            return
+        full = _Full(x, y, downsample) if downsample else None
+        if full is not None:
+            x, y = self._points(ax, full)
+        if entry is None:
+            artist, = ax.plot(x, y, **style)
+            self._add(name, ax, "line", artist, overlay, full=full)
+            return
+        entry.full = full
+        entry.artist.set_data(x, y)
+        self._mark(overlay)
+
+    def scatter(self, name: str, x, y, ax=None, overlay: bool = False,
+                downsample: Optional[str] = None, **style) -> None:
+        """Scatter series; ``downsample`` as for line() ('minmax' keeps the outliers)."""
+        ax = self._axes(ax)
+        entry = self._reuse(name, ax, "scatter")
+        if entry is not None and self._unchanged(entry, x, y, downsample):
+            return
+        full = _Full(x, y, downsample) if downsample else None
+        if full is not None:
+            x, y = self._points(ax, full)
+        if entry is None:
+            artist = ax.scatter(x, y, **style)
+            self._add(name, ax, "scatter", artist, overlay, full=full)
+            return
+        entry.full = full
+        entry.artist.set_offsets(np.column_stack([ax.convert_xunits(np.asarray(x)), np.asarray(y, dtype=float)]))
+        self._mark(overlay)
+
+    def _unchanged(self, entry: _Entry, x, y, downsample) -> bool:
+        if downsample or entry.full is not None:
+            full = entry.full
+            return (full is not None and full.method == downsample
+                    and _same(full.x, np.asarray(x)) and _same(full.y, np.asarray(y, dtype=float)))
+        if entry.kind == "line":
+            old_x, old_y = entry.artist.get_data()
+            return _same(old_x, x) and _same(old_y, y)
+        offsets = np.column_stack([entry.ax.convert_xunits(np.asarray(x)), np.asarray(y, dtype=float)])
+        return _same(entry.artist.get_offsets(), offsets)
+
+    def band(self, name: str, x, low, high, ax=None, **style) -> None:
+        """Shaded range between two series (e.g. min/max); replaced as a whole when its data changes."""
+        ax = self._axes(ax)
+        entry = self._reuse(name, ax, "band")
+        data = (np.asarray(x), np.asarray(low, dtype=float), np.asarray(high, dtype=float))
+        if entry is not None and all(_same(old, new) for old, new in zip(entry.x, data)):
+            return
+        artist = ax.fill_between(*data, **style)
+        if entry is None:
+            self._add(name, ax, "band", artist, False, x=data)
+            return
+        entry.artist.remove()
+        entry.artist, entry.x = artist, data
+        self._mark(False)
+
+    # --- Downsampling and zoom ---
+
+    @staticmethod
+    def width(ax) -> int:
+        """Width of ``ax`` in pixels (DEFAULT_WIDTH_PX before it has a size)."""
+        try:
+            width = int(ax.bbox.width)
+        except Exception:
+            width = 0
+        return width if width > 0 else DEFAULT_WIDTH_PX
+
+    def _points(self, ax, full: _Full, xlim=None):
+        """The points of ``full`` to draw for the x range ``xlim`` (the current zoom, or everything)."""
+        if xlim is None and not ax.get_autoscalex_on():
+            xlim = ax.get_xlim()
+        sl = visible_slice(full.xu, *sorted(xlim)) if xlim is not None else slice(0, len(full.xu))
+        idx = select_indices(full.xu[sl], full.y[sl], self.width(ax), full.method) + sl.start
+        return full.x[idx], full.y[idx]
+
+    def full_data(self, artist) -> Optional[Tuple[np.ndarray, np.ndarray, str]]:
+        """(x in axis units, y, method) behind a downsampled artist; None for other artists."""
+        for entry in self._entries.values():
+            if entry.artist is artist and entry.full is not None:
+                return entry.full.xu, entry.full.y, entry.full.method
+        return None
+
+    def watch_view(self, callback, ax=None) -> None:
+        """Call ``callback(ax)`` after the user zooms or pans ``ax`` (not on the layer's own autoscaling)."""
+        ax = self._axes(ax)
+        self._view_callbacks.setdefault(ax, []).append(callback)
+        self._watch(ax)
+
+    def _watch(self, ax) -> None:
+        if ax not in self._zoom_axes:
+            ax.callbacks.connect("xlim_changed", self._on_xlim)
+            self._zoom_axes.add(ax)
+
+    def _on_xlim(self, ax) -> None:
+        """Zoom/pan: re-pick the downsampled points from the newly visible range."""
+        entries = [e for e in self._entries.values() if e.ax is ax]
+        if self._autoscaling or self._updating or not entries:
+            # Limits moved by the layer itself (new artists, autoscale)
+            return
+        xlim = tuple(ax.get_xlim())
+        limits = self._limits.get(ax)
+        if limits is not None and limits[0] == xlim:
+            # Lazy autoscale during a draw, not a new view
+            return
+        self._limits[ax] = (xlim, tuple(ax.get_ylim()))
+        changed = False
+        for entry in entries:
+            if entry.full is None:
+                continue
+            x, y = self._points(ax, entry.full, xlim)
+            if entry.kind == "line":
+                entry.artist.set_data(x, y)
+            else:
+                entry.artist.set_offsets(np.column_stack([ax.convert_xunits(x), y]))
+            changed = True
+        if changed:
+            self.resamples += 1
+            self._draw()
+        for callback in self._view_callbacks.get(ax, []):
+            try:
+                callback(ax)
+            except Exception:
+                pass
+
+    def bars(self, name: str, x, heights, ax=None, **style) -> None:
+        """Bar series; heights update in place while the x positions stay the same."""
+        ax = self._axes(ax)
+        entry = self._reuse(name, ax, "bars")
+        if entry is not None and _same(entry.x, x):
+            for rect, h in zip(entry.artist.patches, heights):
+                rect.set_height(0.0 if h is None or np.isnan(h) else h)
+            self._mark(False)
+            return
+        if entry is not None:
+            self._remove(name)
+        artist = ax.bar(x, heights, **style)
+        self._add(name, ax, "bars", artist, False, x=np.asarray(x).copy())
+
+    def message(self, ax, text: str) -> None:
+        """Centered text (e.g. 'No data'); shown only in passes that set it."""
+        ax = self._axes(ax)
+        name = f"_message:{id(ax)}"
+        entry = self._reuse(name, ax, "text")
+        if entry is None:
+            artist = ax.text(0.5, 0.5, text, ha="center", va="center", fontsize=12, transform=ax.transAxes)
+            self._add(name, ax, "text", artist, False)
+        elif entry.artist.get_text() != text:
+            entry.artist.set_text(text)
+            self._layout_changed = True
+
+    def labels(self, ax, title: str = "", xlabel: str = "", ylabel: str = "", dates: bool = False) -> None:
+        ax = self._axes(ax)
+        if self._labels.get(ax) != (title, xlabel, ylabel):
+            ax.set_title(title)
+            ax.set_xlabel(xlabel)
+            ax.set_ylabel(ylabel)
+            self._labels[ax] = (title, xlabel, ylabel)
+            self._layout_changed = True
+        if dates:
+            self._date_axes.add(ax)
+        else:
+            self._date_axes.discard(ax)
+
+    def _remove(self, name: str) -> None:
+        entry = self._entries.pop(name)
+        try:
+            entry.artist.remove()
+        except Exception:
+            pass
+        self._mark(entry.overlay, layout=not entry.overlay)
+
+    def end(self, legend: bool = True) -> str:
+        """
+        Finish the pass and redraw as little as possible.
+        Returns the redraw done: 'full', 'data', 'blit' or 'none'.
+        """
+        for name in [n for n in self._entries if n not in self._touched]:
+            self._remove(name)
+        for ax in self.fig.axes:
+            self._update_limits(ax)
+            if legend:
+                self._update_legend(ax)
+        self._updating = False
+        if self._layout_changed:
+            kind = "full"
+            if self._date_axes:
+                try:
+                    self.fig.autofmt_xdate(rotation=25)
+                except Exception:
+                    pass
+            self.full_draws += 1
+            self._draw()
+        elif self._data_changed:
+            kind = "data"
+            self.data_draws += 1
+            self._draw()
+        elif self._overlay_changed:
+            kind = "blit"
+            self.blit()
+        else:
+            kind = "none"
+        self._layout_changed = self._data_changed = self._overlay_changed = False
+        return kind
+
+    def _update_limits(self, ax) -> None:
+        entries = [e for e in self._entries.values() if e.ax is ax and e.kind != "text"]
+        if not entries:
+            return
+        # Overlays count towards the limits too; one that moves them turns the
+        # blit into a full redraw in end()
+        ax.relim(visible_only=True)
+        # relim() skips collections
+        for e in entries:
+            if e.kind == "scatter" and e.artist.get_visible():
+                offsets = np.asarray(e.artist.get_offsets())
+                if len(offsets):
+                    ax.update_datalim(offsets[np.isfinite(offsets).all(axis=1)])
+            elif e.kind == "band":
+                for path in e.artist.get_paths():
+                    vertices = path.vertices[np.isfinite(path.vertices).all(axis=1)]
+                    if len(vertices):
+                        ax.update_datalim(vertices)
+        self._autoscaling = True
+        try:
+            ax.autoscale_view()
+        finally:
+            self._autoscaling = False
+        limits = (tuple(ax.get_xlim()), tuple(ax.get_ylim()))
+        if self._limits.get(ax) != limits:
+            self._limits[ax] = limits
+            self._layout_changed = True
+
+    def _update_legend(self, ax) -> None:
+        handles = [e.artist for e in self._entries.values()
+                   if e.ax is ax and e.kind != "text" and not str(e.artist.get_label()).startswith("_")]
+        labels = [h.get_label() for h in handles]
+        if labels == self._legend_labels.get(ax):
+            return
+        self._legend_labels[ax] = labels
+        old = ax.get_legend()
+        if old is not None:
+            old.remove()
+        if not handles:
+            self._layout_changed = True
+            return
+        leg = ax.legend(handles, labels)
+        if self._blit and any(e.overlay for e in self._entries.values() if e.ax is ax):
+            # Legends next to overlays are blitted with them
+            leg.set_animated(True)
+            self._overlay_changed = True
+        else:
+            self._layout_changed = True
+
+    # --- Whole-axes fallbacks (histograms, box plots, ...) ---
+
+    def reset(self, ax=None) -> None:
+        """Forget the artists of ``ax`` (all axes if None) and clear it for manual drawing."""
+        for axis in ([ax] if ax is not None else self.fig.axes):
+            for name in [n for n, e in self._entries.items() if e.ax is axis]:
+                del self._entries[name]
+            axis.clear()
+            self._labels.pop(axis, None)
+            self._limits.pop(axis, None)
+            self._legend_labels.pop(axis, None)
+            self._date_axes.discard(axis)
+            # clear() also drops the axes callbacks
+            self._zoom_axes.discard(axis)
+            if axis in self._view_callbacks:
+                self._watch(axis)
+        self._layout_changed = True
+
+    def redraw(self) -> None:
+        """Full redraw after manual drawing on a reset axes."""
+        self.full_draws += 1
+        self._layout_changed = self._data_changed = self._overlay_changed = False
+        self._draw()
+
+    # --- Drawing ---
+
+    def _animated(self) -> List:
+        artists = [e.artist for e in self._entries.values() if e.artist.get_animated()]
+        for ax in self.fig.axes:
+            leg = ax.get_legend()
+            if leg is not None and leg.get_animated():
+                artists.append(leg)
+        return artists
+
+    def _draw(self) -> None:
+        if self.canvas is None:
+            return
+        self._draw_pending = True
+        try:
+            self.canvas.draw_idle()
+        except Exception:
+            pass
+
+    def _on_draw(self, event) -> None:
+        """After every full draw: cache the background and paint the overlays on it."""
+        self._draw_pending = False
+        if not self._blit:
+            return
+        try:
+            self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+            for artist in self._animated():
+                self.fig.draw_artist(artist)
+        except Exception:
+            self._background = None
+
+    def blit(self) -> None:
+        """Repaint only the overlay artists on top of the cached background."""
+        if self.canvas is None:
+            return
+        if not self._blit or self._background is None:
+            self._draw()
+            return
+        if self._draw_pending:
+            # The pending draw paints the overlays itself
+            return
+        self.blits += 1
+        try:
+            self.canvas.restore_region(self._background)
+            for artist in self._animated():
+                self.fig.draw_artist(artist)
+            self.canvas.blit(self.fig.bbox)
+        except Exception:
+            self._draw()
+
+    @contextlib.contextmanager
+    def static(self):
+        """Include the animated overlays in figure draws (savefig, PDF export)."""
+        animated = self._animated()
+        for artist in animated:
+            artist.set_animated(False)
+        try:
+            yield
+        finally:
+            for artist in animated:
+                artist.set_animated(True)
@@ -7,18 +7,49 @@ from tkinter import messagebox, filedialog, simpledialog, ttk
 import csv
 import threading
 import os
+import numpy as np
+import pandas as pd
+import alerts
+import chart_export
+import data_versions
+import seed_data
+import table_export
+from chart_layer import ChartLayer
 from db_handler import DBHandler
 from featured_media import FeaturedMediaFrame
+from import_utils import import_chunks, is_multi_farm, read_chunks
+from validation import ChunkValidator, rejects_path_for
+from virtual_table import VirtualTable
 
+# Latest alerts listed by show_alerts
+ALERTS_SHOWN = 30
 THEMES = ["cyborg", "minty", "solar", "morph", "pulse", "flatly", "superhero", "darkly", "cosmo", "journal", "litera", "sandstone", "yeti"]
 
+def _trends_query(farm_id, start_date=None, end_date=None):
+    """(query, params) of a farm's daily rows in a date range, as shown in the Dashboard table."""
+    query = """
+        SELECT c.date, c.temp_max, c.temp_min, c.rainfall,
+               m.daily_gdd, m.effective_rainfall, m.cumulative_gdd
+        FROM climate_data c
+        LEFT JOIN agri_metrics m ON c.farm_id = m.farm_id AND c.date = m.date
+        WHERE c.farm_id=?
+    """
+    params = [farm_id]
+    if start_date:
+        query += " AND c.date >= ?"
+        params.append(start_date)
+    if end_date:
+        query += " AND c.date <= ?"
+        params.append(end_date)
+    query += " ORDER BY c.date ASC"
+    return query, params
+
+
 class Dashboard(tb.Frame):
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
         self.style = tb.Style()
-        self.temp_alert_threshold = 35.0
-        self.rain_alert_threshold = 5.0
 
         # Main content area only
         main = tb.Frame(self)
@@ -85,17 +116,22 @@ class Dashboard(tb.Frame):
         self.ax_temp = None
         self.ax_gdd = None
         self.canvas = None
+        self.chart = None
         self._initialized = False
         self._shutdown = False
+        self.farms = []
+        self.selected_farm_id = None
+        # Per-farm data versions, polled while the page is visible (see data_versions.py)
+        self._versions = data_versions.VersionWatcher()
+        self._watching = False
 
         # Metrics table
         table_frame = tb.Frame(main, padding=10)
         table_frame.pack(pady=8, fill="x", expand=True)
-        self.table = ttk.Treeview(table_frame, columns=("date", "temp_max", "temp_min", "rain", "daily_gdd", "eff_rain", "cum_gdd"), show="headings", height=7)
-        for col, lbl in zip(self.table["columns"], ["Date", "Max T", "Min T", "Rain", "Daily GDD", "Eff Rain", "Cum GDD"]):
-            self.table.heading(col, text=lbl)
-        self.table.tag_configure('oddrow', background='#f0f0f0')
-        self.table.tag_configure('evenrow', background='#e0e0e0')
+        # Only the visible rows exist as Treeview items, however long the range
+        self.table = VirtualTable(table_frame, list(zip(
+            ("date", "temp_max", "temp_min", "rain", "daily_gdd", "eff_rain", "cum_gdd"),
+            ("Date", "Max T", "Min T", "Rain", "Daily GDD", "Eff Rain", "Cum GDD"))), height=7)
         self.table.pack(fill="x", expand=True)
 
         # Theme selection combobox
@@ -125,6 +161,7 @@ class Dashboard(tb.Frame):
             # create figure without constrained_layout to avoid collapsed axes warning
             self.fig, (self.ax_temp, self.ax_gdd) = plt.subplots(2, 1, figsize=(7, 7))
             self.canvas = FigureCanvasTkAgg(self.fig, master=self._chart_parent)
+            self.chart = ChartLayer(self.fig, self.canvas)
             self.canvas.draw()
             self.canvas.get_tk_widget().pack(fill="both", expand=True)
             try:
@@ -135,33 +172,20 @@ class Dashboard(tb.Frame):
         except Exception:
             pass
 
-        # Start background worker to import template (if present) and load farms
+        # From here on, only farms whose data version moves are refreshed
+        if not self._watching:
+            self._watching = True
+            self._versions.changed()
+            data_versions.watch(self, self._versions, self._apply_changes)
+
+        # Start background worker to seed the template (once per file content) and load farms
         def worker():
             try:
-                template_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "climate_template_2025.csv")
-                if os.path.exists(template_path):
-                    try:
-                        with open(template_path, "r", newline="") as f:
-                            reader = csv.DictReader(f)
-                            with DBHandler() as db:
-                                db.execute_query("INSERT OR IGNORE INTO farms (name, location, base_temp) VALUES (?, ?, ?)", ("Template Farm", "Unknown", 10.0))
-                                farm_row = db.fetch_one("SELECT id FROM farms WHERE name=?", ("Template Farm",))
-                                if farm_row:
-                                    farm_id = farm_row[0]
-                                    for row in reader:
-                                        try:
-                                            db.execute_query(
-                                                "INSERT OR REPLACE INTO climate_data (farm_id, date, temp_max, temp_min, rainfall) VALUES (?, ?, ?, ?, ?)",
-                                                (farm_id, row.get("date"), float(row.get("temp_max") or 0), float(row.get("temp_min") or 0), float(row.get("rainfall") or 0))
-                                            )
-                                            db.execute_query(
-                                                "INSERT OR REPLACE INTO agri_metrics (farm_id, date, daily_gdd, effective_rainfall, cumulative_gdd) VALUES (?, ?, ?, ?, ?)",
-                                                (farm_id, row.get("date"), float(row.get("daily_gdd") or 0), float(row.get("eff_rain") or 0), float(row.get("cum_gdd") or 0))
-                                            )
-                                        except Exception:
-                                            continue
-                    except Exception:
-                        pass
+                try:
+                    with DBHandler() as db:
+                        seed_data.seed_climate_template(db)
+                except Exception:
+                    pass
 
                 # fetch farms list
                 with DBHandler() as db:
@@ -182,8 +206,7 @@ class Dashboard(tb.Frame):
                             self.info_label.config(text="No farms in database.")
                             self.selected_farm_id = None
                             if hasattr(self, 'table') and self.table is not None:
-                                for row in self.table.get_children():
-                                    self.table.delete(row)
+                                self.table.clear()
                             self.update_chart()
                     except Exception:
                         pass
@@ -196,34 +219,16 @@ class Dashboard(tb.Frame):
 
     def auto_import_climate_template(self):
         """Force import of climate_template_2025.csv into a farm named 'Template Farm', and select it as default."""
-        import os
-        template_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "climate_template_2025.csv")
-        if not os.path.exists(template_path):
+        if not os.path.exists(seed_data.TEMPLATE_PATH):
             return
         try:
-            with open(template_path, "r", newline="") as f:
-                reader = csv.DictReader(f)
-                with DBHandler() as db:
-                    # Always create/find 'Template Farm'
-                    db.execute_query("INSERT OR IGNORE INTO farms (name, location, base_temp) VALUES (?, ?, ?)", ("Template Farm", "Unknown", 10.0))
-                    farm_row = db.fetch_one("SELECT id FROM farms WHERE name=?", ("Template Farm",))
-                    if not farm_row:
-                        return
-                    farm_id = farm_row[0]
-                    for row in reader:
-                        db.execute_query(
-                            "INSERT OR REPLACE INTO climate_data (farm_id, date, temp_max, temp_min, rainfall) VALUES (?, ?, ?, ?, ?)",
-                            (farm_id, row["date"], float(row["temp_max"]), float(row["temp_min"]), float(row["rainfall"]))
-                        )
-                        db.execute_query(
-                            "INSERT OR REPLACE INTO agri_metrics (farm_id, date, daily_gdd, effective_rainfall, cumulative_gdd) VALUES (?, ?, ?, ?, ?)",
-                            (farm_id, row["date"], float(row["daily_gdd"]), float(row["eff_rain"]), float(row["cum_gdd"]))
-                        )
+            with DBHandler() as db:
+                seed_data.seed_climate_template(db, force=True)
             # After import, set 'Template Farm' as selected
             self.load_farms()
             farm_names = [f[1] for f in self.farms]
-            if "Template Farm" in farm_names:
-                idx = farm_names.index("Template Farm")
+            if seed_data.TEMPLATE_FARM in farm_names:
+                idx = farm_names.index(seed_data.TEMPLATE_FARM)
                 self.farm_combo.current(idx)
                 self.selected_farm_id = self.farms[idx][0]
                 self.update_farm_info()
@@ -276,36 +281,42 @@ class Dashboard(tb.Frame):
             self.parent.destroy()
 
     def upload_csv(self):
+        """
+        Import a CSV through import_chunks on a worker thread: a farm_name column
+        loads every farm in the file (upserted with location, base_temp, lat/lon),
+        otherwise all rows go to the selected farm. Rejected rows go to
+        <file>_rejects.csv.
+        """
         from tkinter import filedialog, messagebox
         file_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")])
         if not file_path:
             return
         try:
-            with open(file_path, "r", newline="") as f:
-                reader = csv.reader(f)
-                headers = next(reader)
-                # Expecting columns: Date, Temp Max, Temp Min, Rainfall, Daily GDD, Eff Rain, Cum GDD
-                for row in reader:
-                    if len(row) < 7:
-                        continue
-                    date, temp_max, temp_min, rainfall, daily_gdd, eff_rain, cum_gdd = row[:7]
-                    # Insert into DB
-                    with DBHandler() as db:
-                        db.execute_query(
-                            "INSERT OR IGNORE INTO climate_data (farm_id, date, temp_max, temp_min, rainfall) VALUES (?, ?, ?, ?, ?)",
-                            (self.selected_farm_id, date, float(temp_max), float(temp_min), float(rainfall))
-                        )
-                        db.execute_query(
-                            "INSERT OR IGNORE INTO agri_metrics (farm_id, date, daily_gdd, effective_rainfall, cumulative_gdd) VALUES (?, ?, ?, ?, ?)",
-                            (self.selected_farm_id, date, float(daily_gdd), float(eff_rain), float(cum_gdd))
-                        )
-            self.refresh_data()
-            messagebox.showinfo("Upload", f"CSV data imported from {file_path}")
+            header = next(read_chunks(file_path, nrows=1)).columns
         except Exception as e:
-            messagebox.showerror("Upload Error", f"Failed to import CSV: {e}")
+            messagebox.showerror("Upload Error", f"Failed to read CSV: {e}")
+            return
+        farm_id = None if is_multi_farm(header) else self.selected_farm_id
+        if farm_id is None and not is_multi_farm(header):
+            messagebox.showwarning("Upload", "Select a farm first.")
+            return
+        rejects_path = rejects_path_for(file_path)
+
+        def worker():
+            try:
+                with ChunkValidator(rejects=rejects_path) as validator:
+                    summary = import_chunks(read_chunks(file_path), farm_id=farm_id, validator=validator)
+            except Exception as e:
+                self.safe_ui_update(messagebox.showerror, "Upload Error", f"Failed to import CSV: {e}")
+                return
+            msg = f"Imported {summary['inserted']} rows from {file_path}"
+            if summary["rejected"]:
+                msg += f"\n{summary['rejected']} rows rejected (see {os.path.basename(rejects_path)})."
+            # The watcher belongs to the Tk thread
+            self.safe_ui_update(lambda: self._apply_changes(self._versions.changed()))
+            self.safe_ui_update(messagebox.showinfo, "Upload", msg)
 
-        # --- Load farms and data ---
-        self.load_farms()
+        threading.Thread(target=worker, daemon=True).start()
 
     def load_sample_data(self):
         """Load sample data from sample_climate_data.csv into the database."""
@@ -315,30 +326,21 @@ class Dashboard(tb.Frame):
             messagebox.showerror("Sample Data", f"File not found: {sample_path}")
             return
         try:
-            with open(sample_path, "r", newline="") as f:
-                reader = csv.DictReader(f)
-                # Use first farm or create a default farm
-                with DBHandler() as db:
-                    farms = db.fetch_all("SELECT id FROM farms LIMIT 1")
-                    if farms:
-                        farm_id = farms[0][0]
+            # Use first farm or create a default farm
+            with DBHandler() as db:
+                farms = db.fetch_all("SELECT id FROM farms LIMIT 1")
+                if farms:
+                    farm_id = farms[0][0]
+                else:
+                    db.execute_query("INSERT INTO farms (name, location, base_temp) VALUES (?, ?, ?)", ("Sample Farm", "Unknown", 10.0))
+                    farm_row = db.fetch_one("SELECT id FROM farms WHERE name=?", ("Sample Farm",))
+                    if farm_row:
+                        farm_id = farm_row[0]
                     else:
-                        db.execute_query("INSERT INTO farms (name, location, base_temp) VALUES (?, ?, ?)", ("Sample Farm", "Unknown", 10.0))
-                        farm_row = db.fetch_one("SELECT id FROM farms WHERE name=?", ("Sample Farm",))
-                        if farm_row:
-                            farm_id = farm_row[0]
-                        else:
-                            messagebox.showerror("Sample Data Error", "Could not create or find Sample Farm in database.")
-                            return
-                    for row in reader:
-                        db.execute_query(
-                            "INSERT OR IGNORE INTO climate_data (farm_id, date, temp_max, temp_min, rainfall) VALUES (?, ?, ?, ?, ?)",
-                            (farm_id, row["date"], float(row["temp_max"]), float(row["temp_min"]), float(row["rainfall"]))
-                        )
-                        db.execute_query(
-                            "INSERT OR IGNORE INTO agri_metrics (farm_id, date, daily_gdd, effective_rainfall, cumulative_gdd) VALUES (?, ?, ?, ?, ?)",
-                            (farm_id, row["date"], float(row["daily_gdd"]), float(row["eff_rain"]), float(row["cum_gdd"]))
-                        )
+                        messagebox.showerror("Sample Data Error", "Could not create or find Sample Farm in database.")
+                        return
+            # Existing days are kept; metrics, pyramid, alerts and caches follow the import
+            import_chunks(read_chunks(sample_path), farm_id=farm_id, on_conflict="IGNORE")
             self.refresh_data()
             messagebox.showinfo("Sample Data", "Sample climate data loaded successfully.")
         except Exception as e:
@@ -353,20 +355,31 @@ class Dashboard(tb.Frame):
     def load_farms(self):
         with DBHandler() as db:
             self.farms = db.fetch_all("SELECT id, name FROM farms ORDER BY name")
-        if self.farms:
-            farm_names = [f[1] for f in self.farms]
-            self.farm_combo["values"] = farm_names
-            # Do not create heavy matplotlib objects here; on_show handles chart initialization.
-            # Clear table rows if present
+        self.farm_combo["values"] = [f[1] for f in self.farms]
+        ids = [f[0] for f in self.farms]
+        if self.selected_farm_id in ids:
+            # Keep the selection (a rename may have moved it in the list)
+            self.farm_combo.current(ids.index(self.selected_farm_id))
+        else:
+            self.selected_farm_id = None
+            self.farm_combo.set("")
             if hasattr(self, 'table') and self.table is not None:
-                for row in self.table.get_children():
-                    try:
-                        self.table.delete(row)
-                    except Exception:
-                        pass
+                self.table.clear()
 
         # Note: template import and farms loading is handled by on_show() background worker to avoid duplicate work.
 
+    def _apply_changes(self, changed):
+        """Refresh what moving data versions affect: the farm list and/or the selected farm."""
+        if data_versions.FARM_LIST in changed:
+            self.load_farms()
+            if self.selected_farm_id is None and self.farms:
+                self.farm_combo.current(0)
+                self.selected_farm_id = self.farms[0][0]
+                changed = changed | {self.selected_farm_id}
+        if self.selected_farm_id is not None and self.selected_farm_id in changed:
+            self.update_farm_info()
+            self.update_chart(*getattr(self, '_trend_range', (None, None)))
+
     def update_farm_info(self):
         with DBHandler() as db:
             farm = db.fetch_one("SELECT name, location, base_temp FROM farms WHERE id=?", (self.selected_farm_id,))
@@ -379,21 +392,9 @@ class Dashboard(tb.Frame):
     def get_trends(self, start_date=None, end_date=None):
         if not self.selected_farm_id:
             return [], [], [], [], [], [], []
-        query = """
-            SELECT c.date, c.temp_max, c.temp_min, c.rainfall,
-                   m.daily_gdd, m.effective_rainfall, m.cumulative_gdd
-            FROM climate_data c
-            LEFT JOIN agri_metrics m ON c.farm_id = m.farm_id AND c.date = m.date
-            WHERE c.farm_id=?
-        """
-        params = [self.selected_farm_id]
-        if start_date:
-            query += " AND c.date >= ?"
-            params.append(start_date)
-        if end_date:
-            query += " AND c.date <= ?"
-            params.append(end_date)
-        query += " ORDER BY c.date ASC"
+        # The range on display, re-queried by export_csv
+        self._trend_range = (start_date, end_date)
+        query, params = _trends_query(self.selected_farm_id, start_date, end_date)
         with DBHandler() as db:
             cursor = db.execute_query(query, tuple(params))
             rows = cursor.fetchall() if cursor else []
@@ -419,31 +420,25 @@ class Dashboard(tb.Frame):
 
         dates, temp_max, temp_min, rain, daily_gdd, eff_rain, cum_gdd = self.get_trends(start_date, end_date)
         # If axes are still not created, skip updating chart
-        if self.ax_temp is None or self.ax_gdd is None:
+        if self.ax_temp is None or self.ax_gdd is None or self.chart is None:
             return
-        self.ax_temp.clear()
-        self.ax_gdd.clear()
-        # Table
-        for row in self.table.get_children():
-            self.table.delete(row)
+        chart = self.chart
+        chart.begin()
         # Summary stats
         if dates:
-            self.ax_temp.plot(dates, temp_max, marker="o", color="#0d6efd", label="Max Temp")
-            self.ax_temp.plot(dates, temp_min, marker="s", color="#33aa33", label="Min Temp")
-            self.ax_temp.set_title("Temperature Trend")
-            self.ax_temp.set_xlabel("Date")
-            self.ax_temp.set_ylabel("Temperature (°C)")
-            self.ax_temp.legend()
-            self.ax_gdd.plot(dates, daily_gdd, marker="s", color="orange", label="Daily GDD")
-            self.ax_gdd.plot(dates, eff_rain, marker="^", color="green", label="Eff. Rainfall")
-            self.ax_gdd.plot(dates, cum_gdd, marker="D", color="purple", label="Cumulative GDD")
-            self.ax_gdd.set_title("Agri Metrics Trend")
-            self.ax_gdd.set_xlabel("Date")
-            self.ax_gdd.set_ylabel("Value")
-            self.ax_gdd.legend()
+            # Persistent artists: switching farm or range only updates their data
+            x = np.array(dates, dtype="datetime64[D]")
+            values = lambda v: np.array(v, dtype=float)
+            chart.line("temp_max", x, values(temp_max), ax=self.ax_temp, downsample="lttb", marker="o", color="#0d6efd", label="Max Temp")
+            chart.line("temp_min", x, values(temp_min), ax=self.ax_temp, downsample="lttb", marker="s", color="#33aa33", label="Min Temp")
+            chart.labels(self.ax_temp, "Temperature Trend", "Date", "Temperature (°C)", dates=True)
+            chart.line("daily_gdd", x, values(daily_gdd), ax=self.ax_gdd, downsample="lttb", marker="s", color="orange", label="Daily GDD")
+            chart.line("eff_rain", x, values(eff_rain), ax=self.ax_gdd, downsample="lttb", marker="^", color="green", label="Eff. Rainfall")
+            chart.line("cum_gdd", x, values(cum_gdd), ax=self.ax_gdd, downsample="lttb", marker="D", color="purple", label="Cumulative GDD")
+            chart.labels(self.ax_gdd, "Agri Metrics Trend", "Date", "Value", dates=True)
             # Fill table
-            for row in zip(dates, temp_max, temp_min, rain, daily_gdd, eff_rain, cum_gdd):
-                self.table.insert('', 'end', values=[*row])
+            self.table.set_data({"date": dates, "temp_max": temp_max, "temp_min": temp_min, "rain": rain,
+                                 "daily_gdd": daily_gdd, "eff_rain": eff_rain, "cum_gdd": cum_gdd})
             # Cards
             temp_vals = [t for t in temp_max if t is not None]
             min_vals = [t for t in temp_min if t is not None]
@@ -455,98 +450,83 @@ class Dashboard(tb.Frame):
             self.min_temp_label.config(text=f"Min T: {min(min_vals):.1f}°C" if min_vals else "Min T: --")
             self.max_temp_label.config(text=f"Max T: {max(temp_vals):.1f}°C" if temp_vals else "Max T: --")
         else:
-            if self.ax_temp is not None:
-                self.ax_temp.text(0.5, 0.5, "No data available", ha="center", va="center", fontsize=12)
-                self.ax_temp.set_xticks([])
-                self.ax_temp.set_yticks([])
-                self.ax_temp.set_title("Temperature Trend")
-            if self.ax_gdd is not None:
-                self.ax_gdd.text(0.5, 0.5, "No data available", ha="center", va="center", fontsize=12)
-                self.ax_gdd.set_xticks([])
-                self.ax_gdd.set_yticks([])
-                self.ax_gdd.set_title("Agri Metrics Trend")
+            self.table.clear()
+            chart.message(self.ax_temp, "No data available")
+            chart.labels(self.ax_temp, "Temperature Trend")
+            chart.message(self.ax_gdd, "No data available")
+            chart.labels(self.ax_gdd, "Agri Metrics Trend")
             self.avg_temp_label.config(text="Avg Temp: --")
             self.total_rain_label.config(text="Total Rain: --")
             self.gdd_label.config(text="Cum. GDD: --")
             self.min_temp_label.config(text="Min Temp: --")
             self.max_temp_label.config(text="Max Temp: --")
         try:
-            if self.canvas:
-                self.canvas.draw()
+            chart.end()
         except Exception:
             pass
 
     def refresh_data(self):
-        self.load_farms()
+        # Only the farms whose data version moved are reloaded
+        changed = self._versions.changed()
+        self._apply_changes(changed)
         if self.winfo_exists():
-            messagebox.showinfo("Info", "Data has been refreshed.")
+            messagebox.showinfo("Info", "Data has been refreshed." if changed else "Data is already up to date.")
 
     # ----- Export Features -----
     def export_report(self):
         file_path = filedialog.asksaveasfilename(defaultextension=".png", filetypes=[("PNG Files", "*.png"), ("All Files", "*.*")])
         if file_path:
-            try:
-                if not getattr(self, '_initialized', False):
-                    self.on_show()
-            except Exception:
-                pass
-            if self.fig:
-                self.fig.savefig(file_path)
-            messagebox.showinfo("Export", f"Chart exported to:\n{file_path}")
+            self._export_chart(file_path, f"Chart exported to:\n{file_path}")
+
+    def _export_chart(self, file_path, message):
+        """Render the chart at print DPI in a worker process (format from the file extension)."""
+        try:
+            if not getattr(self, '_initialized', False):
+                self.on_show()
+        except Exception:
+            pass
+        if not self.fig:
+            return
+        task = chart_export.snapshot_task(self.fig, file_path, layer=self.chart)
+
+        def finished(job):
+            if job.errors:
+                self.safe_ui_update(messagebox.showerror, "Export", f"Export failed:\n{job.errors[0][1]}")
+            else:
+                self.safe_ui_update(messagebox.showinfo, "Export", message)
+
+        chart_export.get_service().submit([task], done=finished)
 
     def export_csv(self):
-        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")])
+        """Stream the table's rows from the database (CSV, gzip CSV, Parquet or Excel by extension)."""
+        if not self.selected_farm_id:
+            messagebox.showwarning("Export", "Select a farm to export.")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=table_export.FILETYPES)
         if file_path:
-            with open(file_path, "w", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow(["Date", "Temp Max", "Temp Min", "Rainfall", "Daily GDD", "Eff Rain", "Cum GDD"])
-                for row in self.table.get_children():
-                    writer.writerow(self.table.item(row)["values"])
-            messagebox.showinfo("Export", f"Table exported to:\n{file_path}")
+            query, params = _trends_query(self.selected_farm_id, *getattr(self, '_trend_range', (None, None)))
+            job = table_export.export_query(
+                query, params, file_path,
+                headers=["Date", "Temp Max", "Temp Min", "Rainfall", "Daily GDD", "Eff Rain", "Cum GDD"])
+            table_export.show_progress(self, job, "Export")
 
     def export_pdf(self):
-        try:
-            from matplotlib.backends.backend_pdf import PdfPages
-        except ImportError:
-            messagebox.showerror("Export PDF", "matplotlib.backends.backend_pdf not available.")
-            return
         file_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF Files", "*.pdf"), ("All Files", "*.*")])
         if file_path:
-            try:
-                if not getattr(self, '_initialized', False):
-                    self.on_show()
-            except Exception:
-                pass
-            if self.fig:
-                with PdfPages(file_path) as pdf:
-                    pdf.savefig(self.fig)
-            messagebox.showinfo("Export", f"Chart PDF exported to:\n{file_path}")
+            self._export_chart(file_path, f"Chart PDF exported to:\n{file_path}")
 
     # ----- Alerts -----
     def show_alerts(self):
         if not self.selected_farm_id:
             messagebox.showwarning("Alerts", "No farm selected.")
             return
+        # Alerts are raised as data is imported (see alerts.py); a farm whose rows
+        # predate the alerts table is evaluated once here
         with DBHandler() as db:
-            results = db.fetch_all(
-                """
-                SELECT c.date, c.temp_max, m.effective_rainfall
-                FROM climate_data c
-                LEFT JOIN agri_metrics m ON c.farm_id = m.farm_id AND c.date = m.date
-                WHERE c.farm_id=?
-                ORDER BY c.date DESC LIMIT 20
-                """,
-                (self.selected_farm_id,)
-            )
-        temp_alerts = [f"{date}: {t}°C" for date, t, _ in results if t is not None and t > self.temp_alert_threshold]
-        rain_alerts = [f"{date}: {r}mm" for date, _, r in results if r is not None and r < self.rain_alert_threshold]
-        msg = ""
-        if temp_alerts:
-            msg += f"High temperature warning! (>{self.temp_alert_threshold}°C)\n" + "\n".join(temp_alerts) + "\n\n"
-        if rain_alerts:
-            msg += f"Low effective rainfall warning! (<{self.rain_alert_threshold}mm)\n" + "\n".join(rain_alerts)
-        if msg:
-            messagebox.showwarning("Alerts", msg)
+            alerts.ensure_evaluated(db, self.selected_farm_id)
+            results = alerts.farm_alerts(db, self.selected_farm_id, limit=ALERTS_SHOWN)
+        if results:
+            messagebox.showwarning("Alerts", "\n".join(f"{a['date']}  {a['message']}" for a in results))
         else:
             messagebox.showinfo("Alerts", "No alerts. All metrics are normal.")
 
@@ -578,33 +558,43 @@ class Dashboard(tb.Frame):
             eff_rain = simpledialog.askfloat("Add Data", "Eff. Rainfall (mm):")
             cum_gdd = simpledialog.askfloat("Add Data", "Cumulative GDD:")
             if date and temp_max is not None and temp_min is not None and rainfall is not None:
-                with DBHandler() as db:
-                    db.execute_query(
-                        "INSERT INTO climate_data (farm_id, date, temp_max, temp_min, rainfall) VALUES (?, ?, ?, ?, ?)",
-                        (self.selected_farm_id, date, temp_max, temp_min, rainfall)
-                    )
-                    db.execute_query(
-                        "INSERT INTO agri_metrics (farm_id, date, daily_gdd, effective_rainfall, cumulative_gdd) VALUES (?, ?, ?, ?, ?)",
-                        (self.selected_farm_id, date, daily_gdd, eff_rain, cum_gdd)
-                    )
-                self.refresh_data()
+                summary = self._write_entry(date, temp_max, temp_min, rainfall, daily_gdd, eff_rain, cum_gdd,
+                                            on_conflict="IGNORE")
+                if summary["rejected"]:
+                    messagebox.showerror("Add Data", f"Invalid entry for {date}; nothing was saved.")
+                elif summary["skipped"]:
+                    messagebox.showwarning("Add Data", f"Data for {date} already exists; use Edit to change it.")
+                else:
+                    self.refresh_data()
+
+    def _write_entry(self, date, temp_max, temp_min, rainfall, daily_gdd, eff_rain, cum_gdd, on_conflict="REPLACE"):
+        """
+        Write one day of the selected farm through import_chunks, so missing
+        metrics are derived and the cumulative GDD, pyramid, alerts and series
+        cache follow the edit. Returns the import summary.
+        """
+        row = pd.DataFrame([{
+            "date": date, "temp_max": temp_max, "temp_min": temp_min, "rainfall": rainfall,
+            "daily_gdd": daily_gdd, "effective_rainfall": eff_rain, "cumulative_gdd": cum_gdd
+        }])
+        with ChunkValidator() as validator:
+            return import_chunks([row], farm_id=self.selected_farm_id, validator=validator, on_conflict=on_conflict)
 
     def edit_entry(self):
         # Edit selected table row (climate data/agri metrics)
         if not hasattr(self, 'table') or self.table is None:
             messagebox.showerror("Edit Error", "Table widget is not initialized. Please refresh or restart the dashboard.")
             return
-        sel = self.table.selection()
+        sel = self.table.selected_indices()
         if not sel:
             # Try to select the first row automatically
-            children = self.table.get_children()
-            if children:
-                self.table.selection_set(children[0])
-                sel = self.table.selection()
+            if len(self.table.model):
+                self.table.select([self.table.model.index(0)])
+                sel = self.table.selected_indices()
             else:
                 messagebox.showwarning("Edit", "No rows available to edit.")
                 return
-        vals = self.table.item(sel[0])["values"]
+        vals = self.table.row_values(sel[0])
         if not vals or not self.selected_farm_id:
             messagebox.showerror("Edit Error", "No farm or row selected.")
             return
@@ -616,16 +606,8 @@ class Dashboard(tb.Frame):
         eff_rain = simpledialog.askfloat("Edit Data", "Eff. Rainfall:", initialvalue=float(vals[5]) if vals[5] is not None else None)
         cum_gdd = simpledialog.askfloat("Edit Data", "Cumulative GDD:", initialvalue=float(vals[6]) if vals[6] is not None else None)
         if temp_max is not None and temp_min is not None and rainfall is not None:
-            with DBHandler() as db:
-                result1 = db.execute_query(
-                    "UPDATE climate_data SET temp_max=?, temp_min=?, rainfall=? WHERE farm_id=? AND date=?",
-                    (temp_max, temp_min, rainfall, self.selected_farm_id, date)
-                )
-                result2 = db.execute_query(
-                    "UPDATE agri_metrics SET daily_gdd=?, effective_rainfall=?, cumulative_gdd=? WHERE farm_id=? AND date=?",
-                    (daily_gdd, eff_rain, cum_gdd, self.selected_farm_id, date)
-                )
-            if result1 and result2:
+            summary = self._write_entry(date, temp_max, temp_min, rainfall, daily_gdd, eff_rain, cum_gdd)
+            if summary["inserted"]:
                 self.refresh_data()
                 messagebox.showinfo("Edit", "Entry updated successfully.")
             else:
@@ -636,31 +618,24 @@ class Dashboard(tb.Frame):
         if not hasattr(self, 'table') or self.table is None:
             messagebox.showerror("Delete Error", "Table widget is not initialized. Please refresh or restart the dashboard.")
             return
-        sel = self.table.selection()
+        sel = self.table.selected_indices()
         if not sel:
             # Try to select the first row automatically
-            children = self.table.get_children()
-            if children:
-                self.table.selection_set(children[0])
-                sel = self.table.selection()
+            if len(self.table.model):
+                self.table.select([self.table.model.index(0)])
+                sel = self.table.selected_indices()
             else:
                 messagebox.showwarning("Delete", "No rows available to delete.")
                 return
-        vals = self.table.item(sel[0])["values"]
+        vals = self.table.row_values(sel[0])
         if not vals or not self.selected_farm_id:
             messagebox.showerror("Delete Error", "No farm or row selected.")
             return
         date = vals[0]
+        # delete_data_entry rebuilds what depends on the day (cumulative GDD, pyramid, alerts)
         with DBHandler() as db:
-            result1 = db.execute_query(
-                "DELETE FROM climate_data WHERE farm_id=? AND date=?",
-                (self.selected_farm_id, date)
-            )
-            result2 = db.execute_query(
-                "DELETE FROM agri_metrics WHERE farm_id=? AND date=?",
-                (self.selected_farm_id, date)
-            )
-        if result1 and result2:
+            deleted = db.delete_data_entry(self.selected_farm_id, date)
+        if deleted:
             self.refresh_data()
             messagebox.showinfo("Delete", "Entry deleted successfully.")
         else:
@@ -0,0 +1,145 @@
+"""
+data_versions.py
+Cheap change detection for pages that show database data.
+
+Triggers on farms, climate_data and agri_metrics bump a counter in the
+data_versions table on every insert, update or delete, whichever process or
+thread makes it:
+
+    key = farm id    that farm's rows or its farms entry changed
+    FARM_LIST (-1)   the farms table changed (a farm added, renamed or removed)
+
+A VersionWatcher keeps its own read-only connection and first asks SQLite
+whether anything was committed since its last look (PRAGMA data_version, no
+table access); only then does it read the counters to tell which farms moved.
+watch() polls a watcher from a Tk widget's after() loop while the widget is on
+screen, so pages refresh just the farms whose data moved, and do nothing when
+nothing did.
+
+Usage:
+    watcher = VersionWatcher()
+    watcher.changed()        # set of keys that moved since the last call (empty if none)
+    watch(page, watcher, lambda changed: ...)
+"""
+
+import sqlite3
+from typing import Any, Callable, Dict, Optional, Set
+
+FARM_LIST = -1
+POLL_MS = 2000
+# Tables whose rows carry a farm_id (farms itself is keyed by its id)
+DATA_TABLES = ("climate_data", "agri_metrics")
+
+
+def _bump(*keys: str) -> str:
+    values = ", ".join(f"({key}, 1)" for key in keys)
+    return (f"INSERT INTO data_versions (key, version) VALUES {values} "
+            "ON CONFLICT(key) DO UPDATE SET version = version + 1;")
+
+
+def install(cursor) -> None:
+    """Create the data_versions table and its triggers (idempotent; called by connect_db)."""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS data_versions (
+            key INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+        """
+    )
+    triggers = []
+    for table in DATA_TABLES:
+        new, old = "COALESCE(NEW.farm_id, 0)", "COALESCE(OLD.farm_id, 0)"
+        triggers += [
+            (f"{table}_ins", f"AFTER INSERT ON {table}", _bump(new)),
+            # Most updates keep the farm, so the second bump only runs when it moves
+            (f"{table}_upd", f"AFTER UPDATE ON {table}",
+             _bump(new) + f" UPDATE data_versions SET version = version + 1 WHERE key = {old} AND {old} != {new};"),
+            (f"{table}_del", f"AFTER DELETE ON {table}", _bump(old)),
+        ]
+    triggers += [
+        ("farms_ins", "AFTER INSERT ON farms", _bump("NEW.id", str(FARM_LIST))),
+        ("farms_upd", "AFTER UPDATE ON farms", _bump("NEW.id", str(FARM_LIST))),
+        ("farms_del", "AFTER DELETE ON farms", _bump("OLD.id", str(FARM_LIST))),
+    ]
+    for name, event, body in triggers:
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS data_version_{name} {event} BEGIN {body} END")
+
+
+def versions(conn) -> Dict[int, int]:
+    """Every counter, by key."""
+    return {row[0]: row[1] for row in conn.execute("SELECT key, version FROM data_versions").fetchall()}
+
+
+class VersionWatcher:
+    """
+    Remembers the counters it saw last. changed() returns the keys that moved
+    since the previous call (every key on the first call). Keeps one plain
+    connection open, so use a watcher from a single thread.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path
+        self.seen: Optional[Dict[int, int]] = None
+        self._data_version: Optional[int] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            from db_handler import DB_FILE, connect_db
+
+            path = self.db_path or DB_FILE
+            # connect_db installs the table and triggers; polling then uses a bare connection
+            setup = connect_db(path)
+            if setup is not None:
+                setup.close()
+            self._conn = sqlite3.connect(path)
+        return self._conn
+
+    def changed(self) -> Set[int]:
+        conn = self._connection()
+        # Moves whenever another connection commits; this one never writes
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if self.seen is not None and data_version == self._data_version:
+            return set()
+        self._data_version = data_version
+        current = versions(conn)
+        if self.seen is None:
+            moved = set(current)
+        else:
+            moved = {key for key in current.keys() | self.seen.keys() if current.get(key) != self.seen.get(key)}
+        self.seen = current
+        return moved
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+            # data_version values only compare within one connection
+            self._data_version = None
+
+
+def watch(widget: Any, watcher: VersionWatcher, callback: Callable[[Set[int]], None],
+          interval_ms: int = POLL_MS) -> None:
+    """
+    Poll ``watcher`` every ``interval_ms`` from ``widget``'s Tk loop and call
+    ``callback(changed_keys)`` when something moved. Polls are skipped while the
+    widget is not mapped; the loop ends when it is destroyed or shut down.
+    """
+    def poll():
+        try:
+            if getattr(widget, "_shutdown", False) or not widget.winfo_exists():
+                watcher.close()
+                return
+            if widget.winfo_ismapped():
+                moved = watcher.changed()
+                if moved:
+                    callback(moved)
+        except Exception:
+            pass
+        try:
+            widget.after(interval_ms, poll)
+        except Exception:
+            watcher.close()
+
+    widget.after(interval_ms, poll)
@@ -0,0 +1,222 @@
+"""
+datagen.py
+Synthetic daily climate data for benchmarking pages and importers.
+
+Generates N farms x M years of daily rows with:
+    - seasonal temperature curves (hemisphere-aware, per-farm mean/amplitude,
+      autocorrelated day-to-day anomalies, variable diurnal range)
+    - clustered rain events (a two-state wet/dry Markov chain with seasonal
+      wet-day probability and gamma-distributed amounts)
+    - daily GDD from each farm's base_temp (metrics.daily_gdd), accumulated
+      per calendar year
+    - configurable missing days and outliers
+Output goes to CSV, Excel (write-only workbook) or straight into SQLite with
+executemany, farm block by farm block so memory stays flat. The same seed
+always produces the same data.
+
+Usage:
+    python datagen.py --farms 100 --years 10 --out bench.csv
+    python datagen.py --farms 1000 --years 10 --format sqlite --out bench.db --seed 7
+"""
+
+import argparse
+import os
+import time
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from metrics import daily_gdd, effective_rainfall
+
+OUTPUT_COLUMNS = [
+    "date", "temp_max", "temp_min", "rainfall", "daily_gdd", "effective_rainfall", "cumulative_gdd",
+    "location", "farm_name", "base_temp", "lat", "lon",
+]
+# Farms generated (and written) per block
+FARMS_PER_BLOCK = 50
+# Excel sheets hold at most 1,048,576 rows including the header
+EXCEL_MAX_ROWS = 1_048_575
+
+
+def _farm_profiles(rng: np.random.Generator, n: int) -> pd.DataFrame:
+    """Per-farm location and climate parameters."""
+    lat = np.round(rng.uniform(-40.0, 55.0, n), 4)
+    lon = np.round(rng.uniform(-120.0, 150.0, n), 4)
+    latitude = np.abs(lat)
+    return pd.DataFrame({
+        "lat": lat,
+        "lon": lon,
+        # Warmer and less seasonal towards the equator
+        "mean_temp": 28.0 - 0.35 * latitude + rng.normal(0.0, 1.5, n),
+        "amplitude": 2.0 + 0.22 * latitude + rng.normal(0.0, 1.0, n).clip(-1.5, 1.5),
+        "diurnal": rng.uniform(7.0, 14.0, n),
+        "wet_fraction": rng.uniform(0.15, 0.45, n),
+        "rain_scale": rng.uniform(4.0, 11.0, n),
+        "base_temp": rng.choice([5.0, 8.0, 10.0, 12.0], n),
+    })
+
+
+def generate_block(rng: np.random.Generator, profiles: pd.DataFrame, first_farm: int, dates: pd.DatetimeIndex,
+                   missing_rate: float = 0.0, outlier_rate: float = 0.0) -> pd.DataFrame:
+    """Generate the daily rows of a block of farms (farm-major, date-minor order)."""
+    n_farms = len(profiles)
+    n_days = len(dates)
+    doy = dates.dayofyear.to_numpy(dtype=float)
+    south = (profiles["lat"].to_numpy() < 0)[:, None]
+    # Warmest around day 200 in the north, day 17 in the south
+    peak = np.where(south, 17.0, 200.0)
+    season = np.cos(2.0 * np.pi * (doy[None, :] - peak) / 365.25)
+
+    # AR(1) anomalies: a few days of persistence, vectorized across farms
+    shocks = rng.normal(0.0, 1.6, (n_farms, n_days))
+    anomaly = np.empty_like(shocks)
+    anomaly[:, 0] = shocks[:, 0]
+    for t in range(1, n_days):
+        anomaly[:, t] = 0.7 * anomaly[:, t - 1] + shocks[:, t]
+
+    mean = profiles["mean_temp"].to_numpy()[:, None] + profiles["amplitude"].to_numpy()[:, None] * season + anomaly
+    half_range = (profiles["diurnal"].to_numpy()[:, None] + rng.normal(0.0, 1.2, (n_farms, n_days))).clip(2.0) / 2.0
+
+    # Wet/dry Markov chain: rain is more likely after a wet day, and in the wet season
+    wet_prob = profiles["wet_fraction"].to_numpy()[:, None] * (1.0 + 0.6 * -season)
+    p_wet_after_dry = (0.7 * wet_prob).clip(0.01, 0.95)
+    p_wet_after_wet = (wet_prob + 0.35).clip(0.05, 0.97)
+    draws = rng.random((n_farms, n_days))
+    wet = np.empty((n_farms, n_days), dtype=bool)
+    wet[:, 0] = draws[:, 0] < wet_prob[:, 0]
+    for t in range(1, n_days):
+        wet[:, t] = draws[:, t] < np.where(wet[:, t - 1], p_wet_after_wet[:, t], p_wet_after_dry[:, t])
+    amounts = rng.gamma(0.8, profiles["rain_scale"].to_numpy()[:, None], (n_farms, n_days))
+    rainfall = np.where(wet, np.round(amounts, 1), 0.0)
+    # Rainy days are a little cooler
+    mean = mean - 1.5 * wet
+
+    temp_max = np.round(mean + half_range, 1)
+    temp_min = np.round(mean - half_range, 1)
+    base = profiles["base_temp"].to_numpy()[:, None]
+    gdd = np.round(daily_gdd(temp_max, temp_min, base), 2)
+    # Cumulative GDD restarts every calendar year (one season per year)
+    running = np.cumsum(gdd, axis=1)
+    year_start = np.flatnonzero(np.r_[True, dates.year[1:] != dates.year[:-1]])
+    first_of_year = year_start[np.searchsorted(year_start, np.arange(n_days), side="right") - 1]
+    before = np.where(first_of_year > 0, running[:, np.maximum(first_of_year - 1, 0)], 0.0)
+    cumulative = np.round(running - before, 2)
+    eff = np.round(effective_rainfall(rainfall), 2)
+
+    if outlier_rate > 0:
+        # Sensor faults: temperature spikes and implausible rain totals
+        spikes = rng.random((n_farms, n_days)) < outlier_rate
+        jump = rng.choice([-1.0, 1.0], spikes.shape) * rng.uniform(25.0, 45.0, spikes.shape)
+        temp_max = np.where(spikes, np.round(temp_max + jump, 1), temp_max)
+        floods = rng.random((n_farms, n_days)) < outlier_rate / 4.0
+        rainfall = np.where(floods, np.round(rng.uniform(500.0, 1500.0, floods.shape), 1), rainfall)
+
+    index = np.arange(first_farm, first_farm + n_farms)
+    farm_names = np.array([f"Farm{i:04d}" for i in index], dtype=object)
+    locations = np.array([f"Location{i:04d}" for i in index], dtype=object)
+    date_strings = dates.strftime("%Y-%m-%d").to_numpy(dtype=object)
+    frame = pd.DataFrame({
+        "date": np.tile(date_strings, n_farms),
+        "temp_max": temp_max.ravel(),
+        "temp_min": temp_min.ravel(),
+        "rainfall": rainfall.ravel(),
+        "daily_gdd": gdd.ravel(),
+        "effective_rainfall": eff.ravel(),
+        "cumulative_gdd": cumulative.ravel(),
+        "location": np.repeat(locations, n_days),
+        "farm_name": np.repeat(farm_names, n_days),
+        "base_temp": np.repeat(base[:, 0], n_days),
+        "lat": np.repeat(profiles["lat"].to_numpy(), n_days),
+        "lon": np.repeat(profiles["lon"].to_numpy(), n_days),
+    })
+    if missing_rate > 0:
+        frame = frame[rng.random(len(frame)) >= missing_rate]
+    return frame
+
+
+def generate(farms: int, years: int, start_year: int = 2015, seed: int = 42, missing_rate: float = 0.0,
+             outlier_rate: float = 0.0, block_farms: int = FARMS_PER_BLOCK) -> Iterator[pd.DataFrame]:
+    """Yield DataFrame blocks covering all farms. Deterministic for a given seed."""
+    rng = np.random.default_rng(seed)
+    profiles = _farm_profiles(rng, farms)
+    dates = pd.date_range(f"{start_year}-01-01", f"{start_year + years - 1}-12-31", freq="D")
+    for start in range(0, farms, block_farms):
+        # One child generator per block keeps blocks reproducible whatever the block order
+        block_rng = np.random.default_rng([seed, start])
+        yield generate_block(block_rng, profiles.iloc[start:start + block_farms].reset_index(drop=True),
+                             start + 1, dates, missing_rate, outlier_rate)
+
+
+def write_csv(blocks, path: str) -> int:
+    rows = 0
+    with open(path, "w", newline="") as f:
+        for i, block in enumerate(blocks):
+            block.to_csv(f, header=(i == 0), index=False, columns=OUTPUT_COLUMNS)
+            rows += len(block)
+    return rows
+
+
+def write_excel(blocks, path: str) -> int:
+    """Write-only openpyxl workbook; spills into extra sheets past Excel's row limit."""
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = EXCEL_MAX_ROWS
+    rows = 0
+    for block in blocks:
+        for values in block[OUTPUT_COLUMNS].itertuples(index=False, name=None):
+            if sheet_rows >= EXCEL_MAX_ROWS:
+                sheet = wb.create_sheet(f"data{len(wb.worksheets) + 1}")
+                sheet.append(OUTPUT_COLUMNS)
+                sheet_rows = 0
+            sheet.append(values)
+            sheet_rows += 1
+            rows += 1
+    wb.save(path)
+    return rows
+
+
+def write_sqlite(blocks, path: str) -> int:
+    """Insert straight into farms / climate_data / agri_metrics, one transaction per block."""
+    from db_handler import DBHandler
+    from import_utils import FarmResolver, write_chunk
+    rows = 0
+    resolver = FarmResolver()
+    with DBHandler(path) as db:
+        db.conn.execute("PRAGMA journal_mode=WAL")
+        db.conn.execute("PRAGMA synchronous=NORMAL")
+        for block in blocks:
+            with db.transaction():
+                written, _ = write_chunk(db, resolver.resolve(db, block), on_conflict="REPLACE")
+            rows += written
+    return rows
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Generate synthetic daily climate data for benchmarks.")
+    parser.add_argument("--farms", type=int, default=10, help="Number of farms (default 10)")
+    parser.add_argument("--years", type=int, default=1, help="Years of daily data per farm (default 1)")
+    parser.add_argument("--start-year", type=int, default=2015)
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (same seed, same data)")
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="Fraction of days dropped (e.g. 0.01)")
+    parser.add_argument("--outlier-rate", type=float, default=0.0, help="Fraction of days with sensor faults")
+    parser.add_argument("--format", choices=["csv", "excel", "sqlite"], help="Output format (default: from --out extension)")
+    parser.add_argument("--out", required=True, help="Output file (.csv, .xlsx or .db)")
+    args = parser.parse_args(argv)
+
+    fmt = args.format
+    if fmt is None:
+        ext = os.path.splitext(args.out)[1].lower()
+        fmt = {".xlsx": "excel", ".xls": "excel", ".db": "sqlite", ".sqlite": "sqlite"}.get(ext, "csv")
+    blocks = generate(args.farms, args.years, args.start_year, args.seed, args.missing_rate, args.outlier_rate)
+    writer = {"csv": write_csv, "excel": write_excel, "sqlite": write_sqlite}[fmt]
+    started = time.perf_counter()
+    rows = writer(blocks, args.out)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {rows:,} rows ({args.farms} farms x {args.years} years) to {args.out} "
+          f"in {elapsed:.1f}s ({rows / max(elapsed, 1e-9) * 60:,.0f} rows/min)")
+
+
+if __name__ == "__main__":
+    main()
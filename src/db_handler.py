@@ -6,9 +6,12 @@ for summary statistics, data import/export, and easier integration with dashboar
 
 import sqlite3
 import os
-from typing import Optional, List, Tuple, Any, Dict, Union
+from contextlib import contextmanager
+from typing import Optional, List, Tuple, Any, Dict, Union, Iterable, Iterator
 import csv
 
+import data_versions
+
 # Default database path - use Streamlit cache dir if available, else project root
 try:
     import streamlit as st
@@ -58,10 +61,18 @@ def connect_db(db_path: str = DB_FILE) -> Optional[sqlite3.Connection]:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT UNIQUE,
                 location TEXT,
-                base_temp REAL
+                base_temp REAL,
+                lat REAL,
+                lon REAL
             )
             """
         )
+        # Migration: farms created before coordinates were stored lack lat/lon
+        cursor.execute("PRAGMA table_info(farms)")
+        farm_columns = [row[1] for row in cursor.fetchall()]
+        for column in ("lat", "lon"):
+            if column not in farm_columns:
+                cursor.execute(f"ALTER TABLE farms ADD COLUMN {column} REAL")
         cursor.execute(
             """
             CREATE TABLE IF NOT EXISTS climate_data (
@@ -88,6 +99,101 @@ def connect_db(db_path: str = DB_FILE) -> Optional[sqlite3.Connection]:
             )
             """
         )
+        # One row per farm and date, so INSERT OR REPLACE/IGNORE behave as upserts.
+        # Older databases may already hold duplicates; keep the newest row of each.
+        for table in ("climate_data", "agri_metrics"):
+            index_sql = f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_farm_date ON {table}(farm_id, date)"
+            try:
+                cursor.execute(index_sql)
+            except sqlite3.IntegrityError:
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE id NOT IN (SELECT MAX(id) FROM {table} GROUP BY farm_id, date)"
+                )
+                cursor.execute(index_sql)
+        # Raw sensor readings live in per-month tables (see readings_store.py);
+        # this registry lists them, and reading_rollups folds them per farm and day
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reading_partitions (
+                name TEXT PRIMARY KEY,
+                month TEXT
+            )
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reading_rollups (
+                farm_id INTEGER,
+                date TEXT,
+                temp_min REAL,
+                temp_max REAL,
+                rain_sum REAL,
+                n INTEGER,
+                PRIMARY KEY (farm_id, date)
+            )
+            """
+        )
+        # Week/month/season aggregates of the daily series (see lod_pyramid.py)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS series_lod (
+                farm_id INTEGER NOT NULL,
+                level TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                n INTEGER,
+                min REAL,
+                max REAL,
+                mean REAL,
+                var REAL,
+                sketch BLOB,
+                PRIMARY KEY (farm_id, level, metric, bucket)
+            ) WITHOUT ROWID
+            """
+        )
+        # Migration: pyramids built before the monthly quantile sketches lack the column
+        cursor.execute("PRAGMA table_info(series_lod)")
+        lod_columns = [row[1] for row in cursor.fetchall()]
+        if "sketch" not in lod_columns:
+            cursor.execute("ALTER TABLE series_lod ADD COLUMN sketch BLOB")
+        # ... and those built before the bucket variances lack var (global_analytics.py)
+        if "var" not in lod_columns:
+            cursor.execute("ALTER TABLE series_lod ADD COLUMN var REAL")
+        # Alerts raised by the rules in alerts.py, one per farm, rule and day;
+        # alert_checks lists the farms whose history has been evaluated
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS alerts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                farm_id INTEGER NOT NULL,
+                rule TEXT NOT NULL,
+                date TEXT NOT NULL,
+                value REAL,
+                message TEXT,
+                created_at TEXT,
+                UNIQUE (farm_id, date, rule)
+            )
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS alert_checks (
+                farm_id INTEGER PRIMARY KEY,
+                checked_at TEXT
+            )
+            """
+        )
+        # Seed files already applied, by content hash (see seed_data.py)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS seed_files (
+                name TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                rows INTEGER,
+                applied_at TEXT
+            )
+            """
+        )
         cursor.execute(
             """
             CREATE TABLE IF NOT EXISTS users (
@@ -99,6 +205,8 @@ def connect_db(db_path: str = DB_FILE) -> Optional[sqlite3.Connection]:
             )
             """
         )
+        # Per-farm change counters kept by triggers (see data_versions.py)
+        data_versions.install(cursor)
         conn.commit()
         return conn
     except (sqlite3.Error, OSError, PermissionError) as e:
@@ -185,12 +293,14 @@ class DBHandler:
     and dashboard convenience methods.
     """
 
-    def __init__(self, db_path: str = DB_FILE):
+    def __init__(self, db_path: Optional[str] = None):
         """
         Initialize the database handler. Opens a connection.
+        db_path defaults to the module's DB_FILE, read at call time so tools
+        (benchmarks, batch jobs) can point every page at another database.
         """
-        self.db_path = db_path
-        self.conn: Optional[sqlite3.Connection] = connect_db(db_path)
+        self.db_path = db_path or DB_FILE
+        self.conn: Optional[sqlite3.Connection] = connect_db(self.db_path)
 
     def __enter__(self) -> "DBHandler":
         """
@@ -236,6 +346,40 @@ class DBHandler:
             print(f"❌ Query failed: {e}\nQuery: {query}\nParams: {params}")
             return None
 
+    def executemany(self, query: str, rows: Iterable[Tuple[Any, ...]]) -> int:
+        """
+        Execute a statement for every parameter tuple in ``rows`` without committing.
+        Intended for bulk writes inside ``transaction()``. Returns the number of rows
+        changed. Errors propagate so the enclosing transaction can roll back.
+        """
+        if self.conn is None:
+            self.conn = connect_db(self.db_path)
+        if self.conn is None:
+            raise sqlite3.OperationalError("No database connection available.")
+        cursor = self.conn.executemany(query, rows)
+        return cursor.rowcount
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Group several writes into one transaction: commits when the block finishes,
+        rolls back if it raises. Do not call execute_query() inside the block, since
+        it commits after every statement.
+        """
+        if self.conn is None:
+            self.conn = connect_db(self.db_path)
+        if self.conn is None:
+            raise sqlite3.OperationalError("No database connection available.")
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.rollback()
+            raise
+        else:
+            self.conn.commit()
+
     def fetch_all(self, query: str, params: Optional[Tuple[Any, ...]] = None) -> List[Tuple]:
         """
         Run a SELECT query and return all results as a list of tuples.
@@ -258,14 +402,56 @@ class DBHandler:
         Get all farms as a list of dictionaries.
         Returns: List[Dict[str, Any]]
         """
-        cursor = self.execute_query("SELECT id, name, location, base_temp FROM farms ORDER BY name")
+        cursor = self.execute_query("SELECT id, name, location, base_temp, lat, lon FROM farms ORDER BY name")
         if cursor:
             return [
-                {"id": row[0], "name": row[1], "location": row[2], "base_temp": row[3]}
+                {"id": row[0], "name": row[1], "location": row[2], "base_temp": row[3], "lat": row[4], "lon": row[5]}
                 for row in cursor.fetchall()
             ]
         return []
 
+    def get_farm_ids(self, names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Map farm name -> id, for all farms or only the given names, in one query.
+        Does not commit, so it is safe to call inside transaction().
+        Returns: Dict[str, int]
+        """
+        if self.conn is None:
+            self.conn = connect_db(self.db_path)
+        if self.conn is None:
+            return {}
+        if names is None:
+            rows = self.conn.execute("SELECT name, id FROM farms").fetchall()
+        else:
+            names = list(names)
+            rows = []
+            # Stay under SQLite's bound-parameter limit on older builds
+            for start in range(0, len(names), 500):
+                batch = names[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows += self.conn.execute(f"SELECT name, id FROM farms WHERE name IN ({placeholders})", batch).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def upsert_farms(self, farms: Iterable[Tuple[Any, ...]]) -> int:
+        """
+        Insert or update farms from (name, location, base_temp, lat, lon) tuples with a
+        single executemany. Missing (None) values never overwrite stored ones; new farms
+        without a base_temp get 10.0. Does not commit; use inside transaction().
+        Returns: number of rows inserted or updated
+        """
+        return self.executemany(
+            """
+            INSERT INTO farms (name, location, base_temp, lat, lon)
+            VALUES (?1, ?2, COALESCE(?3, 10.0), ?4, ?5)
+            ON CONFLICT(name) DO UPDATE SET
+                location = COALESCE(?2, location),
+                base_temp = COALESCE(?3, base_temp),
+                lat = COALESCE(?4, lat),
+                lon = COALESCE(?5, lon)
+            """,
+            farms
+        )
+
     def get_climate_data(self, farm_id: int, limit: int = 20) -> List[Dict[str, Any]]:
         """
         Get up to `limit` rows of climate_data + agri_metrics for a farm, as list of dicts.
@@ -372,18 +558,13 @@ class DBHandler:
     def export_csv(self, query: str, params: Optional[Tuple[Any, ...]], out_path: str) -> int:
         """
         Export data from a SELECT query to a CSV file. Returns row count written.
+        Rows are streamed in chunks; a .gz, .parquet or .xlsx path picks that format.
         """
+        from table_export import write_query
         try:
-            cursor = self.execute_query(query, params)
-            if cursor:
-                rows = cursor.fetchall()
-                colnames = [desc[0] for desc in cursor.description]
-                with open(out_path, "w", newline="") as f:
-                    writer = csv.writer(f)
-                    writer.writerow(colnames)
-                    writer.writerows(rows)
-                return len(rows)
-            return 0
+            if self.conn is None:
+                return 0
+            return write_query(self, query, params or (), out_path)
         except Exception as e:
             print(f"❌ CSV export failed: {e}")
             return 0
@@ -392,19 +573,42 @@ class DBHandler:
         """
         Delete a farm and all associated climate and agri_metrics data.
         """
+        from series_cache import invalidate_farms
         try:
             self.execute_query("DELETE FROM agri_metrics WHERE farm_id=?", (farm_id,))
             self.execute_query("DELETE FROM climate_data WHERE farm_id=?", (farm_id,))
+            self.execute_query("DELETE FROM series_lod WHERE farm_id=?", (farm_id,))
+            self.execute_query("DELETE FROM alerts WHERE farm_id=?", (farm_id,))
+            self.execute_query("DELETE FROM alert_checks WHERE farm_id=?", (farm_id,))
             self.execute_query("DELETE FROM farms WHERE id=?", (farm_id,))
         except Exception as e:
             print(f"❌ Error deleting farm {farm_id}: {e}")
+        invalidate_farms([farm_id])
 
-    def delete_data_entry(self, farm_id: int, date: str) -> None:
-        """
-        Delete a specific climate/agri data entry by farm and date.
-        """
+    def delete_data_entry(self, farm_id: int, date: str) -> bool:
+        """
+        Delete a specific climate/agri data entry by farm and date. In the same
+        transaction the later cumulative GDD values, the LOD pyramid and the
+        alerts from that date on are recomputed; new alerts are published once
+        committed. Returns False if the delete failed (nothing is changed).
+        """
+        from alerts import AlertUpdater, publish
+        from lod_pyramid import rebuild
+        from metrics import recompute_cumulative
+        from series_cache import invalidate_farms
+        alerts = AlertUpdater()
+        alerts.note_date(farm_id, date)
         try:
-            self.execute_query("DELETE FROM agri_metrics WHERE farm_id=? AND date=?", (farm_id, date))
-            self.execute_query("DELETE FROM climate_data WHERE farm_id=? AND date=?", (farm_id, date))
+            with self.transaction() as conn:
+                conn.execute("DELETE FROM agri_metrics WHERE farm_id=? AND date=?", (farm_id, date))
+                conn.execute("DELETE FROM climate_data WHERE farm_id=? AND date=?", (farm_id, date))
+                # The pyramid and milestone alerts read the corrected running totals
+                recompute_cumulative(self, farm_id, date)
+                rebuild(self, farm_id, date)
+                alerts.finish(self)
         except Exception as e:
-            print(f"❌ Error deleting entry for farm {farm_id} date {date}: {e}")
\ No newline at end of file
+            print(f"❌ Error deleting entry for farm {farm_id} date {date}: {e}")
+            return False
+        invalidate_farms([farm_id])
+        publish(alerts.new)
+        return True
\ No newline at end of file
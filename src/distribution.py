@@ -0,0 +1,228 @@
+"""
+distribution.py
+Histogram bins and boxplot statistics computed next to the data.
+
+Distribution charts used to load every daily value of a range into pandas and
+let matplotlib bin it. Here only the results travel:
+
+    histogram()  - bin counts from one SQL GROUP BY (after a MIN/MAX query);
+                   histogram_values() does the same with NumPy over values
+                   already in memory (the series cache)
+    box_stats()  - the five-number summary (plus mean) merged from the monthly
+                   quantile sketches of lod_pyramid; months only partly inside
+                   the range are read as daily values. box_stats_values() is
+                   the exact in-memory version.
+
+Both accept farm_id=None for all farms. Box statistics are dicts as taken by
+matplotlib's Axes.bxp; whiskers reach the furthest sketch point within 1.5 IQR
+of the box, and the extreme values beyond them are drawn as fliers.
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import lod_pyramid
+from lod_pyramid import QUANTILES, SKETCH_LEVEL
+
+# Table holding each metric's daily column
+METRIC_TABLES = {
+    "temp_max": "climate_data", "temp_min": "climate_data", "rainfall": "climate_data",
+    "daily_gdd": "agri_metrics", "effective_rainfall": "agri_metrics", "cumulative_gdd": "agri_metrics",
+}
+DEFAULT_BINS = 10
+WHISKER = 1.5
+
+
+def _where(metric: str, farm_id: Any, start: str, end: str) -> Tuple[str, List[Any]]:
+    if metric not in METRIC_TABLES:
+        raise ValueError(f"Unknown metric: {metric!r}")
+    clauses, params = [f"{metric} IS NOT NULL"], []
+    if farm_id is not None:
+        clauses.append("farm_id=?")
+        params.append(farm_id)
+    if start:
+        clauses.append("date>=?")
+        params.append(start)
+    if end:
+        clauses.append("date<=?")
+        params.append(end)
+    return f"FROM {METRIC_TABLES[metric]} WHERE {' AND '.join(clauses)}", params
+
+
+def _edges(lo: float, hi: float, bins: int) -> np.ndarray:
+    # Same edges as np.histogram, including its +-0.5 range for constant data
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+    return np.linspace(lo, hi, bins + 1)
+
+
+def histogram(db, metric: str, farm_id: Any = None, start: str = "", end: str = "",
+              bins: int = DEFAULT_BINS) -> Tuple[np.ndarray, np.ndarray]:
+    """(edges, counts) of a metric's daily values in [start, end]; empty arrays if there are none."""
+    where, params = _where(metric, farm_id, start, end)
+    lo, hi = db.conn.execute(f"SELECT MIN({metric}), MAX({metric}) {where}", params).fetchone()
+    if lo is None:
+        return np.array([], dtype=float), np.array([], dtype=np.int64)
+    edges = _edges(float(lo), float(hi), bins)
+    # Compared against the same edges as np.histogram (the top edge belongs to the last bin)
+    case = " ".join(f"WHEN {metric} < ? THEN {i}" for i in range(bins - 1))
+    rows = db.conn.execute(
+        f"SELECT CASE {case} ELSE {bins - 1} END AS b, COUNT(*) {where} GROUP BY b",
+        [*(float(e) for e in edges[1:-1]), *params]
+    ).fetchall()
+    counts = np.zeros(bins, dtype=np.int64)
+    for b, count in rows:
+        counts[int(b)] = count
+    return edges, counts
+
+
+def histogram_values(values, bins: int = DEFAULT_BINS) -> Tuple[np.ndarray, np.ndarray]:
+    """histogram() of an in-memory array (NaN skipped)."""
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return np.array([], dtype=float), np.array([], dtype=np.int64)
+    counts, edges = np.histogram(values, bins=bins)
+    return edges, counts
+
+
+def _stats(points: np.ndarray, weights: np.ndarray, raw: np.ndarray, low: float, high: float,
+           mean: float, n: int) -> Dict[str, Any]:
+    """
+    bxp statistics from weighted sample points (sketch points and daily values),
+    the daily values among them (``raw``) and the exact min/max/mean.
+    """
+    order = np.argsort(points, kind="stable")
+    points, weights = points[order], weights[order]
+    # Each point sits at the middle of its weight; with unit weights this is np.quantile's rule
+    position = np.cumsum(weights) - weights / 2.0
+    targets = position[0] + np.array([0.25, 0.5, 0.75]) * (position[-1] - position[0])
+    q1, med, q3 = np.interp(targets, position, points)
+    iqr = q3 - q1
+    inside = points[(points >= q1 - WHISKER * iqr) & (points <= q3 + WHISKER * iqr)]
+    whislo = min(float(inside.min()) if len(inside) else q1, q1)
+    whishi = max(float(inside.max()) if len(inside) else q3, q3)
+    # Fliers: the extremes and the daily values outside the whiskers (sketch points are not data)
+    fliers = np.unique(np.r_[raw, low, high])
+    return {"med": float(med), "q1": float(q1), "q3": float(q3), "whislo": float(whislo), "whishi": float(whishi),
+            "fliers": fliers[(fliers < whislo) | (fliers > whishi)], "mean": mean, "n": n}
+
+
+def box_stats_values(values) -> Optional[Dict[str, Any]]:
+    """Exact box statistics of an in-memory array (NaN skipped); None if empty."""
+    values = np.asarray(values, dtype=float)
+    values = np.sort(values[np.isfinite(values)])
+    if not len(values):
+        return None
+    q1, med, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - WHISKER * iqr) & (values <= q3 + WHISKER * iqr)]
+    whislo, whishi = float(inside[0]), float(inside[-1])
+    return {"med": float(med), "q1": float(q1), "q3": float(q3), "whislo": whislo, "whishi": whishi,
+            "fliers": values[(values < whislo) | (values > whishi)], "mean": float(values.mean()),
+            "n": int(len(values))}
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _split_range(start: str, end: str) -> Tuple[Optional[Tuple[str, str]], List[Tuple[str, str]]]:
+    """
+    Split [start, end] ('' = open) into the span of whole month buckets (first
+    and last bucket, or None if there is none) and the partial-month spans at
+    either end, which are read as daily values.
+    """
+    first = start
+    head = None
+    if start:
+        day = date.fromisoformat(start)
+        if day.day != 1:
+            first = _next_month(day).isoformat()
+            head = (start, (_next_month(day) - timedelta(days=1)).isoformat())
+    last = end
+    tail = None
+    if end:
+        day = date.fromisoformat(end)
+        month = day.replace(day=1)
+        if _next_month(day) - timedelta(days=1) == day:
+            last = month.isoformat()
+        else:
+            last = (month - timedelta(days=1)).replace(day=1).isoformat()
+            tail = (month.isoformat(), end)
+    if first and last and first > last:
+        # Less than a whole month in between
+        return None, [(start, end)]
+    return (first, last), [span for span in (head, tail) if span]
+
+
+def _ensure_sketches(db, farm_id: Any) -> None:
+    """Build (or upgrade) the pyramids that have no month sketches yet."""
+    conn = db.conn
+    if farm_id is None:
+        farms = [r[0] for r in conn.execute(
+            "SELECT id FROM farms WHERE id NOT IN "
+            "(SELECT farm_id FROM series_lod WHERE level=? AND sketch IS NOT NULL)", (SKETCH_LEVEL,)
+        ).fetchall()]
+    else:
+        has = conn.execute("SELECT 1 FROM series_lod WHERE farm_id=? AND level=? AND sketch IS NOT NULL LIMIT 1",
+                           (farm_id, SKETCH_LEVEL)).fetchone()
+        farms = [] if has else [farm_id]
+    if farms:
+        with db.transaction():
+            for farm in farms:
+                lod_pyramid.rebuild(db, farm)
+
+
+def box_stats(db, metric: str, farm_id: Any = None, start: str = "", end: str = "") -> Optional[Dict[str, Any]]:
+    """Box statistics of a metric's daily values in [start, end] from the monthly sketches; None if empty."""
+    _ensure_sketches(db, farm_id)
+    months, partial = _split_range(start, end)
+    points: List[np.ndarray] = []
+    weights: List[np.ndarray] = []
+    raw: List[np.ndarray] = []
+    low, high, total, count = np.inf, -np.inf, 0.0, 0
+    if months is not None:
+        q = "SELECT n, min, max, mean, sketch FROM series_lod WHERE level=? AND metric=? AND sketch IS NOT NULL"
+        params: List[Any] = [SKETCH_LEVEL, metric]
+        if farm_id is not None:
+            q += " AND farm_id=?"
+            params.append(farm_id)
+        if months[0]:
+            q += " AND bucket>=?"
+            params.append(months[0])
+        if months[1]:
+            q += " AND bucket<=?"
+            params.append(months[1])
+        rows = db.conn.execute(q, params).fetchall()
+        if rows:
+            n = np.array([r[0] for r in rows], dtype=float)
+            grid = np.frombuffer(b"".join(r[4] for r in rows), dtype=np.float32).reshape(len(rows), len(QUANTILES))
+            grid = grid.astype(float)
+            # The stored min/max are exact where the float32 ends are not
+            grid[:, 0] = [r[1] for r in rows]
+            grid[:, -1] = [r[2] for r in rows]
+            # Equal shares of the month's count reproduce its own quantiles exactly
+            points.append(grid.ravel())
+            weights.append(np.repeat(n / len(QUANTILES), len(QUANTILES)))
+            low = min(low, min(r[1] for r in rows))
+            high = max(high, max(r[2] for r in rows))
+            total += float((n * np.array([r[3] for r in rows], dtype=float)).sum())
+            count += int(n.sum())
+    for span in partial:
+        where, params = _where(metric, farm_id, *span)
+        values = np.array([r[0] for r in db.conn.execute(f"SELECT {metric} {where}", params).fetchall()],
+                          dtype=float)
+        if len(values):
+            points.append(values)
+            weights.append(np.ones(len(values)))
+            raw.append(values)
+            low, high = min(low, float(values.min())), max(high, float(values.max()))
+            total += float(values.sum())
+            count += len(values)
+    if not count:
+        return None
+    return _stats(np.concatenate(points), np.concatenate(weights), np.concatenate(raw) if raw else np.array([]),
+                  float(low), float(high), total / count, count)
@@ -0,0 +1,151 @@
+"""
+downsample.py
+Reduce long time series to about one point per horizontal pixel before plotting.
+
+    - lttb_indices: Largest-Triangle-Three-Buckets. Keeps the visual shape of
+      a line: each bucket keeps the point forming the largest triangle with
+      the point kept from the previous bucket and the mean of the next one.
+      Computed without a per-bucket Python loop: a first pass uses the
+      previous bucket's mean as the anchor, a second pass re-anchors on the
+      points chosen by the first.
+    - minmax_indices: the minimum and maximum of every bucket, so spikes and
+      outliers always survive (scatter and bar charts, envelopes).
+    - envelope: per-bucket centre, min and max, for a shaded min/max band.
+
+All functions take x as numbers or datetime64 (sorted ascending) and return
+positions into the original arrays, so callers keep their own x/y types.
+Shared by the Tk chart layer and the Streamlit trend plots.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Fallback plot width when the canvas size is not known yet
+DEFAULT_WIDTH_PX = 800
+
+
+def _as_float(x) -> np.ndarray:
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(float)
+    if x.dtype == object:
+        try:
+            return np.asarray(x, dtype="datetime64[ns]").astype(np.int64).astype(float)
+        except (TypeError, ValueError):
+            pass
+    return x.astype(float)
+
+
+def _buckets(n: int, count: int) -> np.ndarray:
+    """Edges of ``count`` near-equal buckets over positions 1..n-2 (first/last stay alone)."""
+    return np.linspace(1, n - 1, count + 1).astype(np.int64)
+
+
+def _segment_argmax(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Position of the maximum of each [edges[i], edges[i+1]) segment (first one on ties)."""
+    starts = edges[:-1]
+    counts = np.diff(edges)
+    maxes = np.maximum.reduceat(values, starts)
+    hits = np.flatnonzero(values >= np.repeat(maxes, counts))
+    segment = np.searchsorted(edges, hits, side="right") - 1
+    _, first = np.unique(segment, return_index=True)
+    return hits[first]
+
+
+def _valid(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """Indices of at most ``n_out`` points chosen by LTTB (non-finite points are skipped)."""
+    xf, yf = _as_float(x), np.asarray(y, dtype=float)
+    keep = _valid(xf, yf)
+    n = len(keep)
+    if n <= n_out:
+        return keep
+    if n_out < 3:
+        # Too few points for triangles: keep the ends
+        return keep[[0, n - 1]][:max(n_out, 0)]
+    px, py = xf[keep], yf[keep]
+    edges = _buckets(n, n_out - 2)
+    starts, counts = edges[:-1], np.diff(edges)
+    bucket = np.repeat(np.arange(n_out - 2), counts)
+    mean_x = np.add.reduceat(px[1:n - 1], starts - 1) / counts
+    mean_y = np.add.reduceat(py[1:n - 1], starts - 1) / counts
+    # Next-bucket means (the last bucket looks at the final point)
+    next_x = np.append(mean_x[1:], px[-1])
+    next_y = np.append(mean_y[1:], py[-1])
+    # Pass 1 anchors on the previous bucket's mean, pass 2 on the point pass 1 kept there
+    anchor_x = np.insert(mean_x[:-1], 0, px[0])
+    anchor_y = np.insert(mean_y[:-1], 0, py[0])
+    mid = slice(1, n - 1)
+    chosen = None
+    for _ in range(2):
+        ax_, ay_ = anchor_x[bucket], anchor_y[bucket]
+        area = np.abs((ax_ - next_x[bucket]) * (py[mid] - ay_) - (ax_ - px[mid]) * (next_y[bucket] - ay_))
+        chosen = _segment_argmax(area, edges - 1) + 1
+        anchor_x = np.insert(px[chosen[:-1]], 0, px[0])
+        anchor_y = np.insert(py[chosen[:-1]], 0, py[0])
+    return keep[np.concatenate(([0], chosen, [n - 1]))]
+
+
+def minmax_indices(x, y, n_buckets: int) -> np.ndarray:
+    """Indices of each bucket's minimum and maximum (in x order), plus the first and last point."""
+    xf, yf = _as_float(x), np.asarray(y, dtype=float)
+    keep = _valid(xf, yf)
+    n = len(keep)
+    if n <= 2 * n_buckets + 2 or n_buckets < 1:
+        return keep
+    py = yf[keep]
+    edges = _buckets(n, n_buckets) - 1
+    inner = py[1:n - 1]
+    hi = _segment_argmax(inner, edges) + 1
+    lo = _segment_argmax(-inner, edges) + 1
+    return keep[np.unique(np.concatenate(([0], lo, hi, [n - 1])))]
+
+
+def envelope(x, y, n_buckets: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-bucket (x of the bucket's first point, min y, max y) for a min/max band."""
+    xf, yf = _as_float(x), np.asarray(y, dtype=float)
+    keep = _valid(xf, yf)
+    x_arr = np.asarray(x)[keep]
+    py = yf[keep]
+    n = len(keep)
+    if n == 0:
+        return x_arr, py, py
+    n_buckets = max(1, min(n_buckets, n))
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    starts = edges[:-1]
+    return x_arr[starts], np.minimum.reduceat(py, starts), np.maximum.reduceat(py, starts)
+
+
+def downsample(x, y, max_points: Optional[int] = None, method: str = "lttb") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (x, y) reduced to at most ``max_points`` (default: DEFAULT_WIDTH_PX).
+    method: 'lttb' for lines, 'minmax' to keep every bucket's extremes.
+    Short series are returned unchanged.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    if len(x) <= (max_points or DEFAULT_WIDTH_PX):
+        return x, y
+    idx = select_indices(x, y, max_points, method)
+    return x[idx], y[idx]
+
+
+def select_indices(x, y, max_points: Optional[int] = None, method: str = "lttb") -> np.ndarray:
+    """Positions kept by downsample() (all positions for short series)."""
+    max_points = max_points or DEFAULT_WIDTH_PX
+    if len(x) <= max_points:
+        return np.arange(len(x))
+    if method == "minmax":
+        return minmax_indices(x, y, max(1, (max_points - 2) // 2))
+    return lttb_indices(x, y, max_points)
+
+
+def visible_slice(x, lo, hi, pad: int = 1) -> slice:
+    """Slice of sorted ``x`` inside [lo, hi] (plus ``pad`` points either side so lines reach the edges)."""
+    xf = _as_float(x)
+    start = max(int(np.searchsorted(xf, lo, side="left")) - pad, 0)
+    stop = min(int(np.searchsorted(xf, hi, side="right")) + pad, len(xf))
+    return slice(start, stop)
@@ -0,0 +1,252 @@
+"""
+folder_watcher.py
+Headless watch-folder ingestion used by ``ingest.py --watch``.
+
+Files dropped into the watched directory are picked up as soon as they stop
+changing, imported through the chunked transactional path (import_chunks),
+and moved to ``done/`` or ``failed/`` next to them. Change events come from
+Linux inotify when available; elsewhere (or with poll=True) the directory is
+polled. Files are streamed chunk by chunk through one import transaction
+each; SQLite allows a single writer, so imports run one file at a time while
+the bounded worker pool keeps the watch loop free to settle the next files.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import shutil
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+from db_handler import DB_FILE, connect_db
+from import_utils import import_chunks, read_chunks
+from notifications import notify
+from validation import ChunkValidator
+
+SUPPORTED_EXTENSIONS = (".csv", ".xls", ".xlsx")
+# Names used by browsers/copy tools for files still being written
+PARTIAL_SUFFIXES = (".part", ".partial", ".tmp", ".crdownload", ".download", "~")
+
+# inotify event bits (see <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_candidate(name: str) -> bool:
+    """True for visible, fully named CSV/Excel files."""
+    lower = name.lower()
+    return (not name.startswith(".") and lower.endswith(SUPPORTED_EXTENSIONS)
+            and not lower.endswith(PARTIAL_SUFFIXES))
+
+
+class _Inotify:
+    """Minimal ctypes binding to Linux inotify for one directory."""
+
+    def __init__(self, path: str):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed for {path}")
+
+    def read(self, timeout: float) -> Set[str]:
+        """Names of files with events, waiting at most ``timeout`` seconds."""
+        names: Set[str] = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return names
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if name:
+                names.add(os.fsdecode(name))
+        return names
+
+    def close(self) -> None:
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class FolderWatcher:
+    """
+    Watch ``drop_dir`` and ingest every file that appears in it.
+
+    A file is ingested once its size and mtime have not changed for
+    ``settle_seconds`` (debouncing files still being copied). Successful files
+    move to ``done/`` (with their ``*_rejects.csv`` if any rows were rejected);
+    files that fail move to ``failed/`` with a ``.error.txt`` next to them.
+
+    Usage:
+        watcher = FolderWatcher("incoming", workers=2)
+        watcher.run()            # blocks; watcher.stop() from another thread
+    """
+
+    def __init__(self, drop_dir: str, db_path: str = DB_FILE, farm_id: Optional[int] = None,
+                 workers: int = 2, settle_seconds: float = 1.0, poll_interval: float = 1.0,
+                 poll: bool = False, on_result: Optional[Callable[[str, str, dict], None]] = None):
+        self.drop_dir = os.path.abspath(drop_dir)
+        self.done_dir = os.path.join(self.drop_dir, "done")
+        self.failed_dir = os.path.join(self.drop_dir, "failed")
+        self.db_path = db_path
+        self.farm_id = farm_id
+        self.workers = max(1, workers)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.force_poll = poll
+        self.on_result = on_result
+        self.mode = "polling"
+        self._stop = threading.Event()
+        self._write_lock = threading.Lock()
+        self._pending: Dict[str, Tuple[int, int, float]] = {}
+        self._in_flight: Set[str] = set()
+        self._in_flight_lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    # --- Event sources ---
+
+    def _scan(self) -> Iterable[str]:
+        try:
+            with os.scandir(self.drop_dir) as it:
+                return [e.name for e in it if e.is_file() and is_candidate(e.name)]
+        except FileNotFoundError:
+            return []
+
+    def _track(self, names: Iterable[str], now: float) -> None:
+        for name in names:
+            if is_candidate(name) and name not in self._pending:
+                # Unknown state: force one settle period before ingesting
+                self._pending[name] = (-1, -1, now)
+
+    def _check_ready(self, now: float) -> None:
+        """Submit files whose size/mtime stayed unchanged for settle_seconds."""
+        for name, (size, mtime, since) in list(self._pending.items()):
+            path = os.path.join(self.drop_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                del self._pending[name]
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime):
+                self._pending[name] = (st.st_size, st.st_mtime_ns, now)
+                continue
+            if now - since < self.settle_seconds:
+                continue
+            with self._in_flight_lock:
+                # Bounded pool: leave the file pending until a worker frees up
+                if name in self._in_flight or len(self._in_flight) >= self.workers:
+                    continue
+                self._in_flight.add(name)
+            del self._pending[name]
+            self._pool.submit(self._ingest, name)
+
+    # --- Ingest ---
+
+    def _move(self, path: str, target_dir: str) -> str:
+        os.makedirs(target_dir, exist_ok=True)
+        base, ext = os.path.splitext(os.path.basename(path))
+        target = os.path.join(target_dir, base + ext)
+        counter = 1
+        while os.path.exists(target):
+            target = os.path.join(target_dir, f"{base}_{counter}{ext}")
+            counter += 1
+        shutil.move(path, target)
+        return target
+
+    def _ingest(self, name: str) -> None:
+        path = os.path.join(self.drop_dir, name)
+        # Rejects are named after the file's final name in done/, known only after the move
+        pending = os.path.join(self.done_dir, f".{name}.{threading.get_ident()}.rejects")
+        summary: dict = {}
+        try:
+            os.makedirs(self.done_dir, exist_ok=True)
+            # Chunks stream from the file through the import transaction, and
+            # SQLite has one writer, so the whole import holds the lock
+            with self._write_lock, ChunkValidator(rejects=pending) as validator:
+                summary = import_chunks(read_chunks(path), farm_id=self.farm_id,
+                                        db_path=self.db_path, validator=validator)
+            target = self._move(path, self.done_dir)
+            if os.path.exists(pending):
+                os.replace(pending, os.path.splitext(target)[0] + "_rejects.csv")
+            status = "done"
+            notify("import", f"{summary['inserted']} entries imported from {name} (watch folder).")
+        except Exception as e:
+            status = "failed"
+            summary = {"error": str(e)}
+            if os.path.exists(pending):
+                os.remove(pending)
+            try:
+                target = self._move(path, self.failed_dir)
+                with open(target + ".error.txt", "w") as f:
+                    f.write(f"{type(e).__name__}: {e}\n")
+            except OSError:
+                target = path
+            notify("import_failed", f"Import of {name} from watch folder failed: {e}")
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.discard(name)
+        if self.on_result:
+            self.on_result(target, status, summary)
+
+    # --- Main loop ---
+
+    def run(self) -> None:
+        """Watch until stop() is called. Files already in the folder are ingested first."""
+        os.makedirs(self.drop_dir, exist_ok=True)
+        conn = connect_db(self.db_path)
+        if conn is not None:
+            # WAL lets pages keep reading while the daemon writes
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+            finally:
+                conn.close()
+        inotify = None
+        if not self.force_poll:
+            try:
+                inotify = _Inotify(self.drop_dir)
+                self.mode = "inotify"
+            except (OSError, AttributeError):
+                inotify = None
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+        self._track(self._scan(), time.monotonic())
+        last_scan = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                # Wake often enough to notice settled files promptly
+                tick = min(self.poll_interval, max(self.settle_seconds / 4.0, 0.05))
+                if inotify is not None:
+                    self._track(inotify.read(tick), time.monotonic())
+                else:
+                    self._stop.wait(tick)
+                now = time.monotonic()
+                if inotify is None and now - last_scan >= self.poll_interval:
+                    self._track(self._scan(), now)
+                    last_scan = now
+                self._check_ready(now)
+        finally:
+            if inotify is not None:
+                inotify.close()
+            self._pool.shutdown(wait=True)
+
+    def stop(self) -> None:
+        self._stop.set()
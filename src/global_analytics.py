@@ -0,0 +1,131 @@
+"""
+global_analytics.py
+All-farm summary behind the Report page's Global Analytics (admin) view.
+
+The per-farm means and overall rainfall/GDD statistics are combined from the
+season buckets of the LOD pyramid (lod_pyramid.py), which keep each bucket's
+count, mean and variance: a farm's decade is about 40 rows per metric instead
+of about 3,650 daily values, and buckets combine exactly (count-weighted sums
+of values and of squares). Farms whose pyramid is missing or predates the
+variances are aggregated in SQL from their daily rows instead. The rolling
+mean of the warmest farm is a window function over that farm's rows only.
+
+Usage:
+    with DBHandler() as db:
+        summary = compute(db)
+    text = format_summary(summary) if summary else "No data for analytics."
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+METRICS = ("temp_max", "rainfall", "cumulative_gdd")
+LEVEL = "season"
+ROLLING_WINDOW = 3
+ROLLING_TAIL = 5
+
+
+def _pyramid_sums(db) -> Dict[int, Dict[str, tuple]]:
+    """(n, sum, sum of squares) per farm and metric from the season buckets of complete pyramids."""
+    rows = db.conn.execute(
+        f"""SELECT farm_id, metric, SUM(n), SUM(n * mean), SUM(n * (var + mean * mean)), COUNT(*) - COUNT(var)
+            FROM series_lod
+            WHERE farm_id IN (SELECT id FROM farms) AND level=? AND metric IN ({', '.join('?' * len(METRICS))})
+            GROUP BY farm_id, metric""",
+        (LEVEL, *METRICS)
+    ).fetchall()
+    sums: Dict[int, Dict[str, tuple]] = {}
+    incomplete = set()
+    for farm_id, metric, n, total, squares, missing_var in rows:
+        if missing_var:
+            incomplete.add(farm_id)
+        sums.setdefault(farm_id, {})[metric] = (n, total, squares)
+    for farm_id in incomplete:
+        del sums[farm_id]
+    return sums
+
+
+def _daily_sums(db, farm_ids: List[int]) -> Dict[int, Dict[str, tuple]]:
+    """The same sums from the daily rows of ``farm_ids`` (farms without a usable pyramid)."""
+    if not farm_ids:
+        return {}
+    columns = {"temp_max": "c.temp_max", "rainfall": "c.rainfall", "cumulative_gdd": "m.cumulative_gdd"}
+    select = ", ".join(f"COUNT({c}), TOTAL({c}), TOTAL({c} * {c})" for c in columns.values())
+    rows = db.conn.execute(
+        f"""SELECT c.farm_id, {select} FROM climate_data c
+            LEFT JOIN agri_metrics m ON c.farm_id = m.farm_id AND c.date = m.date
+            WHERE c.farm_id IN ({', '.join('?' * len(farm_ids))})
+            GROUP BY c.farm_id""",
+        farm_ids
+    ).fetchall()
+    return {row[0]: {metric: tuple(row[1 + 3 * i:4 + 3 * i]) for i, metric in enumerate(columns)} for row in rows}
+
+
+def _rolling(db, farm_id: int, window: int, tail: int) -> pd.DataFrame:
+    rows = db.conn.execute(
+        f"""SELECT date, temp_max,
+                   AVG(temp_max) OVER (ORDER BY date ROWS BETWEEN {int(window) - 1} PRECEDING AND CURRENT ROW)
+            FROM climate_data WHERE farm_id=? ORDER BY date DESC LIMIT ?""",
+        (farm_id, tail)
+    ).fetchall()
+    df = pd.DataFrame([tuple(r) for r in reversed(rows)], columns=["date", "temp_max", "temp_max_rm"])
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def compute(db, window: int = ROLLING_WINDOW, tail: int = ROLLING_TAIL) -> Optional[Dict[str, Any]]:
+    """
+    Summary of every farm's data, or None if there is none:
+
+        farm_means   mean temp_max per farm name (Series, sorted by name)
+        rain_mean    mean and sample std of all daily rainfall
+        rain_std
+        gdd_mean     mean cumulative GDD over all days
+        top_farm     the farm with the highest mean temp_max
+        rolling      its last ``tail`` days with a ``window``-day rolling mean
+    """
+    names = {row[0]: row[1] for row in db.conn.execute("SELECT id, name FROM farms").fetchall()}
+    sums = _pyramid_sums(db)
+    sums.update(_daily_sums(db, [farm_id for farm_id in names if farm_id not in sums]))
+    if not any(n for farm in sums.values() for n, _, _ in farm.values()):
+        return None
+
+    def totals(metric):
+        parts = np.array([farm.get(metric, (0, 0.0, 0.0)) for farm in sums.values()], dtype=float).reshape(-1, 3)
+        return parts.sum(axis=0)
+
+    summary: Dict[str, Any] = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        n, total, squares = totals("rainfall")
+        summary["rain_mean"] = total / n if n else float("nan")
+        summary["rain_std"] = float(np.sqrt(max(squares - total * total / n, 0.0) / (n - 1))) if n > 1 else float("nan")
+        n, total, _ = totals("cumulative_gdd")
+        summary["gdd_mean"] = total / n if n else float("nan")
+
+    means = {farm_id: farm["temp_max"][1] / farm["temp_max"][0]
+             for farm_id, farm in sums.items() if farm.get("temp_max", (0,))[0]}
+    farm_means = pd.Series({names[farm_id]: mean for farm_id, mean in means.items()}, name="temp_max", dtype=float)
+    summary["farm_means"] = farm_means.sort_index().rename_axis("farm")
+    summary["top_farm"] = None
+    summary["rolling"] = None
+    if means:
+        # Highest mean; ties go to the first name, as idxmax over the sorted means
+        top = min(means, key=lambda farm_id: (-means[farm_id], names[farm_id]))
+        summary["top_farm"] = names[top]
+        summary["rolling"] = _rolling(db, top, window, tail)
+    return summary
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """The summary as the Global Analytics window's text."""
+    text = "=== Global Analytics ===\n"
+    if not summary["farm_means"].empty:
+        text += "\nMean Tmax by farm:\n" + summary["farm_means"].round(2).to_string() + "\n"
+    text += f"\nOverall Rainfall Mean: {summary['rain_mean']:.2f} mm, Std: {summary['rain_std']:.2f}\n"
+    text += f"\nOverall GDD Mean: {summary['gdd_mean']:.2f}\n"
+    if summary["rolling"] is not None:
+        text += f"\nRolling mean for Tmax (farm={summary['top_farm']}):\n"
+        text += summary["rolling"].to_string(index=False) + "\n"
+    return text
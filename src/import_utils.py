@@ -1,47 +1,229 @@
 import pandas as pd
 from db_handler import DBHandler
+from validation import ChunkValidator, normalize_columns, rejects_path_for
+from metrics import MetricsUpdater
+from lod_pyramid import LodUpdater
+from alerts import AlertUpdater, publish
+from series_cache import invalidate_farms
 import os
 
+# Rows per chunk for streaming imports; large enough for executemany to amortize
+# statement overhead, small enough to keep memory flat for multi-hundred-MB files.
+DEFAULT_CHUNK_ROWS = 50_000
+
+CLIMATE_COLS = ['date', 'temp_max', 'temp_min', 'rainfall']
+AGRI_COLS = ['date', 'daily_gdd', 'effective_rainfall', 'cumulative_gdd']
+# Per-row farm attributes carried by multi-farm files (see sample_climate_data_complete.csv)
+FARM_COLS = ['farm_name', 'location', 'base_temp', 'lat', 'lon']
+
+
+def read_chunks(source, chunksize=DEFAULT_CHUNK_ROWS, nrows=None):
+    """
+    Yield normalized DataFrame chunks from a CSV or Excel file.
+    `source` may be a path or a file-like object with a `name` (e.g. a Streamlit upload).
+    Dates are kept as strings so they are stored exactly as written in the file.
+    """
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    ext = os.path.splitext(name)[1].lower()
+    if ext in ['.xls', '.xlsx']:
+        df = normalize_columns(pd.read_excel(source, nrows=nrows, dtype={"date": str}))
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+    elif ext in ['.csv', '']:
+        for chunk in pd.read_csv(source, chunksize=chunksize, nrows=nrows, dtype={"date": str}):
+            yield normalize_columns(chunk)
+    else:
+        raise ValueError("Unsupported file type. Only CSV and Excel are supported.")
+
+
+def count_data_rows(file_path):
+    """Count data rows (excluding the header) of a CSV file without parsing it."""
+    with open(file_path, "rb") as f:
+        lines = sum(buf.count(b"\n") for buf in iter(lambda: f.read(1 << 20), b""))
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                lines += 1
+    return max(lines - 1, 0)
+
+
+def write_chunk(db, df, farm_id=None, on_conflict="REPLACE"):
+    """
+    Write one chunk into climate_data (and agri_metrics when the chunk carries the
+    derived columns) with executemany. Does not commit; call inside db.transaction().
+    Returns (written, skipped): rows stored in climate_data, and rows skipped because
+    they had no farm id or (with on_conflict="IGNORE") already existed.
+    """
+    if farm_id is not None:
+        fids = [farm_id] * len(df)
+    elif 'farm_id' in df.columns:
+        fids = df['farm_id'].tolist()
+    else:
+        return 0, len(df)
+    keep = [i for i, f in enumerate(fids) if f is not None and f == f]
+    missing_farm = len(fids) - len(keep)
+    if missing_farm:
+        df = df.iloc[keep]
+        fids = [fids[i] for i in keep]
+    if df.empty:
+        return 0, missing_farm
+    has_climate = all(col in df.columns for col in CLIMATE_COLS)
+    written = 0
+    if has_climate:
+        written = db.executemany(
+            f"INSERT OR {on_conflict} INTO climate_data (farm_id, date, temp_max, temp_min, rainfall) VALUES (?, ?, ?, ?, ?)",
+            zip(fids, *(df[c].tolist() for c in CLIMATE_COLS))
+        )
+    if all(col in df.columns for col in AGRI_COLS):
+        agri_written = db.executemany(
+            f"INSERT OR {on_conflict} INTO agri_metrics (farm_id, date, daily_gdd, effective_rainfall, cumulative_gdd) VALUES (?, ?, ?, ?, ?)",
+            zip(fids, *(df[c].tolist() for c in AGRI_COLS))
+        )
+        if not has_climate:
+            written = agri_written
+    return written, missing_farm + (len(df) - written)
+
+
+def is_multi_farm(columns):
+    """True if a file carries its own farm per row (a farm_name column)."""
+    return 'farm_name' in columns
+
+
+class FarmResolver:
+    """
+    Resolve farm_name -> farm_id for multi-farm files through an in-memory map.
+
+    The map is loaded with one query on first use. Each farm is upserted once, the
+    first time it appears in the import (all new farms of a chunk in a single
+    executemany), so later rows cost a dictionary lookup instead of a farm query.
+    """
+
+    def __init__(self):
+        self.ids = None
+        self._upserted = set()
+
+    def resolve(self, db, df):
+        """Return ``df`` with a farm_id column derived from its farm_name column."""
+        if self.ids is None:
+            self.ids = db.get_farm_ids()
+        names = df['farm_name'].astype('string').str.strip().replace("", pd.NA)
+        present = [c for c in FARM_COLS if c in df.columns]
+        farms = df[present].assign(farm_name=names).dropna(subset=['farm_name'])
+        farms = farms.drop_duplicates('farm_name')
+        farms = farms[~farms['farm_name'].isin(self._upserted)]
+        if not farms.empty:
+            for col in FARM_COLS:
+                if col not in farms.columns:
+                    farms[col] = None
+            farms = farms[FARM_COLS]
+            for col in ('base_temp', 'lat', 'lon'):
+                farms[col] = pd.to_numeric(farms[col], errors='coerce')
+            rows = farms.astype(object).where(farms.notna(), None).itertuples(index=False, name=None)
+            db.upsert_farms(rows)
+            new_names = [str(n) for n in farms['farm_name']]
+            self.ids.update(db.get_farm_ids(new_names))
+            self._upserted.update(new_names)
+        farm_ids = names.map(self.ids).astype(object)
+        return df.assign(farm_id=farm_ids.where(farm_ids.notna(), None).tolist())
+
+
+class _Cancelled(Exception):
+    """Raised inside an atomic import to roll back when the user cancels."""
+
+
+def import_chunks(chunks, farm_id=None, db_path=None, validator=None, progress=None,
+                  cancel_event=None, atomic=True, on_conflict="REPLACE", gdd_method="average"):
+    """
+    Stream DataFrame chunks into the database.
+
+    - validator: optional ChunkValidator; rejected rows are dropped (and logged by it).
+    - progress: optional callable(rows_done) called once per chunk.
+    - cancel_event: optional threading.Event checked between chunks.
+    - farm_id=None with a farm_name column imports a multi-farm file: farms are
+      upserted (with location, base_temp and lat/lon) and rows routed by name.
+    - atomic=True runs the whole import in one transaction so a cancel or error
+      leaves the database untouched; atomic=False commits once per chunk.
+    - Missing daily_gdd / effective_rainfall values are derived from the climate
+      columns and the farm's base_temp (gdd_method: average, cap or cutoff), and
+      cumulative GDD is rebuilt from the earliest new or late row of each farm.
+    - The week/month/season pyramid (series_lod) of every touched farm is rebuilt
+      from its earliest written date in the same transaction, and the alert rules
+      (alerts.py) are evaluated over the new rows; new alerts are published once
+      the rows are committed.
+
+    Returns a summary dict: rows, inserted, skipped, rejected, cancelled.
+    """
+    summary = {"rows": 0, "inserted": 0, "skipped": 0, "rejected": 0, "cancelled": False}
+    touched = set()
+    resolver = FarmResolver() if farm_id is None else None
+    updater = MetricsUpdater(method=gdd_method)
+    lod = LodUpdater()
+    alerts = AlertUpdater()
+    with DBHandler(db_path) as db:
+        def run(chunk):
+            if validator is not None:
+                before = validator.rejected
+                chunk = validator.validate(chunk)
+                summary["rejected"] += validator.rejected - before
+            if resolver is not None and is_multi_farm(chunk.columns) and 'farm_id' not in chunk.columns:
+                chunk = resolver.resolve(db, chunk)
+            chunk = updater.prepare(db, chunk, farm_id)
+            written, skipped = write_chunk(db, chunk, farm_id, on_conflict)
+            if written:
+                lod.note(chunk, farm_id)
+                alerts.note(chunk, farm_id)
+            if written and farm_id is not None:
+                touched.add(farm_id)
+            elif written and "farm_id" in chunk.columns:
+                touched.update(chunk["farm_id"].dropna().unique().tolist())
+            summary["inserted"] += written
+            summary["skipped"] += skipped
+
+        if atomic:
+            try:
+                with db.transaction():
+                    for chunk in chunks:
+                        if cancel_event is not None and cancel_event.is_set():
+                            raise _Cancelled()
+                        run(chunk)
+                        summary["rows"] += len(chunk)
+                        if progress:
+                            progress(summary["rows"])
+                    updater.finish(db)
+                    lod.finish(db)
+                    alerts.finish(db)
+            except _Cancelled:
+                summary.update(inserted=0, skipped=0, cancelled=True)
+        else:
+            for chunk in chunks:
+                if cancel_event is not None and cancel_event.is_set():
+                    summary["cancelled"] = True
+                    break
+                with db.transaction():
+                    run(chunk)
+                summary["rows"] += len(chunk)
+                if progress:
+                    progress(summary["rows"])
+            # Committed chunks stay (even after a cancel), so their cumulative GDD must be rebuilt
+            with db.transaction():
+                updater.finish(db)
+                lod.finish(db)
+                alerts.finish(db)
+    if touched and not (atomic and summary["cancelled"]):
+        invalidate_farms(touched)
+    publish(alerts.new)
+    return summary
+
+
 def import_file_to_db(file_path, farm_id=None):
     """
     Import data from a CSV or Excel file into climate_data and agri_metrics tables.
-    If farm_id is provided, it will be used for all rows (otherwise must be in file).
+    If farm_id is provided, it will be used for all rows; otherwise the file must carry
+    a farm_id column, or a farm_name column (farms are then created/updated from it).
+    Rows failing validation are written to <file>_rejects.csv.
     """
     if not os.path.isfile(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext in ['.csv']:
-        df = pd.read_csv(file_path)
-    elif ext in ['.xls', '.xlsx']:
-        df = pd.read_excel(file_path)
-    else:
-        raise ValueError("Unsupported file type. Only CSV and Excel are supported.")
-
-    # Normalize column names
-    df.columns = [c.strip().lower() for c in df.columns]
-
-    # Required columns for each table
-    climate_cols = ['date', 'temp_max', 'temp_min', 'rainfall']
-    agri_cols = ['date', 'daily_gdd', 'effective_rainfall', 'cumulative_gdd']
-
-    inserted = 0
-    with DBHandler() as db:
-        for _, row in df.iterrows():
-            # Use provided farm_id or from file
-            fid = farm_id or row.get('farm_id')
-            if not fid:
-                continue  # skip if no farm_id
-            # Insert into climate_data
-            if all(col in row for col in climate_cols):
-                db.execute_query(
-                    "INSERT OR REPLACE INTO climate_data (farm_id, date, temp_max, temp_min, rainfall) VALUES (?, ?, ?, ?, ?)",
-                    (fid, row['date'], row['temp_max'], row['temp_min'], row['rainfall'])
-                )
-            # Insert into agri_metrics
-            if all(col in row for col in agri_cols):
-                db.execute_query(
-                    "INSERT OR REPLACE INTO agri_metrics (farm_id, date, daily_gdd, effective_rainfall, cumulative_gdd) VALUES (?, ?, ?, ?, ?)",
-                    (fid, row['date'], row['daily_gdd'], row['effective_rainfall'], row['cumulative_gdd'])
-                )
-            inserted += 1
-    return inserted
+    with ChunkValidator(rejects=rejects_path_for(file_path)) as validator:
+        summary = import_chunks(read_chunks(file_path), farm_id=farm_id, validator=validator)
+    return summary["inserted"]
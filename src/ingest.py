@@ -1,13 +1,56 @@
 import sys
 import os
+import argparse
 from import_utils import import_file_to_db
 
+
+def watch(args):
+    from folder_watcher import FolderWatcher
+
+    def report(path, status, summary):
+        if status == "done":
+            print(f"[done] {os.path.basename(path)}: {summary['inserted']} rows, {summary['rejected']} rejected")
+        else:
+            print(f"[failed] {os.path.basename(path)}: {summary.get('error')}")
+
+    kwargs = {"db_path": args.db} if args.db else {}
+    watcher = FolderWatcher(args.watch, farm_id=args.farm_id, workers=args.workers,
+                            settle_seconds=args.settle, poll_interval=args.poll_interval,
+                            poll=args.poll, on_result=report, **kwargs)
+    print(f"Watching {watcher.drop_dir} (Ctrl+C to stop)")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+
+
 def main():
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(
+        description="Import a CSV/Excel file, or watch a drop folder and import files as they arrive.",
+        usage="python ingest.py <file_path> [farm_id]\n       python ingest.py --watch DIR [options]"
+    )
+    parser.add_argument("file_path", nargs="?")
+    parser.add_argument("farm_id", nargs="?", type=int)
+    parser.add_argument("--watch", metavar="DIR", help="Drop folder to watch (files move to DIR/done or DIR/failed)")
+    parser.add_argument("--farm-id", dest="watch_farm_id", type=int, help="Farm for files without farm columns")
+    parser.add_argument("--workers", type=int, default=2, help="Watch-folder worker threads; imports themselves run one file at a time (default 2)")
+    parser.add_argument("--settle", type=float, default=1.0, help="Seconds a file must stay unchanged before import")
+    parser.add_argument("--poll", action="store_true", help="Poll the folder instead of using inotify")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Polling interval in seconds")
+    parser.add_argument("--db", help="SQLite database path")
+    args = parser.parse_args()
+
+    if args.watch:
+        args.farm_id = args.watch_farm_id
+        watch(args)
+        return
+    if not args.file_path:
         print("Usage: python ingest.py <file_path> [farm_id]")
+        print("Without farm_id, rows are routed by the file's farm_id or farm_name column.")
+        print("       python ingest.py --watch DIR   (watch a drop folder)")
         sys.exit(1)
-    file_path = sys.argv[1]
-    farm_id = sys.argv[2] if len(sys.argv) > 2 else None
+    file_path = args.file_path
+    farm_id = args.farm_id
     if not os.path.isfile(file_path):
         print(f"File not found: {file_path}")
         sys.exit(1)
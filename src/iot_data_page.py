@@ -0,0 +1,174 @@
+import tkinter as tk
+import ttkbootstrap as tb
+from tkinter import messagebox
+
+from iot_service import IngestService, get_service, set_service, DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_MS
+
+# How often the live view polls the service counters
+REFRESH_MS = 1000
+
+
+class IoTDataPage(tb.Frame):
+    """
+    Live view of the sensor ingestion service:
+        - Start/stop the local HTTP/TCP ingest service
+        - Ingest rate, queue depth, and written / dropped / backpressure counters
+    """
+
+    def __init__(self, parent, user=None):
+        super().__init__(parent)
+        self.user = user or {"username": "Guest"}
+        self._refresh_job = None
+        self._shutdown = False
+        self.create_widgets()
+
+    def create_widgets(self):
+        tb.Label(self, text="IoT Live Data", font=("Segoe UI", 18, "bold")).pack(pady=(16, 8))
+
+        # Service controls
+        ctrl = tb.Frame(self)
+        ctrl.pack(pady=4)
+        tb.Label(ctrl, text="HTTP port:").grid(row=0, column=0, sticky="e")
+        self.http_port_var = tk.StringVar(value="8765")
+        tb.Entry(ctrl, textvariable=self.http_port_var, width=7).grid(row=0, column=1, padx=4)
+        tb.Label(ctrl, text="TCP port:").grid(row=0, column=2, sticky="e")
+        self.tcp_port_var = tk.StringVar(value="")
+        tb.Entry(ctrl, textvariable=self.tcp_port_var, width=7).grid(row=0, column=3, padx=4)
+        tb.Label(ctrl, text="Batch size:").grid(row=0, column=4, sticky="e")
+        self.batch_var = tk.StringVar(value=str(DEFAULT_BATCH_SIZE))
+        tb.Entry(ctrl, textvariable=self.batch_var, width=7).grid(row=0, column=5, padx=4)
+        tb.Label(ctrl, text="Flush (ms):").grid(row=0, column=6, sticky="e")
+        self.flush_var = tk.StringVar(value=str(DEFAULT_FLUSH_MS))
+        tb.Entry(ctrl, textvariable=self.flush_var, width=7).grid(row=0, column=7, padx=4)
+        self.start_btn = tb.Button(ctrl, text="Start Service", bootstyle="success", command=self.start_service)
+        self.start_btn.grid(row=0, column=8, padx=6)
+        self.stop_btn = tb.Button(ctrl, text="Stop Service", bootstyle="danger", command=self.stop_service)
+        self.stop_btn.grid(row=0, column=9, padx=2)
+
+        self.status_label = tb.Label(self, text="Service stopped", font=("Segoe UI", 11, "italic"), foreground="#636e72")
+        self.status_label.pack(pady=(6, 10))
+
+        # Live metrics
+        stats = tb.Labelframe(self, text="Ingest", padding=10)
+        stats.pack(fill="x", padx=20, pady=4)
+        tb.Label(stats, text="Rate:", font=("Segoe UI", 11, "bold")).grid(row=0, column=0, sticky="w")
+        self.rate_label = tb.Label(stats, text="0 readings/s", font=("Segoe UI", 11))
+        self.rate_label.grid(row=0, column=1, sticky="w", padx=8)
+        tb.Label(stats, text="Queue depth:", font=("Segoe UI", 11, "bold")).grid(row=1, column=0, sticky="w")
+        self.queue_bar = tb.Progressbar(stats, orient="horizontal", length=260, mode="determinate", bootstyle="info-striped")
+        self.queue_bar.grid(row=1, column=1, sticky="w", padx=8)
+        self.queue_label = tb.Label(stats, text="0 / 0", font=("Segoe UI", 10))
+        self.queue_label.grid(row=1, column=2, sticky="w")
+        self.counter_labels = {}
+        counters = [
+            ("received", "Received"), ("written", "Written"), ("dropped", "Dropped"),
+            ("backpressure_waits", "Backpressure waits"), ("invalid", "Invalid"),
+            ("batches", "Batches"), ("retries", "Write retries"), ("last_batch_ms", "Last batch (ms)"),
+        ]
+        for i, (key, label) in enumerate(counters):
+            tb.Label(stats, text=f"{label}:", font=("Segoe UI", 10)).grid(row=2 + i // 4, column=(i % 4) * 2, sticky="w", pady=2)
+            value = tb.Label(stats, text="0", font=("Segoe UI", 10, "bold"))
+            value.grid(row=2 + i // 4, column=(i % 4) * 2 + 1, sticky="w", padx=(4, 16))
+            self.counter_labels[key] = value
+
+        # Rate history
+        tb.Label(self, text="Ingest rate (last 60 s)", font=("Segoe UI", 10, "bold")).pack(pady=(10, 0))
+        self.rate_canvas = tk.Canvas(self, height=80, bg="white", highlightthickness=1, highlightbackground="#dfe6e9")
+        self.rate_canvas.pack(fill="x", padx=20, pady=4)
+        self.rate_history = []
+
+    # --- Service control ---
+
+    def _int(self, var, default=None):
+        text = var.get().strip()
+        return int(text) if text else default
+
+    def start_service(self):
+        if get_service() is not None and get_service().running:
+            messagebox.showinfo("IoT Service", "The ingest service is already running.")
+            return
+        try:
+            http_port = self._int(self.http_port_var)
+            tcp_port = self._int(self.tcp_port_var)
+            service = IngestService(batch_size=self._int(self.batch_var, DEFAULT_BATCH_SIZE),
+                                    flush_ms=self._int(self.flush_var, DEFAULT_FLUSH_MS))
+            service.start(http_port=http_port, tcp_port=tcp_port)
+        except (ValueError, OSError) as e:
+            messagebox.showerror("IoT Service", f"Could not start the ingest service: {e}")
+            return
+        set_service(service)
+        self.refresh_stats()
+
+    def stop_service(self):
+        service = get_service()
+        if service is None:
+            return
+        service.stop()
+        set_service(None)
+        self.refresh_stats()
+
+    # --- Live view ---
+
+    def on_show(self):
+        """Start polling the service counters when the page becomes visible."""
+        if self._refresh_job is None:
+            self.refresh_stats()
+
+    def refresh_stats(self):
+        if self._refresh_job is not None:
+            try:
+                self.after_cancel(self._refresh_job)
+            except Exception:
+                pass
+            self._refresh_job = None
+        if self._shutdown or not self.winfo_exists():
+            return
+        service = get_service()
+        if service is None or not service.running:
+            self.status_label.config(text="Service stopped")
+            stats = None
+        else:
+            ends = [f"HTTP :{service.http_port}" if service.http_port else "", f"TCP :{service.tcp_port}" if service.tcp_port else ""]
+            self.status_label.config(text="Listening on " + ", ".join(e for e in ends if e))
+            stats = service.stats()
+        if stats:
+            self.rate_label.config(text=f"{stats['rate_per_s']:.1f} readings/s")
+            self.queue_bar.config(maximum=max(stats["queue_capacity"], 1), value=stats["queue_depth"])
+            self.queue_label.config(text=f"{stats['queue_depth']} / {stats['queue_capacity']}")
+            for key, label in self.counter_labels.items():
+                label.config(text=str(stats.get(key, 0)))
+            self.rate_history = (self.rate_history + [stats["rate_per_s"]])[-60:]
+            self.draw_rate_history()
+        # Keep polling only while the page is shown
+        if self.winfo_ismapped() or service is not None:
+            self._refresh_job = self.after(REFRESH_MS, self.refresh_stats)
+
+    def draw_rate_history(self):
+        canvas = self.rate_canvas
+        canvas.delete("all")
+        if len(self.rate_history) < 2:
+            return
+        width = max(canvas.winfo_width(), 100)
+        height = max(canvas.winfo_height(), 40)
+        peak = max(max(self.rate_history), 1.0)
+        step = width / 59.0
+        offset = 60 - len(self.rate_history)
+        points = []
+        for i, rate in enumerate(self.rate_history):
+            points += [(offset + i) * step, height - 4 - (height - 8) * rate / peak]
+        canvas.create_line(*points, fill="#0984e3", width=2)
+        canvas.create_text(4, 4, anchor="nw", text=f"peak {peak:.1f}/s", fill="#636e72", font=("Segoe UI", 8))
+
+    def stop(self):
+        """Called by the main window on logout: stop polling and the service."""
+        self._shutdown = True
+        if self._refresh_job is not None:
+            try:
+                self.after_cancel(self._refresh_job)
+            except Exception:
+                pass
+            self._refresh_job = None
+        self.stop_service()
+
+    def get_frame(self):
+        return self
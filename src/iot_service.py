@@ -0,0 +1,516 @@
+"""
+iot_service.py
+Local ingestion service for field sensor readings.
+
+Sensors (or a gateway) push readings over HTTP or plain TCP, as JSON or as
+line protocol. Readings are buffered in a bounded in-memory queue and a single
+writer thread micro-batches them into SQLite every ``flush_ms`` milliseconds or
+every ``batch_size`` readings, whichever comes first. Each batch is stored raw
+and rolled up into the daily climate rows (see readings_store.py). When the
+queue is full, producers wait up to ``put_timeout`` seconds (backpressure) and
+the reading is then dropped; both events are counted and exposed through stats().
+A batch that cannot be written because another process holds the database
+(watch-folder daemon, GUI) is retried with backoff and counted as dropped if it
+still fails.
+
+Accepted formats (one reading per JSON object / line):
+    JSON:           {"farm_id": 3, "sensor": "s1", "ts": "2025-10-01T06:00:00", "temperature": 18.2, "rainfall": 0.4}
+                    (a JSON array of such objects is also accepted; "farm" may give a farm name)
+    Line protocol:  weather,farm_id=3,sensor=s1 temperature=18.2,rainfall=0.4 1759298400
+
+HTTP:  POST /readings   body = JSON or line protocol -> 202 {"accepted": n, "dropped": m}
+                                                      or 503 when everything was dropped
+       GET  /stats      -> current counters as JSON
+TCP:   newline-delimited readings; the server answers "OK" or "DROP" per line.
+
+Timestamps (epoch seconds/ms/ns or ISO 8601) are all stored as local time in
+one service timezone (``--tz``, default UTC), so the daily roll-ups split every
+reading at the same midnight. ISO strings without an offset are taken to be in
+that timezone already.
+
+Usage:
+    python iot_service.py [--http 8765] [--tcp 8766] [--db path] [--tz Europe/Madrid]
+"""
+
+import argparse
+import json
+import queue
+import socketserver
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone, tzinfo
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from alerts import AlertUpdater, publish
+from db_handler import DBHandler, DB_FILE
+from readings_store import apply_rollups, store_readings
+from series_cache import invalidate_farms
+
+DEFAULT_QUEUE_SIZE = 10_000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_MS = 500
+# Window over which the ingest rate is averaged
+RATE_WINDOW_SECONDS = 10.0
+# A batch that hits "database is locked" is retried this many times, with the
+# pause doubling from RETRY_BACKOFF_SECONDS, before it is dropped
+WRITE_RETRIES = 4
+RETRY_BACKOFF_SECONDS = 0.05
+
+READING_FIELDS = ("temperature", "rainfall")
+
+
+class ReadingError(ValueError):
+    """Raised for a reading that cannot be parsed."""
+
+
+def resolve_tz(name: Optional[str]) -> tzinfo:
+    """Timezone for an IANA name such as 'Europe/Madrid'; empty or 'UTC' gives UTC."""
+    if not name or name.upper() == "UTC":
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name!r}")
+
+
+def _parse_ts(value: Any, tz: tzinfo = timezone.utc) -> str:
+    """
+    Normalize a timestamp (epoch seconds/ms/ns or ISO string) to 'YYYY-MM-DD HH:MM:SS'
+    in ``tz``. ISO strings without an offset are taken to be in ``tz`` already.
+    """
+    if value is None or value == "":
+        return datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.strip().lstrip("-").isdigit()):
+        seconds = float(value)
+        # Line protocol timestamps are usually nanoseconds; accept ms too
+        if seconds > 1e17:
+            seconds /= 1e9
+        elif seconds > 1e11:
+            seconds /= 1e3
+        return datetime.fromtimestamp(seconds, tz).strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ReadingError(f"Invalid timestamp: {value!r}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(tz)
+    return parsed.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _reading_from_dict(obj: Dict[str, Any], tz: tzinfo = timezone.utc) -> Dict[str, Any]:
+    if not isinstance(obj, dict):
+        raise ReadingError("Reading must be a JSON object")
+    farm = obj.get("farm_id", obj.get("farm"))
+    if farm is None or farm == "":
+        raise ReadingError("Reading has no farm_id")
+    reading = {
+        "farm": farm,
+        "sensor": str(obj.get("sensor", "")),
+        "ts": _parse_ts(obj.get("ts", obj.get("time")), tz),
+    }
+    for field in READING_FIELDS:
+        value = obj.get(field)
+        try:
+            reading[field] = None if value is None or value == "" else float(value)
+        except (TypeError, ValueError):
+            raise ReadingError(f"Invalid {field}: {value!r}")
+    if all(reading[f] is None for f in READING_FIELDS):
+        raise ReadingError("Reading has no values")
+    return reading
+
+
+def parse_line_protocol(line: str, tz: tzinfo = timezone.utc) -> Dict[str, Any]:
+    """Parse ``measurement,tag=v,... field=v,... [timestamp]`` into a reading dict."""
+    parts = line.strip().split(" ")
+    if len(parts) < 2:
+        raise ReadingError(f"Invalid line: {line!r}")
+    obj: Dict[str, Any] = {}
+    for tag in parts[0].split(",")[1:]:
+        key, _, value = tag.partition("=")
+        obj[key] = value
+    for field in parts[1].split(","):
+        key, _, value = field.partition("=")
+        obj[key] = value.rstrip("i")
+    if len(parts) > 2:
+        obj["ts"] = parts[2]
+    if isinstance(obj.get("farm_id"), str) and obj["farm_id"].isdigit():
+        obj["farm_id"] = int(obj["farm_id"])
+    return _reading_from_dict(obj, tz)
+
+
+def parse_payload(payload: Any, tz: tzinfo = timezone.utc) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Parse a request body or TCP line into readings, with timestamps in ``tz``.
+    Returns (readings, invalid_count). JSON is detected by a leading '{' or '['.
+    """
+    if isinstance(payload, bytes):
+        payload = payload.decode("utf-8", errors="replace")
+    text = payload.strip()
+    readings: List[Dict[str, Any]] = []
+    invalid = 0
+    if not text:
+        return readings, invalid
+    if text[0] in "{[":
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            # Newline-delimited JSON
+            data = []
+            for line in text.splitlines():
+                try:
+                    data.append(json.loads(line))
+                except json.JSONDecodeError:
+                    invalid += 1
+        for obj in data if isinstance(data, list) else [data]:
+            try:
+                readings.append(_reading_from_dict(obj, tz))
+            except ReadingError:
+                invalid += 1
+    else:
+        for line in text.splitlines():
+            if not line.strip() or line.startswith("#"):
+                continue
+            try:
+                readings.append(parse_line_protocol(line, tz))
+            except ReadingError:
+                invalid += 1
+    return readings, invalid
+
+
+def write_readings(db: DBHandler, readings: List[Dict[str, Any]], farm_ids: Dict[str, int],
+                   alerts: Optional[AlertUpdater] = None) -> int:
+    """
+    Store a batch of readings in their month partitions and fold them into the
+    daily climate rows. Farms given by name are resolved through ``farm_ids``
+    (name -> id). Days written are noted in ``alerts`` if given. Does not commit;
+    call inside db.transaction(). Returns rows written.
+    """
+    rows = []
+    for r in readings:
+        farm = r["farm"]
+        if not isinstance(farm, int):
+            farm = int(farm) if str(farm).isdigit() else farm_ids.get(str(farm))
+        if farm is None:
+            continue
+        rows.append((farm, r["sensor"], r["ts"], r["temperature"], r["rainfall"]))
+    if not rows:
+        return 0
+    apply_rollups(db, store_readings(db, rows), alerts=alerts)
+    return len(rows)
+
+
+class IngestService:
+    """
+    Bounded queue + micro-batching writer, with optional HTTP and TCP front ends.
+    Timestamps are normalized to ``tz`` (an IANA name, default UTC).
+
+    Usage:
+        service = IngestService(batch_size=500, flush_ms=500)
+        service.start(http_port=8765)
+        ...
+        service.stop()   # flushes whatever is still queued
+    """
+
+    def __init__(self, db_path: str = DB_FILE, max_queue: int = DEFAULT_QUEUE_SIZE,
+                 batch_size: int = DEFAULT_BATCH_SIZE, flush_ms: int = DEFAULT_FLUSH_MS,
+                 put_timeout: float = 0.05, tz: Optional[str] = None):
+        self.db_path = db_path
+        self.tz = resolve_tz(tz)
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_ms = flush_ms
+        self.put_timeout = put_timeout
+        self.queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._counters = {
+            "received": 0, "written": 0, "dropped": 0, "invalid": 0,
+            "backpressure_waits": 0, "batches": 0, "retries": 0, "errors": 0,
+        }
+        self._last_batch_ms = 0.0
+        self._written_log: deque = deque()
+        self._stop = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._servers: List[socketserver.BaseServer] = []
+        self.http_port: Optional[int] = None
+        self.tcp_port: Optional[int] = None
+
+    # --- Producer side ---
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[key] += n
+
+    def submit(self, readings: List[Dict[str, Any]], invalid: int = 0) -> Tuple[int, int]:
+        """
+        Queue parsed readings. When the queue is full a producer waits up to
+        ``put_timeout`` (backpressure) before the reading is dropped.
+        Returns (accepted, dropped).
+        """
+        accepted = dropped = 0
+        for reading in readings:
+            try:
+                self.queue.put_nowait(reading)
+                accepted += 1
+                continue
+            except queue.Full:
+                self._count("backpressure_waits")
+            try:
+                self.queue.put(reading, timeout=self.put_timeout)
+                accepted += 1
+            except queue.Full:
+                dropped += 1
+        with self._lock:
+            self._counters["received"] += accepted + dropped
+            self._counters["dropped"] += dropped
+            self._counters["invalid"] += invalid
+        return accepted, dropped
+
+    def submit_payload(self, payload: Any) -> Tuple[int, int, int]:
+        """Parse and queue a raw payload. Returns (accepted, dropped, invalid)."""
+        readings, invalid = parse_payload(payload, self.tz)
+        accepted, dropped = self.submit(readings, invalid)
+        return accepted, dropped, invalid
+
+    # --- Writer side ---
+
+    def _drain(self, first: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Collect a batch: up to batch_size readings or until flush_ms has passed."""
+        batch = [first]
+        deadline = time.monotonic() + self.flush_ms / 1000.0
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, db: DBHandler, batch: List[Dict[str, Any]], farm_ids: Dict[str, int]) -> None:
+        started = time.perf_counter()
+        delay = RETRY_BACKOFF_SECONDS
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                if any(not isinstance(r["farm"], int) and not str(r["farm"]).isdigit()
+                       and str(r["farm"]) not in farm_ids for r in batch):
+                    farm_ids.update(db.get_farm_ids())
+                alerts = AlertUpdater()
+                with db.transaction():
+                    written = write_readings(db, batch, farm_ids, alerts)
+                    alerts.finish(db)
+                break
+            except sqlite3.OperationalError:
+                # A failed COMMIT leaves the transaction open
+                if db.conn is not None and db.conn.in_transaction:
+                    db.conn.rollback()
+                if attempt == WRITE_RETRIES:
+                    self._discard(batch)
+                    return
+                self._count("retries")
+                time.sleep(delay)
+                delay *= 2
+            except Exception:
+                self._discard(batch)
+                return
+        publish(alerts.new)
+        invalidate_farms(r["farm"] if isinstance(r["farm"], int) else farm_ids.get(str(r["farm"]), r["farm"])
+                         for r in batch)
+        now = time.monotonic()
+        with self._lock:
+            self._counters["written"] += written
+            self._counters["invalid"] += len(batch) - written
+            self._counters["batches"] += 1
+            self._last_batch_ms = (time.perf_counter() - started) * 1000.0
+            self._written_log.append((now, written))
+
+    def _discard(self, batch: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._counters["errors"] += 1
+            self._counters["dropped"] += len(batch)
+
+    def _run_writer(self) -> None:
+        farm_ids: Dict[str, int] = {}
+        with DBHandler(self.db_path) as db:
+            while not (self._stop.is_set() and self.queue.empty()):
+                try:
+                    first = self.queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                self._flush(db, self._drain(first), farm_ids)
+
+    def flush_pending(self) -> None:
+        """Write everything currently queued (used by tests and on shutdown)."""
+        farm_ids: Dict[str, int] = {}
+        with DBHandler(self.db_path) as db:
+            while True:
+                try:
+                    first = self.queue.get_nowait()
+                except queue.Empty:
+                    return
+                self._flush(db, self._drain(first), farm_ids)
+
+    # --- Lifecycle ---
+
+    def start(self, http_port: Optional[int] = None, tcp_port: Optional[int] = None,
+              host: str = "127.0.0.1") -> "IngestService":
+        """Start the writer thread and the requested front ends (port 0 picks a free port)."""
+        self._stop.clear()
+        self._writer = threading.Thread(target=self._run_writer, name="iot-writer", daemon=True)
+        self._writer.start()
+        if http_port is not None:
+            server = ThreadingHTTPServer((host, http_port), _make_http_handler(self))
+            self.http_port = server.server_address[1]
+            self._serve(server)
+        if tcp_port is not None:
+            server = _ThreadingTCPServer((host, tcp_port), _make_tcp_handler(self))
+            self.tcp_port = server.server_address[1]
+            self._serve(server)
+        return self
+
+    def _serve(self, server: socketserver.BaseServer) -> None:
+        server.daemon_threads = True
+        self._servers.append(server)
+        threading.Thread(target=server.serve_forever, name="iot-server", daemon=True).start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the front ends, then let the writer flush the queue and exit."""
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join(timeout)
+            self._writer = None
+
+    @property
+    def running(self) -> bool:
+        return self._writer is not None and self._writer.is_alive()
+
+    # --- Monitoring ---
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus queue depth and the ingest rate (rows written/s) over the last few seconds."""
+        now = time.monotonic()
+        with self._lock:
+            while self._written_log and now - self._written_log[0][0] > RATE_WINDOW_SECONDS:
+                self._written_log.popleft()
+            recent = sum(n for _, n in self._written_log)
+            stats = dict(self._counters)
+            stats["last_batch_ms"] = round(self._last_batch_ms, 2)
+        stats["queue_depth"] = self.queue.qsize()
+        stats["queue_capacity"] = self.max_queue
+        stats["rate_per_s"] = round(recent / RATE_WINDOW_SECONDS, 2)
+        return stats
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+
+
+def _make_http_handler(service: IngestService):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/readings":
+                self._reply(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            accepted, dropped, invalid = service.submit_payload(self.rfile.read(length))
+            body = {"accepted": accepted, "dropped": dropped, "invalid": invalid}
+            if dropped and not accepted:
+                # Queue full: ask the client to back off and retry
+                self._reply(503, body, {"Retry-After": "1"})
+            elif invalid and not accepted:
+                self._reply(400, body)
+            else:
+                self._reply(202, body)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                self._reply(200, service.stats())
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def log_message(self, format, *args):
+            # Sensors post every minute; keep the console quiet
+            pass
+
+    return Handler
+
+
+def _make_tcp_handler(service: IngestService):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                line = raw.strip()
+                if not line:
+                    continue
+                accepted, dropped, invalid = service.submit_payload(line)
+                reply = b"OK\n" if accepted else (b"DROP\n" if dropped else b"INVALID\n")
+                try:
+                    self.wfile.write(reply)
+                except OSError:
+                    return
+
+    return Handler
+
+
+_service: Optional[IngestService] = None
+
+
+def get_service() -> Optional[IngestService]:
+    """The service started in this process by the IoT page, if any."""
+    return _service
+
+
+def set_service(service: Optional[IngestService]) -> None:
+    global _service
+    _service = service
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the sensor ingestion service.")
+    parser.add_argument("--http", type=int, default=8765, help="HTTP port (default 8765)")
+    parser.add_argument("--tcp", type=int, default=None, help="Optional plain TCP port")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database path")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--flush-ms", type=int, default=DEFAULT_FLUSH_MS)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument("--tz", default="UTC",
+                        help="Timezone readings are stored in and days split by (IANA name, default UTC)")
+    args = parser.parse_args()
+    try:
+        service = IngestService(args.db, max_queue=args.queue_size, batch_size=args.batch_size,
+                                flush_ms=args.flush_ms, tz=args.tz)
+    except ValueError as e:
+        parser.error(str(e))
+    service.start(http_port=args.http, tcp_port=args.tcp, host=args.host)
+    print(f"Ingest service listening: http={service.http_port} tcp={service.tcp_port}")
+    try:
+        while True:
+            time.sleep(5)
+            print(json.dumps(service.stats()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
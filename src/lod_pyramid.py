@@ -0,0 +1,234 @@
+"""
+lod_pyramid.py
+Multi-resolution (level-of-detail) aggregates of every farm's daily series.
+
+series_lod holds, per farm, metric and level, one row per bucket with the
+count, min, max, mean and (population) variance of the metric's daily values:
+
+    week    - Monday-based weeks
+    month   - calendar months
+    season  - Dec-Feb, Mar-May, Jun-Aug, Sep-Nov (as DBHandler.detect_season)
+
+Month buckets also carry a quantile sketch: SKETCH_POINTS evenly spaced
+quantiles (min, ..., median, ..., max) as float32, so distribution charts
+(distribution.py) merge a few hundred sketches instead of reading every value.
+
+The daily rows themselves are the finest level ('day'). Charts pick the
+finest level with at most about one point per pixel for the visible range
+(level_for), so a decade of one farm is a few hundred rows at any zoom.
+
+Ingest paths keep the pyramid current: LodUpdater remembers, per farm, the
+earliest date written and rebuilds only the buckets from there onwards inside
+the ingest transaction. Farms imported before the pyramid existed are built
+on their first fetch.
+"""
+
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from series_cache import METRICS, load_series
+
+LEVELS = ("day", "week", "month", "season")
+# Average bucket length in days, used to estimate points per range
+LEVEL_DAYS = {"day": 1.0, "week": 7.0, "month": 30.44, "season": 91.31}
+LEVEL_NAMES = {"day": "daily", "week": "weekly", "month": "monthly", "season": "seasonal"}
+# Quantiles kept per month bucket: every 1/16, so the quartiles are exact
+SKETCH_POINTS = 17
+SKETCH_LEVEL = "month"
+QUANTILES = np.linspace(0.0, 1.0, SKETCH_POINTS)
+
+
+def bucket_starts(dates, level: str) -> np.ndarray:
+    """First day (datetime64[D]) of the ``level`` bucket of each date."""
+    days = np.asarray(dates).astype("datetime64[D]")
+    if level == "day":
+        return days
+    if level == "week":
+        # 1970-01-01 was a Thursday (Monday-based weekday 3)
+        weekday = (days.astype(np.int64) + 3) % 7
+        return days - weekday.astype("timedelta64[D]")
+    months = days.astype("datetime64[M]")
+    if level == "month":
+        return months.astype("datetime64[D]")
+    if level == "season":
+        # Dec starts a season, Jan/Feb belong to the previous December's
+        offset = (months.astype(np.int64) % 12 + 1) % 3
+        return (months - offset.astype("timedelta64[M]")).astype("datetime64[D]")
+    raise ValueError(f"Unknown level: {level!r} (expected one of {', '.join(LEVELS)})")
+
+
+def bucket_start(date_str: str, level: str) -> str:
+    """bucket_starts() for one 'YYYY-MM-DD' string."""
+    return str(bucket_starts(np.array([date_str], dtype="datetime64[D]"), level)[0])
+
+
+def level_for(start: str, end: str, max_points: int) -> str:
+    """Finest level with at most ``max_points`` buckets between two dates (inclusive)."""
+    try:
+        span = (date.fromisoformat(end) - date.fromisoformat(start)).days + 1
+    except (TypeError, ValueError):
+        return "day"
+    for level in LEVELS:
+        if span / LEVEL_DAYS[level] <= max_points:
+            return level
+    return LEVELS[-1]
+
+
+def rebuild(db, farm_id: Any, since: str = "") -> int:
+    """
+    Recompute the pyramid of one farm for buckets containing ``since`` or later
+    ('' = everything). Does not commit; call inside db.transaction().
+    Returns the number of bucket rows written.
+    """
+    conn = db.conn
+    starts = {level: bucket_start(since, level) if since else "" for level in LEVELS[1:]}
+    for level, start in starts.items():
+        conn.execute("DELETE FROM series_lod WHERE farm_id=? AND level=? AND bucket>=?", (farm_id, level, start))
+    # Reading from the earliest affected bucket gives every rebuilt bucket all its days
+    series = load_series(db, farm_id, min(starts.values()))
+    if not len(series):
+        return 0
+    rows: List[tuple] = []
+    for level, start in starts.items():
+        keys = bucket_starts(series.dates, level)
+        first = int(np.searchsorted(keys, np.datetime64(start))) if start else 0
+        keys = keys[first:]
+        if not len(keys):
+            continue
+        edges = np.r_[0, np.flatnonzero(keys[1:] != keys[:-1]) + 1]
+        labels = keys[edges].astype(str)
+        for metric in METRICS:
+            values = series.columns[metric][first:]
+            valid = ~np.isnan(values)
+            n = np.add.reduceat(valid.astype(np.int64), edges)
+            total = np.add.reduceat(np.where(valid, values, 0.0), edges)
+            with np.errstate(invalid="ignore"):
+                low = np.fmin.reduceat(values, edges)
+                high = np.fmax.reduceat(values, edges)
+                mean = total / n
+                deviation = np.where(valid, values - np.repeat(mean, np.diff(np.r_[edges, len(values)])), 0.0)
+                var = np.add.reduceat(deviation * deviation, edges) / n
+            sketches = sketch_rows(values, edges, n) if level == SKETCH_LEVEL else None
+            for i in np.flatnonzero(n):
+                rows.append((farm_id, level, metric, labels[i], int(n[i]), float(low[i]), float(high[i]),
+                             float(mean[i]), float(var[i]), sketches[i].tobytes() if sketches is not None else None))
+    return db.executemany(
+        "INSERT OR REPLACE INTO series_lod (farm_id, level, metric, bucket, n, min, max, mean, var, sketch) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows
+    )
+
+
+def sketch_rows(values: np.ndarray, edges: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """
+    QUANTILES of the valid values of each bucket (buckets start at ``edges``,
+    ``n`` valid values each) as a (buckets, SKETCH_POINTS) float32 array, with
+    linear interpolation as np.quantile. One sort for all buckets.
+    """
+    sizes = np.diff(np.r_[edges, len(values)])
+    group = np.repeat(np.arange(len(edges)), sizes)
+    # NaN sorts last, so each bucket's valid values come first within it
+    ordered = values[np.lexsort((values, group))]
+    pos = edges[:, None] + QUANTILES[None, :] * np.maximum(n - 1, 0)[:, None]
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.maximum(np.minimum(lo + 1, (edges + n - 1)[:, None]), lo)
+    frac = pos - lo
+    return (ordered[lo] * (1.0 - frac) + ordered[hi] * frac).astype(np.float32)
+
+
+class LodUpdater:
+    """
+    Track the earliest written date per farm during an ingest and rebuild the
+    affected buckets afterwards (in the same transaction as the writes).
+
+    Usage:
+        lod = LodUpdater()
+        for chunk in chunks:
+            write(chunk)
+            lod.note(chunk, farm_id)
+        lod.finish(db)
+    """
+
+    def __init__(self):
+        self.earliest: Dict[Any, str] = {}
+
+    def note(self, df: pd.DataFrame, farm_id: Any = None) -> None:
+        if df is None or df.empty or "date" not in df.columns:
+            return
+        if farm_id is not None:
+            firsts = {farm_id: df["date"].astype(str).min()}
+        elif "farm_id" in df.columns:
+            rows = df[df["farm_id"].notna()]
+            firsts = rows["date"].astype(str).groupby(rows["farm_id"]).min().to_dict()
+        else:
+            return
+        for farm, first in firsts.items():
+            farm = int(farm) if isinstance(farm, (float, np.floating)) and float(farm).is_integer() else farm
+            if farm not in self.earliest or first < self.earliest[farm]:
+                self.earliest[farm] = first
+
+    def finish(self, db) -> int:
+        """Rebuild the recorded farms. Returns bucket rows written."""
+        written = sum(rebuild(db, farm, since) for farm, since in self.earliest.items())
+        self.earliest = {}
+        return written
+
+
+def fetch(db, farm_id: Any, metrics: Iterable[str], level: str, start: str = "", end: str = "") -> pd.DataFrame:
+    """
+    Buckets of ``level`` overlapping [start, end] ('' = open) as a DataFrame with
+    a ``date`` column (bucket start) and, per metric, its mean plus
+    ``<metric>_min`` and ``<metric>_max``. Builds the farm's pyramid first if it
+    has daily rows but no pyramid yet.
+    """
+    metrics = list(dict.fromkeys(metrics))
+    q = (f"SELECT bucket, metric, min, max, mean FROM series_lod WHERE farm_id=? AND level=? "
+         f"AND metric IN ({', '.join('?' * len(metrics))})")
+    params: List[Any] = [farm_id, level, *metrics]
+    if start:
+        q += " AND bucket>=?"
+        params.append(bucket_start(start, level))
+    if end:
+        q += " AND bucket<=?"
+        params.append(end)
+    rows = db.conn.execute(q + " ORDER BY bucket", params).fetchall()
+    if not rows and _needs_build(db, farm_id):
+        with db.transaction():
+            rebuild(db, farm_id)
+        rows = db.conn.execute(q + " ORDER BY bucket", params).fetchall()
+    columns = ["date"] + [c for m in metrics for c in (m, f"{m}_min", f"{m}_max")]
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    long = pd.DataFrame([tuple(r) for r in rows], columns=["bucket", "metric", "min", "max", "mean"])
+    wide = long.pivot(index="bucket", columns="metric", values=["mean", "min", "max"])
+    out = pd.DataFrame({"date": pd.to_datetime(wide.index).to_numpy(dtype="datetime64[ns]")})
+    for m in metrics:
+        for col, stat in ((m, "mean"), (f"{m}_min", "min"), (f"{m}_max", "max")):
+            out[col] = wide[(stat, m)].to_numpy(dtype=float) if (stat, m) in wide.columns else np.nan
+    return out[columns]
+
+
+def _needs_build(db, farm_id: Any) -> bool:
+    conn = db.conn
+    if conn.execute("SELECT 1 FROM series_lod WHERE farm_id=? LIMIT 1", (farm_id,)).fetchone():
+        return False
+    return conn.execute("SELECT 1 FROM climate_data WHERE farm_id=? LIMIT 1", (farm_id,)).fetchone() is not None
+
+
+def date_range(db, farm_id: Any, start: str = "", end: str = "") -> Optional[tuple]:
+    """(first, last) stored date of a farm within [start, end], filling open bounds; None if no rows."""
+    q = "SELECT MIN(date), MAX(date) FROM climate_data WHERE farm_id=?"
+    params: List[Any] = [farm_id]
+    if start:
+        q += " AND date>=?"
+        params.append(start)
+    if end:
+        q += " AND date<=?"
+        params.append(end)
+    row = db.conn.execute(q, params).fetchone()
+    if row is None or row[0] is None:
+        return None
+    return str(row[0])[:10], str(row[1])[:10]
@@ -455,6 +455,10 @@ class ClimateApp(tk.Tk):
             from upload_page import UploadPage
             return UploadPage(self)
 
+        def iot_factory():
+            from iot_data_page import IoTDataPage
+            return IoTDataPage(self, user=self.logged_in_user)
+
         def visualization_factory():
             from visualization import VisualizationPage
             return VisualizationPage(self, user=self.logged_in_user)
@@ -484,6 +488,7 @@ class ClimateApp(tk.Tk):
             "contact": contact_factory,
             "dashboard": dashboard_factory,
             "upload": upload_factory,
+            "iot": iot_factory if self.logged_in_user and self.logged_in_user["role"] == "admin" else None,
             "visualization": visualization_factory,
             "prediction": prediction_factory,
             "report": report_factory,
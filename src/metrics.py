@@ -0,0 +1,275 @@
+"""
+metrics.py
+Derived agronomic metrics computed from raw climate columns.
+
+Daily growing degree days (GDD) and effective rainfall are computed for whole
+arrays at once with NumPy; cumulative GDD is a per-farm cumulative sum. When
+late or corrected rows are written, recompute_cumulative() rebuilds only the
+suffix of a farm's cumulative GDD from the earliest changed date onwards.
+"""
+
+from typing import Any, Dict, Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BASE_TEMP = 10.0
+# Upper developmental threshold used by the "cap" and "cutoff" methods
+DEFAULT_UPPER_TEMP = 30.0
+# Share of rainfall assumed to reach the root zone
+DEFAULT_RAIN_FRACTION = 0.8
+
+GDD_METHODS = ("average", "cap", "cutoff")
+
+
+def daily_gdd(temp_max, temp_min, base_temp=DEFAULT_BASE_TEMP, method: str = "average",
+              upper_temp: float = DEFAULT_UPPER_TEMP) -> np.ndarray:
+    """
+    Daily growing degree days for arrays of temperatures.
+
+    Methods:
+        average - max(0, (temp_max + temp_min) / 2 - base_temp)
+        cap     - temperatures are clamped to [base_temp, upper_temp] before
+                  averaging (horizontal cutoff)
+        cutoff  - like average, but days whose mean exceeds upper_temp add no
+                  growth (vertical cutoff)
+
+    ``base_temp`` may be a scalar or an array aligned with the temperatures.
+    NaN temperatures give NaN.
+    """
+    tmax = np.asarray(temp_max, dtype=float)
+    tmin = np.asarray(temp_min, dtype=float)
+    base = np.asarray(base_temp, dtype=float)
+    if method == "average":
+        mean = (tmax + tmin) / 2.0
+    elif method == "cap":
+        mean = (np.clip(tmax, base, upper_temp) + np.clip(tmin, base, upper_temp)) / 2.0
+    elif method == "cutoff":
+        mean = (tmax + tmin) / 2.0
+        mean = np.where(mean > upper_temp, base, mean)
+    else:
+        raise ValueError(f"Unknown GDD method: {method!r} (expected one of {', '.join(GDD_METHODS)})")
+    with np.errstate(invalid="ignore"):
+        return np.maximum(mean - base, 0.0)
+
+
+def effective_rainfall(rainfall, fraction: float = DEFAULT_RAIN_FRACTION,
+                       min_rain: float = 0.0) -> np.ndarray:
+    """
+    Effective rainfall: ``fraction`` of each day's rain, with falls below
+    ``min_rain`` (lost to interception/evaporation) counting as zero.
+    """
+    rain = np.asarray(rainfall, dtype=float)
+    with np.errstate(invalid="ignore"):
+        return np.where(rain < min_rain, 0.0, rain * fraction)
+
+
+def cumulative_gdd(farm_ids, dates, gdd, offsets: Optional[Mapping[Any, float]] = None) -> np.ndarray:
+    """
+    Cumulative GDD per farm in date order, returned in the input row order.
+
+    Rows are sorted once by (farm, date) and summed with a single cumsum; each
+    farm's running total is then restarted by subtracting the total reached
+    before its first row. ``offsets`` optionally gives a starting total per farm
+    (e.g. the stored cumulative value on the day before the first row).
+    NaN daily values count as zero.
+    """
+    ids = pd.Series(farm_ids).to_numpy()
+    farms = pd.factorize(ids, use_na_sentinel=False)[0]
+    days = pd.to_datetime(pd.Series(dates), errors="coerce").to_numpy(dtype="datetime64[D]").astype(np.int64)
+    values = np.nan_to_num(np.asarray(gdd, dtype=float))
+    order = np.lexsort((days, farms))
+    sorted_farms = farms[order]
+    running = np.cumsum(values[order])
+    is_start = np.r_[True, sorted_farms[1:] != sorted_farms[:-1]][:len(order)]
+    group = np.cumsum(is_start) - 1
+    # Total reached before each farm's first row, subtracted to restart the sum
+    before = (running - values[order])[is_start]
+    result_sorted = running - before[group]
+    if offsets:
+        start = np.array([float(offsets.get(f) or 0.0) for f in ids[order][is_start]])
+        result_sorted += start[group]
+    result = np.empty_like(result_sorted)
+    result[order] = result_sorted
+    return result
+
+
+def derive_metrics(df: pd.DataFrame, base_temp: Union[float, Mapping[Any, float], None] = None,
+                   method: str = "average", upper_temp: float = DEFAULT_UPPER_TEMP,
+                   rain_fraction: float = DEFAULT_RAIN_FRACTION, overwrite: bool = False) -> pd.DataFrame:
+    """
+    Fill daily_gdd and effective_rainfall for a chunk of climate rows.
+
+    Values already present in the chunk are kept unless ``overwrite`` is set.
+    The base temperature comes from a ``base_temp`` column if the chunk has one,
+    else from ``base_temp`` (a scalar, or a mapping of farm_id -> base_temp).
+    A cumulative_gdd column is added (NaN) if missing; MetricsUpdater fills it
+    (in the chunk for appended rows, else with recompute_cumulative()).
+    """
+    df = df.copy()
+    if "base_temp" in df.columns:
+        base = pd.to_numeric(df["base_temp"], errors="coerce").to_numpy(dtype=float)
+    elif isinstance(base_temp, Mapping) and "farm_id" in df.columns:
+        base = df["farm_id"].map(base_temp).to_numpy(dtype=float, na_value=np.nan)
+    else:
+        base = np.full(len(df), DEFAULT_BASE_TEMP if base_temp is None or isinstance(base_temp, Mapping) else float(base_temp))
+    base = np.where(np.isnan(base), DEFAULT_BASE_TEMP, base)
+
+    gdd = daily_gdd(pd.to_numeric(df["temp_max"], errors="coerce"), pd.to_numeric(df["temp_min"], errors="coerce"),
+                    base, method=method, upper_temp=upper_temp)
+    eff = effective_rainfall(pd.to_numeric(df["rainfall"], errors="coerce"), fraction=rain_fraction)
+    for col, derived in (("daily_gdd", gdd), ("effective_rainfall", eff)):
+        if overwrite or col not in df.columns:
+            df[col] = derived
+        else:
+            current = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+            df[col] = np.where(np.isnan(current), derived, current)
+    if "cumulative_gdd" not in df.columns:
+        df["cumulative_gdd"] = np.nan
+    return df
+
+
+def recompute_cumulative(db, farm_id: int, from_date: str) -> int:
+    """
+    Rebuild agri_metrics.cumulative_gdd for one farm from ``from_date`` onwards.
+
+    Only the suffix is read and rewritten. The running total starts from the
+    stored value on the last date before ``from_date``; for a farm's first row it
+    starts from that row's own cumulative value minus its daily GDD, so a season
+    total carried by the source file is preserved. Does not commit; call inside
+    db.transaction(). Returns the number of rows updated.
+    """
+    conn = db.conn
+    prev = conn.execute(
+        "SELECT cumulative_gdd FROM agri_metrics WHERE farm_id=? AND date<? ORDER BY date DESC LIMIT 1",
+        (farm_id, from_date)
+    ).fetchone()
+    rows = conn.execute(
+        "SELECT id, daily_gdd, cumulative_gdd FROM agri_metrics WHERE farm_id=? AND date>=? ORDER BY date",
+        (farm_id, from_date)
+    ).fetchall()
+    if not rows:
+        return 0
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    daily = np.array([r[1] for r in rows], dtype=float)
+    daily = np.nan_to_num(daily)
+    if prev is not None and prev[0] is not None:
+        start = float(prev[0])
+    elif prev is None and rows[0][2] is not None:
+        start = float(rows[0][2]) - daily[0]
+    else:
+        start = 0.0
+    cumulative = start + np.cumsum(daily)
+    return db.executemany(
+        "UPDATE agri_metrics SET cumulative_gdd=? WHERE id=?",
+        zip(cumulative.tolist(), ids.tolist())
+    )
+
+
+def recompute_suffixes(db, earliest: Dict[Any, str]) -> int:
+    """Recompute cumulative GDD for every farm in ``earliest`` (farm_id -> first changed date)."""
+    return sum(recompute_cumulative(db, farm_id, date) for farm_id, date in earliest.items())
+
+
+class MetricsUpdater:
+    """
+    Keep derived metrics consistent while chunks are written to the database.
+
+    prepare() derives daily GDD and effective rainfall for a chunk (using each
+    farm's stored base_temp). Rows appended after a farm's latest row get their
+    cumulative GDD in the chunk (cumulative_gdd() from the farm's running total),
+    so appends are written once. Otherwise prepare() records, per farm, the
+    earliest date whose cumulative GDD must be rebuilt: late or corrected rows
+    dated on or before the farm's latest row, and rows it could not sum in order
+    (repeated dates, or mixed with cumulative values from the file).
+    finish() then recomputes only those suffixes.
+
+    Usage (inside one transaction, or one per chunk followed by a final one):
+        updater = MetricsUpdater()
+        for chunk in chunks:
+            write(updater.prepare(db, chunk, farm_id))
+        updater.finish(db)
+    """
+
+    def __init__(self, method: str = "average", upper_temp: float = DEFAULT_UPPER_TEMP,
+                 rain_fraction: float = DEFAULT_RAIN_FRACTION):
+        self.method = method
+        self.upper_temp = upper_temp
+        self.rain_fraction = rain_fraction
+        self.earliest: Dict[Any, str] = {}
+        # Latest day and its cumulative GDD per farm, stored or written earlier in this run
+        self._latest: Optional[Dict[Any, str]] = None
+        self._totals: Dict[Any, Optional[float]] = {}
+        self._base_temps: Dict[Any, float] = {}
+
+    def _load(self, db, farm_ids) -> None:
+        if self._latest is None:
+            rows = db.conn.execute(
+                """SELECT a.farm_id, a.date, a.cumulative_gdd FROM agri_metrics a
+                   JOIN (SELECT farm_id, MAX(date) AS date FROM agri_metrics GROUP BY farm_id) l
+                   ON a.farm_id = l.farm_id AND a.date = l.date"""
+            ).fetchall()
+            self._latest = {r[0]: r[1] for r in rows}
+            self._totals = {r[0]: r[2] for r in rows}
+        missing = [f for f in farm_ids if f not in self._base_temps]
+        if missing:
+            self._base_temps.update(db.conn.execute("SELECT id, base_temp FROM farms").fetchall())
+            for f in missing:
+                self._base_temps.setdefault(f, None)
+
+    def prepare(self, db, df: pd.DataFrame, farm_id: Any = None) -> pd.DataFrame:
+        """Return ``df`` with derived columns filled; remember which suffixes to rebuild."""
+        if df.empty or not all(c in df.columns for c in ("date", "temp_max", "temp_min", "rainfall")):
+            return df
+        if farm_id is not None:
+            farms = pd.Series(farm_id, index=df.index)
+        elif "farm_id" in df.columns:
+            farms = df["farm_id"]
+        else:
+            return df
+        self._load(db, farms.dropna().unique().tolist())
+        base = farms.map(self._base_temps).to_numpy(dtype=float, na_value=np.nan)
+        # Base temperatures come from the farms table (already upserted for multi-farm files)
+        df = derive_metrics(df.assign(base_temp=base), method=self.method, upper_temp=self.upper_temp,
+                            rain_fraction=self.rain_fraction).drop(columns=["base_temp"])
+        cumulative = pd.to_numeric(df["cumulative_gdd"], errors="coerce")
+        latest = farms.map(self._latest).astype(object)
+        dates = df["date"].astype(str)
+        late = latest.notna() & (dates <= latest.where(latest.notna(), ""))
+        missing = cumulative.isna() & ~late
+        # Farms whose appended rows all lack a cumulative value, on distinct dates, and
+        # whose running total is known (a farm already due for a rebuild is left to it)
+        appended = farms[~late]
+        summable = (missing[~late].groupby(appended).all()
+                    & ~(appended.astype(str) + "|" + dates[~late]).duplicated(keep=False).groupby(appended).any())
+        summable = {f for f, ok in summable.items() if ok and f not in self.earliest
+                    and (f not in self._latest or self._totals.get(f) is not None)}
+        fresh = missing & farms.isin(summable)
+        values = cumulative.to_numpy(dtype=float, copy=True)
+        if fresh.any():
+            mask = fresh.to_numpy()
+            values[mask] = cumulative_gdd(farms[fresh], dates[fresh], df.loc[fresh, "daily_gdd"],
+                                          offsets={f: self._totals.get(f) or 0.0 for f in summable})
+            df["cumulative_gdd"] = values
+        dirty = (missing & ~fresh) | late
+        if dirty.any():
+            firsts = dates[dirty].groupby(farms[dirty]).min()
+            for f, d in firsts.items():
+                if f not in self.earliest or d < self.earliest[f]:
+                    self.earliest[f] = d
+        # The appended rows become each farm's latest day for the next chunk
+        if (~late).any():
+            last = pd.DataFrame({"farm": farms[~late], "date": dates[~late], "total": values[(~late).to_numpy()]})
+            last = last.sort_values("date").groupby("farm").tail(1)
+            for f, d, total in last.itertuples(index=False):
+                self._latest[f] = d
+                self._totals[f] = None if np.isnan(total) else float(total)
+        return df
+
+    def finish(self, db) -> int:
+        """Recompute the recorded cumulative GDD suffixes. Returns rows updated."""
+        updated = recompute_suffixes(db, self.earliest)
+        self.earliest = {}
+        self._latest = None
+        self._totals = {}
+        return updated
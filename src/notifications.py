@@ -4,7 +4,8 @@ Subscribers should implement either `backend_event_notification(event_type, mess
 `add_notification(message)`. Notifications are delivered on the subscriber's Tk mainloop
 via `after(0, ...)` when possible.
 """
-from typing import List
+import time
+from typing import Callable, List
 
 _subscribers: List[object] = []
 
@@ -78,3 +79,33 @@ def notify(event_type: str, message: str) -> None:
         except Exception:
             # Do not let one failed subscriber stop others
             pass
+
+
+class ProgressThrottle:
+    """Rate-limit progress callbacks from worker threads.
+
+    `update(done, total)` forwards to `callback(done, total)` at most `max_per_second`
+    times per second; `finish(done, total)` always forwards. Use it so that long
+    imports/exports do not flood the Tk event queue with one callback per row.
+    """
+
+    def __init__(self, callback: Callable[[int, int], None], max_per_second: float = 10.0):
+        self.callback = callback
+        self.interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+        self._last = 0.0
+
+    def update(self, done: int, total: int) -> None:
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            try:
+                self.callback(done, total)
+            except Exception:
+                pass
+
+    def finish(self, done: int, total: int) -> None:
+        self._last = time.monotonic()
+        try:
+            self.callback(done, total)
+        except Exception:
+            pass
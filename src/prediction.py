@@ -8,6 +8,8 @@ import os
 import csv
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from chart_layer import ChartLayer
+import data_versions
 
 class PredictionPage(tb.Frame):
     def run_prediction(self):
@@ -86,15 +88,20 @@ class PredictionPage(tb.Frame):
         self.fig = None
         self.ax = None
         self.canvas = None
+        self.chart = None
         self._initialized = False
         self._shutdown = False
 
         # Prediction history
         self.prediction_history = []
 
-        # Load farms
+        # Load farms; the list is reloaded only when the farms table changes (see data_versions.py)
         self.farm_ids = []
+        self.selected_farm_id = None
+        self._versions = data_versions.VersionWatcher()
+        self._versions.changed()
         self.load_farms()
+        data_versions.watch(self, self._versions, self._on_data_changed)
 
         # ML Model placeholder
         self.ml_model = None
@@ -102,17 +109,23 @@ class PredictionPage(tb.Frame):
         self.model_meta = {}
 
     def load_farms(self):
-        """Load farms from the database for selection."""
+        """Load farms from the database for selection, keeping the selected farm if it still exists."""
         with DBHandler() as db:
             farms = db.get_farms()
+        previous = getattr(self, 'selected_farm_id', None)
         if farms:
             self.farm_combo["values"] = [f["name"] for f in farms]
             self.farm_ids = [f["id"] for f in farms]
-            self.farm_combo.current(0)
+            self.farm_combo.current(self.farm_ids.index(previous) if previous in self.farm_ids else 0)
         else:
             self.farm_combo["values"] = []
             self.farm_ids = []
-        self.selected_farm_id = self.farm_ids[0] if self.farm_ids else None
+        self.selected_farm_id = self.farm_ids[self.farm_combo.current()] if self.farm_ids else None
+
+    def _on_data_changed(self, changed):
+        # Predictions read farm data when run; only the farm list itself can go stale
+        if data_versions.FARM_LIST in changed:
+            self.load_farms()
 
     def on_show(self):
         """Lazily create matplotlib figure and canvas when the page becomes visible."""
@@ -121,6 +134,7 @@ class PredictionPage(tb.Frame):
         try:
             self.fig, self.ax = plt.subplots(figsize=(4, 3))
             self.canvas = FigureCanvasTkAgg(self.fig, master=self)
+            self.chart = ChartLayer(self.fig, self.canvas)
             widget = getattr(self.canvas, 'get_tk_widget', lambda: None)()
             if widget:
                 try:
@@ -308,25 +322,21 @@ class PredictionPage(tb.Frame):
                 self.on_show()
             except Exception:
                 pass
-        if self.ax is None:
+        chart = getattr(self, 'chart', None)
+        if self.ax is None or chart is None:
             return
-        self.ax.clear()
+        chart.begin()
         if self.prediction_history:
-            xs = list(range(1, len(self.prediction_history) + 1))
-            ys = [entry["predicted_yield"] for entry in self.prediction_history]
-            self.ax.plot(xs, ys, marker="o", color="#0d6efd", label="Predicted Yield")
-            self.ax.set_title("Predicted Yield History")
-            self.ax.set_xlabel("Prediction #")
-            self.ax.set_ylabel("Yield")
-            self.ax.legend()
+            xs = np.arange(1, len(self.prediction_history) + 1)
+            ys = np.array([entry["predicted_yield"] for entry in self.prediction_history], dtype=float)
+            chart.line("yield", xs, ys, ax=self.ax, marker="o", color="#0d6efd", label="Predicted Yield")
+            chart.labels(self.ax, "Predicted Yield History", "Prediction #", "Yield")
         else:
-            self.ax.text(0.5, 0.5, "No predictions yet", ha="center", va="center", fontsize=12)
-        canvas = getattr(self, 'canvas', None)
-        if canvas is not None:
-            try:
-                canvas.draw()
-            except Exception:
-                pass
+            chart.message(self.ax, "No predictions yet")
+        try:
+            chart.end()
+        except Exception:
+            pass
 
     def batch_predict_csv(self):
         """
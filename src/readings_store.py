@@ -0,0 +1,213 @@
+"""
+readings_store.py
+Storage for raw high-frequency sensor readings and their daily roll-up.
+
+Raw readings are partitioned by month: each month has its own table
+(sensor_readings_YYYY_MM) whose clustered primary key (farm_id, ts, sensor)
+keeps every farm's readings together and in time order, so a farm/day lookup
+is a single range scan. Partitions are created on first use and listed in
+reading_partitions.
+
+reading_rollups keeps min/max temperature, rainfall sum and reading count per
+farm and day. New readings, in or out of order, are folded into it
+incrementally; a reading that replaces a stored one with different values
+makes its day be re-aggregated from the raw partition. Touched days are then
+written to climate_data (temp_min, temp_max, rainfall) and their derived
+metrics updated, so dashboards keep reading compact daily rows.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from import_utils import write_chunk
+from lod_pyramid import LodUpdater
+from metrics import MetricsUpdater
+
+PARTITION_PREFIX = "sensor_readings_"
+
+Reading = Tuple[int, str, str, Optional[float], Optional[float]]  # farm_id, sensor, ts, temperature, rainfall
+DayKey = Tuple[int, str]  # farm_id, 'YYYY-MM-DD'
+
+
+def partition_for(ts: str) -> str:
+    """Partition table holding a 'YYYY-MM-DD HH:MM:SS' timestamp: sensor_readings_YYYY_MM."""
+    return f"{PARTITION_PREFIX}{ts[0:4]}_{ts[5:7]}"
+
+
+def ensure_partition(conn, name: str) -> None:
+    """Create a month partition (and register it) if it does not exist yet."""
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {name} (
+            farm_id INTEGER NOT NULL,
+            ts TEXT NOT NULL,
+            sensor TEXT NOT NULL DEFAULT '',
+            temperature REAL,
+            rainfall REAL,
+            PRIMARY KEY (farm_id, ts, sensor)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        "INSERT OR IGNORE INTO reading_partitions (name, month) VALUES (?, ?)",
+        (name, f"{name[len(PARTITION_PREFIX):len(PARTITION_PREFIX) + 4]}-{name[-2:]}")
+    )
+
+
+def partitions(conn, start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+    """Partition tables overlapping [start, end] (dates or timestamps), oldest first."""
+    query = "SELECT name FROM reading_partitions WHERE 1=1"
+    params: List[Any] = []
+    if start:
+        query += " AND month >= ?"
+        params.append(start[:7])
+    if end:
+        query += " AND month <= ?"
+        params.append(end[:7])
+    return [row[0] for row in conn.execute(query + " ORDER BY month", params).fetchall()]
+
+
+def _fold_sql() -> str:
+    # Scalar min()/max() return NULL if either side is NULL, so fall back explicitly
+    return """
+        INSERT INTO reading_rollups (farm_id, date, temp_min, temp_max, rain_sum, n)
+        SELECT farm_id, substr(ts, 1, 10), MIN(temperature), MAX(temperature), SUM(rainfall), COUNT(*)
+        FROM _incoming WHERE state = 0
+        GROUP BY farm_id, substr(ts, 1, 10)
+        ON CONFLICT(farm_id, date) DO UPDATE SET
+            temp_min = COALESCE(min(temp_min, excluded.temp_min), temp_min, excluded.temp_min),
+            temp_max = COALESCE(max(temp_max, excluded.temp_max), temp_max, excluded.temp_max),
+            rain_sum = CASE WHEN rain_sum IS NULL AND excluded.rain_sum IS NULL THEN NULL
+                            ELSE COALESCE(rain_sum, 0) + COALESCE(excluded.rain_sum, 0) END,
+            n = n + excluded.n
+    """
+
+
+def store_readings(db, readings: Iterable[Reading]) -> Set[DayKey]:
+    """
+    Write raw readings into their month partitions and fold them into
+    reading_rollups. Does not commit; call inside db.transaction().
+    Returns the (farm_id, date) days whose roll-up changed.
+    """
+    conn = db.conn
+    by_partition: Dict[str, List[Reading]] = {}
+    for r in readings:
+        by_partition.setdefault(partition_for(r[2]), []).append(r)
+    if not by_partition:
+        return set()
+    # state: 0 = new reading, 1 = identical to the stored one, 2 = replaces a stored value
+    conn.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS _incoming (
+            farm_id INTEGER, sensor TEXT, ts TEXT, temperature REAL, rainfall REAL,
+            state INTEGER DEFAULT 0,
+            PRIMARY KEY (farm_id, ts, sensor)
+        )
+        """
+    )
+    touched: Set[DayKey] = set()
+    for name, rows in by_partition.items():
+        ensure_partition(conn, name)
+        conn.execute("DELETE FROM _incoming")
+        # Within one batch the last reading for a key wins
+        db.executemany(
+            "INSERT OR REPLACE INTO _incoming (farm_id, sensor, ts, temperature, rainfall) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.execute(
+            f"""
+            UPDATE _incoming SET state = (
+                SELECT CASE WHEN p.temperature IS _incoming.temperature AND p.rainfall IS _incoming.rainfall
+                            THEN 1 ELSE 2 END
+                FROM {name} p
+                WHERE p.farm_id = _incoming.farm_id AND p.ts = _incoming.ts AND p.sensor = _incoming.sensor
+            )
+            WHERE EXISTS (
+                SELECT 1 FROM {name} p
+                WHERE p.farm_id = _incoming.farm_id AND p.ts = _incoming.ts AND p.sensor = _incoming.sensor
+            )
+            """
+        )
+        conn.execute(_fold_sql())
+        recompute = conn.execute(
+            "SELECT DISTINCT farm_id, substr(ts, 1, 10) FROM _incoming WHERE state = 2"
+        ).fetchall()
+        conn.execute(
+            f"""
+            INSERT OR REPLACE INTO {name} (farm_id, ts, sensor, temperature, rainfall)
+            SELECT farm_id, ts, sensor, temperature, rainfall FROM _incoming WHERE state != 1
+            """
+        )
+        for farm_id, day in recompute:
+            reaggregate_day(conn, farm_id, day)
+        touched.update(
+            (row[0], row[1]) for row in
+            conn.execute("SELECT DISTINCT farm_id, substr(ts, 1, 10) FROM _incoming WHERE state != 1").fetchall()
+        )
+    return touched
+
+
+def reaggregate_day(conn, farm_id: int, day: str) -> None:
+    """Rebuild one day's roll-up from its raw readings (a single primary-key range scan)."""
+    conn.execute(
+        f"""
+        INSERT OR REPLACE INTO reading_rollups (farm_id, date, temp_min, temp_max, rain_sum, n)
+        SELECT ?, ?, MIN(temperature), MAX(temperature), SUM(rainfall), COUNT(*)
+        FROM {partition_for(day)}
+        WHERE farm_id = ? AND ts BETWEEN ? AND ?
+        """,
+        (farm_id, day, farm_id, f"{day} 00:00:00", f"{day} 23:59:59")
+    )
+
+
+def apply_rollups(db, days: Iterable[DayKey], gdd_method: str = "average", alerts=None) -> int:
+    """
+    Copy the roll-ups of ``days`` into climate_data and refresh their derived
+    agri metrics (cumulative GDD and the series_lod pyramid are rebuilt from the
+    earliest touched day of each farm). With an alerts.AlertUpdater, the written
+    days are noted in it for the caller to finish(). Does not commit. Returns
+    the number of daily rows written.
+    """
+    days = sorted(set(days))
+    if not days:
+        return 0
+    conn = db.conn
+    rows = []
+    for start in range(0, len(days), 400):
+        batch = days[start:start + 400]
+        clause = " OR ".join(["(farm_id = ? AND date = ?)"] * len(batch))
+        params = [v for key in batch for v in key]
+        rows += conn.execute(
+            f"SELECT farm_id, date, temp_max, temp_min, rain_sum FROM reading_rollups WHERE {clause}",
+            params
+        ).fetchall()
+    if not rows:
+        return 0
+    df = pd.DataFrame([tuple(r) for r in rows], columns=["farm_id", "date", "temp_max", "temp_min", "rainfall"])
+    updater = MetricsUpdater(method=gdd_method)
+    df = updater.prepare(db, df)
+    written, _ = write_chunk(db, df, on_conflict="REPLACE")
+    updater.finish(db)
+    lod = LodUpdater()
+    lod.note(df)
+    lod.finish(db)
+    if alerts is not None:
+        alerts.note(df)
+    return written
+
+
+def get_readings(db, farm_id: int, start: str, end: str) -> pd.DataFrame:
+    """Raw readings of one farm between two dates/timestamps (inclusive), in time order."""
+    conn = db.conn
+    lo = start if len(start) > 10 else f"{start} 00:00:00"
+    hi = end if len(end) > 10 else f"{end} 23:59:59"
+    frames = []
+    for name in partitions(conn, lo, hi):
+        frames.append(pd.read_sql_query(
+            f"SELECT farm_id, ts, sensor, temperature, rainfall FROM {name} WHERE farm_id = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+            conn, params=(farm_id, lo, hi)
+        ))
+    if not frames:
+        return pd.DataFrame(columns=["farm_id", "ts", "sensor", "temperature", "rainfall"])
+    return pd.concat(frames, ignore_index=True)
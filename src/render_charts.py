@@ -0,0 +1,270 @@
+"""
+render_charts.py
+Headless batch rendering of farm charts (no Tk, no pyplot).
+
+Renders, for every farm or a filtered set over a date range:
+    - dashboard  - the Dashboard's Temperature Trend and Agri Metrics Trend charts
+    - <metric>   - the Visualization page's line chart of one metric
+                   (temp_max, temp_min, rainfall, daily_gdd, effective_rainfall,
+                   cumulative_gdd)
+as PNG, SVG or PDF, one file per farm and chart (<farm>_<chart>.<format>).
+
+Work is spread over a process pool; each worker opens one database connection
+and one Agg figure and reuses both for all of its charts. A manifest in the
+output directory records, per file, a key built from the farm's data
+fingerprint (its data_versions counter, bumped by triggers on every write,
+plus row count, first/last date and column totals over the range, taken for
+all farms in one query) and the render settings. Farms whose data did not
+change since the last run are skipped, so a nightly job only renders what was
+imported or edited.
+
+Usage:
+    python render_charts.py --out charts/
+    python render_charts.py --out charts/ --match "North" --start 2024-01-01 --end 2024-12-31 --format pdf
+    python render_charts.py --db bench.db --out charts/ --charts dashboard,rainfall --workers 4 --force
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import chart_export
+import data_versions
+from chart_export import DEFAULT_DPI, date_numbers, file_slug, line_axes
+from series_cache import METRICS, load_series
+
+CHARTS = ["dashboard"] + METRICS
+FORMATS = ["png", "svg", "pdf"]
+MANIFEST = ".render_manifest.json"
+# Bump when the chart layout changes so existing files are re-rendered
+RENDER_VERSION = 1
+
+DASHBOARD_SIZE = (10.0, 8.0)
+# Dashboard lines: (metric, label, color, marker)
+TEMP_LINES = [
+    ("temp_max", "Max Temp", "#0d6efd", "o"),
+    ("temp_min", "Min Temp", "#33aa33", "s"),
+]
+AGRI_LINES = [
+    ("daily_gdd", "Daily GDD", "orange", "s"),
+    ("effective_rainfall", "Eff. Rainfall", "green", "^"),
+    ("cumulative_gdd", "Cumulative GDD", "purple", "D"),
+]
+
+
+# --- Chart specs ---
+
+def _lines(series, lines) -> List[Dict[str, Any]]:
+    return [{"y": series.columns[m], "label": label, "color": color, "marker": marker}
+            for m, label, color, marker in lines]
+
+
+def chart_spec(db, farm_id, name: str, chart: str, start: str = "", end: str = "") -> Dict[str, Any]:
+    """Snapshot-style spec (see chart_export.render) of one farm chart."""
+    series = load_series(db, farm_id, start, end)
+    x = date_numbers(series.dates)
+    if chart == "dashboard":
+        return {"size": DASHBOARD_SIZE, "axes": [
+            line_axes(x, _lines(series, TEMP_LINES), (0.08, 0.58, 0.88, 0.34),
+                      f"Temperature Trend - {name}", ylabel="Temperature (°C)"),
+            line_axes(x, _lines(series, AGRI_LINES), (0.08, 0.10, 0.88, 0.34), "Agri Metrics Trend"),
+        ]}
+    if chart not in METRICS:
+        raise ValueError(f"Unknown chart: {chart!r} (expected one of {', '.join(CHARTS)})")
+    return {"size": chart_export.DEFAULT_SIZE, "axes": [
+        line_axes(x, [{"y": series.columns[chart], "label": chart, "color": "#0d6efd", "marker": "o"}],
+                  (0.08, 0.15, 0.88, 0.75), f"{chart} for {name}", ylabel=chart),
+    ]}
+
+
+# --- Data fingerprints ---
+
+def select_farms(db, farm_ids: Optional[Sequence[int]] = None, match: str = "") -> List[Tuple[int, str]]:
+    """(id, name) of the farms to render, optionally limited to ids and a name/location substring."""
+    q = "SELECT id, name FROM farms WHERE 1=1"
+    params: List[Any] = []
+    if farm_ids:
+        q += f" AND id IN ({', '.join('?' * len(farm_ids))})"
+        params.extend(farm_ids)
+    if match:
+        q += " AND (name LIKE ? OR location LIKE ?)"
+        params.extend([f"%{match}%"] * 2)
+    return [(row[0], row[1]) for row in db.conn.execute(q + " ORDER BY id", params).fetchall()]
+
+
+def fingerprints(db, start: str = "", end: str = "") -> Dict[int, str]:
+    """
+    Per farm, a digest of its rows in [start, end]. Totals alone miss edits that
+    cancel out (+1 on one day, -1 on another, or swapped values), so the digest
+    leads with the farm's data_versions counter, which every insert, update or
+    delete of its rows bumps (any write re-renders all of the farm's ranges).
+    The count, date bounds and totals still tell apart a replaced database whose
+    counters restarted. One grouped query for all farms.
+    """
+    counters = data_versions.versions(db.conn)
+    q = """
+        SELECT c.farm_id, COUNT(*), MIN(c.date), MAX(c.date),
+               TOTAL(c.temp_max), TOTAL(c.temp_min), TOTAL(c.rainfall),
+               TOTAL(m.daily_gdd), TOTAL(m.effective_rainfall), TOTAL(m.cumulative_gdd)
+        FROM climate_data c
+        LEFT JOIN agri_metrics m ON c.farm_id = m.farm_id AND c.date = m.date
+        WHERE 1=1
+    """
+    params: List[Any] = []
+    if start:
+        q += " AND c.date>=?"
+        params.append(start)
+    if end:
+        q += " AND c.date<=?"
+        params.append(end)
+    rows = db.conn.execute(q + " GROUP BY c.farm_id", params).fetchall()
+    return {row[0]: "|".join(repr(v) for v in (counters.get(row[0]), *row[1:])) for row in rows}
+
+
+def cache_key(fingerprint: str, name: str, chart: str, start: str, end: str, dpi: int, fmt: str) -> str:
+    raw = json.dumps([RENDER_VERSION, fingerprint, name, chart, start, end, dpi, fmt])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def load_manifest(out_dir: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(out_dir: str, manifest: Dict[str, str]) -> None:
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+# --- Workers ---
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(db_path: Optional[str]) -> None:
+    """Open the connection and the Agg figure each worker reuses for all its charts."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from db_handler import DBHandler
+
+    db = DBHandler(db_path)
+    db.__enter__()
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    _worker.update(db=db, fig=fig)
+
+
+def _render_one(task: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Render one farm chart in this worker. Returns (task, error or None)."""
+    try:
+        spec = chart_spec(_worker["db"], task["farm_id"], task["name"], task["chart"], task["start"], task["end"])
+        chart_export.render(spec, task["path"], task["dpi"], fig=_worker["fig"])
+        return task, None
+    except Exception as e:
+        return task, f"{type(e).__name__}: {e}"
+
+
+def plan(db, out_dir: str, farms: Sequence[Tuple[int, str]], charts: Sequence[str], start: str = "",
+         end: str = "", dpi: int = DEFAULT_DPI, fmt: str = "png",
+         force: bool = False) -> Tuple[List[Dict[str, Any]], int]:
+    """Tasks for the charts whose data or settings changed since the last run, and the number skipped."""
+    prints = fingerprints(db, start, end)
+    manifest = {} if force else load_manifest(out_dir)
+    tasks, skipped = [], 0
+    for farm_id, name in farms:
+        for chart in charts:
+            file_name = f"{file_slug(name)}_{chart}.{fmt}"
+            key = cache_key(prints.get(farm_id, ""), name, chart, start, end, dpi, fmt)
+            if manifest.get(file_name) == key and os.path.exists(os.path.join(out_dir, file_name)):
+                skipped += 1
+                continue
+            tasks.append({"farm_id": farm_id, "name": name, "chart": chart, "start": start, "end": end,
+                          "dpi": dpi, "path": os.path.join(out_dir, file_name), "file": file_name, "key": key})
+    return tasks, skipped
+
+
+def render_all(db_path: Optional[str], out_dir: str, farm_ids: Optional[Sequence[int]] = None, match: str = "",
+               charts: Sequence[str] = ("dashboard",), start: str = "", end: str = "", dpi: int = DEFAULT_DPI,
+               fmt: str = "png", workers: Optional[int] = None, force: bool = False) -> Dict[str, Any]:
+    """
+    Render the selected charts of the selected farms into ``out_dir``, skipping
+    unchanged ones. Returns {"rendered": [paths], "skipped": n, "errors": [(path, error)]}.
+    """
+    from db_handler import DBHandler
+
+    for chart in charts:
+        if chart not in CHARTS:
+            raise ValueError(f"Unknown chart: {chart!r} (expected one of {', '.join(CHARTS)})")
+    os.makedirs(out_dir, exist_ok=True)
+    with DBHandler(db_path) as db:
+        farms = select_farms(db, farm_ids, match)
+        tasks, skipped = plan(db, out_dir, farms, charts, start, end, dpi, fmt, force)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks) or 1))
+    if workers == 1:
+        _init_worker(db_path)
+        try:
+            results = [_render_one(task) for task in tasks]
+        finally:
+            _worker.pop("db").close()
+            _worker.clear()
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(db_path,)) as pool:
+            results = list(pool.imap_unordered(_render_one, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    manifest = {} if force else load_manifest(out_dir)
+    rendered, errors = [], []
+    for task, error in results:
+        if error:
+            errors.append((task["path"], error))
+            manifest.pop(task["file"], None)
+        else:
+            rendered.append(task["path"])
+            manifest[task["file"]] = task["key"]
+    save_manifest(out_dir, manifest)
+    return {"rendered": sorted(rendered), "skipped": skipped, "errors": errors}
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Render farm charts to image files without the GUI.")
+    parser.add_argument("--db", help="SQLite database (default: the app's climate.db)")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--farm-ids", help="Comma-separated farm ids (default: all farms)")
+    parser.add_argument("--match", default="", help="Only farms whose name or location contains this text")
+    parser.add_argument("--start", default="", help="First date (YYYY-MM-DD, default: open)")
+    parser.add_argument("--end", default="", help="Last date (YYYY-MM-DD, default: open)")
+    parser.add_argument("--charts", default="dashboard,temp_max",
+                        help=f"Comma-separated charts: {', '.join(CHARTS)} (default dashboard,temp_max)")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_DPI, help=f"Resolution (default {DEFAULT_DPI})")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Re-render charts even if their data is unchanged")
+    args = parser.parse_args(argv)
+
+    farm_ids = [int(v) for v in args.farm_ids.split(",") if v.strip()] if args.farm_ids else None
+    charts = [c.strip() for c in args.charts.split(",") if c.strip()]
+    unknown = [c for c in charts if c not in CHARTS]
+    if unknown:
+        parser.error(f"unknown chart(s): {', '.join(unknown)} (expected {', '.join(CHARTS)})")
+    started = time.perf_counter()
+    result = render_all(args.db, args.out, farm_ids, args.match, charts, args.start, args.end, args.dpi,
+                        args.format, args.workers, args.force)
+    elapsed = time.perf_counter() - started
+    for path, error in result["errors"]:
+        print(f"FAILED {path}: {error}")
+    print(f"Rendered {len(result['rendered'])} chart(s), skipped {result['skipped']} unchanged, "
+          f"{len(result['errors'])} failed, in {elapsed:.1f}s -> {args.out}")
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,200 @@
+"""
+report_builder.py
+Report data for the Report page, built off the Tk thread.
+
+One query reads every selected farm's rows (ordered by farm, in selection
+order, then date). The rows are fetched in chunks into columns, and the
+per-farm summary and chart series are computed from those columns with NumPy,
+all on a worker thread. The page then renders text lines from the columns a
+chunk at a time (see ReportPage._render_report_chunk).
+
+Usage:
+    job = start_report(farms, "2024-01-01", "2024-12-31", ["date", "temp_max"], "admin")
+    job.wait(); job.result.frame()      # or poll job.finished / job.read / job.total from Tk
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import table_export
+
+# Report fields and the columns they are read from
+FIELD_COLUMNS = {
+    "date": "c.date",
+    "temp_max": "c.temp_max",
+    "temp_min": "c.temp_min",
+    "rainfall": "c.rainfall",
+    "daily_gdd": "m.daily_gdd",
+    "effective_rainfall": "m.effective_rainfall",
+    "cumulative_gdd": "m.cumulative_gdd"
+}
+CHUNK_ROWS = 10_000
+
+
+class ReportCancelled(Exception):
+    """Raised inside build_report() when its job was cancelled."""
+
+
+def report_query(farms: Sequence[int], start_date: str, end_date: str, fields: Sequence[str],
+                 user: str) -> Tuple[str, List[Any]]:
+    """
+    (query, params) of a report's rows for all its farms: the template fields,
+    then farm and user, ordered by farm (as selected) and date.
+    """
+    aliases = ['"' + f.replace('"', '""') + '"' for f in fields]
+    select_clause = ", ".join(f"{FIELD_COLUMNS.get(f, f)} AS {alias}" for f, alias in zip(fields, aliases))
+    order = " ".join(f"WHEN {int(farm_id)} THEN {i}" for i, farm_id in enumerate(farms))
+    query = f"""SELECT {select_clause}, COALESCE(f.name, 'Farm') AS farm, ? AS user
+                FROM climate_data c
+                LEFT JOIN agri_metrics m ON c.farm_id = m.farm_id AND c.date = m.date
+                LEFT JOIN farms f ON f.id = c.farm_id
+                WHERE c.farm_id IN ({', '.join('?' * len(farms))})"""
+    params: List[Any] = [user, *farms]
+    if start_date:
+        query += " AND c.date>=?"
+        params.append(start_date)
+    if end_date:
+        query += " AND c.date<=?"
+        params.append(end_date)
+    query += f" ORDER BY CASE c.farm_id {order} END, c.date ASC"
+    return query, params
+
+
+class ReportResult:
+    """
+    A report as columns: ``columns[field]`` holds the raw values (as the
+    database returned them) and ``farm``/``user`` the name columns. ``stats`` are
+    the per-farm summary strings and ``plot_series`` the chart lines
+    (key, label, dates, values).
+    """
+
+    def __init__(self, fields: Sequence[str], columns: Dict[str, list], farm: list, user: list):
+        self.fields = list(fields)
+        self.columns = columns
+        self.farm = farm
+        self.user = user
+        self.stats: List[str] = []
+        self.plot_series: List[Tuple[str, str, np.ndarray, np.ndarray]] = []
+
+    def __len__(self) -> int:
+        return len(self.farm)
+
+    def numeric(self, field: str) -> np.ndarray:
+        """A column as floats (dates and other text become NaN)."""
+        return pd.to_numeric(pd.Series(self.columns[field], dtype=object), errors="coerce").to_numpy(dtype=float)
+
+    def farm_spans(self) -> List[Tuple[str, int, int]]:
+        """(farm name, first row, end row) of each farm's contiguous rows."""
+        if not len(self):
+            return []
+        names = np.asarray(self.farm, dtype=object)
+        bounds = np.r_[0, np.flatnonzero(names[1:] != names[:-1]) + 1, len(names)]
+        return [(names[a], int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def summarize(self) -> None:
+        """Fill ``stats`` and ``plot_series`` from the columns."""
+        fields = self.fields
+        numeric = {f: self.numeric(f) for f in fields if f != "date"}
+        dates = None
+        if "date" in fields:
+            dates = pd.to_datetime(pd.Series(self.columns["date"], dtype=object),
+                                   errors="coerce").to_numpy(dtype="datetime64[D]")
+        self.stats, self.plot_series = [], []
+        for name, a, b in self.farm_spans():
+            s = f"{name}:"
+            if "temp_max" in numeric:
+                s += f" Avg Tmax={np.nanmean(numeric['temp_max'][a:b]) if b > a else 0:.1f}°C"
+            if "rainfall" in numeric:
+                s += f", Total Rain={np.nansum(numeric['rainfall'][a:b]):.1f}mm"
+            if "cumulative_gdd" in numeric:
+                s += f", Cum GDD={numeric['cumulative_gdd'][b - 1]:.1f}"
+            self.stats.append(s)
+            if dates is not None:
+                for f in fields:
+                    if f != "date":
+                        self.plot_series.append((f"{name}:{f}", f"{name} {f}", dates[a:b], numeric[f][a:b]))
+
+    def frame(self) -> pd.DataFrame:
+        """The rows as a DataFrame: the fields, then farm and user."""
+        data = {f: self.columns[f] for f in self.fields}
+        data.update(farm=self.farm, user=self.user)
+        return pd.DataFrame(data, columns=[*self.fields, "farm", "user"])
+
+    def lines(self, start: int, stop: int) -> List[str]:
+        """Text lines of rows [start, stop) as the page's table shows them."""
+        cols = [self.columns[f][start:stop] for f in self.fields]
+        return [f"{farm:<15} {user:<10}" + " ".join(f"{v!s:<12}" for v in values)
+                for farm, user, *values in zip(self.farm[start:stop], self.user[start:stop], *cols)]
+
+
+def build_report(db, farms: Sequence[int], start_date: str, end_date: str, fields: Sequence[str], user: str,
+                 chunk_rows: int = CHUNK_ROWS, progress: Optional[Callable[[int], None]] = None,
+                 cancelled: Optional[threading.Event] = None) -> ReportResult:
+    """Read a report with one query, chunk by chunk, and summarize it."""
+    query, params = report_query(farms, start_date, end_date, fields, user)
+    cursor = db.conn.execute(query, params)
+    columns: List[list] = [[] for _ in range(len(fields) + 2)]
+    read = 0
+    while True:
+        if cancelled is not None and cancelled.is_set():
+            raise ReportCancelled()
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        for column, values in zip(columns, zip(*rows)):
+            column.extend(values)
+        read += len(rows)
+        if progress is not None:
+            progress(read)
+    result = ReportResult(fields, dict(zip(fields, columns)), columns[-2], columns[-1])
+    result.summarize()
+    return result
+
+
+class ReportJob:
+    """One start_report() run: ``read``/``total`` rows, then ``result`` or ``error`` once finished."""
+
+    def __init__(self, farms, start_date, end_date, fields, user):
+        self.request = (list(farms), start_date, end_date, list(fields), user)
+        self.read = 0
+        self.total: Optional[int] = None
+        self.result: Optional[ReportResult] = None
+        self.error: Optional[str] = None
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.finished.wait(timeout)
+
+
+def start_report(farms: Sequence[int], start_date: str, end_date: str, fields: Sequence[str], user: str,
+                 db_path: Optional[str] = None) -> ReportJob:
+    """build_report() on a worker thread with its own connection (row count first, for progress)."""
+    from db_handler import DBHandler
+
+    job = ReportJob(farms, start_date, end_date, fields, user)
+
+    def progress(read):
+        job.read = read
+
+    def worker():
+        try:
+            with DBHandler(db_path) as db:
+                query, params = report_query(*job.request)
+                job.total = table_export.count_rows(db, query, params)
+                job.result = build_report(db, *job.request, progress=progress, cancelled=job.cancelled)
+        except ReportCancelled:
+            job.error = "Cancelled"
+        except Exception as e:
+            job.error = str(e)
+        finally:
+            job.finished.set()
+
+    threading.Thread(target=worker, daemon=True).start()
+    return job
@@ -5,11 +5,18 @@ from db_handler import DBHandler
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import pandas as pd
-import csv
 import os
-import numpy as np
 from datetime import datetime, timedelta
 import threading
+from chart_layer import ChartLayer
+import data_versions
+import table_export
+import report_builder
+import global_analytics
+
+# Report table lines inserted per Tk tick while rendering
+RENDER_CHUNK = 2000
+POLL_MS = 100
 
 class ReportPage(tb.Frame):
     """
@@ -37,7 +44,12 @@ class ReportPage(tb.Frame):
         tb.Label(farm_frame, text="Select Farm(s):", font=("Segoe UI", 12)).pack(side="left")
         self.farm_listbox = tk.Listbox(farm_frame, selectmode="multiple", width=36, height=4)
         self.farm_listbox.pack(side="left", padx=10)
+        self.farm_map = {}
+        # The list is reloaded only when the farms table changes (see data_versions.py)
+        self._versions = data_versions.VersionWatcher()
+        self._versions.changed()
         self.load_farms()
+        data_versions.watch(self, self._versions, self._on_data_changed)
 
         # Section: User selection (for admins)
         user_frame = tb.Frame(self.main)
@@ -99,6 +111,14 @@ class ReportPage(tb.Frame):
         tb.Button(btn_frame, text="Analytics", width=13, command=self.show_analytics).pack(side="left", padx=5)
         tb.Button(btn_frame, text="Global Analytics", width=16, command=self.global_analytics).pack(side="left", padx=5)
 
+        # Section: Report progress (shown while a report is read and rendered)
+        self.progress_frame = tb.Frame(self.main)
+        self.progress_bar = tb.Progressbar(self.progress_frame, mode="determinate", length=280, maximum=1)
+        self.progress_bar.pack(side="left", padx=5)
+        self.progress_label = tb.Label(self.progress_frame, text="", font=("Segoe UI", 9))
+        self.progress_label.pack(side="left", padx=5)
+        tb.Button(self.progress_frame, text="Cancel", width=8, command=self.cancel_report).pack(side="left", padx=5)
+
         # Section: Summary stats
         self.summary_label = tb.Label(self.main, text="", font=("Segoe UI", 11, "bold"))
         self.summary_label.pack(pady=8)
@@ -106,6 +126,7 @@ class ReportPage(tb.Frame):
         self.fig = None
         self.ax = None
         self.canvas = None
+        self.chart = None
         self._initialized = False
         self._shutdown = False
 
@@ -113,8 +134,10 @@ class ReportPage(tb.Frame):
         self.table = tk.Text(self.main, height=8, width=110, font=("Consolas", 10), wrap="none")
         self.table.pack(pady=8, fill="x")
 
-        # Data cache
-        self.report_data = []
+        # Data cache (a DataFrame of the last report's rows)
+        self.report_data = pd.DataFrame()
+        self.report_job = None
+        self.report_busy = False
         self.custom_fields = None
 
         # Cloud API key
@@ -137,7 +160,8 @@ class ReportPage(tb.Frame):
         self.load_farms()  # Optionally filter farms by user
 
     def load_farms(self):
-        """Load farms for reporting, optionally filter by user."""
+        """Load farms for reporting, optionally filter by user. Selected farms stay selected."""
+        selected = set(self.get_selected_farms())
         self.farm_listbox.delete(0, tk.END)
         with DBHandler() as db:
             farms = db.get_farms()
@@ -148,10 +172,17 @@ class ReportPage(tb.Frame):
             label = f"{farm['name']} ({farm['location']})"
             self.farm_listbox.insert(tk.END, label)
             self.farm_map[i] = farm["id"]
+            if farm["id"] in selected:
+                self.farm_listbox.selection_set(i)
+
+    def _on_data_changed(self, changed):
+        # Farm data is read when a report is generated; only the list itself can go stale
+        if data_versions.FARM_LIST in changed:
+            self.load_farms()
 
     def get_selected_farms(self):
         selection = self.farm_listbox.curselection()
-        return [self.farm_map[i] for i in selection]
+        return [self.farm_map[i] for i in selection if i in self.farm_map]
 
     # ---- Template Logic ----
     def handle_custom_template(self, event=None):
@@ -208,6 +239,7 @@ class ReportPage(tb.Frame):
         try:
             self.fig, self.ax = plt.subplots(figsize=(5, 3.5))
             self.canvas = FigureCanvasTkAgg(self.fig, master=self.main)
+            self.chart = ChartLayer(self.fig, self.canvas)
             w = getattr(self.canvas, 'get_tk_widget', lambda: None)()
             if w:
                 try:
@@ -245,6 +277,8 @@ class ReportPage(tb.Frame):
 
     def destroy(self):
         self._shutdown = True
+        if self.report_job is not None:
+            self.report_job.cancel()
         try:
             canvas = getattr(self, 'canvas', None)
             if canvas is not None:
@@ -283,6 +317,11 @@ class ReportPage(tb.Frame):
 
     # ---- Report Generation, Export, Analytics ----
     def generate_report(self):
+        """
+        Read the report on a worker thread (one query for all selected farms),
+        then render it into the table a chunk per Tk tick. A new report, or
+        Cancel, stops the one in progress.
+        """
         if not self.winfo_exists():
             return
         farms = self.get_selected_farms()
@@ -296,148 +335,122 @@ class ReportPage(tb.Frame):
             self.safe_ui_update(messagebox.showerror, "Date Error", "Start date must be before end date.")
             return
 
-        self.report_data.clear()
-        self.safe_ui_update(self.table.delete, "1.0", tk.END)
+        self.cancel_report()
+        self.report_data = pd.DataFrame()
+        self.table.delete("1.0", tk.END)
         # If axes/canvas aren't initialized yet, lazily initialize them
         if not getattr(self, '_initialized', False):
             try:
                 self.on_show()
             except Exception:
                 pass
-        ax = getattr(self, 'ax', None)
-        if ax is not None:
-            # capture ax in default arg to avoid None at call time
-            self.safe_ui_update(lambda a=ax: a.clear())
-        all_stats = []
 
         fields = self.get_template_fields()
-        field_map = {
-            "date": "c.date",
-            "temp_max": "c.temp_max",
-            "temp_min": "c.temp_min",
-            "rainfall": "c.rainfall",
-            "daily_gdd": "m.daily_gdd",
-            "effective_rainfall": "m.effective_rainfall",
-            "cumulative_gdd": "m.cumulative_gdd"
-        }
-
-        select_fields = [field_map.get(f, f) for f in fields]
-        select_clause = ", ".join(select_fields)
-        header = " | ".join([f.capitalize() for f in fields])
+        # What export_csv re-queries
+        self._report_request = (list(farms), start_date, end_date, list(fields),
+                                self.current_user.get("username", "N/A"))
+        job = report_builder.start_report(*self._report_request)
+        self.report_job = job
+        self.report_busy = True
+        self.summary_label.config(text="Generating report...")
+        self.progress_bar.config(maximum=1, value=0)
+        self.progress_label.config(text="Counting rows...")
+        self.progress_frame.pack(anchor="w", pady=2)
+        self.after(POLL_MS, lambda: self._poll_report(job))
+
+    def cancel_report(self):
+        """Stop the report being read or rendered (its partial table stays)."""
+        job = self.report_job
+        if job is None:
+            return
+        job.cancel()
+        self.report_job = None
+        self._finish_report()
 
-        with DBHandler() as db:
-            for farm_id in farms:
-                q = f"""SELECT {select_clause} FROM climate_data c
-                        LEFT JOIN agri_metrics m ON c.farm_id = m.farm_id AND c.date = m.date
-                        WHERE c.farm_id=?"""
-                params = [farm_id]
-                if start_date:
-                    q += " AND c.date>=?"
-                    params.append(start_date)
-                if end_date:
-                    q += " AND c.date<=?"
-                    params.append(end_date)
-                q += " ORDER BY c.date ASC"
-                rows = db.fetch_all(q, tuple(params))
-                if not rows:
-                    continue
-                farm_name = db.fetch_one("SELECT name FROM farms WHERE id=?", (farm_id,))
-                farm_name = farm_name[0] if farm_name else "Farm"
-                for row in rows:
-                    entry = dict(zip(fields, row))
-                    entry["farm"] = farm_name
-                    entry["user"] = self.current_user.get("username", "N/A")
-                    self.report_data.append(entry)
-                # Analytics for summary
-                arr = np.array(rows, dtype=float)
-                if "temp_max" in fields:
-                    avg_temp = np.nanmean(arr[:,fields.index("temp_max")]) if arr.size else 0
-                else:
-                    avg_temp = None
-                if "rainfall" in fields:
-                    total_rain = np.nansum(arr[:,fields.index("rainfall")]) if arr.size else 0
-                else:
-                    total_rain = None
-                if "cumulative_gdd" in fields:
-                    last_gdd = arr[-1,fields.index("cumulative_gdd")] if arr.size else 0
-                else:
-                    last_gdd = None
-                s = f"{farm_name}:"
-                if avg_temp is not None: s += f" Avg Tmax={avg_temp:.1f}°C"
-                if total_rain is not None: s += f", Total Rain={total_rain:.1f}mm"
-                if last_gdd is not None: s += f", Cum GDD={last_gdd:.1f}"
-                all_stats.append(s)
-                # Plot
-                dates = [row[fields.index("date")] for row in rows]
-                for i, f in enumerate(fields):
-                    if f == "date":
-                        continue
-                    vals = [row[i] for row in rows]
-                    ax = getattr(self, 'ax', None)
-                    if self.winfo_exists() and ax is not None:
-                        try:
-                            ax.plot(dates, vals, marker="o", label=f"{farm_name} {f}")
-                        except Exception:
-                            pass
+    def _finish_report(self, text=None):
+        self.report_busy = False
+        try:
+            self.progress_frame.pack_forget()
+            if text is not None:
+                self.summary_label.config(text=text)
+        except Exception:
+            pass
 
-        if not self.report_data:
-            self.safe_ui_update(self.summary_label.config, text="No data found for selection.")
-            ax = getattr(self, 'ax', None)
-            canvas = getattr(self, 'canvas', None)
-            if ax is not None:
-                self.safe_ui_update(lambda a=ax: a.text(0.5, 0.5, "No data", ha="center", va="center", fontsize=12))
-            if canvas is not None:
-                self.safe_ui_update(lambda c=canvas: c.draw())
+    def _poll_report(self, job):
+        if job is not self.report_job or getattr(self, '_shutdown', False):
             return
-
-        # Table output
+        if not job.finished.is_set():
+            if job.total:
+                self.progress_bar.config(maximum=job.total, value=job.read)
+                self.progress_label.config(text=f"Reading {job.read:,} of {job.total:,} rows")
+            self.after(POLL_MS, lambda: self._poll_report(job))
+            return
+        if job.error:
+            self.report_job = None
+            self._finish_report(f"Report failed: {job.error}")
+            return
+        result = job.result
+        if not len(result):
+            self.report_job = None
+            self._finish_report("No data found for selection.")
+            self.draw_report_chart([])
+            return
+        fields = result.fields
         table_header = f"{'Farm':<15} {'User':<10}" + " ".join([f"{h:<12}" for h in fields])
         self.table.insert(tk.END, table_header + "\n" + "-"*len(table_header) + "\n")
-        for row in self.report_data:
-            line = f"{row['farm']:<15} {row['user']:<10}" + " ".join([f"{row.get(f, '')!s:<12}" for f in fields])
-            self.table.insert(tk.END, line + "\n")
+        self.progress_bar.config(maximum=len(result), value=0)
+        self._render_report_chunk(job, 0)
 
-        # Summary
-        self.safe_ui_update(self.summary_label.config, text=" | ".join(all_stats))
-
-        # Plot
+    def _render_report_chunk(self, job, start):
+        """Insert the next RENDER_CHUNK table lines, then yield to the Tk loop."""
+        if job is not self.report_job or getattr(self, '_shutdown', False):
+            return
+        result = job.result
+        stop = min(start + RENDER_CHUNK, len(result))
+        self.table.insert(tk.END, "\n".join(result.lines(start, stop)) + "\n")
+        if stop < len(result):
+            self.progress_bar.config(value=stop)
+            self.progress_label.config(text=f"Rendering {stop:,} of {len(result):,} rows")
+            self.after(1, lambda: self._render_report_chunk(job, stop))
+            return
+        self.report_job = None
+        self.report_data = result.frame()
+        self._finish_report(" | ".join(result.stats))
+        self.draw_report_chart(result.plot_series)
+
+    def draw_report_chart(self, plot_series):
+        """Update the report chart's persistent lines; series no longer selected are removed."""
+        chart = getattr(self, 'chart', None)
         ax = getattr(self, 'ax', None)
-        fig = getattr(self, 'fig', None)
-        canvas = getattr(self, 'canvas', None)
-        if ax is not None:
-            self.safe_ui_update(lambda a=ax: a.set_title("Report Metrics Over Time"))
-            self.safe_ui_update(lambda a=ax: a.set_xlabel("Date"))
-            self.safe_ui_update(lambda a=ax: a.set_ylabel("Value"))
-            self.safe_ui_update(lambda a=ax: a.legend())
-        if fig is not None:
-            self.safe_ui_update(lambda f=fig: f.autofmt_xdate(rotation=25))
-        if canvas is not None:
-            self.safe_ui_update(lambda c=canvas: c.draw())
+        if chart is None or ax is None:
+            return
+        chart.begin()
+        if plot_series:
+            for name, label, dates, values in plot_series:
+                chart.line(name, dates, values, ax=ax, downsample="lttb", marker="o", label=label)
+            chart.labels(ax, "Report Metrics Over Time", "Date", "Value", dates=True)
+        else:
+            chart.message(ax, "No data")
+        chart.end()
 
     def export_csv(self):
-        """Export current report data to CSV."""
-        if not self.report_data:
+        """Stream the current report's rows from the database (CSV, gzip CSV, Parquet or Excel by extension)."""
+        if self.report_data.empty or not getattr(self, '_report_request', None):
             messagebox.showwarning("Export", "No report data to export.")
             return
         file_path = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")]
+            filetypes=table_export.FILETYPES
         )
         if not file_path:
             return
-        try:
-            with open(file_path, "w", newline="") as f:
-                writer = csv.DictWriter(f, fieldnames=list(self.report_data[0].keys()))
-                writer.writeheader()
-                for entry in self.report_data:
-                    writer.writerow(entry)
-            messagebox.showinfo("Export", f"Report exported to:\n{file_path}")
-        except Exception as e:
-            messagebox.showerror("Export Error", f"Failed to export report: {e}")
+        query, params = report_builder.report_query(*self._report_request)
+        job = table_export.export_query(query, params, file_path)
+        table_export.show_progress(self, job, "Export")
 
     def export_pdf(self):
         """Export current plot to PDF."""
-        if not self.report_data:
+        if self.report_data.empty:
             messagebox.showwarning("Export", "No report generated to export.")
             return
         file_path = filedialog.asksaveasfilename(
@@ -456,7 +469,7 @@ class ReportPage(tb.Frame):
 
     def export_cloud(self):
         """Export report data to a cloud endpoint (with API key and error handling)."""
-        if not self.report_data:
+        if self.report_data.empty:
             messagebox.showwarning("Export", "No report data to export.")
             return
         try:
@@ -478,10 +491,7 @@ class ReportPage(tb.Frame):
         headers = {"Authorization": f"Bearer {self.cloud_api_key}"}
         import io
         buf = io.StringIO()
-        writer = csv.DictWriter(buf, fieldnames=list(self.report_data[0].keys()))
-        writer.writeheader()
-        for entry in self.report_data:
-            writer.writerow(entry)
+        self.report_data.to_csv(buf, index=False)
         buf.seek(0)
         files = {"file": ("report.csv", buf.read())}
         try:
@@ -500,13 +510,13 @@ class ReportPage(tb.Frame):
 
     def show_analytics(self):
         """Show advanced analytics on the report data (trend, correlation, outlier, rolling mean, farm comparison, anomaly detection)."""
-        if not self.report_data:
+        if self.report_data.empty:
             messagebox.showinfo("Analytics", "No report data for analytics.")
             return
         import numpy as np
         import pandas as pd
         try:
-            df = pd.DataFrame(self.report_data)
+            df = self.report_data.copy()
             numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
             analytic_str = "=== Analytics ===\n"
             # Correlation matrix
@@ -557,45 +567,13 @@ class ReportPage(tb.Frame):
         if self.current_user.get("username", "") != "admin":
             messagebox.showwarning("Global Analytics", "Admin access required.")
             return
-        import numpy as np
-        import pandas as pd
         try:
             with DBHandler() as db:
-                farms = db.get_farms()
-                allrows = []
-                for farm in farms:
-                    farm_id = farm["id"]
-                    rows = db.fetch_all(
-                        "SELECT date, temp_max, temp_min, rainfall, cumulative_gdd FROM climate_data WHERE farm_id=? ORDER BY date ASC",
-                        (farm_id,)
-                    )
-                    for row in rows:
-                        entry = dict(date=row[0], temp_max=row[1], temp_min=row[2], rainfall=row[3], cumulative_gdd=row[4], farm=farm["name"])
-                        allrows.append(entry)
-            if not allrows:
+                summary = global_analytics.compute(db)
+            if summary is None:
                 messagebox.showinfo("Global Analytics", "No data for analytics.")
                 return
-            df = pd.DataFrame(allrows)
-            analytic_str = "=== Global Analytics ===\n"
-            if "temp_max" in df.columns and "farm" in df.columns:
-                farm_means = df.groupby("farm")["temp_max"].mean()
-                analytic_str += "\nMean Tmax by farm:\n" + farm_means.round(2).to_string() + "\n"
-            if "rainfall" in df.columns:
-                analytic_str += f"\nOverall Rainfall Mean: {df['rainfall'].mean():.2f} mm, Std: {df['rainfall'].std():.2f}\n"
-            if "cumulative_gdd" in df.columns:
-                analytic_str += f"\nOverall GDD Mean: {df['cumulative_gdd'].mean():.2f}\n"
-            # Show trend for top farm
-            if "farm" in df.columns and "temp_max" in df.columns:
-                farm_means = df.groupby("farm")["temp_max"].mean()
-                analytic_str += "\nMean Tmax by farm:\n" + farm_means.round(2).to_string() + "\n"
-                if "date" in df.columns:
-                    top_farm = farm_means.idxmax()
-                    df_top = df[df["farm"] == top_farm]
-                    df_top["date"] = pd.to_datetime(df_top["date"])
-                    df_top.sort_values("date", inplace=True)
-                    df_top["temp_max_rm"] = df_top["temp_max"].rolling(window=3, min_periods=1).mean()
-                    analytic_str += f"\nRolling mean for Tmax (farm={top_farm}):\n"
-                    analytic_str += df_top[["date", "temp_max", "temp_max_rm"]].tail(5).to_string(index=False) + "\n"
+            analytic_str = global_analytics.format_summary(summary)
             # Display
             top = tk.Toplevel(self)
             top.title("Global Analytics (Admin)")
@@ -0,0 +1,131 @@
+"""
+seed_data.py
+Seed files applied to the database once per content.
+
+The Dashboard used to re-insert climate_template_2025.csv row by row (one
+commit per statement) every time it was first shown. Seeds are now recorded
+in the seed_files table with the SHA-256 of the file they came from:
+
+    apply_seed()       - hash the file, skip it if that hash is already
+                         recorded (one primary-key lookup), otherwise run the
+                         loader and record the hash in a single transaction
+    seed_climate_template() - the Dashboard's template seed ('Template Farm')
+
+Editing a seed file changes its hash, so it is applied again on the next run.
+Deleting the seeded farm does not bring it back unless the file changes or
+the seed is forced (Dashboard.auto_import_climate_template).
+
+Usage:
+    with DBHandler() as db:
+        rows = apply_seed(db, "climate_template_2025.csv", load_climate_csv)   # None if already applied
+"""
+
+import csv
+import hashlib
+import os
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+
+import lod_pyramid
+from series_cache import invalidate_farms
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "climate_template_2025.csv")
+TEMPLATE_FARM = "Template Farm"
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def applied_hash(db, name: str) -> Optional[str]:
+    """Hash of the file last applied under ``name``, or None."""
+    row = db.conn.execute("SELECT sha256 FROM seed_files WHERE name=?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def apply_seed(db, path: str, load: Callable[[Any, str], int], name: Optional[str] = None,
+               force: bool = False) -> Optional[int]:
+    """
+    Run ``load(db, path)`` and record the file's hash, in one transaction.
+    Returns the loader's row count, or None if this content was already applied
+    (and ``force`` is off). ``name`` defaults to the file name.
+    """
+    name = name or os.path.basename(path)
+    digest = file_hash(path)
+    if not force and applied_hash(db, name) == digest:
+        return None
+    with db.transaction() as conn:
+        rows = load(db, path)
+        conn.execute(
+            "INSERT OR REPLACE INTO seed_files (name, sha256, rows, applied_at) VALUES (?, ?, ?, ?)",
+            (name, digest, rows, datetime.now().isoformat(timespec="seconds"))
+        )
+    return rows
+
+
+def _number(value: Any) -> float:
+    """A required cell as a float; blank or missing cells raise ValueError (the row is skipped)."""
+    if value is None or not str(value).strip():
+        raise ValueError("blank cell")
+    return float(value)
+
+
+def _optional(value: Any) -> Optional[float]:
+    """An optional cell as a float, or None (stored as NULL) when blank."""
+    if value is None or not str(value).strip():
+        return None
+    return float(value)
+
+
+def load_climate_csv(db, path: str, farm_name: str = TEMPLATE_FARM) -> int:
+    """
+    Upsert a template-format CSV (date, temp_max, temp_min, rainfall, daily_gdd,
+    eff_rain, cum_gdd) into ``farm_name``, creating the farm if needed. Rows whose
+    date or climate values are blank or do not parse are skipped; blank metric
+    cells are stored as NULL. Call inside a transaction. Returns rows written.
+    """
+    conn = db.conn
+    conn.execute("INSERT OR IGNORE INTO farms (name, location, base_temp) VALUES (?, ?, ?)",
+                 (farm_name, "Unknown", 10.0))
+    farm_id = conn.execute("SELECT id FROM farms WHERE name=?", (farm_name,)).fetchone()[0]
+    climate: List[Tuple[Any, ...]] = []
+    metrics: List[Tuple[Any, ...]] = []
+    with open(path, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                day = row["date"]
+                if not day or not day.strip():
+                    raise ValueError("blank date")
+                values = (_number(row.get("temp_max")), _number(row.get("temp_min")), _number(row.get("rainfall")))
+                derived = (_optional(row.get("daily_gdd")), _optional(row.get("eff_rain")), _optional(row.get("cum_gdd")))
+            except (KeyError, TypeError, ValueError):
+                continue
+            climate.append((farm_id, day) + values)
+            metrics.append((farm_id, day) + derived)
+    if not climate:
+        return 0
+    db.executemany("INSERT OR REPLACE INTO climate_data (farm_id, date, temp_max, temp_min, rainfall) "
+                   "VALUES (?, ?, ?, ?, ?)", climate)
+    db.executemany("INSERT OR REPLACE INTO agri_metrics (farm_id, date, daily_gdd, effective_rainfall, "
+                   "cumulative_gdd) VALUES (?, ?, ?, ?, ?)", metrics)
+    lod_pyramid.rebuild(db, farm_id, min(r[1] for r in climate))
+    return len(climate)
+
+
+def seed_climate_template(db, path: str = TEMPLATE_PATH, force: bool = False) -> Optional[int]:
+    """
+    Apply the Dashboard's climate template if it exists and changed since it was
+    last applied. Returns rows written, or None if skipped.
+    """
+    if not os.path.exists(path):
+        return None
+    rows = apply_seed(db, path, load_climate_csv, force=force)
+    if rows:
+        farm = db.conn.execute("SELECT id FROM farms WHERE name=?", (TEMPLATE_FARM,)).fetchone()
+        invalidate_farms([farm[0]] if farm else None)
+    return rows
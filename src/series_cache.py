@@ -0,0 +1,233 @@
+"""
+series_cache.py
+In-memory cache of per-farm daily series for the chart pages.
+
+A cache entry holds every metric of one farm over one date range as columnar
+NumPy arrays, so switching metric, overlay, plot type or styling is answered
+from memory instead of a new SQL query. Entries are evicted least recently
+used once the cache holds more than ``max_bytes``. A request for a range
+inside a cached one (e.g. a sub-range of the full history) is sliced from it.
+
+Ingest paths call invalidate_farms() after committing; every live cache in
+that process then drops the entries of those farms. Writes made by another
+process are seen through data_versions: pages holding a cache poll a
+VersionWatcher and invalidate the farms whose counters moved. A load that was
+running while a farm was invalidated is returned to its caller but not kept.
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from db_handler import DBHandler
+
+METRICS = ["temp_max", "temp_min", "rainfall", "daily_gdd", "effective_rainfall", "cumulative_gdd"]
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+Key = Tuple[int, str, str]  # farm_id, start ('' = open), end ('' = open)
+
+_caches: "weakref.WeakSet[SeriesCache]" = weakref.WeakSet()
+
+
+def _farm_key(farm_id):
+    try:
+        return int(farm_id)
+    except (TypeError, ValueError):
+        return farm_id
+
+
+def invalidate_farms(farm_ids: Optional[Iterable] = None) -> None:
+    """Drop cached series of ``farm_ids`` (all farms if None) from every live cache."""
+    farms = None if farm_ids is None else {_farm_key(f) for f in farm_ids if f is not None}
+    for cache in list(_caches):
+        cache.invalidate(farms)
+
+
+class Series:
+    """Daily rows of one farm: ``dates`` (datetime64) plus one float array per metric."""
+
+    def __init__(self, dates: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.dates = dates
+        self.columns = columns
+        self.nbytes = dates.nbytes + sum(a.nbytes for a in columns.values())
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def slice(self, start: str = "", end: str = "") -> "Series":
+        lo = np.searchsorted(self.dates, np.datetime64(start), "left") if start else 0
+        hi = np.searchsorted(self.dates, np.datetime64(end) + np.timedelta64(1, "D"), "left") if end else len(self.dates)
+        return Series(self.dates[lo:hi], {k: v[lo:hi] for k, v in self.columns.items()})
+
+    def frame(self, metrics: Optional[List[str]] = None) -> pd.DataFrame:
+        """DataFrame with a ``date`` column and the requested metrics."""
+        data = {"date": self.dates}
+        for m in metrics or METRICS:
+            data[m] = self.columns[m]
+        return pd.DataFrame(data)
+
+
+def load_series(db, farm_id, start: str = "", end: str = "") -> Series:
+    """One query for all metrics of a farm between two dates (inclusive, '' = open)."""
+    q = """
+        SELECT c.date, c.temp_max, c.temp_min, c.rainfall,
+               m.daily_gdd, m.effective_rainfall, m.cumulative_gdd
+        FROM climate_data c
+        LEFT JOIN agri_metrics m ON c.farm_id = m.farm_id AND c.date = m.date
+        WHERE c.farm_id=?
+    """
+    params: list = [farm_id]
+    if start:
+        q += " AND c.date>=?"
+        params.append(start)
+    if end:
+        q += " AND c.date<=?"
+        params.append(end)
+    rows = db.conn.execute(q + " ORDER BY c.date ASC", params).fetchall()
+    if not rows:
+        return Series(np.array([], dtype="datetime64[ns]"), {m: np.array([], dtype=float) for m in METRICS})
+    cols = list(zip(*rows))
+    dates = pd.to_datetime(pd.Series(cols[0]), errors="coerce").to_numpy(dtype="datetime64[ns]")
+    return Series(dates, {m: np.array(v, dtype=float) for m, v in zip(METRICS, cols[1:])})
+
+
+def adjacent_windows(start: str, end: str) -> List[Tuple[str, str]]:
+    """The equally long date windows right before and after [start, end] (none for open ranges)."""
+    if not start or not end:
+        return []
+    try:
+        lo, hi = date.fromisoformat(start), date.fromisoformat(end)
+    except ValueError:
+        return []
+    span = hi - lo + timedelta(days=1)
+    return [
+        ((lo - span).isoformat(), (lo - timedelta(days=1)).isoformat()),
+        ((hi + timedelta(days=1)).isoformat(), (hi + span).isoformat()),
+    ]
+
+
+class SeriesCache:
+    """
+    LRU cache of Series keyed by (farm_id, start, end), bounded by bytes.
+
+    Usage:
+        cache = SeriesCache()
+        series = cache.lookup(farm_id, start, end)      # memory only, None on a miss
+        if series is None:
+            with DBHandler() as db:
+                series = cache.load(db, farm_id, start, end)
+            cache.prefetch_adjacent(farm_id, start, end)
+        df = series.frame(["temp_max"])
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Key, Series]" = OrderedDict()
+        self._epochs: Dict = {}
+        self._lock = threading.Lock()
+        self._prefetcher: Optional[ThreadPoolExecutor] = None
+        self._prefetching = set()
+        _caches.add(self)
+
+    @staticmethod
+    def _key(farm_id, start, end) -> Key:
+        return (_farm_key(farm_id), start or "", end or "")
+
+    def lookup(self, farm_id, start: str = "", end: str = "") -> Optional[Series]:
+        """Cached series for the range, sliced from a covering entry if needed; None on a miss."""
+        farm, start, end = self._key(farm_id, start, end)
+        with self._lock:
+            exact = self._entries.get((farm, start, end))
+            if exact is not None:
+                self._entries.move_to_end((farm, start, end))
+                self.hits += 1
+                return exact
+            for (f, s, e), series in reversed(self._entries.items()):
+                # '' is an open bound, so it covers anything on its side
+                if f == farm and (not s or (start and s <= start)) and (not e or (end and e >= end)):
+                    self._entries.move_to_end((f, s, e))
+                    self.hits += 1
+                    return series.slice(start, end)
+            self.misses += 1
+        return None
+
+    def load(self, db, farm_id, start: str = "", end: str = "") -> Series:
+        """Query the range through ``db`` and keep it (unless the farm was invalidated meanwhile)."""
+        key = self._key(farm_id, start, end)
+        with self._lock:
+            epoch = self._epochs.get(key[0], 0)
+        series = load_series(db, key[0], key[1], key[2])
+        self._store(key, series, epoch)
+        return series
+
+    def get(self, farm_id, start: str = "", end: str = "") -> Series:
+        """lookup(), falling back to a load through a new DBHandler."""
+        series = self.lookup(farm_id, start, end)
+        if series is None:
+            with DBHandler() as db:
+                series = self.load(db, farm_id, start, end)
+        return series
+
+    def _store(self, key: Key, series: Series, epoch: int) -> None:
+        with self._lock:
+            if self._epochs.get(key[0], 0) != epoch or series.nbytes > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._entries[key] = series
+            self.nbytes += series.nbytes
+            while self.nbytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def invalidate(self, farm_ids: Optional[Iterable] = None) -> None:
+        """Drop entries of ``farm_ids`` (everything if None)."""
+        with self._lock:
+            if farm_ids is None:
+                for farm in {k[0] for k in self._entries} | set(self._epochs):
+                    self._epochs[farm] = self._epochs.get(farm, 0) + 1
+                self._entries.clear()
+                self.nbytes = 0
+                return
+            farms = {_farm_key(f) for f in farm_ids}
+            for farm in farms:
+                self._epochs[farm] = self._epochs.get(farm, 0) + 1
+            for key in [k for k in self._entries if k[0] in farms]:
+                self.nbytes -= self._entries.pop(key).nbytes
+
+    def prefetch_adjacent(self, farm_id, start: str, end: str) -> None:
+        """Load the windows before and after [start, end] in the background."""
+        for s, e in adjacent_windows(start or "", end or ""):
+            key = self._key(farm_id, s, e)
+            with self._lock:
+                if key in self._entries or key in self._prefetching:
+                    continue
+                self._prefetching.add(key)
+                if self._prefetcher is None:
+                    self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="series-prefetch")
+            self._prefetcher.submit(self._prefetch, key)
+
+    def _prefetch(self, key: Key) -> None:
+        try:
+            with DBHandler() as db:
+                self.load(db, *key)
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._prefetching.discard(key)
+
+    def close(self) -> None:
+        if self._prefetcher is not None:
+            self._prefetcher.shutdown(wait=False)
+            self._prefetcher = None
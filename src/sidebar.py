@@ -119,6 +119,7 @@ class Sidebar(tb.Frame):
         # Only show Upload Data for admin
         if self.user.get("role", "user") == "admin":
             nav_items.insert(1, ("Upload Data", "upload", "⬆️"))
+            nav_items.insert(2, ("IoT Live Data", "iot", "📡"))
             nav_items.append(("User Management", "user_management", "👥"))
         for name, key, emoji in nav_items:
             self.btns[key] = tb.Button(
@@ -0,0 +1,277 @@
+"""
+table_export.py
+Streaming table exports straight from the database.
+
+Exports re-run the page's query and write the cursor chunk by chunk
+(fetchmany), so memory stays flat for any number of rows and values keep
+their database types instead of the strings a Tk widget holds. The format
+follows the file name:
+
+    .csv                 csv module
+    .csv.gz / .gz        gzip-compressed CSV
+    .parquet             pyarrow (optional; one row group per chunk)
+    .xlsx                openpyxl write-only workbook, spilling into further
+                         sheets past Excel's row limit
+
+Files are written under a temporary name and moved into place when complete,
+so a cancelled or failed export leaves nothing behind.
+
+Usage:
+    rows = write_query(db, query, params, "farm.csv.gz")            # blocking
+    job = export_query(query, params, "farm.parquet")                # worker thread
+    show_progress(parent, job, "Export")                              # Tk dialog with Cancel
+"""
+
+import csv
+import gzip
+import os
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+
+CHUNK_ROWS = 10_000
+# Excel sheets hold at most 1,048,576 rows including the header
+EXCEL_MAX_ROWS = 1_048_575
+FILETYPES = [
+    ("CSV Files", "*.csv"), ("Gzip CSV", "*.csv.gz"), ("Parquet", "*.parquet"),
+    ("Excel Workbook", "*.xlsx"), ("All Files", "*.*"),
+]
+
+
+class ExportCancelled(Exception):
+    """Raised inside a writer when its job was cancelled."""
+
+
+def format_for(path: str) -> str:
+    """'csv', 'csv.gz', 'parquet' or 'xlsx' from a file name (CSV if unknown)."""
+    name = path.lower()
+    if name.endswith(".gz"):
+        return "csv.gz"
+    if name.endswith(".parquet"):
+        return "parquet"
+    if name.endswith((".xlsx", ".xlsm")):
+        return "xlsx"
+    return "csv"
+
+
+def count_rows(db, query: str, params: Sequence[Any] = ()) -> int:
+    row = db.conn.execute(f"SELECT COUNT(*) FROM ({query})", tuple(params)).fetchone()
+    return int(row[0]) if row else 0
+
+
+def _chunks(cursor, chunk_rows: int) -> Iterator[List[tuple]]:
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            return
+        yield rows
+
+
+def _write_csv(path: str, columns: List[str], chunks: Iterable[List[tuple]], compress: bool, step) -> None:
+    opener = gzip.open(path, "wt", newline="", encoding="utf-8") if compress else \
+        open(path, "w", newline="", encoding="utf-8")
+    with opener as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(rows)
+            step(len(rows))
+
+
+def _parquet_type(values):
+    import pyarrow as pa
+
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, bool):
+            return pa.bool_()
+        if isinstance(v, int):
+            return pa.int64()
+        if isinstance(v, float):
+            return pa.float64()
+        if isinstance(v, bytes):
+            return pa.binary()
+        return pa.string()
+    # All empty in the first chunk: assume a measurement
+    return pa.float64()
+
+
+def _write_parquet(path: str, columns: List[str], chunks: Iterable[List[tuple]], step) -> None:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow)") from e
+    writer = None
+    schema = None
+    try:
+        for rows in chunks:
+            values = list(zip(*rows))
+            if schema is None:
+                schema = pa.schema([(name, _parquet_type(col)) for name, col in zip(columns, values)])
+                writer = pq.ParquetWriter(path, schema)
+            table = pa.Table.from_arrays([pa.array(col, type=field.type) for col, field in zip(values, schema)],
+                                         schema=schema)
+            writer.write_table(table)
+            step(len(rows))
+        if writer is None:
+            pq.write_table(pa.table({name: pa.array([], type=pa.string()) for name in columns}), path)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_xlsx(path: str, columns: List[str], chunks: Iterable[List[tuple]], step) -> None:
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    sheet = wb.create_sheet("data")
+    sheet.append(columns)
+    sheet_rows = 0
+    for rows in chunks:
+        for row in rows:
+            if sheet_rows >= EXCEL_MAX_ROWS:
+                sheet = wb.create_sheet(f"data{len(wb.worksheets) + 1}")
+                sheet.append(columns)
+                sheet_rows = 0
+            sheet.append(tuple(row))
+            sheet_rows += 1
+        step(len(rows))
+    wb.save(path)
+
+
+def write_rows(path: str, columns: Sequence[str], chunks: Iterable[List[tuple]], fmt: Optional[str] = None,
+               progress: Optional[Callable[[int], None]] = None,
+               cancelled: Optional[threading.Event] = None) -> int:
+    """
+    Write chunks of row tuples to ``path`` (format from the name unless ``fmt``).
+    ``progress(rows_written)`` is called after every chunk. Returns rows written.
+    """
+    fmt = fmt or format_for(path)
+    columns = [str(c) for c in columns]
+    written = [0]
+
+    def step(n):
+        written[0] += n
+        if progress is not None:
+            progress(written[0])
+        if cancelled is not None and cancelled.is_set():
+            raise ExportCancelled()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = os.path.join(directory, f".{os.path.basename(path)}.part")
+    try:
+        if fmt in ("csv", "csv.gz"):
+            _write_csv(tmp, columns, chunks, fmt == "csv.gz", step)
+        elif fmt == "parquet":
+            _write_parquet(tmp, columns, chunks, step)
+        elif fmt == "xlsx":
+            _write_xlsx(tmp, columns, chunks, step)
+        else:
+            raise ValueError(f"Unknown export format: {fmt!r}")
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return written[0]
+
+
+def write_query(db, query: str, params: Sequence[Any], path: str, headers: Optional[Sequence[str]] = None,
+                fmt: Optional[str] = None, chunk_rows: int = CHUNK_ROWS,
+                progress: Optional[Callable[[int], None]] = None,
+                cancelled: Optional[threading.Event] = None) -> int:
+    """Run a SELECT and stream its rows to ``path``. ``headers`` replace the column names."""
+    cursor = db.conn.execute(query, tuple(params))
+    columns = list(headers) if headers else [d[0] for d in cursor.description]
+    return write_rows(path, columns, _chunks(cursor, chunk_rows), fmt, progress, cancelled)
+
+
+class ExportJob:
+    """One export_query() run: ``written``/``total`` rows, ``error`` (str) once finished."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.written = 0
+        self.total: Optional[int] = None
+        self.error: Optional[str] = None
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.finished.wait(timeout)
+
+
+def export_query(query: str, params: Sequence[Any], path: str, headers: Optional[Sequence[str]] = None,
+                 db_path: Optional[str] = None, fmt: Optional[str] = None,
+                 done: Optional[Callable[[ExportJob], None]] = None) -> ExportJob:
+    """
+    write_query() on a worker thread with its own connection. The row count is
+    taken first so progress has a total. ``done(job)`` runs on the worker thread.
+    """
+    from db_handler import DBHandler
+
+    job = ExportJob(path)
+
+    def progress(written):
+        job.written = written
+
+    def worker():
+        try:
+            with DBHandler(db_path) as db:
+                job.total = count_rows(db, query, params)
+                write_query(db, query, params, path, headers, fmt, progress=progress, cancelled=job.cancelled)
+        except ExportCancelled:
+            job.error = "Cancelled"
+        except Exception as e:
+            job.error = str(e)
+        finally:
+            job.finished.set()
+            if done is not None:
+                done(job)
+
+    threading.Thread(target=worker, daemon=True).start()
+    return job
+
+
+def show_progress(parent, job: ExportJob, title: str = "Export",
+                  on_close: Optional[Callable[[ExportJob], None]] = None) -> None:
+    """
+    A small Tk dialog with a progress bar and Cancel button that follows ``job``
+    (polled with after(), so no Tk calls come from the worker). Reports the
+    result in a message box unless ``on_close`` handles it.
+    """
+    import tkinter as tk
+    from tkinter import messagebox, ttk
+
+    win = tk.Toplevel(parent)
+    win.title(title)
+    win.transient(parent.winfo_toplevel())
+    label = ttk.Label(win, text="Counting rows...")
+    label.pack(padx=16, pady=(12, 4))
+    bar = ttk.Progressbar(win, mode="determinate", length=280, maximum=1)
+    bar.pack(padx=16, pady=4)
+    ttk.Button(win, text="Cancel", command=job.cancel).pack(pady=(4, 12))
+    win.protocol("WM_DELETE_WINDOW", job.cancel)
+
+    def poll():
+        if not job.finished.is_set():
+            if job.total:
+                bar.config(maximum=job.total, value=job.written)
+                label.config(text=f"{job.written:,} of {job.total:,} rows")
+            win.after(100, poll)
+            return
+        win.destroy()
+        if on_close is not None:
+            on_close(job)
+        elif job.error == "Cancelled":
+            pass
+        elif job.error:
+            messagebox.showerror(title, f"Export failed:\n{job.error}", parent=parent)
+        else:
+            messagebox.showinfo(title, f"Exported {job.written:,} rows to:\n{job.path}", parent=parent)
+
+    win.after(100, poll)
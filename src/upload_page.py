@@ -9,8 +9,11 @@ try:
 except Exception:
     socketio = None
     _HAS_SOCKETIO = False
+import pandas as pd
 from db_handler import DBHandler
-from notifications import notify
+from notifications import notify, ProgressThrottle
+from validation import ChunkValidator, normalize_columns, rejects_path_for
+from import_utils import read_chunks, import_chunks, count_data_rows, is_multi_farm
 from datetime import datetime
 import os
 
@@ -62,6 +65,8 @@ class UploadPage(tb.Frame):
         - Role/user aware
     """
     CSV_FIELDS = ["date", "temp_max", "temp_min", "rainfall", "daily_gdd", "eff_rain", "cum_gdd"]
+    # Agri metrics are optional: missing values are derived from the climate columns on import
+    REQUIRED_FIELDS = ["date", "temp_max", "temp_min", "rainfall"]
 
     def __init__(self, parent, sidebar=None, user=None):
         super().__init__(parent)
@@ -109,6 +114,7 @@ class UploadPage(tb.Frame):
         tb.Button(import_frame, text="Import Data", width=16, command=self.import_data).grid(row=0, column=0, padx=4)
         tb.Button(import_frame, text="Show Audit History", width=18, command=self.show_audit_history).grid(row=0, column=1, padx=4)
         tb.Button(import_frame, text="Refresh Farms", width=14, command=self.load_farms).grid(row=0, column=2, padx=4)
+        tb.Button(import_frame, text="Cancel Import", width=14, command=self.cancel_import).grid(row=0, column=3, padx=4)
 
         # Data & audit
         self.farm_ids = []
@@ -116,6 +122,7 @@ class UploadPage(tb.Frame):
         self.selected_file = None
         self.preview_rows = []
         self.audit_trail = []
+        self._import_cancel = None
         # socket attributes (may be None if python-socketio is not installed)
         self.socketio_client = None
         self.socket_thread = None
@@ -169,40 +176,32 @@ class UploadPage(tb.Frame):
                 reader = csv.DictReader(f)
                 header = reader.fieldnames
                 if not self.validate_csv_header(header):
-                    self.preview_text.insert(tk.END, f"Header error: CSV must contain fields: {', '.join(self.CSV_FIELDS)}\n")
+                    self.preview_text.insert(tk.END, f"Header error: CSV must contain fields: {', '.join(self.REQUIRED_FIELDS)}\n")
                     return
                 if header:
                     self.preview_text.insert(tk.END, ",".join(header) + "\n")
                 for i, row in enumerate(reader):
                     self.preview_rows.append(row)
-                    errors = self.validate_row(row, header)
-                    preview_line = ",".join([row.get(col, "") for col in header]) if header else ""
-                    if errors:
-                        preview_line += "   <-- " + "; ".join(errors)
-                    self.preview_text.insert(tk.END, preview_line + "\n")
                     if i >= 4: break
+            # Validate the preview rows in one vectorized pass
+            row_errors = ChunkValidator().row_errors(normalize_columns(pd.DataFrame(self.preview_rows, columns=header)))
+            for row, errors in zip(self.preview_rows, row_errors):
+                preview_line = ",".join([row.get(col, "") for col in header]) if header else ""
+                if errors:
+                    preview_line += "   <-- " + "; ".join(errors)
+                self.preview_text.insert(tk.END, preview_line + "\n")
         except Exception as e:
             self.preview_text.insert(tk.END, f"Preview failed: {e}")
 
     def validate_csv_header(self, header):
         # Check for all required fields
-        return all(f in header for f in self.CSV_FIELDS)
+        return all(f in header for f in self.REQUIRED_FIELDS)
 
     def validate_row(self, row, header=None):
-        # Validate date and numeric fields; returns list of errors
-        errors = []
-        date = row.get("date", "")
-        try:
-            datetime.strptime(date, "%Y-%m-%d")
-        except Exception:
-            errors.append("Invalid date")
-        for f in self.CSV_FIELDS[1:]:
-            val = row.get(f, "")
-            try:
-                float(val)
-            except Exception:
-                errors.append(f"Invalid {f}")
-        return errors
+        # Validate a single row dict; returns list of errors. Bulk imports validate
+        # whole frames with ChunkValidator instead of calling this per row.
+        frame = normalize_columns(pd.DataFrame([row], columns=list(header) if header else None))
+        return ChunkValidator().row_errors(frame)[0]
 
     def download_template(self):
         file_path = filedialog.asksaveasfilename(
@@ -230,74 +229,91 @@ class UploadPage(tb.Frame):
             messagebox.showerror("Download Error", f"Failed to save template: {e}")
 
     def import_data(self):
-        if not self.selected_farm_id:
-            messagebox.showwarning("Import", "Please select a target farm.")
-            return
         if not self.selected_file:
             messagebox.showwarning("Import", "Please select a CSV file to import.")
             return
+        if self._import_cancel is not None:
+            messagebox.showinfo("Import", "An import is already running.")
+            return
         try:
-            with open(self.selected_file, "r", newline="") as f:
-                reader = list(csv.DictReader(f))
-                header = reader[0].keys() if reader else self.CSV_FIELDS
+            header = [str(c).strip().lower() for c in pd.read_csv(self.selected_file, nrows=0).columns]
         except Exception as e:
             messagebox.showerror("Import Error", f"Failed to read file: {e}")
             return
         if not self.validate_csv_header(header):
-            messagebox.showerror("Import Error", f"CSV file must have columns: {', '.join(self.CSV_FIELDS)}")
+            messagebox.showerror("Import Error", f"CSV file must have columns: {', '.join(self.REQUIRED_FIELDS)}")
             return
-        total = len(reader)
-        if total == 0:
-            messagebox.showerror("Import Error", "CSV file contains no data.")
+        # Files with a farm_name column load every farm they contain; otherwise all
+        # rows go to the selected farm
+        multi_farm = is_multi_farm(header)
+        if not multi_farm and not self.selected_farm_id:
+            messagebox.showwarning("Import", "Please select a target farm.")
             return
-        self.import_progress["maximum"] = total
+        file_path = self.selected_file
+        farm_id = None if multi_farm else self.selected_farm_id
+        target = "farms listed in the file" if multi_farm else f"farm {farm_id}"
+        rejects_path = rejects_path_for(file_path)
+        cancel = threading.Event()
+        self._import_cancel = cancel
         self.import_progress["value"] = 0
-        self.prog_label.config(text=f"0/{total}")
+        self.prog_label.config(text="Counting rows...")
+
+        def show_progress(done, total):
+            self.safe_ui_update(self.import_progress.config, maximum=max(total, 1), value=done)
+            self.safe_ui_update(self.prog_label.config, text=f"{done}/{total}")
 
-        # Do import in thread to avoid UI block
+        # Do import in thread to avoid UI block. Rows are validated and written in
+        # chunks inside one transaction; progress reaches the UI at most 10x/second.
         def import_thread():
-            count = 0
-            errors = []
-            for i, row in enumerate(reader):
-                row_errors = self.validate_row(row, header)
-                if row_errors:
-                    errors.append(f"Row {i+1}: {'; '.join(row_errors)}")
-                    continue
-                try:
-                    date = row.get("date")
-                    temp_max = float(row.get("temp_max", 0))
-                    temp_min = float(row.get("temp_min", 0))
-                    rainfall = float(row.get("rainfall", 0))
-                    daily_gdd = float(row.get("daily_gdd", 0))
-                    eff_rain = float(row.get("eff_rain", 0))
-                    cum_gdd = float(row.get("cum_gdd", 0))
-                    with DBHandler() as db:
-                        db.execute_query(
-                            "INSERT OR REPLACE INTO climate_data (farm_id, date, temp_max, temp_min, rainfall) VALUES (?, ?, ?, ?, ?)",
-                            (self.selected_farm_id, date, temp_max, temp_min, rainfall)
-                        )
-                        db.execute_query(
-                            "INSERT OR REPLACE INTO agri_metrics (farm_id, date, daily_gdd, effective_rainfall, cumulative_gdd) VALUES (?, ?, ?, ?, ?)",
-                            (self.selected_farm_id, date, daily_gdd, eff_rain, cum_gdd)
-                        )
-                    count += 1
-                except Exception as e:
-                    errors.append(f"Row {i+1}: {e}")
-                # Update progress bar on UI thread
-                self.safe_ui_update(self.import_progress.config, value=i+1)
-                self.safe_ui_update(self.prog_label.config, text=f"{i+1}/{total}")
-                notify("progress", f"Import progress: {i+1}/{total}")
+            summary = None
+            error = None
+            try:
+                total = count_data_rows(file_path)
+                throttle = ProgressThrottle(show_progress, max_per_second=10)
+                throttle.finish(0, total)
+                with ChunkValidator(rejects=rejects_path) as validator:
+                    summary = import_chunks(
+                        read_chunks(file_path),
+                        farm_id=farm_id,
+                        validator=validator,
+                        progress=lambda done: throttle.update(done, total),
+                        cancel_event=cancel,
+                    )
+                throttle.finish(summary["rows"], total)
+            except Exception as e:
+                error = e
+            finally:
+                self._import_cancel = None
             self.safe_ui_update(self.import_progress.config, value=0)
             self.safe_ui_update(self.prog_label.config, text="")
-            self._audit("import", f"{count} entries imported by {self.user['username']} to farm {self.selected_farm_id}.")
-            notify("import", f"{count} entries uploaded by {self.user['username']}.")
-            msg = f"Imported {count} entries."
-            if errors:
-                msg += f"\n{len(errors)} rows skipped due to errors."
-            self.safe_ui_update(messagebox.showinfo, "Import", msg)
+            if error is not None:
+                self._audit("import_failed", f"Import by {self.user['username']} to {target} failed and was rolled back: {error}")
+                self.safe_ui_update(messagebox.showerror, "Import Error", f"Import failed, no rows were saved: {error}")
+            elif summary["cancelled"]:
+                self._audit("import_cancelled", f"Import by {self.user['username']} to {target} cancelled; no rows saved.")
+                self.safe_ui_update(messagebox.showinfo, "Import", "Import cancelled. No rows were saved.")
+            else:
+                count = summary["inserted"]
+                # _audit broadcasts the single completion notification
+                self._audit("import", f"{count} entries imported by {self.user['username']} to {target}.")
+                msg = f"Imported {count} entries."
+                if summary["rejected"]:
+                    msg += f"\n{summary['rejected']} rows rejected by validation (see {os.path.basename(rejects_path)})."
+                if summary["skipped"]:
+                    msg += f"\n{summary['skipped']} rows skipped."
+                self.safe_ui_update(messagebox.showinfo, "Import", msg)
             self.save_persistent_audit_trail()
         threading.Thread(target=import_thread, daemon=True).start()
 
+    def cancel_import(self):
+        """Request cancellation of the running import; its transaction is rolled back."""
+        cancel = self._import_cancel
+        if cancel is None:
+            messagebox.showinfo("Import", "No import is running.")
+            return
+        cancel.set()
+        self.prog_label.config(text="Cancelling...")
+
     # --- Cloud/server upload stub ---
     def cloud_upload_stub(self):
         if not self.selected_file:
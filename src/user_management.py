@@ -2,6 +2,9 @@ import tkinter as tk
 import ttkbootstrap as tb
 from tkinter import messagebox, simpledialog, filedialog
 from db_handler import DBHandler
+from virtual_table import VirtualTable
+
+USER_COLUMNS = [("id", "ID"), ("username", "Username"), ("role", "Role"), ("status", "Status")]
 
 class UserManagementPage(tb.Frame):
     def __init__(self, parent, user, *args, **kwargs):
@@ -33,9 +36,9 @@ class UserManagementPage(tb.Frame):
         order_menu = tk.OptionMenu(control_frame, self.order_var, "asc", "desc", command=lambda _: self.refresh_users())
         order_menu.pack(side="left", padx=4)
         # User list
-        # Use a Listbox with multiple selection for bulk actions
-        self.user_listbox = tk.Listbox(self, width=60, height=12, selectmode=tk.MULTIPLE)
-        self.user_listbox.pack(pady=8)
+        # Ctrl/Shift-click selects several users for bulk actions
+        self.user_table = VirtualTable(self, USER_COLUMNS, height=12, selectmode="extended")
+        self.user_table.pack(pady=8, fill="x", padx=12)
         # Pagination controls
         page_frame = tk.Frame(self)
         page_frame.pack(pady=2)
@@ -58,11 +61,11 @@ class UserManagementPage(tb.Frame):
         tk.Button(btn_frame, text="View Audit Log", command=self.view_audit_log).pack(side="left", padx=4)
         tk.Button(btn_frame, text="Refresh", command=self.refresh_users).pack(side="left", padx=4)
     def delete_selected_users(self):
-        selected = self.user_listbox.curselection()
+        selected = self.user_table.selected_values("id")
         if not selected:
             messagebox.showinfo("Bulk Delete", "Select users to delete.")
             return
-        ids = [int(self.user_listbox.get(i).split(":")[0]) for i in selected]
+        ids = [int(user_id) for user_id in selected]
         from db_handler import DBHandler
         with DBHandler() as db:
             for user_id in ids:
@@ -71,14 +74,14 @@ class UserManagementPage(tb.Frame):
         self.refresh_users()
 
     def change_role_selected(self):
-        selected = self.user_listbox.curselection()
+        selected = self.user_table.selected_values("id")
         if not selected:
             messagebox.showinfo("Bulk Role Change", "Select users to change role.")
             return
         role = simpledialog.askstring("Change Role", "Enter new role for selected users:")
         if not role:
             return
-        ids = [int(self.user_listbox.get(i).split(":")[0]) for i in selected]
+        ids = [int(user_id) for user_id in selected]
         from db_handler import DBHandler
         with DBHandler() as db:
             for user_id in ids:
@@ -87,11 +90,11 @@ class UserManagementPage(tb.Frame):
         self.refresh_users()
 
     def toggle_status_selected(self):
-        selected = self.user_listbox.curselection()
+        selected = self.user_table.selected_values("id")
         if not selected:
             messagebox.showinfo("Toggle Status", "Select users to toggle status.")
             return
-        ids = [int(self.user_listbox.get(i).split(":")[0]) for i in selected]
+        ids = [int(user_id) for user_id in selected]
         from db_handler import DBHandler
         with DBHandler() as db:
             for user_id in ids:
@@ -143,7 +146,7 @@ class UserManagementPage(tb.Frame):
         self.total_users = 0
 
     def refresh_users(self):
-        self.user_listbox.delete(0, tk.END)
+        self.user_table.clear()
         search = self.search_var.get()
         sort = self.sort_var.get()
         order = self.order_var.get()
@@ -155,16 +158,14 @@ class UserManagementPage(tb.Frame):
                 # Get total count for pagination
                 count_cursor = db.execute_query("SELECT COUNT(*) FROM users" + (f" WHERE username LIKE ? OR role LIKE ?" if search else ""), tuple([f"%{search}%", f"%{search}%"] if search else []))
                 total = count_cursor.fetchone()[0] if count_cursor else 0
-            def update_listbox():
-                self.user_listbox.delete(0, tk.END)
-                for u in users:
-                    self.user_listbox.insert(tk.END, f"{u['id']}: {u['username']} ({u['role']}) - {u.get('email','')}")
+            def update_table():
+                self.user_table.set_data({key: [u.get(key, "") for u in users] for key, _ in USER_COLUMNS})
                 self.total_users = total
                 total_pages = max(1, (self.total_users + self.page_size - 1) // self.page_size)
                 self.page_label.config(text=f"Page {self.page} of {total_pages}")
                 self.prev_btn.config(state="normal" if self.page > 1 else "disabled")
                 self.next_btn.config(state="normal" if self.page < total_pages else "disabled")
-            self.after(0, update_listbox)
+            self.after(0, update_table)
         import threading
         threading.Thread(target=load_users, daemon=True).start()
 
@@ -186,26 +187,22 @@ class UserManagementPage(tb.Frame):
         self.refresh_users()
 
     def edit_user(self):
-        selection = self.user_listbox.curselection()
+        selection = self.user_table.selected_values("id")
         if not selection:
             messagebox.showinfo("Edit User", "Select a user to edit.")
             return
-        idx = selection[0]
-        user_str = self.user_listbox.get(idx)
-        user_id = int(user_str.split(":")[0])
+        user_id = int(selection[0])
         from edit_user_dialog import EditUserDialog
         dialog = EditUserDialog(self, user_id)
         self.wait_window(dialog)
         self.refresh_users()
 
     def delete_user(self):
-        selection = self.user_listbox.curselection()
+        selection = self.user_table.selected_values("id")
         if not selection:
             messagebox.showinfo("Delete User", "Select a user to delete.")
             return
-        idx = selection[0]
-        user_str = self.user_listbox.get(idx)
-        user_id = int(user_str.split(":")[0])
+        user_id = int(selection[0])
         if messagebox.askyesno("Delete User", "Are you sure you want to delete this user?"):
             from db_handler import DBHandler
             with DBHandler() as db:
@@ -0,0 +1,306 @@
+"""
+validation.py
+Vectorized validation of climate/agri rows before they are written to the database.
+
+Rules are declared as plain dicts (see DEFAULT_RULES) and evaluated as NumPy masks
+over a whole DataFrame chunk at once. Rows failing any rule are dropped from the
+returned frame and can be streamed to a rejects CSV together with their source row
+number and the reasons they were rejected.
+"""
+
+import csv
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Column aliases used by the CSV templates shipped with the app
+COLUMN_ALIASES = {
+    "eff_rain": "effective_rainfall",
+    "cum_gdd": "cumulative_gdd",
+}
+
+# Declarative rule set. Supported rule types:
+#   numeric - value must parse as a number (empty counts as invalid unless optional)
+#   range   - numeric value must lie within [min, max] (either bound optional)
+#   compare - numeric left <op> right, e.g. temp_min <= temp_max
+#   date    - value must parse with the given strftime format
+#   unique  - no repeated key (within the chunk and across earlier chunks); key
+#             columns missing from the chunk are left out of the key
+# Rules whose columns are not present in the chunk are skipped.
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    {"type": "date", "column": "date", "format": "%Y-%m-%d", "message": "Invalid date"},
+    {"type": "numeric", "columns": ["temp_max", "temp_min", "rainfall"]},
+    {"type": "numeric", "columns": ["daily_gdd", "effective_rainfall", "cumulative_gdd"], "optional": True},
+    {"type": "range", "column": "temp_max", "min": -60.0, "max": 60.0},
+    {"type": "range", "column": "temp_min", "min": -60.0, "max": 60.0},
+    {"type": "range", "column": "rainfall", "min": 0.0, "max": 1000.0, "message": "Negative or unrealistic rainfall"},
+    {"type": "range", "column": "daily_gdd", "min": 0.0},
+    {"type": "range", "column": "effective_rainfall", "min": 0.0},
+    {"type": "range", "column": "cumulative_gdd", "min": 0.0},
+    {"type": "compare", "left": "temp_min", "op": "<=", "right": "temp_max", "message": "temp_min > temp_max"},
+    {"type": "unique", "columns": ["farm_id", "farm_name", "date"], "message": "Duplicate date"},
+]
+
+_COMPARE_OPS = {
+    "<=": np.less_equal,
+    "<": np.less,
+    ">=": np.greater_equal,
+    ">": np.greater,
+    "==": np.equal,
+}
+
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Lower-case and strip column names and map template aliases (eff_rain, cum_gdd)
+    to the database column names. Alias columns are only renamed when the canonical
+    column is not already present.
+    """
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    renames = {a: c for a, c in COLUMN_ALIASES.items() if a in df.columns and c not in df.columns}
+    if renames:
+        df = df.rename(columns=renames)
+    return df
+
+
+def _as_float(col: pd.Series) -> np.ndarray:
+    """Return a float64 array for a column, with unparseable values as NaN."""
+    if pd.api.types.is_numeric_dtype(col.dtype):
+        return col.to_numpy(dtype=float, na_value=np.nan)
+    return pd.to_numeric(col, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def _as_days(col: pd.Series, fmt: str) -> np.ndarray:
+    """Return dates as int64 days since epoch; invalid dates become the NaT sentinel."""
+    if pd.api.types.is_datetime64_any_dtype(col.dtype):
+        parsed = col
+    else:
+        parsed = pd.to_datetime(col, format=fmt, errors="coerce")
+    return parsed.to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+
+_NAT = np.datetime64("NaT").astype(np.int64)
+
+
+class ChunkValidator:
+    """
+    Validate DataFrame chunks against a declarative rule set.
+
+    The validator is stateful so that a file can be fed chunk by chunk: source row
+    numbers keep counting across chunks and the ``unique`` rule remembers keys seen
+    in earlier chunks. Rejected rows are appended to ``rejects`` (a path or a text
+    file object) if one is given.
+
+    Usage:
+        with ChunkValidator(rejects="rejects.csv") as v:
+            for chunk in pd.read_csv(path, chunksize=100_000):
+                good = v.validate(chunk)
+    """
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None,
+                 rejects: Union[str, Any, None] = None, first_row: int = 1):
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        self.next_row = first_row
+        self.checked = 0
+        self.rejected = 0
+        self._rejects_target = rejects
+        self._rejects_file = None
+        self._rejects_writer = None
+        self._owns_file = False
+        self._seen: Dict[int, np.ndarray] = {}
+        self._key_codes: Dict[int, Dict[Any, int]] = {}
+
+    def __enter__(self) -> "ChunkValidator":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """Close the rejects file if this validator opened it."""
+        if self._rejects_file is not None and self._owns_file:
+            try:
+                self._rejects_file.close()
+            except Exception:
+                pass
+        self._rejects_file = None
+        self._rejects_writer = None
+
+    # --- Rule evaluation ---
+
+    def _numeric_cache(self, df: pd.DataFrame, cache: Dict[str, np.ndarray], col: str) -> np.ndarray:
+        if col not in cache:
+            cache[col] = _as_float(df[col])
+        return cache[col]
+
+    def _unique_keys(self, rule_idx: int, df: pd.DataFrame, days: np.ndarray, cols: List[str]) -> np.ndarray:
+        """Build an int64 key per row from the date (days) and any grouping columns."""
+        key = days.copy()
+        group_cols = [c for c in cols if c != "date" and c in df.columns]
+        if group_cols:
+            codes_map = self._key_codes.setdefault(rule_idx, {})
+            groups = df[group_cols[0]] if len(group_cols) == 1 else df[group_cols].astype(str).agg("|".join, axis=1)
+            local_codes, uniques = pd.factorize(groups, use_na_sentinel=False)
+            remap = np.empty(len(uniques), dtype=np.int64)
+            for i, u in enumerate(uniques):
+                remap[i] = codes_map.setdefault(u, len(codes_map))
+            # Dates fit comfortably in 32 bits of days, so the group code goes above them
+            key = remap[local_codes] * (1 << 32) + days
+        return key
+
+    def evaluate(self, df: pd.DataFrame) -> Tuple[np.ndarray, Dict[int, List[str]]]:
+        """
+        Evaluate all rules on ``df`` without recording rejects (keys seen by the
+        ``unique`` rule are still remembered for later chunks).
+        Returns (valid_mask, reasons) where reasons maps a positional row index to
+        the list of rule messages it failed.
+        """
+        n = len(df)
+        valid = np.ones(n, dtype=bool)
+        failures: List[Tuple[np.ndarray, str]] = []
+        numeric: Dict[str, np.ndarray] = {}
+        days: Optional[np.ndarray] = None
+
+        for idx, rule in enumerate(self.rules):
+            rtype = rule.get("type")
+            if rtype == "date":
+                col = rule.get("column", "date")
+                if col not in df.columns:
+                    continue
+                days = _as_days(df[col], rule.get("format", "%Y-%m-%d"))
+                fail = days == _NAT
+                msg = rule.get("message", f"Invalid {col}")
+            elif rtype == "numeric":
+                cols = [c for c in rule.get("columns", []) if c in df.columns]
+                for col in cols:
+                    vals = self._numeric_cache(df, numeric, col)
+                    fail = np.isnan(vals)
+                    if rule.get("optional"):
+                        # Blank optional values are allowed (they are derived on import);
+                        # only text that does not parse as a number is rejected
+                        fail &= df[col].notna().to_numpy() & (df[col].astype(str).str.strip() != "").to_numpy()
+                    if fail.any():
+                        failures.append((fail, rule.get("message", f"Invalid {col}")))
+                        valid &= ~fail
+                continue
+            elif rtype == "range":
+                col = rule.get("column")
+                if col not in df.columns:
+                    continue
+                vals = self._numeric_cache(df, numeric, col)
+                fail = np.zeros(n, dtype=bool)
+                with np.errstate(invalid="ignore"):
+                    if rule.get("min") is not None:
+                        fail |= vals < rule["min"]
+                    if rule.get("max") is not None:
+                        fail |= vals > rule["max"]
+                msg = rule.get("message", f"{col} out of range")
+            elif rtype == "compare":
+                left, right = rule.get("left"), rule.get("right")
+                if left not in df.columns or right not in df.columns:
+                    continue
+                lv = self._numeric_cache(df, numeric, left)
+                rv = self._numeric_cache(df, numeric, right)
+                op = _COMPARE_OPS[rule.get("op", "<=")]
+                with np.errstate(invalid="ignore"):
+                    # NaNs are reported by the numeric rule, not here
+                    fail = ~op(lv, rv) & ~np.isnan(lv) & ~np.isnan(rv)
+                msg = rule.get("message", f"{left} {rule.get('op', '<=')} {right} violated")
+            elif rtype == "unique":
+                cols = rule.get("columns", ["date"])
+                if "date" not in cols or "date" not in df.columns:
+                    continue
+                if days is None:
+                    days = _as_days(df["date"], "%Y-%m-%d")
+                key = self._unique_keys(idx, df, days, cols)
+                # Only rows that passed the earlier rules take part, so a rejected row
+                # does not shadow a later valid row with the same key
+                has_key = (days != _NAT) & valid
+                fail = np.zeros(n, dtype=bool)
+                if has_key.any():
+                    k = key[has_key]
+                    dup = pd.Series(k).duplicated(keep="first").to_numpy()
+                    seen = self._seen.get(idx)
+                    if seen is not None and seen.size:
+                        pos = np.searchsorted(seen, k)
+                        pos[pos >= seen.size] = 0
+                        dup = dup | (seen[pos] == k)
+                    fail[has_key] = dup
+                    # Surviving keys are distinct from each other and from earlier chunks
+                    keep = k[~dup]
+                    if seen is not None:
+                        keep = np.concatenate([seen, keep])
+                    keep.sort()
+                    self._seen[idx] = keep
+                msg = rule.get("message", "Duplicate key")
+            else:
+                continue
+            if fail.any():
+                failures.append((fail, msg))
+                valid &= ~fail
+
+        reasons: Dict[int, List[str]] = {}
+        for fail, msg in failures:
+            for i in np.flatnonzero(fail):
+                reasons.setdefault(int(i), []).append(msg)
+        return valid, reasons
+
+    def validate(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Validate a chunk and return only the valid rows. Rejected rows are written to
+        the rejects target (if any) with their source row number and reasons.
+        """
+        n = len(df)
+        valid, reasons = self.evaluate(df)
+        first_row = self.next_row
+        self.next_row += n
+        self.checked += n
+        if reasons:
+            self.rejected += len(reasons)
+            self._write_rejects(df, reasons, first_row)
+        if valid.all():
+            return df
+        return df[valid]
+
+    def row_errors(self, df: pd.DataFrame) -> List[List[str]]:
+        """Return the list of error messages for every row of ``df`` (empty if valid)."""
+        _, reasons = self.evaluate(df)
+        return [reasons.get(i, []) for i in range(len(df))]
+
+    # --- Rejects output ---
+
+    def _write_rejects(self, df: pd.DataFrame, reasons: Dict[int, List[str]], first_row: int) -> None:
+        if self._rejects_target is None:
+            return
+        if self._rejects_writer is None:
+            if isinstance(self._rejects_target, str):
+                self._rejects_file = open(self._rejects_target, "w", newline="")
+                self._owns_file = True
+            else:
+                self._rejects_file = self._rejects_target
+            self._rejects_writer = csv.writer(self._rejects_file)
+            self._rejects_writer.writerow(["row", "reason"] + [str(c) for c in df.columns])
+        positions = sorted(reasons)
+        rows = df.iloc[positions].astype(object).where(df.iloc[positions].notna(), "").values.tolist()
+        self._rejects_writer.writerows(
+            [first_row + p, "; ".join(reasons[p])] + vals for p, vals in zip(positions, rows)
+        )
+
+
+def validate_frame(df: pd.DataFrame, rules: Optional[List[Dict[str, Any]]] = None,
+                   rejects: Union[str, Any, None] = None) -> Tuple[pd.DataFrame, int]:
+    """
+    One-shot helper: validate a whole DataFrame.
+    Returns (valid_rows, rejected_count).
+    """
+    with ChunkValidator(rules=rules, rejects=rejects) as v:
+        good = v.validate(df)
+        return good, v.rejected
+
+
+def rejects_path_for(source_path: str) -> str:
+    """Default rejects CSV path next to the source file: data.csv -> data_rejects.csv"""
+    base, _ = os.path.splitext(source_path)
+    return f"{base}_rejects.csv"
@@ -0,0 +1,351 @@
+"""
+virtual_table.py
+A Treeview that only materializes the rows on screen.
+
+A ttk.Treeview keeps one Tk item per row, so filling one with 50k rows (and
+deleting them item by item on the next refresh) took seconds and a lot of
+memory. VirtualTable keeps the rows in a columnar TableModel (one NumPy array
+per column) and owns a fixed pool of Treeview items, one per visible line.
+Scrolling rewrites the values of those items from the model, so its cost
+depends on the window height, not on the number of rows.
+
+Sorting (heading click) reorders an index array instead of the data, and the
+selection is kept as model row indices so it survives scrolling and sorting.
+
+Usage:
+    table = VirtualTable(parent, [("date", "Date"), ("temp_max", "Max T")], height=7)
+    table.set_data({"date": dates, "temp_max": values})    # or a DataFrame
+    for index in table.selected_indices():
+        values = table.row_values(index)
+"""
+
+from tkinter import ttk
+from typing import Any, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Decimals shown for float cells
+FLOAT_DIGITS = 3
+
+
+def _column(values) -> np.ndarray:
+    """A column as a NumPy array: numbers (None -> NaN) as float/int, anything else as objects."""
+    if hasattr(values, "to_numpy"):
+        values = values.to_numpy()
+    arr = np.asarray(values)
+    if arr.dtype.kind in "biufM":
+        return arr
+    arr = np.asarray(values, dtype=object)
+    if not any(isinstance(v, (str, bytes)) for v in arr):
+        try:
+            return arr.astype(float)
+        except (TypeError, ValueError):
+            pass
+    return arr
+
+
+def _cell(value) -> Any:
+    """A model value as a plain Python value (NaN/NaT -> None)."""
+    if isinstance(value, np.datetime64):
+        return None if np.isnat(value) else str(value.astype("datetime64[D]"))
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def _text(value) -> str:
+    value = _cell(value)
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return str(round(value, FLOAT_DIGITS))
+    return str(value)
+
+
+class TableModel:
+    """Columns of equal length plus the display order (an index array)."""
+
+    def __init__(self, keys: Sequence[str]):
+        self.keys = list(keys)
+        self.columns = {k: np.array([], dtype=object) for k in self.keys}
+        self.order = np.arange(0)
+        self.sort_key: Optional[str] = None
+        self.descending = False
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def set_data(self, columns: Mapping[str, Iterable]) -> None:
+        """Replace the rows; columns missing from ``columns`` are left empty. Keeps the sort."""
+        arrays = {k: _column(columns[k]) for k in self.keys if k in columns}
+        n = max((len(a) for a in arrays.values()), default=0)
+        for k in self.keys:
+            if k not in arrays:
+                arrays[k] = np.full(n, None, dtype=object)
+            elif len(arrays[k]) != n:
+                raise ValueError(f"Column {k!r} has {len(arrays[k])} rows, expected {n}")
+        self.columns = arrays
+        self.order = np.arange(n)
+        if self.sort_key is not None:
+            self.sort(self.sort_key, self.descending)
+
+    def sort(self, key: str, descending: bool = False) -> None:
+        """Order the rows by one column (stable; empty cells last in both directions)."""
+        values = self.columns[key]
+        if values.dtype.kind == "M":
+            values = values.astype("datetime64[ns]").astype(np.int64).astype(float)
+            values[self.columns[key] != self.columns[key]] = np.nan
+        if values.dtype.kind in "biuf":
+            values = values.astype(float)
+            missing = np.isnan(values)
+        else:
+            missing = np.array([v is None for v in values], dtype=bool)
+            values = np.array(["" if v is None else str(v) for v in values], dtype=object)
+        present = np.flatnonzero(~missing)
+        # Ranks sort both ways while keeping equal keys in row order
+        ranks = np.unique(values[present], return_inverse=True)[1].astype(np.int64)
+        order = present[np.argsort(-ranks if descending else ranks, kind="stable")]
+        self.order = np.r_[order, np.flatnonzero(missing)].astype(np.int64)
+        self.sort_key, self.descending = key, descending
+
+    def index(self, position: int) -> int:
+        """Model row index shown at a display position."""
+        return int(self.order[position])
+
+    def position(self, index: int) -> Optional[int]:
+        """Display position of a model row index (None if out of range)."""
+        found = np.flatnonzero(self.order == index)
+        return int(found[0]) if len(found) else None
+
+    def row(self, index: int) -> List[Any]:
+        """Values of one model row as plain Python values, in column order."""
+        return [_cell(self.columns[k][index]) for k in self.keys]
+
+    def texts(self, start: int, stop: int) -> List[Tuple[str, ...]]:
+        """Display strings of the rows at positions [start, stop)."""
+        rows = self.order[start:stop]
+        cols = [self.columns[k][rows] for k in self.keys]
+        return [tuple(_text(c[i]) for c in cols) for i in range(len(rows))]
+
+    def rows(self) -> Iterator[List[Any]]:
+        """All rows in display order (plain Python values)."""
+        for index in self.order:
+            yield self.row(int(index))
+
+
+class VirtualTable(ttk.Frame):
+    """
+    A ttk.Treeview with a vertical scrollbar showing a TableModel. ``columns`` is
+    a list of (key, heading) pairs; ``selectmode`` as for Treeview.
+    """
+
+    def __init__(self, parent, columns: Sequence[Tuple[str, str]], height: int = 10,
+                 selectmode: str = "browse", **kwargs):
+        super().__init__(parent, **kwargs)
+        self.selectmode = selectmode
+        self.tree = ttk.Treeview(self, show="headings", height=height, selectmode=selectmode)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.tag_configure('oddrow', background='#f0f0f0')
+        self.tree.tag_configure('evenrow', background='#e0e0e0')
+        self.top = 0
+        # Pool of Treeview items, one per visible line, and the model row each shows
+        self._items: List[str] = []
+        self._shown: List[Optional[int]] = []
+        self._selected: set = set()
+        self._cursor: Optional[int] = None
+        # Item selection last set by _render (Tk reports it as a <<TreeviewSelect>> later)
+        self._synced: Tuple[str, ...] = ()
+        self._extend = False
+        self.set_columns(columns)
+        self._resize(height)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<ButtonPress-1>", self._on_press, add="+")
+        self.tree.bind("<Configure>", self._on_configure)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self._on_wheel)
+        for sequence, step in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "-page"), ("<Next>", "page"),
+                               ("<Home>", "home"), ("<End>", "end")):
+            self.tree.bind(sequence, lambda e, s=step: self._on_key(s))
+
+    # --- Data ---
+
+    def set_columns(self, columns: Sequence[Tuple[str, str]]) -> None:
+        """Change the columns (clears the rows)."""
+        keys = [k for k, _ in columns]
+        self.model = TableModel(keys)
+        self.tree.configure(columns=keys)
+        for key, label in columns:
+            self.tree.heading(key, text=label, command=lambda k=key: self.sort_by(k))
+        self._selected.clear()
+        self.top = 0
+        self._render()
+
+    def set_data(self, columns: Mapping[str, Iterable]) -> None:
+        """Show new rows (a mapping or DataFrame of columns); clears the selection and scrolls to the top."""
+        self.model.set_data(columns)
+        self._selected.clear()
+        self._cursor = None
+        self.top = 0
+        self._render()
+
+    def clear(self) -> None:
+        self.set_data({})
+
+    def row_values(self, index: int) -> List[Any]:
+        return self.model.row(index)
+
+    def rows(self) -> Iterator[List[Any]]:
+        return self.model.rows()
+
+    def sort_by(self, key: str) -> None:
+        """Sort by a column; clicking the same heading again reverses the order."""
+        descending = self.model.sort_key == key and not self.model.descending
+        self.model.sort(key, descending)
+        self._render()
+
+    # --- Selection ---
+
+    def selected_indices(self) -> List[int]:
+        """Selected model row indices in display order."""
+        if not self._selected:
+            return []
+        selected = np.fromiter(self._selected, dtype=np.int64)
+        return [int(i) for i in self.model.order[np.isin(self.model.order, selected)]]
+
+    def selected_values(self, key: str) -> List[Any]:
+        """One column of the selected rows."""
+        column = self.model.keys.index(key)
+        return [self.model.row(i)[column] for i in self.selected_indices()]
+
+    def select(self, indices: Iterable[int]) -> None:
+        """Select model rows and scroll the first one into view."""
+        self._selected = set(int(i) for i in indices)
+        first = self.selected_indices()
+        if first:
+            self._cursor = self.model.position(first[0])
+            self.see(self._cursor)
+        self._render()
+
+    def see(self, position: int) -> None:
+        """Scroll so that a display position is visible."""
+        rows = len(self._items)
+        if position < self.top:
+            self.top = position
+        elif position >= self.top + rows:
+            self.top = position - rows + 1
+        self._render()
+
+    # --- Scrolling and rendering ---
+
+    def scroll_to(self, top: int) -> None:
+        self.top = top
+        self._render()
+
+    def _render(self) -> None:
+        """Write the visible rows into the item pool (the only per-scroll work)."""
+        rows, total = len(self._items), len(self.model)
+        self.top = max(0, min(self.top, total - rows))
+        texts = self.model.texts(self.top, self.top + rows)
+        shown: List[Optional[int]] = []
+        selected_items = []
+        for i, iid in enumerate(self._items):
+            if i < len(texts):
+                position = self.top + i
+                index = self.model.index(position)
+                self.tree.item(iid, values=texts[i], tags=('evenrow' if position % 2 == 0 else 'oddrow',))
+                shown.append(index)
+                if index in self._selected:
+                    selected_items.append(iid)
+            else:
+                # Lines past the last row stay in place, blank
+                self.tree.item(iid, values=(), tags=())
+                shown.append(None)
+        self._shown = shown
+        self._synced = tuple(selected_items)
+        if tuple(self.tree.selection()) != self._synced:
+            self.tree.selection_set(selected_items)
+        if total > rows:
+            self.scrollbar.set(self.top / total, (self.top + rows) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _resize(self, rows: int) -> None:
+        """Grow or shrink the item pool to ``rows`` lines."""
+        rows = max(1, rows)
+        while len(self._items) < rows:
+            self._items.append(self.tree.insert("", "end", values=()))
+            self._shown.append(None)
+        while len(self._items) > rows:
+            self.tree.delete(self._items.pop())
+            self._shown.pop()
+        self._render()
+
+    def _on_configure(self, event) -> None:
+        bbox = self.tree.bbox(self._items[0]) if self._items else None
+        if not bbox:
+            return
+        header, row_height = bbox[1], bbox[3]
+        rows = max(1, (event.height - header) // max(row_height, 1))
+        if rows != len(self._items):
+            self._resize(rows)
+
+    def _on_scrollbar(self, *args) -> None:
+        total, rows = len(self.model), len(self._items)
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(int(round(float(args[1]) * total)))
+        elif args[0] == "scroll":
+            step = int(args[1]) * (rows if args[2] == "pages" else 1)
+            self.scroll_to(self.top + step)
+
+    def _on_wheel(self, event) -> str:
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to(self.top - 3)
+        else:
+            self.scroll_to(self.top + 3)
+        return "break"
+
+    def _on_key(self, step) -> str:
+        total, rows = len(self.model), len(self._items)
+        if not total:
+            return "break"
+        cursor = self.top if self._cursor is None else self._cursor
+        if step == "home":
+            cursor = 0
+        elif step == "end":
+            cursor = total - 1
+        elif step in ("page", "-page"):
+            cursor += rows if step == "page" else -rows
+        else:
+            cursor += step
+        cursor = max(0, min(cursor, total - 1))
+        self._cursor = cursor
+        self._selected = {self.model.index(cursor)}
+        self.see(cursor)
+        self.tree.event_generate("<<VirtualTableSelect>>")
+        return "break"
+
+    def _on_press(self, event) -> None:
+        # Ctrl/Shift-click extends the selection instead of replacing it
+        self._extend = bool(event.state & 0x0005)
+
+    def _on_select(self, event=None) -> None:
+        if tuple(self.tree.selection()) == self._synced:
+            return
+        visible = {index for index in self._shown if index is not None}
+        picked = {self._shown[self._items.index(iid)] for iid in self.tree.selection() if iid in self._items}
+        picked.discard(None)
+        if self.selectmode == "extended" and self._extend:
+            self._selected = (self._selected - visible) | picked
+        else:
+            self._selected = picked
+        self._extend = False
+        if picked:
+            self._cursor = self.model.position(next(iter(picked)))
+        self._synced = tuple(self.tree.selection())
+        self.tree.event_generate("<<VirtualTableSelect>>")
@@ -18,11 +18,41 @@ import ttkbootstrap as tb
 from tkinter import messagebox, filedialog, simpledialog
 from db_handler import DBHandler
 import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 import pandas as pd
 import numpy as np
 import os
 from datetime import datetime
+import threading
+import contextlib
+from matplotlib import dates as mdates
+from chart_layer import ChartLayer
+from downsample import DEFAULT_WIDTH_PX
+from series_cache import SeriesCache, invalidate_farms
+import data_versions
+import lod_pyramid
+import chart_export
+import distribution
+from virtual_table import VirtualTable
+
+
+class _PlotJob:
+    """One background plot fetch; cancel() also interrupts its running query."""
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.cancelled = threading.Event()
+        self.conn = None
+
+    def cancel(self):
+        self.cancelled.set()
+        conn = self.conn
+        if conn is not None:
+            try:
+                conn.interrupt()
+            except Exception:
+                pass
+
 
 class VisualizationPage(tb.Frame):
     def safe_ui_update(self, func, *args, **kwargs):
@@ -53,6 +83,8 @@ class VisualizationPage(tb.Frame):
         ("Effective Rain", "effective_rainfall"), ("Cum GDD", "cumulative_gdd")
     ]
     PLOT_TYPES = ["Line", "Bar", "Scatter", "Histogram", "Boxplot", "Heatmap"]
+    # Drawn from bins/box statistics instead of the daily series
+    DISTRIBUTION_TYPES = ("histogram", "boxplot")
     COLOR_THEMES = {
         "Default": {"primary": "#2563eb", "secondary": "#f3f4f6", "trend": "#10b981"},
         "Warm":    {"primary": "#fb5607", "secondary": "#ffbe0b", "trend": "#ff006e"},
@@ -127,6 +159,7 @@ class VisualizationPage(tb.Frame):
         tb.Button(actions, text="Import CSV/Excel", width=18, command=self.import_data_dialog).pack(side="left", padx=4)
         tb.Button(actions, text="Export CSV", width=14, command=self.export_csv).pack(side="left", padx=4)
         tb.Button(actions, text="Export Image", width=14, command=self.export_image).pack(side="left", padx=4)
+        tb.Button(actions, text="Batch Export", width=14, command=self.export_batch).pack(side="left", padx=4)
         tb.Button(actions, text="Show Audit History", width=18, command=self.show_audit_history).pack(side="left", padx=4)
         tb.Button(actions, text="Reset Form", width=12, command=self._reset_form).pack(side="left", padx=4)
 
@@ -141,11 +174,25 @@ class VisualizationPage(tb.Frame):
         self.fig = None
         self.ax = None
         self.canvas = None
+        self.chart = None
         self._initialized = False
         self._plot_after_id = None
-
-        # Data table (ttk.Treeview)
-        self.tree = ttk.Treeview(self.data_tab, columns=[], show="headings")
+        # Background plot fetches: only the newest generation is drawn
+        self._plot_generation = 0
+        self._plot_job = None
+        self._export_job = None
+        # All metrics of recently plotted farm/date ranges, kept in memory
+        self.series_cache = SeriesCache()
+        # Writes from other processes (watch folder, sensor service, web app) only
+        # reach the cache through the per-farm data versions
+        self._versions = data_versions.VersionWatcher()
+        self._watching = False
+        # Zoom/pan view and what the chart currently holds: (level, start, end)
+        self._view_after_id = None
+        self._plot_loaded = None
+
+        # Data table of the plotted rows (only the visible rows become Treeview items)
+        self.tree = VirtualTable(self.data_tab, [])
         self.tree.pack(fill="both", expand=True, padx=12, pady=8)
 
         # Animation tab: loading spinner
@@ -217,8 +264,11 @@ class VisualizationPage(tb.Frame):
         widget.bind("<Leave>", on_leave)
 
     def schedule_plot(self, delay_ms: int = 300):
-        """Schedule a debounced plot call. Cancels the previous pending one."""
+        """Schedule a debounced plot call. Cancels the previous pending one and any fetch in flight."""
         try:
+            # A fetch started for older settings would only be thrown away
+            self._cancel_plot_job()
+            self._plot_generation += 1
             # cancel previous
             _pid = getattr(self, '_plot_after_id', None)
             if _pid is not None:
@@ -247,8 +297,14 @@ class VisualizationPage(tb.Frame):
             # create figure without constrained_layout to avoid collapsed axes warning on some backends
             self.fig, self.ax = plt.subplots(figsize=(7.5, 4.5))
             self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_tab)
+            self.chart = ChartLayer(self.fig, self.canvas)
+            self.chart.watch_view(self._on_view_changed, self.ax)
             canvas_widget = self.canvas.get_tk_widget()
             canvas_widget.config(width=640, height=380)
+            # zoom/pan; downsampled series re-pick their points for the visible range
+            self.toolbar = NavigationToolbar2Tk(self.canvas, self.plot_tab, pack_toolbar=False)
+            self.toolbar.update()
+            self.toolbar.pack(side="bottom", fill="x")
             canvas_widget.pack(pady=12, fill="both", expand=True)
             # after the canvas widget is available, call tight_layout to arrange axes
             try:
@@ -272,6 +328,10 @@ class VisualizationPage(tb.Frame):
                             pass
             except Exception:
                 pass
+            if not self._watching:
+                self._watching = True
+                self._versions.changed()
+                data_versions.watch(self, self._versions, self._apply_changes)
             self._initialized = True
         except Exception:
             # If something goes wrong during lazy init, ignore to avoid crashing the UI
@@ -300,23 +360,69 @@ class VisualizationPage(tb.Frame):
                 return
             try:
                 # ensure figure exists (lazy init)
-                if getattr(self, '_initialized', False) and self.fig is not None:
-                    self.fig.savefig(file_path)
-                else:
-                    # attempt to initialize the view and then save
+                if not getattr(self, '_initialized', False) or self.fig is None:
                     try:
                         self.on_show()
                     except Exception:
                         pass
-                    if self.fig is not None:
-                        self.fig.savefig(file_path)
-                    else:
-                        raise RuntimeError("Figure not initialized")
-                self._audit("image_export", f"Plot image exported by {self.user.get('username') }.")
-                messagebox.showinfo("Export", f"Image exported to {file_path}")
+                if self.fig is None:
+                    raise RuntimeError("Figure not initialized")
+                # Rendered at print DPI in a worker process; the snapshot is all the UI thread does
+                task = chart_export.snapshot_task(self.fig, file_path, layer=self.chart)
+                self._start_export([task], f"Image exported to {file_path}", "image_export")
             except Exception as e:
                 messagebox.showerror("Export Error", f"Failed to export image: {e}")
 
+    def export_batch(self):
+        """Export one chart per farm (current metric) or per metric (current farm) in parallel."""
+        mode = simpledialog.askstring("Batch Export", "Type 'farm' for one chart per farm, 'metric' for one chart per metric:")
+        if not mode or mode.lower() not in ("farm", "metric"):
+            return
+        out_dir = filedialog.askdirectory(title="Export Charts To")
+        if not out_dir:
+            return
+        request = self._plot_request()
+        if request is None:
+            return
+        names = dict(zip(self.farm_ids, self.farm_combo.cget("values")))
+        if mode.lower() == "farm":
+            tasks = chart_export.farm_tasks(list(names.items()), request["metric_key"], out_dir,
+                                            request["start_date"], request["end_date"])
+        else:
+            farm = (request["farm_id"], names.get(request["farm_id"], request["farm_id"]))
+            tasks = chart_export.metric_tasks(farm, [key for _, key in self.METRIC_CHOICES], out_dir,
+                                              request["start_date"], request["end_date"])
+        self._start_export(tasks, f"{len(tasks)} charts exported to {out_dir}", "batch_export")
+
+    def _start_export(self, tasks, message, audit_action):
+        """Submit export tasks; the progress bar counts finished charts and a dialog reports the result."""
+        try:
+            self.progress.stop()
+            self.progress.config(mode="determinate", maximum=len(tasks), value=0)
+        except Exception:
+            pass
+
+        def progress(done, total, path, error):
+            self.safe_ui_update(lambda: self.progress.config(value=done))
+
+        def finished(job):
+            self.safe_ui_update(self._export_finished, job, message, audit_action)
+
+        self._export_job = chart_export.get_service().submit(tasks, progress=progress, done=finished)
+
+    def _export_finished(self, job, message, audit_action):
+        self._export_job = None
+        try:
+            self.progress.config(mode="indeterminate", value=0)
+        except Exception:
+            pass
+        if job.errors:
+            path, error = job.errors[0]
+            messagebox.showerror("Export Error", f"{len(job.errors)} of {job.total} exports failed.\n{path}: {error}")
+            return
+        self._audit(audit_action, f"{message} by {self.user.get('username')}.")
+        messagebox.showinfo("Export", message)
+
     def cloud_export_stub(self):
         if not self.df.empty:
             file_path = filedialog.asksaveasfilename(
@@ -328,14 +434,14 @@ class VisualizationPage(tb.Frame):
                 return
             try:
                 if getattr(self, '_initialized', False) and self.fig is not None:
-                    self.fig.savefig(file_path)
+                    self._save_figure(file_path)
                 else:
                     try:
                         self.on_show()
                     except Exception:
                         pass
                     if self.fig is not None:
-                        self.fig.savefig(file_path)
+                        self._save_figure(file_path)
                     else:
                         raise RuntimeError("Figure not initialized")
                 self._audit("cloud_export", f"Plot image cloud-exported by {self.user.get('username') }.")
@@ -369,8 +475,15 @@ class VisualizationPage(tb.Frame):
         else:
             text.insert("end", "No audit history found.")
 
-    def plot(self):
-        """Query DB for selected farm/date/metric and draw the plot on the canvas."""
+    def plot(self, view_range=None):
+        """
+        Plot the selected farm/date/metric. Ranges already in the series cache are
+        drawn straight away; otherwise the query runs on a background worker and
+        only the newest request (by generation) is drawn. Long ranges are fetched
+        from the week/month/season pyramid so the point count stays bounded.
+        ``view_range`` (start, end) replots the zoomed/panned view instead of the
+        date fields.
+        """
         try:
             # Ensure the canvas/figure are initialized
             if not getattr(self, '_initialized', False):
@@ -379,165 +492,312 @@ class VisualizationPage(tb.Frame):
                 except Exception:
                     pass
 
-            # Determine metric key (support either label or key in the combobox)
-            metric_val = self.metric_var.get()
-            metric_key = None
-            for lbl, key in self.METRIC_CHOICES:
-                if metric_val == key or metric_val == lbl:
-                    metric_key = key
-                    break
-            if metric_key is None:
-                # fallback to first metric
-                metric_key = self.METRIC_CHOICES[0][1]
-
-            # overlay metric
-            overlay_key = None
-            if self.overlay_var.get():
-                ov = self.overlay_metric.get()
-                for lbl, key in self.METRIC_CHOICES:
-                    if ov == key or ov == lbl:
-                        overlay_key = key
-                        break
-
-            # Map metric keys to table columns (cloned from report_page style)
-            field_map = {
-                "date": "c.date",
-                "temp_max": "c.temp_max",
-                "temp_min": "c.temp_min",
-                "rainfall": "c.rainfall",
-                "daily_gdd": "m.daily_gdd",
-                "effective_rainfall": "m.effective_rainfall",
-                "cumulative_gdd": "m.cumulative_gdd"
-            }
-
-            date_col = "c.date"
-            metric_col = field_map.get(metric_key, f"c.{metric_key}")
-            overlay_col = field_map.get(overlay_key) if overlay_key else None
-
-            # Get date range and farm
-            farm_id = self.selected_farm_id
-            if not farm_id:
-                messagebox.showwarning("Plot", "Please select a farm to plot.")
+            request = self._plot_request(view_range)
+            if request is None:
+                self._stop_progress()
                 return
-            start_date = self.start_date_var.get().strip()
-            end_date = self.end_date_var.get().strip()
-
-            # Build query
-            select_clause = f"{date_col}, {metric_col}"
-            if overlay_col:
-                select_clause += f", {overlay_col}"
-            q = f"SELECT {select_clause} FROM climate_data c LEFT JOIN agri_metrics m ON c.farm_id = m.farm_id AND c.date = m.date WHERE c.farm_id=?"
-            params = [farm_id]
-            if start_date:
-                q += " AND c.date>=?"
-                params.append(start_date)
-            if end_date:
-                q += " AND c.date<=?"
-                params.append(end_date)
-            q += " ORDER BY c.date ASC"
-
-            with DBHandler() as db:
-                rows = db.fetch_all(q, tuple(params))
-
-            # Build DataFrame
-            if not rows:
-                # No data: clear axes and show message
-                ax = getattr(self, 'ax', None)
-                canvas = getattr(self, 'canvas', None)
-                if ax is not None:
-                    def _no_data(a=ax):
-                        a.clear()
-                        a.text(0.5, 0.5, "No data available for selection", ha="center", va="center", fontsize=12)
-                    self.safe_ui_update(_no_data)
-                if canvas is not None:
-                    self.safe_ui_update(lambda c=canvas: c.draw())
+            # A new plot supersedes whatever is still being fetched
+            self._cancel_plot_job()
+            self._plot_generation += 1
+            job = _PlotJob(self._plot_generation)
+            self._plot_job = job
+            # Catch writes made since the last poll before answering from memory
+            self._apply_changes(self._versions.changed(), replot=False)
+            series = self.series_cache.lookup(request["farm_id"], request["start_date"], request["end_date"])
+            if series is not None:
+                # Metric, overlay and style changes are answered from memory
+                request["level"] = "day"
+                self._finish_plot(job, request, self._series_frame(series, request))
                 return
-
-            # Convert rows to DataFrame
-            cols = ["date", metric_key]
-            if overlay_col and overlay_key:
-                cols.append(overlay_key)
-            df = pd.DataFrame(rows, columns=cols)
-            # parse dates
             try:
-                df["date"] = pd.to_datetime(df["date"])
+                self.progress.start(12)
             except Exception:
                 pass
-            self.df = df
+            threading.Thread(target=self._plot_worker, args=(job, request), daemon=True).start()
+        except Exception:
+            pass
 
-            # Plot on axes
-            ax = getattr(self, 'ax', None)
-            canvas = getattr(self, 'canvas', None)
-            if ax is None or canvas is None:
-                return
+    def _apply_changes(self, changed, replot=True):
+        """Drop cached series of farms whose data version moved; replot if the plotted farm is one."""
+        farms = {key for key in changed if key != data_versions.FARM_LIST}
+        if not farms:
+            return
+        invalidate_farms(farms)
+        if replot and self.selected_farm_id in farms:
+            self.schedule_plot()
+
+    def _plot_request(self, view_range=None):
+        """Read the plot settings from the widgets (main thread). None if no farm is selected."""
+        # Determine metric key (support either label or key in the combobox)
+        metric_val = self.metric_var.get()
+        metric_key = None
+        for lbl, key in self.METRIC_CHOICES:
+            if metric_val == key or metric_val == lbl:
+                metric_key = key
+                break
+        if metric_key is None:
+            # fallback to first metric
+            metric_key = self.METRIC_CHOICES[0][1]
+
+        # overlay metric
+        overlay_key = None
+        if self.overlay_var.get():
+            ov = self.overlay_metric.get()
+            for lbl, key in self.METRIC_CHOICES:
+                if ov == key or ov == lbl:
+                    overlay_key = key
+                    break
 
-            def _draw(a=ax, data=df):
-                try:
-                    a.clear()
-                    plot_type = self.plot_type_var.get()
-                    x = data["date"]
-                    y = data[metric_key]
-                    if plot_type == "line":
-                        a.plot(x, y, marker="o", label=metric_key)
-                    elif plot_type == "bar":
-                        a.bar(x, y, label=metric_key)
-                    elif plot_type == "scatter":
-                        a.scatter(x, y, label=metric_key)
-                    elif plot_type == "histogram":
-                        a.hist(y.dropna(), bins=10)
-                    elif plot_type == "boxplot":
-                        a.boxplot(y.dropna())
-                    else:
-                        # fallback to line for unknown types
-                        a.plot(x, y, marker="o", label=metric_key)
+        # Get date range and farm
+        farm_id = self.selected_farm_id
+        if not farm_id:
+            messagebox.showwarning("Plot", "Please select a farm to plot.")
+            return None
+        start_date, end_date = view_range or (self.start_date_var.get().strip(), self.end_date_var.get().strip())
+        ax = getattr(self, 'ax', None)
+        return {
+            "farm_id": farm_id,
+            "metric_key": metric_key,
+            "overlay_key": overlay_key,
+            "start_date": start_date,
+            "end_date": end_date,
+            "plot_type": self.plot_type_var.get().lower(),
+            "max_points": ChartLayer.width(ax) if ax is not None else DEFAULT_WIDTH_PX,
+            "view": view_range is not None,
+        }
 
-                    # overlay
-                    if overlay_col and overlay_key in data.columns:
-                        try:
-                            ov_y = data[overlay_key]
-                            a.plot(x, ov_y, marker="x", linestyle="--", label=overlay_key)
-                        except Exception:
-                            pass
+    def _plot_worker(self, job, request):
+        """Background thread: query and prepare the DataFrame, then hand it to the UI thread."""
+        df = None
+        try:
+            df = self._load_plot_data(job, request)
+        except Exception:
+            df = None
+        if job.cancelled.is_set() or job.generation != self._plot_generation:
+            return
+        self.safe_ui_update(self._finish_plot, job, request, df)
+
+    def _load_plot_data(self, job, request):
+        """
+        Load the farm/date range; None when cancelled. Ranges with more days than
+        the plot has pixels come from the coarsest sufficient pyramid level, others
+        load all metrics into the series cache. Histograms and boxplots only fetch
+        their bins or box statistics (into request["distribution"]).
+        """
+        farm_id, start_date, end_date = request["farm_id"], request["start_date"], request["end_date"]
+        with DBHandler() as db:
+            # Lets a newer plot interrupt this query mid-scan
+            job.conn = db.conn
+            if job.cancelled.is_set():
+                return None
+            if request["plot_type"] in self.DISTRIBUTION_TYPES:
+                request["level"] = "day"
+                request["distribution"] = self._load_distribution(db, request)
+                job.conn = None
+                return None
+            request["level"] = self._plot_level(db, request)
+            if request["level"] != "day":
+                df = lod_pyramid.fetch(db, farm_id, self._plot_metrics(request), request["level"],
+                                       start_date, end_date)
+                job.conn = None
+                return None if job.cancelled.is_set() else df
+            series = self.series_cache.load(db, farm_id, start_date, end_date)
+            job.conn = None
+        if job.cancelled.is_set():
+            return None
+        # Stepping the date range to a neighbouring window then needs no query
+        self.series_cache.prefetch_adjacent(farm_id, start_date, end_date)
+        return self._series_frame(series, request)
+
+    def _load_distribution(self, db, request):
+        """Histogram (edges, counts) or box statistics of the request, aggregated in the database."""
+        args = (db, request["metric_key"], request["farm_id"], request["start_date"], request["end_date"])
+        if request["plot_type"] == "histogram":
+            return distribution.histogram(*args)
+        return distribution.box_stats(*args)
+
+    def _plot_level(self, db, request):
+        """Pyramid level for the request's date range."""
+        span = lod_pyramid.date_range(db, request["farm_id"], request["start_date"], request["end_date"])
+        if span is None:
+            return "day"
+        return lod_pyramid.level_for(span[0], span[1], request["max_points"])
+
+    def _plot_metrics(self, request):
+        metrics = [request["metric_key"]]
+        if request["overlay_key"] and request["overlay_key"] != request["metric_key"]:
+            metrics.append(request["overlay_key"])
+        return metrics
+
+    def _series_frame(self, series, request):
+        return series.frame(self._plot_metrics(request))
+
+    def _on_view_changed(self, ax):
+        """Zoom/pan: replot the visible range (debounced) unless the chart already holds it at the right level."""
+        if self.plot_type_var.get().lower() in self.DISTRIBUTION_TYPES:
+            return
+        try:
+            start, end = (mdates.num2date(v).date().isoformat() for v in sorted(ax.get_xlim()))
+        except Exception:
+            return
+        loaded = self._plot_loaded
+        if loaded is not None:
+            level, lo, hi = loaded
+            covered = (not lo or lo <= start) and (not hi or hi >= end)
+            if covered and level == lod_pyramid.level_for(start, end, ChartLayer.width(ax)):
+                return
+        if self._view_after_id is not None:
+            try:
+                self.after_cancel(self._view_after_id)
+            except Exception:
+                pass
+        try:
+            self._view_after_id = self.after(250, lambda: self.safe_ui_update(self.plot, (start, end)))
+        except Exception:
+            pass
 
-                    if self.trendline_var.get() and len(data) >= 2:
-                        try:
-                            # simple linear trend
-                            xv = np.arange(len(x))
-                            valid = ~np.isnan(y)
-                            if valid.sum() >= 2:
-                                coeffs = np.polyfit(xv[valid], y[valid].astype(float), 1)
-                                trend = np.polyval(coeffs, xv)
-                                a.plot(x, trend, color="#ff6600", linewidth=1.6, label="Trendline")
-                        except Exception:
-                            pass
+    def _cancel_plot_job(self):
+        job = getattr(self, '_plot_job', None)
+        if job is not None:
+            job.cancel()
+        self._plot_job = None
 
-                    a.set_title(f"{metric_key} for farm {self.selected_farm_id}")
-                    a.set_xlabel("Date")
-                    a.set_ylabel(metric_key)
-                    try:
-                        a.legend()
-                    except Exception:
-                        pass
+    def _stop_progress(self):
+        try:
+            self.progress.stop()
+        except Exception:
+            pass
+
+    def _finish_plot(self, job, request, df):
+        """UI thread: draw the fetched data if it is still the newest request."""
+        if job.generation != self._plot_generation or job.cancelled.is_set():
+            return
+        self._plot_job = None
+        self._stop_progress()
+        try:
+            chart = getattr(self, 'chart', None)
+            if chart is not None and not request.get("view"):
+                # New settings: drop the zoom so the chart fits the new data
+                chart.fig.axes[0].set_autoscale_on(True)
+                toolbar = getattr(self, 'toolbar', None)
+                if toolbar is not None:
+                    toolbar.update()
+            self._plot_loaded = (request.get("level", "day"), request["start_date"], request["end_date"])
+            if df is not None and not df.empty:
+                self.df = df
+                self._fill_table(df)
+            if chart is None:
+                return
+            self._draw_series(chart, df, request)
+            if (df is not None and not df.empty) or request.get("distribution") is not None:
+                # audit
+                try:
+                    self._audit("plot", f"Plotted {request['metric_key']} for farm {request['farm_id']}")
                 except Exception:
                     pass
+        except Exception:
+            pass
 
-            self.safe_ui_update(_draw)
-            # format dates and draw
-            try:
-                fig = getattr(self, 'fig', None)
-                if fig is not None:
-                    # capture fig locally to avoid static analyzer thinking self.fig may be None
-                    self.safe_ui_update(lambda f=fig: f.autofmt_xdate(rotation=25))
-            except Exception:
-                pass
-            self.safe_ui_update(lambda c=canvas: c.draw())
-            # audit
+    def _fill_table(self, df):
+        """Show the plotted frame in the Data Table tab."""
+        try:
+            columns = [(str(c), str(c)) for c in df.columns]
+            if self.tree.model.keys != [k for k, _ in columns]:
+                self.tree.set_columns(columns)
+            self.tree.set_data({str(c): df[c] for c in df.columns})
+        except Exception:
+            pass
+
+    def _draw_series(self, chart, data, request):
+        """Update the chart's persistent artists for ``data`` (redrawing only what changed)."""
+        ax = chart.fig.axes[0]
+        metric_key = request["metric_key"]
+        overlay_key = request["overlay_key"]
+        chart.begin()
+        plot_type = request["plot_type"]
+        if plot_type in self.DISTRIBUTION_TYPES:
+            self._draw_distribution(chart, ax, data, request)
+            return
+        if data is None or data.empty:
+            # No data: drop the series and show message
+            chart.message(ax, "No data available for selection")
+            chart.end()
+            return
+        x = data["date"]
+        y = data[metric_key]
+        if plot_type == "bar":
+            chart.bars("metric", x, y, ax=ax, label=metric_key)
+        elif plot_type == "scatter":
+            chart.scatter("metric", x, y, ax=ax, downsample="minmax", label=metric_key)
+        else:
+            # line, and fallback to line for unknown types
+            chart.line("metric", x, y, ax=ax, downsample="lttb", marker="o", label=metric_key)
+            level = request.get("level", "day")
+            if level != "day" and f"{metric_key}_min" in data.columns:
+                # Aggregated buckets: the mean line inside each bucket's min/max
+                chart.band("range", x, data[f"{metric_key}_min"], data[f"{metric_key}_max"], ax=ax,
+                           alpha=0.2, color="#0d6efd", linewidth=0, label=f"{level} min/max")
+
+        # overlay and trendline are blitted over the base series
+        if overlay_key and overlay_key in data.columns:
+            chart.line("overlay", x, data[overlay_key], ax=ax, overlay=True, downsample="lttb", marker="x", linestyle="--",
+                       label=overlay_key)
+        if self.trendline_var.get() and len(data) >= 2:
             try:
-                self._audit("plot", f"Plotted {metric_key} for farm {self.selected_farm_id}")
+                # simple linear trend
+                xv = np.arange(len(x))
+                valid = ~np.isnan(y)
+                if valid.sum() >= 2:
+                    coeffs = np.polyfit(xv[valid], y[valid].astype(float), 1)
+                    chart.line("trend", x, np.polyval(coeffs, xv), ax=ax, overlay=True, color="#ff6600",
+                               linewidth=1.6, label="Trendline")
             except Exception:
                 pass
-        except Exception:
-            pass
+        level = request.get("level", "day")
+        title = f"{metric_key} for farm {request['farm_id']}" + (f" ({lod_pyramid.LEVEL_NAMES[level]} mean)" if level != "day" else "")
+        chart.labels(ax, title, "Date", metric_key, dates=True)
+        chart.end()
+
+    def _draw_distribution(self, chart, ax, data, request):
+        """Histogram bars or a boxplot from precomputed bins/statistics (or the cached daily values)."""
+        metric_key = request["metric_key"]
+        plot_type = request["plot_type"]
+        summary = request.get("distribution")
+        if summary is None and data is not None and not data.empty:
+            # Series already in memory: bin it with NumPy instead of querying
+            values = data[metric_key].to_numpy(dtype=float)
+            summary = (distribution.histogram_values(values) if plot_type == "histogram"
+                       else distribution.box_stats_values(values))
+        if summary is None or (plot_type == "histogram" and not len(summary[0])):
+            chart.message(ax, "No data available for selection")
+            chart.end()
+            return
+        # Different axes layout altogether: draw from scratch
+        chart.reset(ax)
+        if plot_type == "histogram":
+            edges, counts = summary
+            ax.bar(edges[:-1], counts, width=np.diff(edges), align="edge", edgecolor="white")
+        else:
+            ax.bxp([summary])
+        ax.set_title(f"{metric_key} for farm {request['farm_id']}")
+        ax.set_ylabel(metric_key)
+        chart.redraw()
+
+    def _save_figure(self, file_path):
+        """savefig including the blitted overlays."""
+        chart = getattr(self, 'chart', None)
+        with chart.static() if chart is not None else contextlib.nullcontext():
+            self.fig.savefig(file_path)
+
+    def destroy(self):
+        """Cancel any running fetch before the widgets go away."""
+        self._shutdown = True
+        self._cancel_plot_job()
+        job = getattr(self, '_export_job', None)
+        if job is not None:
+            job.cancel()
+        self.series_cache.close()
+        super().destroy()
 
     def export_csv(self):
         """Export the currently plotted DataFrame to CSV."""
@@ -0,0 +1,345 @@
+"""
+benchmarks.py
+Benchmark cases for the ingest, query, report, chart and prediction paths.
+
+Each case is a function taking a Dataset and returning a dict with the timed
+``seconds`` and the number of ``rows`` it handled. Setup (fresh databases,
+Tk pages, input files) happens outside the timed section. Cases that need a
+display return ``{"skipped": reason}`` when Tk is unavailable.
+"""
+
+import contextlib
+import csv
+import os
+import shutil
+import sys
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import db_handler  # noqa: E402
+import datagen  # noqa: E402
+import lod_pyramid  # noqa: E402
+from db_handler import DBHandler, connect_db  # noqa: E402
+
+# name: (farms, years)
+SCALES = {
+    "tiny": (3, 1),
+    "small": (20, 2),
+    "medium": (100, 5),
+    "large": (1000, 10),
+}
+# Per-farm query cases sample at most this many farms
+QUERY_FARMS = 25
+# DBHandler.import_csv commits every row; keep its input bounded
+IMPORT_CSV_MAX_ROWS = 5000
+# Farms selected for the report page case
+REPORT_FARMS = 10
+
+
+@dataclass
+class Dataset:
+    """Generated input files for one scale, plus a preloaded database."""
+    scale: str
+    farms: int
+    years: int
+    workdir: str
+    csv_path: str = ""
+    db_path: str = ""
+    rows: int = 0
+    farm_ids: List[int] = field(default_factory=list)
+    tk_root: Optional[object] = None
+
+    def query_farms(self) -> List[int]:
+        return self.farm_ids[:QUERY_FARMS]
+
+    def fresh_db(self, name: str) -> str:
+        """Path of a new, empty (schema only) database in the work directory."""
+        path = os.path.join(self.workdir, f"{name}.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        conn = connect_db(path)
+        if conn is not None:
+            conn.close()
+        return path
+
+
+def build_dataset(scale: str, workdir: str, seed: int = 42) -> Dataset:
+    """Generate the CSV and a preloaded SQLite database for ``scale``."""
+    farms, years = SCALES[scale]
+    os.makedirs(workdir, exist_ok=True)
+    ds = Dataset(scale=scale, farms=farms, years=years, workdir=workdir)
+    ds.csv_path = os.path.join(workdir, "climate.csv")
+    ds.rows = datagen.write_csv(datagen.generate(farms, years, seed=seed), ds.csv_path)
+    ds.db_path = os.path.join(workdir, "climate.db")
+    datagen.write_sqlite(datagen.generate(farms, years, seed=seed), ds.db_path)
+    with DBHandler(ds.db_path) as db:
+        ds.farm_ids = [row[0] for row in db.conn.execute("SELECT id FROM farms ORDER BY id").fetchall()]
+        # The import paths build each farm's LOD pyramid; write_sqlite writes around them
+        with db.transaction():
+            for farm_id in ds.farm_ids:
+                lod_pyramid.rebuild(db, farm_id)
+    return ds
+
+
+@contextlib.contextmanager
+def use_db(path: str):
+    """Point every DBHandler() opened without a path at ``path``."""
+    previous = db_handler.DB_FILE
+    db_handler.DB_FILE = path
+    try:
+        yield
+    finally:
+        db_handler.DB_FILE = previous
+
+
+@contextlib.contextmanager
+def quiet_dialogs(*modules):
+    """Replace the messagebox (and file dialog) functions of page modules with no-ops."""
+    saved = []
+    for module in modules:
+        for attr in ("messagebox", "filedialog"):
+            dialog = getattr(module, attr, None)
+            if dialog is None:
+                continue
+            for name in dir(dialog):
+                if name.startswith(("show", "ask")):
+                    saved.append((dialog, name, getattr(dialog, name)))
+                    setattr(dialog, name, lambda *a, **k: None)
+    try:
+        yield
+    finally:
+        for dialog, name, func in saved:
+            setattr(dialog, name, func)
+
+
+class timed:
+    """``with timed() as t: ...`` then ``t.seconds``."""
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        return False
+
+
+def _pump(root, until: Callable[[], bool], timeout: float = 600.0) -> None:
+    """Run the Tk event loop until ``until()`` is true."""
+    deadline = time.monotonic() + timeout
+    while not until():
+        if time.monotonic() > deadline:
+            raise TimeoutError("Tk page did not finish in time")
+        root.update()
+        time.sleep(0.005)
+    root.update()
+
+
+def _no_tk(ds: Dataset) -> Optional[Dict]:
+    if ds.tk_root is None:
+        return {"skipped": "Tk display unavailable"}
+    return None
+
+
+# --- Ingest ---
+
+def bench_import_file_to_db(ds: Dataset) -> Dict:
+    from import_utils import import_file_to_db
+    path = ds.fresh_db("ingest")
+    with use_db(path), timed() as t:
+        inserted = import_file_to_db(ds.csv_path)
+    return {"seconds": t.seconds, "rows": inserted}
+
+
+def bench_db_import_csv(ds: Dataset) -> Dict:
+    """Row-by-row DBHandler.import_csv on a climate-only extract (at most IMPORT_CSV_MAX_ROWS)."""
+    fieldnames = ["farm_id", "date", "temp_max", "temp_min", "rainfall"]
+    extract = os.path.join(ds.workdir, "import_csv.csv")
+    with DBHandler(ds.db_path) as db:
+        rows = db.conn.execute(
+            "SELECT farm_id, date, temp_max, temp_min, rainfall FROM climate_data ORDER BY farm_id, date LIMIT ?",
+            (IMPORT_CSV_MAX_ROWS,)
+        ).fetchall()
+        farms = db.conn.execute("SELECT id, name, location, base_temp FROM farms").fetchall()
+    with open(extract, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(fieldnames)
+        writer.writerows(rows)
+    path = ds.fresh_db("import_csv")
+    with DBHandler(path) as db:
+        db.executemany("INSERT INTO farms (id, name, location, base_temp) VALUES (?, ?, ?, ?)", farms)
+        db.conn.commit()
+        with timed() as t:
+            inserted = db.import_csv(extract, "climate_data", fieldnames,
+                                     {"farm_id": int, "temp_max": float, "temp_min": float, "rainfall": float})
+    return {"seconds": t.seconds, "rows": inserted}
+
+
+def bench_upload_page_import(ds: Dataset) -> Dict:
+    skipped = _no_tk(ds)
+    if skipped:
+        return skipped
+    import upload_page
+    path = ds.fresh_db("upload")
+    with use_db(path), quiet_dialogs(upload_page):
+        page = upload_page.UploadPage(ds.tk_root, user={"username": "bench"})
+        try:
+            page.selected_file = ds.csv_path
+            with timed() as t:
+                page.import_data()
+                _pump(ds.tk_root, lambda: page._import_cancel is None)
+        finally:
+            page.destroy()
+    with DBHandler(path) as db:
+        rows = db.conn.execute("SELECT COUNT(*) FROM climate_data").fetchone()[0]
+    return {"seconds": t.seconds, "rows": rows}
+
+
+# --- Queries ---
+
+def bench_get_climate_data(ds: Dataset) -> Dict:
+    rows = 0
+    per_farm = ds.years * 366
+    with DBHandler(ds.db_path) as db, timed() as t:
+        for farm_id in ds.query_farms():
+            rows += len(db.get_climate_data(farm_id, limit=per_farm))
+    return {"seconds": t.seconds, "rows": rows, "calls": len(ds.query_farms())}
+
+
+def bench_get_farm_summary(ds: Dataset) -> Dict:
+    with DBHandler(ds.db_path) as db, timed() as t:
+        for farm_id in ds.query_farms():
+            db.get_farm_summary(farm_id)
+    return {"seconds": t.seconds, "calls": len(ds.query_farms())}
+
+
+def bench_dashboard_get_trends(ds: Dataset) -> Dict:
+    # get_trends only reads selected_farm_id from the page, so no widgets are needed
+    from dashboard import Dashboard
+    rows = 0
+    with use_db(ds.db_path), timed() as t:
+        for farm_id in ds.query_farms():
+            rows += len(Dashboard.get_trends(SimpleNamespace(selected_farm_id=farm_id))[0])
+    return {"seconds": t.seconds, "rows": rows, "calls": len(ds.query_farms())}
+
+
+# --- Reports ---
+
+def bench_generate_report(ds: Dataset) -> Dict:
+    skipped = _no_tk(ds)
+    if skipped:
+        return skipped
+    import report_page
+    with use_db(ds.db_path), quiet_dialogs(report_page):
+        page = report_page.ReportPage(ds.tk_root, user={"username": "admin"})
+        try:
+            page.on_show()
+            page.load_farms()
+            page.farm_listbox.selection_set(0, min(REPORT_FARMS, len(ds.farm_ids)) - 1)
+            ds.tk_root.update()
+            with timed() as t:
+                page.generate_report()
+                # Read on a worker, rendered in chunks from the Tk loop
+                while page.report_busy:
+                    ds.tk_root.update()
+                    time.sleep(0.001)
+            rows = len(page.report_data)
+        finally:
+            page.destroy()
+    return {"seconds": t.seconds, "rows": rows}
+
+
+def bench_global_analytics(ds: Dataset) -> Dict:
+    skipped = _no_tk(ds)
+    if skipped:
+        return skipped
+    import report_page
+    with use_db(ds.db_path), quiet_dialogs(report_page):
+        page = report_page.ReportPage(ds.tk_root, user={"username": "admin"})
+        try:
+            with timed() as t:
+                page.global_analytics()
+                ds.tk_root.update()
+        finally:
+            page.destroy()
+    return {"seconds": t.seconds, "rows": ds.rows}
+
+
+# --- Charts ---
+
+def bench_visualization_plot(ds: Dataset) -> Dict:
+    skipped = _no_tk(ds)
+    if skipped:
+        return skipped
+    import visualization
+    with use_db(ds.db_path), quiet_dialogs(visualization):
+        page = visualization.VisualizationPage(ds.tk_root)
+        try:
+            page.on_show()
+            page.selected_farm_id = ds.farm_ids[0]
+            ds.tk_root.update()
+            with timed() as t:
+                page.plot()
+                # The fetch runs on a worker; the case ends once its result is drawn
+                _pump(ds.tk_root, lambda: page._plot_job is None)
+            rows = len(getattr(page, "df", []))
+        finally:
+            page.destroy()
+    return {"seconds": t.seconds, "rows": rows}
+
+
+# --- Prediction ---
+
+def bench_batch_predict(ds: Dataset) -> Dict:
+    """PredictionPage.batch_predict_csv (formula model) on one row per generated day."""
+    import prediction
+    path = os.path.join(ds.workdir, "predict.csv")
+    with DBHandler(ds.db_path) as db:
+        rows = db.conn.execute(
+            """
+            SELECT c.temp_max, MIN(c.rainfall, 1000), MIN(COALESCE(m.cumulative_gdd, 0), 10000)
+            FROM climate_data c JOIN agri_metrics m ON c.farm_id = m.farm_id AND c.date = m.date
+            """
+        ).fetchall()
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows(rows)
+    page = SimpleNamespace(
+        ml_model=None,
+        farm_combo=SimpleNamespace(get=lambda: "Bench"),
+        model_path=SimpleNamespace(get=lambda: "formula"),
+        prediction_history=[],
+        plot_predictions=lambda: None,
+    )
+    page.validate_input = lambda *args: prediction.PredictionPage.validate_input(page, *args)
+    with quiet_dialogs(prediction):
+        prediction.filedialog.askopenfilename = lambda *a, **k: path
+        with timed() as t:
+            prediction.PredictionPage.batch_predict_csv(page)
+    return {"seconds": t.seconds, "rows": len(page.prediction_history)}
+
+
+# name -> case, in run order
+BENCHMARKS: Dict[str, Callable[[Dataset], Dict]] = {
+    "ingest.import_file_to_db": bench_import_file_to_db,
+    "ingest.db_import_csv": bench_db_import_csv,
+    "ingest.upload_page": bench_upload_page_import,
+    "query.get_climate_data": bench_get_climate_data,
+    "query.get_farm_summary": bench_get_farm_summary,
+    "query.dashboard_get_trends": bench_dashboard_get_trends,
+    "report.generate_report": bench_generate_report,
+    "report.global_analytics": bench_global_analytics,
+    "chart.visualization_plot": bench_visualization_plot,
+    "predict.batch_csv": bench_batch_predict,
+}
+
+
+def cleanup(ds: Dataset) -> None:
+    shutil.rmtree(ds.workdir, ignore_errors=True)
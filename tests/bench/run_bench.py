@@ -0,0 +1,199 @@
+"""
+run_bench.py
+Run the benchmark suite on generated datasets and record the results as JSON.
+
+Every case runs ``--repeat`` times per scale; the median time is the figure
+compared between runs. With ``--baseline`` the results are checked against a
+stored run and any case slower than baseline x (1 + threshold) is reported as
+a regression (exit status 1).
+
+Usage:
+    python tests/bench/run_bench.py --scales small,medium --out bench.json
+    python tests/bench/run_bench.py --scales small --baseline bench_baseline.json --threshold 0.25
+    python tests/bench/run_bench.py --compare new.json --baseline old.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks import BENCHMARKS, ROOT, SCALES, build_dataset, cleanup  # noqa: E402
+
+DEFAULT_THRESHOLD = 0.20
+# Cases faster than this are too noisy to flag
+MIN_COMPARABLE_SECONDS = 0.005
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _tk_root():
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+        root.withdraw()
+        return root
+    except Exception:
+        return None
+
+
+def run_case(func, ds, repeat: int) -> Dict:
+    runs: List[Dict] = []
+    for _ in range(repeat):
+        try:
+            result = func(ds)
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+        if "skipped" in result:
+            return result
+        runs.append(result)
+    seconds = [r["seconds"] for r in runs]
+    summary = {k: v for k, v in runs[-1].items() if k != "seconds"}
+    summary.update(seconds=statistics.median(seconds), min_seconds=min(seconds), runs=seconds)
+    if summary.get("rows"):
+        summary["rows_per_s"] = summary["rows"] / max(summary["seconds"], 1e-9)
+    return summary
+
+
+def run_suite(scales: List[str], repeat: int = 3, only: Optional[List[str]] = None, seed: int = 42,
+              workdir: Optional[str] = None, log=print) -> Dict:
+    """Run the selected cases at each scale and return the JSON-ready results."""
+    names = [n for n in BENCHMARKS if not only or any(n.startswith(o) for o in only)]
+    root = _tk_root()
+    results: Dict = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "seed": seed,
+            "tk": root is not None,
+        },
+        "scales": {},
+    }
+    base_dir = workdir or tempfile.mkdtemp(prefix="climate_bench_")
+    try:
+        for scale in scales:
+            farms, years = SCALES[scale]
+            log(f"[{scale}] generating {farms} farms x {years} years...")
+            ds = build_dataset(scale, os.path.join(base_dir, scale), seed=seed)
+            ds.tk_root = root
+            cases: Dict = {}
+            for name in names:
+                cases[name] = run_case(BENCHMARKS[name], ds, repeat)
+                log(f"[{scale}] {name}: {describe(cases[name])}")
+            results["scales"][scale] = {"farms": farms, "years": years, "rows": ds.rows, "cases": cases}
+            if workdir is None:
+                cleanup(ds)
+    finally:
+        if root is not None:
+            root.destroy()
+        if workdir is None:
+            shutil.rmtree(base_dir, ignore_errors=True)
+    return results
+
+
+def describe(case: Dict) -> str:
+    if "skipped" in case:
+        return f"skipped ({case['skipped']})"
+    if "error" in case:
+        return f"error ({case['error']})"
+    text = f"{case['seconds'] * 1000:.1f} ms"
+    if case.get("rows_per_s"):
+        text += f" ({case['rows_per_s']:,.0f} rows/s)"
+    return text
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """
+    Compare two result sets case by case. Returns one entry per case present
+    in both with a timing: scale, case, baseline, current, ratio, regression.
+    """
+    report = []
+    for scale, data in current.get("scales", {}).items():
+        base_cases = baseline.get("scales", {}).get(scale, {}).get("cases", {})
+        for name, case in data.get("cases", {}).items():
+            base = base_cases.get(name, {})
+            if "seconds" not in case or "seconds" not in base:
+                continue
+            ratio = case["seconds"] / max(base["seconds"], 1e-9)
+            noisy = max(case["seconds"], base["seconds"]) < MIN_COMPARABLE_SECONDS
+            report.append({
+                "scale": scale, "case": name,
+                "baseline": base["seconds"], "current": case["seconds"], "ratio": ratio,
+                "regression": not noisy and ratio > 1.0 + threshold,
+            })
+    return report
+
+
+def print_comparison(report: List[Dict], threshold: float) -> None:
+    print(f"\n{'scale':<8} {'case':<30} {'baseline':>11} {'current':>11} {'change':>8}")
+    for row in report:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['scale']:<8} {row['case']:<30} {row['baseline'] * 1000:>9.1f}ms "
+              f"{row['current'] * 1000:>9.1f}ms {(row['ratio'] - 1) * 100:>+7.1f}%{flag}")
+    regressions = sum(r["regression"] for r in report)
+    print(f"\n{regressions} regression(s) over {threshold:.0%} in {len(report)} compared case(s).")
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the ClimateAnalysis benchmark suite.")
+    parser.add_argument("--scales", default="small,medium",
+                        help=f"Comma-separated scales from {', '.join(SCALES)} (default small,medium)")
+    parser.add_argument("--only", help="Comma-separated case name prefixes, e.g. ingest,query.get_trends")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the median is kept (default 3)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Stored results to compare against")
+    parser.add_argument("--compare", help="Compare this results file with --baseline instead of running")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown before a case counts as a regression (default 0.20)")
+    parser.add_argument("--keep", metavar="DIR", help="Generate datasets in DIR and keep them")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        if not args.baseline:
+            parser.error("--compare needs --baseline")
+        with open(args.compare) as f:
+            results = json.load(f)
+    else:
+        scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+        unknown = [s for s in scales if s not in SCALES]
+        if unknown:
+            parser.error(f"unknown scale(s): {', '.join(unknown)}")
+        only = [o.strip() for o in args.only.split(",")] if args.only else None
+        results = run_suite(scales, repeat=max(1, args.repeat), only=only, seed=args.seed, workdir=args.keep)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report = compare(results, baseline, args.threshold)
+        print_comparison(report, args.threshold)
+        if any(r["regression"] for r in report):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
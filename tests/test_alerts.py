@@ -0,0 +1,106 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import alerts  # noqa: E402
+import notifications  # noqa: E402
+from db_handler import DBHandler  # noqa: E402
+from import_utils import import_chunks  # noqa: E402
+
+RULES = [
+    {"name": "heat", "kind": "threshold", "metric": "temp_max", "op": ">", "value": 35.0},
+    {"name": "heatwave", "kind": "consecutive", "metric": "temp_max", "op": ">", "value": 30.0, "days": 3},
+    {"name": "dry", "kind": "rolling_sum", "metric": "rainfall", "op": "<", "value": 2.0, "days": 5},
+    {"name": "gdd", "kind": "milestone", "metric": "cumulative_gdd", "values": [100.0, 200.0]},
+]
+
+
+def _days(start, temps, rain):
+    dates = pd.date_range(start, periods=len(temps)).strftime("%Y-%m-%d")
+    return pd.DataFrame({"date": dates, "temp_max": temps, "temp_min": [t - 10.0 for t in temps], "rainfall": rain})
+
+
+def _stored(db, farm_id=1):
+    return sorted((r[0], r[1]) for r in db.conn.execute(
+        "SELECT rule, date FROM alerts WHERE farm_id=?", (farm_id,)).fetchall())
+
+
+def test_rules_fire_on_the_expected_days():
+    days = np.arange(12)
+    temps = np.array([20, 31, 32, 33, 34, 20, 36, 31, 31, 20, 20, 20], dtype=float)
+    fired, _, _ = alerts._fired(RULES[0], days, temps)
+    assert list(np.flatnonzero(fired)) == [6]
+    # Each run fires once, on its third day; a missing day breaks a run
+    fired, _, _ = alerts._fired(RULES[1], days, temps)
+    assert list(np.flatnonzero(fired)) == [3, 8]
+    gap = np.r_[days[:7], days[7:] + 1]
+    assert not alerts._fired(RULES[1], gap, np.array([20, 31, 32, 20, 20, 20, 31, 32, 33, 20, 20, 20.0]))[0][:6].any()
+    rain = np.array([5, 0, 0, 0, 0, 1, 0, 1.5, 0, 0, 0, 0], dtype=float)
+    fired, sums, _ = alerts._fired(RULES[2], days, rain)
+    # Fires when the 5-day sum first drops below 2 (and again after it recovers)
+    assert list(np.flatnonzero(fired)) == [5, 10] and sums[5] == 1.0
+    cumulative = np.array([50, 90, 150, 210, 230, 260, 300, 310, 320, 330, 340, 350], dtype=float)
+    fired, _, limit = alerts._fired(RULES[3], days, cumulative)
+    assert list(np.flatnonzero(fired)) == [2, 3] and list(limit[[2, 3]]) == [100.0, 200.0]
+
+
+def test_ingest_evaluates_only_new_rows_and_publishes(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "alerts.db")
+    sent = []
+    monkeypatch.setattr(alerts, "load_rules", lambda path=None: RULES)
+    monkeypatch.setattr(alerts, "notify", lambda kind, message: sent.append((kind, message)))
+    with DBHandler(db_path) as db:
+        db.execute_query("INSERT INTO farms (id, name, base_temp) VALUES (1, 'North', 10.0)")
+    first = _days("2025-01-01", [20, 31, 32, 33, 20, 20, 20], [5, 5, 5, 5, 5, 5, 5])
+    import_chunks([first], farm_id=1, db_path=db_path)
+    with DBHandler(db_path) as db:
+        assert _stored(db) == [("heatwave", "2025-01-04")]
+    assert len(sent) == 1 and "heatwave" in sent[0][1]
+
+    # Appending continues runs and windows across the boundary without re-sending old alerts
+    sent.clear()
+    later = _days("2025-01-08", [36, 31, 31, 20, 20, 20, 20], [0, 0, 0, 0, 0, 0, 0])
+    import_chunks([later], farm_id=1, db_path=db_path)
+    with DBHandler(db_path) as db:
+        assert _stored(db) == [("dry", "2025-01-12"), ("gdd", "2025-01-09"), ("heat", "2025-01-08"),
+                               ("heatwave", "2025-01-04"), ("heatwave", "2025-01-10")]
+    assert sorted(m.split(" on ")[0] for _, m in sent) == ["North: dry", "North: gdd", "North: heat",
+                                                           "North: heatwave"]
+
+    # A correction that ends the heat removes the alerts it invalidates
+    import_chunks([_days("2025-01-08", [25], [0])], farm_id=1, db_path=db_path)
+    with DBHandler(db_path) as db:
+        assert ("heat", "2025-01-08") not in _stored(db)
+        assert ("heatwave", "2025-01-10") not in _stored(db)
+        assert db.delete_data_entry(1, "2025-01-04")
+        assert ("heatwave", "2025-01-04") not in _stored(db)
+        # Later running totals no longer include the deleted day
+        rows = db.conn.execute("SELECT date, daily_gdd, cumulative_gdd FROM agri_metrics WHERE farm_id=1 "
+                               "AND date IN ('2025-01-03', '2025-01-05') ORDER BY date").fetchall()
+        assert rows[1][2] == rows[0][2] + rows[1][1]
+        assert alerts.farm_alerts(db, 1)[0]["date"] == "2025-01-12"
+
+
+def test_history_is_evaluated_once_and_bursts_are_summarised(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "alerts.db")
+    sent = []
+    monkeypatch.setattr(notifications, "_subscribers", [])
+    monkeypatch.setattr(alerts, "notify", lambda kind, message: sent.append(message))
+    with DBHandler(db_path) as db:
+        db.execute_query("INSERT INTO farms (id, name) VALUES (1, 'South')")
+        db.conn.executemany("INSERT INTO climate_data (farm_id, date, temp_max, temp_min, rainfall) "
+                            "VALUES (1, ?, 40.0, 20.0, 5.0)",
+                            [(d,) for d in pd.date_range("2025-01-01", periods=10).strftime("%Y-%m-%d")])
+        db.conn.commit()
+        new = alerts.ensure_evaluated(db, 1)
+        assert len([a for a in new if a["rule"] == "heat"]) == 10
+        assert alerts.ensure_evaluated(db, 1) == []
+    alerts.publish(new)
+    assert len(sent) == 1 and sent[0].startswith(f"{len(new)} new alerts on 1 farm")
@@ -0,0 +1,38 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "bench"))
+
+import run_bench  # noqa: E402
+
+
+def _results(seconds):
+    return {"scales": {"small": {"cases": {name: ({"seconds": s} if s is not None else {"skipped": "Tk"})
+                                           for name, s in seconds.items()}}}}
+
+
+def test_compare_flags_slowdowns_over_threshold():
+    baseline = _results({"query.a": 0.100, "query.b": 0.100, "query.c": 0.001, "chart.d": None})
+    current = _results({"query.a": 0.115, "query.b": 0.150, "query.c": 0.004, "chart.d": None})
+    report = {r["case"]: r for r in run_bench.compare(current, baseline, threshold=0.2)}
+    assert not report["query.a"]["regression"]
+    assert report["query.b"]["regression"]
+    assert abs(report["query.b"]["ratio"] - 1.5) < 1e-9
+    # Sub-millisecond cases are noise, skipped cases are not compared
+    assert not report["query.c"]["regression"]
+    assert "chart.d" not in report
+
+
+def test_suite_runs_headless_cases_on_tiny_dataset(tmp_path):
+    results = run_bench.run_suite(["tiny"], repeat=1, only=["ingest.import_file_to_db", "query", "predict"],
+                                  workdir=str(tmp_path), log=lambda *_: None)
+    tiny = results["scales"]["tiny"]
+    assert tiny["rows"] == 3 * 365
+    cases = tiny["cases"]
+    assert cases["ingest.import_file_to_db"]["rows"] == tiny["rows"]
+    assert cases["query.dashboard_get_trends"]["rows"] == tiny["rows"]
+    assert cases["predict.batch_csv"]["rows"] == tiny["rows"]
+    for case in cases.values():
+        assert case["seconds"] > 0
+    # The same results compared with themselves never regress
+    assert not any(r["regression"] for r in run_bench.compare(results, results))
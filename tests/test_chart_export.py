@@ -0,0 +1,69 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import chart_export  # noqa: E402
+import datagen  # noqa: E402
+from chart_layer import ChartLayer  # noqa: E402
+
+
+def _chart():
+    fig = Figure(figsize=(6, 3))
+    ax = fig.add_subplot()
+    layer = ChartLayer(fig, FigureCanvasAgg(fig))
+    x = pd.date_range("2000-01-01", periods=5000).to_numpy()
+    y = np.sin(np.arange(5000) / 50.0)
+    layer.begin()
+    layer.line("metric", x, y, ax=ax, downsample="lttb", marker="o", label="temp_max")
+    layer.line("trend", x, y * 0.5, ax=ax, overlay=True, label="Trendline")
+    layer.band("range", x, y - 1, y + 1, ax=ax, alpha=0.2)
+    layer.labels(ax, "temp_max for farm 1", "Date", "°C", dates=True)
+    layer.end()
+    return fig, layer
+
+
+def test_snapshot_keeps_full_resolution_and_overlays(tmp_path):
+    fig, layer = _chart()
+    spec = chart_export.snapshot(fig, layer)
+    axes = spec["axes"][0]
+    assert axes["dates"] and axes["title"] == "temp_max for farm 1" and axes["legend"]
+    metric, trend = axes["lines"]
+    # The chart shows a downsampled line; the export gets every point
+    assert len(fig.axes[0].lines[0].get_xdata()) < 5000
+    assert len(metric["x"]) == 5000 and metric["downsample"] == "lttb"
+    assert trend["label"] == "Trendline" and len(axes["polys"]) == 1
+    for name in ("chart.png", "chart.pdf"):
+        path = chart_export.render(spec, str(tmp_path / name), dpi=150)
+        assert os.path.getsize(path) > 0
+
+
+def test_batch_export_in_worker_processes(tmp_path):
+    db_path = str(tmp_path / "export.db")
+    datagen.write_sqlite(datagen.generate(2, 1), db_path)
+    out_dir = str(tmp_path / "charts")
+    tasks = chart_export.farm_tasks([(1, "North Farm"), (2, "South/Farm")], "temp_max", out_dir,
+                                    dpi=100, db_path=db_path)
+    tasks += chart_export.metric_tasks((1, "North Farm"), ["rainfall"], out_dir, dpi=100, db_path=db_path)
+    fig, layer = _chart()
+    tasks.append(chart_export.snapshot_task(fig, str(tmp_path / "page.png"), layer=layer, dpi=100))
+    service = chart_export.ExportService(workers=2)
+    seen = []
+    try:
+        job = service.submit(tasks, progress=lambda done, total, path, error: seen.append((done, total)))
+        assert job.wait(120)
+    finally:
+        service.shutdown()
+    assert job.completed == 4 and not job.errors
+    assert seen[-1] == (4, 4)
+    assert sorted(os.listdir(out_dir)) == ["North_Farm_rainfall.png", "North_Farm_temp_max.png",
+                                           "South_Farm_temp_max.png"]
+    assert os.path.getsize(str(tmp_path / "page.png")) > 0
@@ -0,0 +1,120 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from chart_layer import ChartLayer  # noqa: E402
+
+
+def _layer():
+    fig = Figure()
+    ax = fig.add_subplot()
+    return ChartLayer(fig, FigureCanvasAgg(fig)), ax
+
+
+def _pass(layer, ax, x, y, trend=None, label="Trendline"):
+    layer.begin()
+    layer.line("metric", x, y, ax=ax, marker="o", label="temp_max")
+    if trend is not None:
+        layer.line("trend", x, trend, ax=ax, overlay=True, label=label)
+    layer.labels(ax, "temp_max", "Date", "°C", dates=True)
+    return layer.end()
+
+
+def test_artists_persist_and_redraw_only_what_changed():
+    layer, ax = _layer()
+    x = pd.date_range("2020-01-01", periods=200).to_numpy()
+    y = np.sin(np.arange(200) / 10.0)
+    assert _pass(layer, ax, x, y) == "full"
+    line = ax.lines[0]
+    # Same data: nothing to redraw
+    assert _pass(layer, ax, x, y) == "none"
+    # New data with the same limits: the artist is updated in place
+    y = y[::-1]
+    assert _pass(layer, ax, x, y) == "data"
+    assert ax.lines[0] is line and len(ax.lines) == 1
+    # Adding or changing a trendline only blits the overlay (and its legend)
+    assert _pass(layer, ax, x, y, trend=np.linspace(-0.5, 0.5, 200)) == "blit"
+    assert _pass(layer, ax, x, y, trend=np.linspace(-0.4, 0.4, 200), label="Trend 2") == "blit"
+    assert ax.get_legend().get_animated()
+    # New limits mean a new layout
+    assert _pass(layer, ax, x, y * 5) == "full"
+    assert len(ax.lines) == 1
+    assert layer.blits == 2
+
+
+def test_overlays_outside_the_base_range_widen_the_limits():
+    layer, ax = _layer()
+    x = np.arange(100)
+    assert _pass(layer, ax, x, np.full(100, 25.0)) == "full"
+    # An overlay the current limits cannot show needs a full redraw, not a blit
+    assert _pass(layer, ax, x, np.full(100, 25.0), trend=np.linspace(0, 3000, 100)) == "full"
+    low, high = ax.get_ylim()
+    assert low <= 0 and high >= 3000
+    assert _pass(layer, ax, x, np.full(100, 25.0), trend=np.linspace(3000, 0, 100)) == "blit"
+
+
+def test_static_export_includes_overlays(tmp_path):
+    layer, ax = _layer()
+    x = np.arange(50)
+    _pass(layer, ax, x, x * 1.0, trend=x * 0.5)
+    trend = [e.artist for e in layer._entries.values() if e.overlay][0]
+    with layer.static():
+        assert not trend.get_animated()
+        layer.fig.savefig(str(tmp_path / "chart.png"))
+    assert trend.get_animated()
+    assert (tmp_path / "chart.png").stat().st_size > 0
+
+
+def test_kinds_messages_and_reset():
+    layer, ax = _layer()
+    x = np.arange(10)
+    layer.begin()
+    layer.bars("metric", x, np.ones(10), ax=ax)
+    assert layer.end() == "full"
+    layer.begin()
+    layer.bars("metric", x, np.full(10, 0.5), ax=ax)
+    layer.end()
+    assert [p.get_height() for p in ax.patches][:2] == [0.5, 0.5]
+    # Series not set in a pass are removed
+    layer.begin()
+    layer.message(ax, "No data")
+    assert layer.end() == "full"
+    assert not ax.patches and ax.texts[0].get_text() == "No data"
+    layer.reset(ax)
+    ax.hist(np.random.default_rng(0).normal(size=100))
+    layer.redraw()
+    layer.begin()
+    layer.scatter("metric", x, x * 2.0, ax=ax)
+    layer.end()
+    assert len(ax.collections) == 1
+
+
+def test_band_and_view_callbacks():
+    layer, ax = _layer()
+    x = np.arange(100.0)
+    seen = []
+    layer.watch_view(lambda a: seen.append(a.get_xlim()), ax)
+    layer.begin()
+    layer.line("mean", x, np.zeros(100), ax=ax)
+    layer.band("range", x, -np.ones(100), np.ones(100), ax=ax, alpha=0.2)
+    assert layer.end() == "full"
+    # The band counts for the y limits
+    assert ax.get_ylim()[1] >= 1.0
+    layer.begin()
+    layer.line("mean", x, np.zeros(100), ax=ax)
+    layer.band("range", x, -np.ones(100) * 0.5, np.ones(100) * 0.5, ax=ax, alpha=0.2)
+    layer.end()
+    assert len(ax.collections) == 1
+    # Autoscaling is not a view change; zooming is
+    assert seen == []
+    ax.set_xlim(10, 20)
+    assert seen == [(10.0, 20.0)]
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from data_versions import FARM_LIST, VersionWatcher  # noqa: E402
+from db_handler import DBHandler  # noqa: E402
+from import_utils import import_chunks  # noqa: E402
+
+
+def test_watcher_reports_only_the_farms_that_moved(tmp_path):
+    db_path = str(tmp_path / "versions.db")
+    with DBHandler(db_path) as db:
+        db.execute_query("INSERT INTO farms (id, name) VALUES (1, 'North')")
+        db.execute_query("INSERT INTO farms (id, name) VALUES (2, 'South')")
+    watcher = VersionWatcher(db_path)
+    assert watcher.changed() == {1, 2, FARM_LIST}
+    assert watcher.changed() == set()
+
+    rows = pd.DataFrame({"date": ["2025-01-01", "2025-01-02"], "temp_max": [20.0, 21.0],
+                         "temp_min": [10.0, 11.0], "rainfall": [0.0, 1.0]})
+    import_chunks([rows], farm_id=2, db_path=db_path)
+    assert watcher.changed() == {2}
+    with DBHandler(db_path) as db:
+        db.execute_query("UPDATE climate_data SET rainfall=5 WHERE farm_id=2 AND date='2025-01-01'")
+        # Writes to other tables do not move any farm
+        db.execute_query("INSERT INTO users (username, password_hash) VALUES (?, ?)", ("ann", "x"))
+    assert watcher.changed() == {2}
+    assert watcher.changed() == set()
+    with DBHandler(db_path) as db:
+        db.execute_query("UPDATE farms SET name='North Farm' WHERE id=1")
+    assert watcher.changed() == {1, FARM_LIST}
+    with DBHandler(db_path) as db:
+        db.delete_farm(2)
+    assert watcher.changed() == {2, FARM_LIST}
+
+    # A poll with nothing new is a single pragma read
+    started = time.perf_counter()
+    for _ in range(1000):
+        assert watcher.changed() == set()
+    assert (time.perf_counter() - started) / 1000 < 0.001
+    watcher.close()
@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+from datagen import generate, write_sqlite
+from db_handler import connect_db, DBHandler
+
+
+def test_generator_is_seeded_and_shaped():
+    first = pd.concat(generate(5, 2, start_year=2020, seed=3, block_farms=2))
+    again = pd.concat(generate(5, 2, start_year=2020, seed=3, block_farms=2))
+    other = pd.concat(generate(5, 2, start_year=2020, seed=4, block_farms=2))
+    assert len(first) == 5 * 731 and first["farm_name"].nunique() == 5
+    pd.testing.assert_frame_equal(first, again)
+    assert not first["temp_max"].equals(other["temp_max"])
+    assert (first["temp_min"] <= first["temp_max"]).all()
+    # Rain falls on a plausible share of days and cumulative GDD restarts each year
+    assert 0.1 < (first["rainfall"] > 0).mean() < 0.7
+    assert (first.loc[first["date"] == "2021-01-01", "cumulative_gdd"] == first.loc[first["date"] == "2021-01-01", "daily_gdd"]).all()
+
+
+def test_missing_days_and_outliers():
+    frame = pd.concat(generate(4, 1, seed=1, missing_rate=0.1, outlier_rate=0.05))
+    assert 0.8 * 4 * 365 < len(frame) < 0.97 * 4 * 365
+    assert (frame["temp_max"] > 50).any() or (frame["temp_max"] < -40).any()
+
+
+def test_sqlite_output_creates_farms_with_coordinates():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        connect_db(path).close()
+        rows = write_sqlite(generate(3, 1, seed=9), path)
+        assert rows == 3 * 365
+        with DBHandler(path) as db:
+            farms = db.get_farms()
+            assert len(farms) == 3 and all(f["lat"] is not None for f in farms)
+            assert db.fetch_one("SELECT COUNT(*) FROM agri_metrics")[0] == rows
+    finally:
+        os.remove(path)
@@ -0,0 +1,63 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import datagen  # noqa: E402
+from db_handler import DBHandler  # noqa: E402
+from distribution import box_stats, box_stats_values, histogram, histogram_values  # noqa: E402
+from import_utils import import_chunks  # noqa: E402
+
+
+def _values(db, metric, farm_id=None, start="", end=""):
+    table = "climate_data" if metric in ("temp_max", "temp_min", "rainfall") else "agri_metrics"
+    q = f"SELECT {metric} FROM {table} WHERE {metric} IS NOT NULL AND date BETWEEN ? AND ?"
+    params = [start or "0000", end or "9999"]
+    if farm_id is not None:
+        q += " AND farm_id=?"
+        params.append(farm_id)
+    return np.array([r[0] for r in db.conn.execute(q, params).fetchall()], dtype=float)
+
+
+def test_sql_histogram_matches_numpy(tmp_path):
+    path = str(tmp_path / "dist.db")
+    datagen.write_sqlite(datagen.generate(3, 2), path)
+    with DBHandler(path) as db:
+        for metric, farm_id, start, end in [("temp_max", 1, "", ""), ("rainfall", None, "2015-03-10", "2016-02-20"),
+                                            ("cumulative_gdd", 2, "2016-01-01", "2016-06-30")]:
+            edges, counts = histogram(db, metric, farm_id, start, end)
+            expected_edges, expected_counts = histogram_values(_values(db, metric, farm_id, start, end))
+            assert np.allclose(edges, expected_edges)
+            assert list(counts) == list(expected_counts)
+        assert len(histogram(db, "temp_max", 1, "2030-01-01", "2030-12-31")[0]) == 0
+
+
+def test_box_stats_from_sketches(tmp_path):
+    path = str(tmp_path / "dist.db")
+    datagen.write_sqlite(datagen.generate(3, 3), path)
+    with DBHandler(path) as db:
+        # Whole months come from sketches: close to the exact quartiles, exact count/mean/extremes
+        values = _values(db, "temp_max", 1, "2015-02-14", "2017-08-20")
+        stats, exact = box_stats(db, "temp_max", 1, "2015-02-14", "2017-08-20"), box_stats_values(values)
+        assert stats["n"] == exact["n"] and np.isclose(stats["mean"], exact["mean"])
+        for key in ("q1", "med", "q3"):
+            assert abs(stats[key] - exact[key]) < 0.02 * np.ptp(values)
+        assert (stats["whislo"], stats["whishi"]) == (exact["whislo"], exact["whishi"])
+        # Less than a month is read as daily values: exact
+        short = box_stats(db, "temp_min", None, "2016-05-03", "2016-05-20")
+        exact = box_stats_values(_values(db, "temp_min", None, "2016-05-03", "2016-05-20"))
+        for key in ("q1", "med", "q3", "whislo", "whishi"):
+            assert np.isclose(short[key], exact[key])
+        assert box_stats(db, "temp_max", 1, "2030-01-01", "2030-12-31") is None
+    # Imports keep the sketches current
+    spike = pd.DataFrame({"date": ["2016-07-04"], "temp_max": [80.0], "temp_min": [10.0], "rainfall": [0.0]})
+    import_chunks([spike], farm_id=1, db_path=path)
+    with DBHandler(path) as db:
+        stats = box_stats(db, "temp_max", 1, "2016-01-01", "2016-12-31")
+        assert 80.0 in stats["fliers"]
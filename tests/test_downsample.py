@@ -0,0 +1,79 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from chart_layer import ChartLayer  # noqa: E402
+from downsample import downsample, envelope, lttb_indices, minmax_indices, visible_slice  # noqa: E402
+
+
+def _series(n=100_000):
+    rng = np.random.default_rng(7)
+    return np.arange(n, dtype=float), np.cumsum(rng.normal(size=n))
+
+
+def test_lttb_keeps_ends_and_shape():
+    x, y = _series()
+    idx = lttb_indices(x, y, 800)
+    assert len(idx) == 800
+    assert idx[0] == 0 and idx[-1] == len(x) - 1
+    assert np.all(np.diff(idx) > 0)
+    # The line's range survives the reduction
+    assert y[idx].max() > y.max() - 0.05 * np.ptp(y)
+    assert y[idx].min() < y.min() + 0.05 * np.ptp(y)
+    # Short series and tiny budgets
+    assert list(lttb_indices(x[:10], y[:10], 800)) == list(range(10))
+    assert list(lttb_indices(x[:10], y[:10], 2)) == [0, 9]
+
+
+def test_minmax_keeps_spikes_and_skips_nans():
+    x, y = _series()
+    y[12345] = 1e6
+    y[::97] = np.nan
+    idx = minmax_indices(x, y, 100)
+    assert 12345 in idx
+    assert len(idx) <= 202
+    assert not np.isnan(y[idx]).any()
+    starts, lo, hi = envelope(x, y, 10)
+    assert len(starts) == len(lo) == len(hi) == 10
+    assert np.nanmax(y) == hi.max()
+
+
+def test_datetime_x_and_visible_slice():
+    dates = pd.date_range("2000-01-01", periods=5000).to_numpy()
+    _, y = _series(5000)
+    xs, ys = downsample(dates, y, 300)
+    assert xs.dtype == dates.dtype and len(xs) == len(ys) == 300
+    assert xs[0] == dates[0] and xs[-1] == dates[-1]
+    sl = visible_slice(np.arange(100.0), 10, 20)
+    assert (sl.start, sl.stop) == (9, 22)
+
+
+def test_chart_layer_resamples_on_zoom():
+    fig = Figure(figsize=(4, 3), dpi=100)
+    ax = fig.add_subplot()
+    layer = ChartLayer(fig, FigureCanvasAgg(fig))
+    x, y = _series(20_000)
+    layer.begin()
+    layer.line("metric", x, y, ax=ax, downsample="lttb")
+    layer.end()
+    width = int(ax.bbox.width)
+    assert len(ax.lines[0].get_xdata()) == width
+    # Same data again: nothing to redraw
+    layer.begin()
+    layer.line("metric", x, y, ax=ax, downsample="lttb")
+    assert layer.end() == "none"
+    # Zooming re-picks points from the full data of the visible range
+    ax.set_xlim(1000, 1500)
+    shown = ax.lines[0].get_xdata()
+    assert layer.resamples == 1
+    assert len(shown) == width
+    assert shown[0] >= 999 and shown[-1] <= 1501
@@ -0,0 +1,101 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+from db_handler import connect_db, DBHandler
+from folder_watcher import FolderWatcher, is_candidate
+
+
+def setup_temp_db():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    conn = connect_db(path)
+    if conn:
+        conn.close()
+    return path
+
+
+def run_watcher(drop_dir, db_path, expected, poll):
+    results = []
+    watcher = FolderWatcher(drop_dir, db_path=db_path, farm_id=1, workers=2, settle_seconds=0.2,
+                            poll_interval=0.1, poll=poll, on_result=lambda p, s, _: results.append((os.path.basename(p), s)))
+    thread = threading.Thread(target=watcher.run, daemon=True)
+    thread.start()
+    return watcher, thread, results
+
+
+def wait_for(results, n, timeout=10):
+    deadline = time.time() + timeout
+    while len(results) < n and time.time() < deadline:
+        time.sleep(0.05)
+
+
+def test_candidate_names():
+    assert is_candidate("data.csv") and is_candidate("Data.XLSX")
+    assert not is_candidate("data.csv.part") and not is_candidate(".data.csv") and not is_candidate("notes.txt")
+
+
+def check_watch(poll):
+    db_path = setup_temp_db()
+    drop_dir = tempfile.mkdtemp()
+    try:
+        pd.DataFrame({"date": ["2025-01-01", "2025-01-02"], "temp_max": [30.0, 31.0],
+                      "temp_min": [20.0, 21.0], "rainfall": [1.0, 0.0]}).to_csv(os.path.join(drop_dir, "early.csv"), index=False)
+        watcher, thread, results = run_watcher(drop_dir, db_path, 2, poll)
+        # A file written in two steps is only imported once it has settled
+        with open(os.path.join(drop_dir, "late.csv"), "w") as f:
+            f.write("date,temp_max,temp_min,rainfall\n2025-01-03,30,20,0\n")
+            f.flush()
+            time.sleep(0.1)
+            f.write("2025-01-04,29,19,2\n")
+        with open(os.path.join(drop_dir, "broken.csv"), "w") as f:
+            f.write("date,temp_max\n\"unterminated\n")
+        wait_for(results, 3)
+        watcher.stop()
+        thread.join(5)
+        assert sorted(results) == [("broken.csv", "failed"), ("early.csv", "done"), ("late.csv", "done")]
+        assert sorted(os.listdir(os.path.join(drop_dir, "done"))) == ["early.csv", "late.csv"]
+        assert os.path.exists(os.path.join(drop_dir, "failed", "broken.csv.error.txt"))
+        with DBHandler(db_path) as db:
+            assert db.fetch_one("SELECT COUNT(*) FROM climate_data")[0] == 4
+    finally:
+        os.remove(db_path)
+
+
+def test_watch_folder_polling():
+    check_watch(poll=True)
+
+
+def test_watch_folder_inotify_or_fallback():
+    check_watch(poll=False)
+
+
+def test_same_name_twice_keeps_both_rejects():
+    db_path = setup_temp_db()
+    drop_dir = tempfile.mkdtemp()
+    try:
+        watcher, thread, results = run_watcher(drop_dir, db_path, 2, True)
+        for n, day in enumerate(["2025-02-01", "2025-02-02"], start=1):
+            with open(os.path.join(drop_dir, "daily.csv"), "w") as f:
+                f.write(f"date,temp_max,temp_min,rainfall\n{day},30,20,0\n{day},31,21,-5\n")
+            wait_for(results, n)
+        watcher.stop()
+        thread.join(5)
+        assert [s for _, s in results] == ["done", "done"]
+        assert results[1][0] == "daily_1.csv"
+        done = os.path.join(drop_dir, "done")
+        assert sorted(os.listdir(done)) == ["daily.csv", "daily_1.csv", "daily_1_rejects.csv", "daily_rejects.csv"]
+        with open(os.path.join(done, "daily_1_rejects.csv")) as f:
+            assert "2025-02-02" in f.read()
+        with DBHandler(db_path) as db:
+            assert db.fetch_one("SELECT COUNT(*) FROM climate_data")[0] == 2
+    finally:
+        os.remove(db_path)
@@ -0,0 +1,59 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import datagen  # noqa: E402
+import global_analytics  # noqa: E402
+import lod_pyramid  # noqa: E402
+from db_handler import DBHandler  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "global.db")
+    datagen.write_sqlite(datagen.generate(4, 2, missing_rate=0.01), path)
+    return path
+
+
+def _expected(db):
+    df = pd.read_sql_query(
+        """SELECT c.date, c.temp_max, c.rainfall, m.cumulative_gdd, f.name AS farm FROM climate_data c
+           JOIN farms f ON f.id = c.farm_id
+           LEFT JOIN agri_metrics m ON c.farm_id = m.farm_id AND c.date = m.date""", db.conn)
+    farm_means = df.groupby("farm")["temp_max"].mean()
+    top = df[df["farm"] == farm_means.idxmax()].sort_values("date")
+    rolling = top["temp_max"].rolling(window=3, min_periods=1).mean()
+    return df, farm_means, rolling.tail(5).to_numpy()
+
+
+def test_pyramid_and_daily_farms_match_pandas(db_path):
+    with DBHandler(db_path) as db:
+        with db.transaction():
+            # Farm 1 has a full pyramid, farm 2 one from before the variances, 3 and 4 none
+            lod_pyramid.rebuild(db, 1)
+            lod_pyramid.rebuild(db, 2)
+        db.execute_query("UPDATE series_lod SET var=NULL WHERE farm_id=2 AND bucket<'2016-01-01'")
+        summary = global_analytics.compute(db)
+        df, farm_means, rolling = _expected(db)
+    pd.testing.assert_series_equal(summary["farm_means"], farm_means, check_exact=False)
+    assert summary["rain_mean"] == pytest.approx(df["rainfall"].mean())
+    assert summary["rain_std"] == pytest.approx(df["rainfall"].std())
+    assert summary["gdd_mean"] == pytest.approx(df["cumulative_gdd"].mean())
+    assert summary["top_farm"] == farm_means.idxmax()
+    assert np.allclose(summary["rolling"]["temp_max_rm"], rolling)
+    text = global_analytics.format_summary(summary)
+    assert text.count("Mean Tmax by farm") == 1 and f"(farm={farm_means.idxmax()})" in text
+
+
+def test_no_data(tmp_path):
+    with DBHandler(str(tmp_path / "empty.db")) as db:
+        db.execute_query("INSERT INTO farms (id, name) VALUES (1, 'North')")
+        assert global_analytics.compute(db) is None
@@ -0,0 +1,143 @@
+import io
+import os
+import sys
+import tempfile
+import threading
+
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+from db_handler import connect_db, DBHandler
+from import_utils import import_chunks, read_chunks, count_data_rows
+from notifications import ProgressThrottle
+from validation import ChunkValidator
+
+
+def setup_temp_db():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    conn = connect_db(path)
+    if conn:
+        conn.close()
+    return path
+
+
+def write_csv(rows):
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    dates = pd.date_range("2025-01-01", periods=rows, freq="D").strftime("%Y-%m-%d")
+    pd.DataFrame({
+        "date": dates,
+        "temp_max": 30.0,
+        "temp_min": 20.0,
+        "rainfall": 1.0,
+        "daily_gdd": 15.0,
+        "eff_rain": 0.8,
+        "cum_gdd": [15.0 * (i + 1) for i in range(rows)],
+    }).to_csv(path, index=False)
+    return path
+
+
+def count(db_path, table):
+    with DBHandler(db_path) as db:
+        return db.fetch_one(f"SELECT COUNT(*) FROM {table}")[0]
+
+
+def test_chunked_import_upserts_both_tables():
+    db_path = setup_temp_db()
+    csv_path = write_csv(250)
+    try:
+        assert count_data_rows(csv_path) == 250
+        done = []
+        summary = import_chunks(read_chunks(csv_path, chunksize=100), farm_id=1, db_path=db_path,
+                                validator=ChunkValidator(), progress=done.append)
+        assert summary["inserted"] == 250 and not summary["cancelled"]
+        assert done == [100, 200, 250]
+        # Re-importing replaces rows instead of duplicating them
+        import_chunks(read_chunks(csv_path, chunksize=100), farm_id=1, db_path=db_path)
+        assert count(db_path, "climate_data") == 250
+        assert count(db_path, "agri_metrics") == 250
+        # INSERT OR IGNORE reports existing rows as skipped
+        summary = import_chunks(read_chunks(csv_path), farm_id=1, db_path=db_path, on_conflict="IGNORE")
+        assert summary["inserted"] == 0 and summary["skipped"] == 250
+    finally:
+        os.remove(db_path)
+        os.remove(csv_path)
+
+
+def test_cancel_rolls_back_atomic_import():
+    db_path = setup_temp_db()
+    csv_path = write_csv(300)
+    try:
+        cancel = threading.Event()
+        summary = import_chunks(read_chunks(csv_path, chunksize=100), farm_id=1, db_path=db_path,
+                                progress=lambda done: cancel.set() if done >= 200 else None,
+                                cancel_event=cancel)
+        assert summary["cancelled"] and summary["inserted"] == 0
+        assert count(db_path, "climate_data") == 0
+        # Per-chunk commits keep the chunks finished before the cancel
+        cancel.clear()
+        summary = import_chunks(read_chunks(csv_path, chunksize=100), farm_id=1, db_path=db_path,
+                                progress=lambda done: cancel.set() if done >= 200 else None,
+                                cancel_event=cancel, atomic=False)
+        assert summary["cancelled"]
+        assert count(db_path, "climate_data") == 200
+    finally:
+        os.remove(db_path)
+        os.remove(csv_path)
+
+
+def test_progress_throttle_limits_callbacks():
+    calls = []
+    throttle = ProgressThrottle(lambda done, total: calls.append(done), max_per_second=10)
+    for i in range(10000):
+        throttle.update(i, 10000)
+    throttle.finish(10000, 10000)
+    assert calls[0] == 0 and calls[-1] == 10000
+    assert len(calls) < 10
+
+
+def test_file_like_upload_imports_per_chunk():
+    db_path = setup_temp_db()
+    csv_path = write_csv(120)
+    try:
+        with open(csv_path, "rb") as f:
+            upload = io.BytesIO(f.read())
+        upload.name = "upload.csv"
+        summary = import_chunks(read_chunks(upload, chunksize=50), farm_id=1, db_path=db_path,
+                                validator=ChunkValidator(), atomic=False, on_conflict="IGNORE")
+        assert summary == {"rows": 120, "inserted": 120, "skipped": 0, "rejected": 0, "cancelled": False}
+        assert count(db_path, "agri_metrics") == 120
+    finally:
+        os.remove(db_path)
+        os.remove(csv_path)
+
+
+def test_multi_farm_file_upserts_farms_with_coordinates():
+    db_path = setup_temp_db()
+    fd, csv_path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    rows = []
+    for i in range(40):
+        farm = f"Farm{i % 4}"
+        rows.append({"date": f"2025-01-{i // 4 + 1:02d}", "temp_max": 30.0, "temp_min": 20.0,
+                     "rainfall": 1.0, "farm_name": farm, "location": f"Loc{i % 4}",
+                     "base_temp": 10.0, "lat": 20.0 + i % 4, "lon": 70.0})
+    pd.DataFrame(rows).to_csv(csv_path, index=False)
+    try:
+        with DBHandler(db_path) as db:
+            db.execute_query("INSERT INTO farms (name, location, base_temp) VALUES (?, ?, ?)", ("Farm1", "Old", 8.0))
+        summary = import_chunks(read_chunks(csv_path, chunksize=15), db_path=db_path, validator=ChunkValidator())
+        assert summary["inserted"] == 40
+        with DBHandler(db_path) as db:
+            farms = {f["name"]: f for f in db.get_farms()}
+            per_farm = dict(db.fetch_all("SELECT f.name, COUNT(*) FROM climate_data c JOIN farms f ON f.id = c.farm_id GROUP BY f.name"))
+        assert sorted(farms) == ["Farm0", "Farm1", "Farm2", "Farm3"]
+        assert farms["Farm1"]["location"] == "Loc1" and farms["Farm1"]["lat"] == 21.0
+        assert per_farm == {"Farm0": 10, "Farm1": 10, "Farm2": 10, "Farm3": 10}
+    finally:
+        os.remove(db_path)
+        os.remove(csv_path)
@@ -0,0 +1,140 @@
+import json
+import os
+import socket
+import sqlite3
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+from db_handler import connect_db, DBHandler
+import iot_service
+from iot_service import IngestService, parse_payload
+from readings_store import get_readings
+
+
+def setup_temp_db():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    conn = connect_db(path)
+    if conn:
+        conn.close()
+    return path
+
+
+def post(port, body):
+    req = urllib.request.Request(f"http://127.0.0.1:{port}/readings", data=body.encode(), method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def count_readings(db_path):
+    with DBHandler(db_path) as db:
+        return len(get_readings(db, 1, "2025-01-01", "2026-12-31"))
+
+
+def test_parse_json_and_line_protocol():
+    readings, invalid = parse_payload('[{"farm_id": 1, "sensor": "s1", "ts": "2025-10-01T06:00:00Z", "temperature": 18.5},'
+                                      ' {"farm_id": 1, "temperature": "hot"}]')
+    assert invalid == 1 and readings[0]["ts"] == "2025-10-01 06:00:00"
+    readings, invalid = parse_payload("weather,farm_id=2,sensor=s9 temperature=21.0,rainfall=0.5 1759298400000000000\nbad line")
+    assert invalid == 1
+    assert readings[0]["farm"] == 2 and readings[0]["rainfall"] == 0.5 and readings[0]["ts"] == "2025-10-01 06:00:00"
+
+
+
+def test_timestamps_share_one_timezone():
+    tz = iot_service.resolve_tz("Europe/Madrid")
+    payload = ('[{"farm_id": 1, "ts": "2025-10-01T23:30:00Z", "temperature": 1},'
+               ' {"farm_id": 1, "ts": 1759361400, "temperature": 1},'
+               ' {"farm_id": 1, "ts": "2025-10-02T01:30:00", "temperature": 1}]')
+    # The same instant as UTC, epoch and naive local time lands on the same local day
+    readings, _ = parse_payload(payload, tz)
+    assert [r["ts"] for r in readings] == ["2025-10-02 01:30:00"] * 3
+    readings, _ = parse_payload(payload)
+    assert [r["ts"] for r in readings] == ["2025-10-01 23:30:00", "2025-10-01 23:30:00", "2025-10-02 01:30:00"]
+    with pytest.raises(ValueError):
+        IngestService(tz="Mars/Olympus")
+
+
+def test_http_and_tcp_clients_are_batched_into_sqlite():
+    db_path = setup_temp_db()
+    service = IngestService(db_path, batch_size=50, flush_ms=50).start(http_port=0, tcp_port=0)
+    try:
+        lines = "\n".join(f"weather,farm_id=1,sensor=s1 temperature={20 + i % 5} {1759298400 + 60 * i}" for i in range(120))
+        status, body = post(service.http_port, lines)
+        assert status == 202 and body["accepted"] == 120
+        with socket.create_connection(("127.0.0.1", service.tcp_port), timeout=5) as sock:
+            sock.sendall(b'{"farm_id": 1, "sensor": "s2", "ts": 1759298400, "temperature": 19.0}\nnot valid\n')
+            replies = b""
+            while replies.count(b"\n") < 2:
+                replies += sock.recv(64)
+        assert replies.split() == [b"OK", b"INVALID"]
+        deadline = time.time() + 5
+        while service.stats()["written"] < 121 and time.time() < deadline:
+            time.sleep(0.02)
+        stats = service.stats()
+        assert stats["written"] == 121 and stats["batches"] >= 3 and stats["dropped"] == 0
+    finally:
+        service.stop()
+        os.remove(db_path)
+
+
+def test_full_queue_applies_backpressure_then_drops():
+    db_path = setup_temp_db()
+    # Writer not started, so the queue fills up
+    service = IngestService(db_path, max_queue=10, put_timeout=0.01)
+    try:
+        readings, _ = parse_payload("\n".join(f"w,farm_id=1 temperature=1 {1759298400 + i}" for i in range(15)))
+        accepted, dropped = service.submit(readings)
+        stats = service.stats()
+        assert (accepted, dropped) == (10, 5)
+        assert stats["queue_depth"] == 10 and stats["dropped"] == 5 and stats["backpressure_waits"] == 5
+        service.flush_pending()
+        assert count_readings(db_path) == 10
+    finally:
+        os.remove(db_path)
+
+
+def test_locked_database_is_retried_then_dropped(monkeypatch):
+    db_path = setup_temp_db()
+    write = iot_service.write_readings
+    failures = []
+
+    def locked(*args, **kwargs):
+        if failures:
+            failures.pop()
+            raise sqlite3.OperationalError("database is locked")
+        return write(*args, **kwargs)
+
+    monkeypatch.setattr(iot_service, "write_readings", locked)
+    monkeypatch.setattr(iot_service, "RETRY_BACKOFF_SECONDS", 0.001)
+    service = IngestService(db_path)
+    try:
+        readings, _ = parse_payload("\n".join(f"w,farm_id=1 temperature=1 {1759298400 + i}" for i in range(5)))
+        # Two locked attempts, then the batch goes through
+        failures.extend([1, 1])
+        service.submit(readings)
+        service.flush_pending()
+        stats = service.stats()
+        assert stats["written"] == 5 and stats["retries"] == 2 and stats["errors"] == 0
+        # Still locked after every retry: the batch is counted as dropped
+        failures.extend([1] * (iot_service.WRITE_RETRIES + 1))
+        service.submit(readings)
+        service.flush_pending()
+        stats = service.stats()
+        assert stats["dropped"] == 5 and stats["errors"] == 1
+        assert stats["received"] == stats["written"] + stats["dropped"] + stats["invalid"]
+        assert count_readings(db_path) == 5
+    finally:
+        os.remove(db_path)
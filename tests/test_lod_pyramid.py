@@ -0,0 +1,72 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import datagen  # noqa: E402
+from db_handler import DBHandler  # noqa: E402
+from import_utils import import_chunks  # noqa: E402
+from lod_pyramid import bucket_starts, fetch, level_for  # noqa: E402
+
+
+def _db(tmp_path, farms=2, years=3):
+    path = str(tmp_path / "lod.db")
+    datagen.write_sqlite(datagen.generate(farms, years), path)
+    return path
+
+
+def test_bucket_starts_and_levels():
+    dates = np.array(["2024-01-07", "2024-01-08", "2024-02-29", "2024-12-15"], dtype="datetime64[D]")
+    assert list(bucket_starts(dates, "week").astype(str)) == ["2024-01-01", "2024-01-08", "2024-02-26", "2024-12-09"]
+    assert list(bucket_starts(dates, "month").astype(str)) == ["2024-01-01", "2024-01-01", "2024-02-01", "2024-12-01"]
+    assert list(bucket_starts(dates, "season").astype(str)) == ["2023-12-01", "2023-12-01", "2023-12-01", "2024-12-01"]
+    assert level_for("2024-01-01", "2024-06-30", 800) == "day"
+    assert level_for("2015-01-01", "2024-12-31", 800) == "week"
+    assert level_for("2015-01-01", "2024-12-31", 200) == "month"
+    assert level_for("", "2024-12-31", 200) == "day"
+
+
+def test_fetch_builds_pyramid_matching_daily_rows(tmp_path):
+    path = _db(tmp_path)
+    with DBHandler(path) as db:
+        months = fetch(db, 1, ["temp_max", "rainfall"], "month")
+        assert len(months) == 36
+        expected = db.conn.execute(
+            "SELECT AVG(temp_max), MIN(temp_max), MAX(temp_max), SUM(rainfall) FROM climate_data "
+            "WHERE farm_id=1 AND date LIKE '2016-02%'"
+        ).fetchone()
+        row = months[months["date"] == pd.Timestamp("2016-02-01")].iloc[0]
+        assert np.isclose(row["temp_max"], expected[0])
+        assert (row["temp_max_min"], row["temp_max_max"]) == (expected[1], expected[2])
+        # Ranges select the buckets overlapping them
+        weeks = fetch(db, 1, ["temp_max"], "week", "2016-01-10", "2016-02-01")
+        assert list(weeks["date"].dt.strftime("%Y-%m-%d")) == ["2016-01-04", "2016-01-11", "2016-01-18",
+                                                               "2016-01-25", "2016-02-01"]
+        # Only the farm that was fetched has been built
+        assert db.conn.execute("SELECT COUNT(DISTINCT farm_id) FROM series_lod").fetchone()[0] == 1
+
+
+def test_ingest_and_delete_keep_pyramid_current(tmp_path):
+    path = _db(tmp_path)
+    with DBHandler(path) as db:
+        fetch(db, 1, ["temp_max"], "season")
+        before = dict(db.conn.execute(
+            "SELECT bucket, mean FROM series_lod WHERE farm_id=1 AND level='season' AND metric='temp_max'"
+        ).fetchall())
+    spike = pd.DataFrame({"date": ["2018-01-10"], "temp_max": [99.0], "temp_min": [1.0], "rainfall": [0.0]})
+    import_chunks([spike], farm_id=1, db_path=path)
+    with DBHandler(path) as db:
+        season = fetch(db, 1, ["temp_max"], "season", "2017-12-01", "2018-02-28")
+        assert season["temp_max_max"].iloc[0] == 99.0
+        # Earlier buckets are left alone
+        assert fetch(db, 1, ["temp_max"], "season", "2015-09-01", "2015-11-30")["temp_max"].iloc[0] == before["2015-09-01"]
+        db.delete_data_entry(1, "2018-01-10")
+        season = fetch(db, 1, ["temp_max"], "season", "2017-12-01", "2018-02-28")
+        assert season["temp_max_max"].iloc[0] < 99.0
+        assert np.isclose(season["temp_max"].iloc[0], before["2017-12-01"])
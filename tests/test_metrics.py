@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+from db_handler import connect_db, DBHandler
+from import_utils import import_chunks
+from metrics import MetricsUpdater, cumulative_gdd, daily_gdd, effective_rainfall
+
+
+def setup_temp_db():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    conn = connect_db(path)
+    if conn:
+        conn.close()
+    return path
+
+
+def climate_frame(dates, temp_max=30.0, temp_min=20.0, rainfall=10.0):
+    return pd.DataFrame({"date": dates, "temp_max": temp_max, "temp_min": temp_min, "rainfall": rainfall})
+
+
+def stored_metrics(db_path):
+    with DBHandler(db_path) as db:
+        return db.fetch_all("SELECT date, daily_gdd, effective_rainfall, cumulative_gdd FROM agri_metrics ORDER BY date")
+
+
+def test_gdd_methods():
+    tmax = np.array([35.0, 20.0, 40.0, 8.0])
+    tmin = np.array([20.0, 5.0, 30.0, 2.0])
+    assert list(daily_gdd(tmax, tmin, 10.0)) == [17.5, 2.5, 25.0, 0.0]
+    assert list(daily_gdd(tmax, tmin, 10.0, method="cap", upper_temp=30.0)) == [15.0, 5.0, 20.0, 0.0]
+    assert list(daily_gdd(tmax, tmin, 10.0, method="cutoff", upper_temp=30.0)) == [17.5, 2.5, 0.0, 0.0]
+    assert list(effective_rainfall([10.0, 2.0], fraction=0.8, min_rain=5.0)) == [8.0, 0.0]
+
+
+def test_cumulative_gdd_per_farm_in_date_order():
+    result = cumulative_gdd([1, 2, 1, 2, 1], ["2025-01-03", "2025-01-01", "2025-01-01", "2025-01-02", "2025-01-02"],
+                            [1.0, 10.0, 2.0, 20.0, 4.0], offsets={2: 100.0})
+    assert list(result) == [7.0, 110.0, 2.0, 130.0, 6.0]
+
+
+def test_import_derives_metrics_and_rebuilds_suffix_for_late_rows():
+    db_path = setup_temp_db()
+    try:
+        with DBHandler(db_path) as db:
+            db.execute_query("INSERT INTO farms (name, location, base_temp) VALUES (?, ?, ?)", ("F", "L", 15.0))
+        days = ["2025-01-01", "2025-01-02", "2025-01-04", "2025-01-05"]
+        import_chunks([climate_frame(days)], farm_id=1, db_path=db_path)
+        rows = stored_metrics(db_path)
+        assert [r[1] for r in rows] == [10.0] * 4 and rows[0][2] == 8.0
+        assert [r[3] for r in rows] == [10.0, 20.0, 30.0, 40.0]
+        # A late row for 2025-01-03 and a correction for 2025-01-05 shift only the suffix
+        import_chunks([climate_frame(["2025-01-03", "2025-01-05"], temp_max=[25.0, 35.0])], farm_id=1, db_path=db_path)
+        rows = stored_metrics(db_path)
+        assert [r[1] for r in rows] == [10.0, 10.0, 7.5, 10.0, 12.5]
+        assert [r[3] for r in rows] == [10.0, 20.0, 27.5, 37.5, 50.0]
+    finally:
+        os.remove(db_path)
+
+
+def test_appended_rows_are_summed_in_the_chunk():
+    db_path = setup_temp_db()
+    try:
+        with DBHandler(db_path) as db:
+            db.execute_query("INSERT INTO farms (name, location, base_temp) VALUES (?, ?, ?)", ("F", "L", 15.0))
+        import_chunks([climate_frame(["2025-01-01", "2025-01-02"])], farm_id=1, db_path=db_path)
+        updater = MetricsUpdater()
+        with DBHandler(db_path) as db:
+            first = updater.prepare(db, climate_frame(["2025-01-04", "2025-01-03"]), 1)
+            second = updater.prepare(db, climate_frame(["2025-01-05"]), 1)
+            # Nothing is left for the UPDATE pass
+            assert updater.earliest == {}
+            late = updater.prepare(db, climate_frame(["2025-01-05"]), 1)
+        assert list(first["cumulative_gdd"]) == [40.0, 30.0]
+        assert list(second["cumulative_gdd"]) == [50.0]
+        assert np.isnan(late["cumulative_gdd"].iloc[0]) and updater.earliest == {1: "2025-01-05"}
+    finally:
+        os.remove(db_path)
@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+from db_handler import connect_db, DBHandler
+from readings_store import apply_rollups, get_readings, partitions, store_readings
+
+
+def setup_temp_db():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    conn = connect_db(path)
+    if conn:
+        conn.close()
+    return path
+
+
+def ingest(db_path, rows):
+    with DBHandler(db_path) as db:
+        with db.transaction():
+            days = store_readings(db, rows)
+            apply_rollups(db, days)
+    return days
+
+
+def climate(db_path):
+    with DBHandler(db_path) as db:
+        return [tuple(r) for r in db.fetch_all(
+            "SELECT c.date, c.temp_min, c.temp_max, c.rainfall, m.cumulative_gdd FROM climate_data c "
+            "JOIN agri_metrics m ON m.farm_id = c.farm_id AND m.date = c.date WHERE c.farm_id = 1 ORDER BY c.date")]
+
+
+def test_readings_fold_into_daily_rows_and_partitions():
+    db_path = setup_temp_db()
+    try:
+        days = ingest(db_path, [
+            (1, "s1", "2025-10-31 06:00:00", 12.0, 0.5),
+            (1, "s1", "2025-10-31 14:00:00", 24.0, 1.5),
+            (1, "s1", "2025-11-01 06:00:00", 10.0, 0.0),
+        ])
+        assert days == {(1, "2025-10-31"), (1, "2025-11-01")}
+        # Out-of-order reading for an earlier day folds in incrementally
+        ingest(db_path, [(1, "s2", "2025-10-31 03:00:00", 8.0, 2.0), (1, "s1", "2025-11-01 13:00:00", 20.0, None)])
+        assert climate(db_path) == [("2025-10-31", 8.0, 24.0, 4.0, 6.0), ("2025-11-01", 10.0, 20.0, 0.0, 11.0)]
+        with DBHandler(db_path) as db:
+            assert partitions(db.conn) == ["sensor_readings_2025_10", "sensor_readings_2025_11"]
+            assert len(get_readings(db, 1, "2025-10-31", "2025-11-01")) == 5
+            assert db.fetch_one("SELECT n FROM reading_rollups WHERE date = '2025-10-31'")[0] == 3
+    finally:
+        os.remove(db_path)
+
+
+def test_corrected_reading_reaggregates_only_its_day():
+    db_path = setup_temp_db()
+    try:
+        ingest(db_path, [
+            (1, "s1", "2025-10-30 06:00:00", 12.0, 0.0),
+            (1, "s1", "2025-10-31 06:00:00", 30.0, 0.0),
+            (1, "s1", "2025-10-31 12:00:00", 20.0, 0.0),
+        ])
+        # Re-sent identical reading changes nothing; the corrected one lowers the max
+        days = ingest(db_path, [(1, "s1", "2025-10-30 06:00:00", 12.0, 0.0), (1, "s1", "2025-10-31 06:00:00", 22.0, 0.0)])
+        assert days == {(1, "2025-10-31")}
+        rows = climate(db_path)
+        assert rows[1][:3] == ("2025-10-31", 20.0, 22.0)
+        with DBHandler(db_path) as db:
+            assert db.fetch_one("SELECT n FROM reading_rollups WHERE date = '2025-10-31'")[0] == 2
+    finally:
+        os.remove(db_path)
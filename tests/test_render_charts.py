@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import datagen  # noqa: E402
+import render_charts  # noqa: E402
+from db_handler import DBHandler  # noqa: E402
+from import_utils import import_chunks  # noqa: E402
+
+
+def test_renders_and_skips_unchanged_farms(tmp_path):
+    db_path = str(tmp_path / "charts.db")
+    datagen.write_sqlite(datagen.generate(3, 1), db_path)
+    out_dir = str(tmp_path / "out")
+    args = ["--db", db_path, "--out", out_dir, "--charts", "dashboard,rainfall", "--dpi", "60"]
+    assert render_charts.main(args + ["--workers", "2"]) == 0
+    files = sorted(f for f in os.listdir(out_dir) if f.endswith(".png"))
+    assert len(files) == 6
+    assert all(os.path.getsize(os.path.join(out_dir, f)) > 0 for f in files)
+    # Nothing changed: nothing is rendered again
+    again = render_charts.render_all(db_path, out_dir, charts=["dashboard", "rainfall"], dpi=60, workers=1)
+    assert again["rendered"] == [] and again["skipped"] == 6
+    # New data for one farm re-renders only that farm's charts
+    row = pd.DataFrame({"date": ["2016-01-01"], "temp_max": [30.0], "temp_min": [12.0], "rainfall": [4.0]})
+    import_chunks([row], farm_id=2, db_path=db_path)
+    result = render_charts.render_all(db_path, out_dir, charts=["dashboard", "rainfall"], dpi=60, workers=1)
+    assert result["skipped"] == 4 and not result["errors"]
+    assert len(result["rendered"]) == 2
+    with DBHandler(db_path) as db:
+        name = dict(render_charts.select_farms(db))[2]
+    assert all(os.path.basename(p).startswith(render_charts.file_slug(name)) for p in result["rendered"])
+    # Filters and formats
+    subset = render_charts.render_all(db_path, str(tmp_path / "pdf"), farm_ids=[1], charts=["temp_min"],
+                                      start="2015-03-01", end="2015-03-31", dpi=60, fmt="pdf", workers=1)
+    assert [os.path.basename(p)[-12:] for p in subset["rendered"]] == ["temp_min.pdf"]
+
+
+def test_fingerprint_sees_edits_that_keep_the_totals(tmp_path):
+    db_path = str(tmp_path / "charts.db")
+    datagen.write_sqlite(datagen.generate(2, 1), db_path)
+    with DBHandler(db_path) as db:
+        before = render_charts.fingerprints(db)
+        # Swap two days' rainfall: count, bounds and every total stay the same
+        a, b = [r[0] for r in db.conn.execute(
+            "SELECT rainfall FROM climate_data WHERE farm_id=1 AND date IN ('2015-01-01', '2015-01-02') ORDER BY date")]
+        with db.transaction() as conn:
+            conn.execute("UPDATE climate_data SET rainfall=? WHERE farm_id=1 AND date='2015-01-01'", (b,))
+            conn.execute("UPDATE climate_data SET rainfall=? WHERE farm_id=1 AND date='2015-01-02'", (a,))
+        after = render_charts.fingerprints(db)
+    assert after[1] != before[1] and after[2] == before[2]
@@ -0,0 +1,63 @@
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import datagen  # noqa: E402
+import report_builder  # noqa: E402
+from db_handler import DBHandler  # noqa: E402
+
+FIELDS = ["date", "temp_max", "rainfall", "cumulative_gdd"]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "report.db")
+    datagen.write_sqlite(datagen.generate(3, 1), path)
+    return path
+
+
+def test_one_query_matches_the_per_farm_summaries(db_path):
+    with DBHandler(db_path) as db:
+        names = dict(db.conn.execute("SELECT id, name FROM farms").fetchall())
+        result = report_builder.build_report(db, [3, 1], "2015-02-01", "2015-03-31", FIELDS, "ana",
+                                             chunk_rows=25)
+        expected = {farm_id: pd.read_sql_query(
+            """SELECT c.date, c.temp_max, c.rainfall, m.cumulative_gdd FROM climate_data c
+               LEFT JOIN agri_metrics m ON c.farm_id = m.farm_id AND c.date = m.date
+               WHERE c.farm_id=? AND c.date>='2015-02-01' AND c.date<='2015-03-31' ORDER BY c.date""",
+            db.conn, params=(farm_id,)) for farm_id in (3, 1)}
+    assert len(result) == 2 * 59
+    frame = result.frame()
+    assert list(frame.columns) == FIELDS + ["farm", "user"]
+    assert frame["farm"].iloc[0] == names[3] and frame["farm"].iloc[-1] == names[1]
+    assert set(frame["user"]) == {"ana"}
+    for stats, farm_id in zip(result.stats, (3, 1)):
+        rows = expected[farm_id]
+        assert stats == (f"{names[farm_id]}: Avg Tmax={rows['temp_max'].mean():.1f}°C, "
+                         f"Total Rain={rows['rainfall'].sum():.1f}mm, "
+                         f"Cum GDD={rows['cumulative_gdd'].iloc[-1]:.1f}")
+    assert len(result.plot_series) == 2 * 3
+    key, label, dates, values = result.plot_series[0]
+    assert key == f"{names[3]}:temp_max" and dates[0] == np.datetime64("2015-02-01")
+    assert np.allclose(values, expected[3]["temp_max"])
+    line = result.lines(0, 1)[0]
+    assert line.startswith(f"{names[3]:<15} ana       ") and "2015-02-01" in line
+
+
+def test_background_job_and_cancel(db_path):
+    job = report_builder.start_report([1, 2, 3], "", "", ["date", "temp_max"], "ana", db_path=db_path)
+    assert job.wait(30) and job.error is None
+    assert job.read == job.total == len(job.result) == 3 * 365
+    stop = threading.Event()
+    stop.set()
+    with DBHandler(db_path) as db, pytest.raises(report_builder.ReportCancelled):
+        report_builder.build_report(db, [1], "", "", ["date"], "ana", cancelled=stop)
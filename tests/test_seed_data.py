@@ -0,0 +1,59 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import seed_data  # noqa: E402
+from db_handler import DBHandler  # noqa: E402
+
+HEADER = "date,temp_max,temp_min,rainfall,daily_gdd,eff_rain,cum_gdd\n"
+
+
+def _template(path, *rows):
+    path.write_text(HEADER + "".join(f"{row}\n" for row in rows))
+    return str(path)
+
+
+def test_template_seed_applied_once_per_content(tmp_path):
+    template = _template(tmp_path / "template.csv", "2025-09-01,32.5,21.7,12.3,17.5,10.0,214.0",
+                         "2025-09-02,30.0,20.0,,15.0,0.0,229.0", "2025-09-03,30.0,20.0,1.0,,,", ",31,21,2,16,0,31", "not-a-row,abc")
+    with DBHandler(str(tmp_path / "seed.db")) as db:
+        assert seed_data.seed_climate_template(db, template) == 2
+        farm_id = db.fetch_one("SELECT id FROM farms WHERE name=?", (seed_data.TEMPLATE_FARM,))[0]
+        # A blank climate cell skips the row; blank metric cells are stored as NULL, not 0
+        assert db.fetch_one("SELECT COUNT(*) FROM climate_data WHERE date='2025-09-02'")[0] == 0
+        # So does a blank date, in both tables
+        assert db.fetch_one("SELECT COUNT(*) FROM climate_data WHERE date=''")[0] == 0
+        assert db.fetch_one("SELECT COUNT(*) FROM agri_metrics WHERE date=''")[0] == 0
+        assert tuple(db.fetch_one("SELECT daily_gdd, effective_rainfall, cumulative_gdd FROM agri_metrics "
+                                  "WHERE farm_id=? AND date='2025-09-03'", (farm_id,))) == (None, None, None)
+        assert db.fetch_one("SELECT COUNT(*) FROM series_lod WHERE farm_id=?", (farm_id,))[0] > 0
+        # Same content: skipped, and a deleted template farm stays deleted
+        db.delete_farm(farm_id)
+        assert seed_data.seed_climate_template(db, template) is None
+        assert db.fetch_one("SELECT COUNT(*) FROM farms")[0] == 0
+        # Changed content (or force) applies it again
+        _template(tmp_path / "template.csv", "2025-09-01,33.0,21.0,0.0,17.0,0.0,17.0")
+        assert seed_data.seed_climate_template(db, template) == 1
+        assert seed_data.seed_climate_template(db, template, force=True) == 1
+        assert seed_data.applied_hash(db, "template.csv") == seed_data.file_hash(template)
+        assert seed_data.seed_climate_template(db, str(tmp_path / "missing.csv")) is None
+
+
+def test_failed_seed_is_rolled_back_and_not_recorded(tmp_path):
+    template = _template(tmp_path / "template.csv", "2025-09-01,32.5,21.7,12.3,17.5,10.0,214.0")
+
+    def load(db, path):
+        seed_data.load_climate_csv(db, path)
+        raise RuntimeError("disk full")
+
+    with DBHandler(str(tmp_path / "seed.db")) as db:
+        try:
+            seed_data.apply_seed(db, template, load)
+        except RuntimeError:
+            pass
+        assert db.fetch_one("SELECT COUNT(*) FROM climate_data")[0] == 0
+        assert seed_data.applied_hash(db, "template.csv") is None
@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import datagen  # noqa: E402
+import db_handler  # noqa: E402
+from db_handler import DBHandler  # noqa: E402
+from import_utils import import_chunks  # noqa: E402
+from series_cache import SeriesCache, adjacent_windows, invalidate_farms  # noqa: E402
+
+
+def _db(tmp_path, farms=2, years=1):
+    path = str(tmp_path / "series.db")
+    datagen.write_sqlite(datagen.generate(farms, years), path)
+    return path
+
+
+def test_load_keeps_all_metrics_and_serves_sub_ranges(tmp_path):
+    path = _db(tmp_path)
+    cache = SeriesCache()
+    assert cache.lookup(1) is None
+    with DBHandler(path) as db:
+        full = cache.load(db, 1)
+    assert len(full) == 365
+    assert set(full.columns) == {"temp_max", "temp_min", "rainfall", "daily_gdd", "effective_rainfall", "cumulative_gdd"}
+    # The open-ended entry answers any range of the same farm from memory
+    part = cache.lookup(1, "2015-03-01", "2015-03-31")
+    assert len(part) == 31
+    df = part.frame(["rainfall"])
+    assert list(df.columns) == ["date", "rainfall"]
+    assert df["date"].iloc[0] == pd.Timestamp("2015-03-01")
+    assert cache.lookup(2) is None
+    assert cache.hits == 1 and cache.misses == 2
+
+
+def test_lru_eviction_by_bytes(tmp_path):
+    path = _db(tmp_path, farms=3)
+    with DBHandler(path) as db:
+        size = SeriesCache().load(db, 1).nbytes
+        cache = SeriesCache(max_bytes=int(size * 2.5))
+        cache.load(db, 1)
+        cache.load(db, 2)
+        cache.lookup(1)          # farm 1 becomes most recently used
+        cache.load(db, 3)
+    assert cache.nbytes <= cache.max_bytes
+    assert cache.lookup(2) is None
+    assert cache.lookup(1) is not None and cache.lookup(3) is not None
+
+
+def test_import_invalidates_only_touched_farms(tmp_path):
+    path = _db(tmp_path)
+    cache = SeriesCache()
+    with DBHandler(path) as db:
+        cache.load(db, 1)
+        cache.load(db, 2)
+    new_day = pd.DataFrame({"date": ["2016-01-01"], "temp_max": [20.0], "temp_min": [10.0], "rainfall": [1.0]})
+    import_chunks([new_day], farm_id=1, db_path=path)
+    assert cache.lookup(1) is None
+    assert cache.lookup(2) is not None
+    with DBHandler(path) as db:
+        assert len(cache.load(db, 1)) == 366
+    invalidate_farms()
+    assert cache.lookup(2) is None
+
+
+def test_deletes_invalidate_the_farm(tmp_path):
+    path = _db(tmp_path)
+    cache = SeriesCache()
+    with DBHandler(path) as db:
+        cache.load(db, 1)
+        cache.load(db, 2)
+        assert db.delete_data_entry(1, "2015-03-01")
+        assert cache.lookup(1) is None and cache.lookup(2) is not None
+        assert len(cache.load(db, 1)) == 364
+        db.delete_farm(2)
+        assert cache.lookup(2) is None
+
+
+def test_prefetch_adjacent_windows(tmp_path):
+    path = _db(tmp_path)
+    assert adjacent_windows("2015-03-01", "2015-03-31") == [("2015-01-29", "2015-02-28"), ("2015-04-01", "2015-05-01")]
+    assert adjacent_windows("", "2015-03-31") == []
+    previous = db_handler.DB_FILE
+    db_handler.DB_FILE = path
+    try:
+        cache = SeriesCache()
+        cache.prefetch_adjacent(1, "2015-03-01", "2015-03-31")
+        deadline = time.time() + 5
+        while cache.lookup(1, "2015-04-01", "2015-05-01") is None and time.time() < deadline:
+            time.sleep(0.02)
+        assert len(cache.lookup(1, "2015-04-01", "2015-05-01")) == 31
+        assert len(cache.lookup(1, "2015-01-29", "2015-02-28")) == 31
+        cache.close()
+    finally:
+        db_handler.DB_FILE = previous
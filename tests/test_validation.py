@@ -0,0 +1,78 @@
+import io
+import os
+import sys
+
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+from validation import ChunkValidator, normalize_columns, validate_frame
+
+
+def make_frame():
+    return pd.DataFrame({
+        "date": ["2025-01-01", "2025-01-02", "not-a-date", "2025-01-04", "2025-01-02", "2025-01-06"],
+        "temp_max": [30.0, 31.0, 29.0, 20.0, 28.0, "x"],
+        "temp_min": [20.0, 21.0, 19.0, 25.0, 18.0, 10.0],
+        "rainfall": [5.0, -1.0, 2.5, 0.0, 1.0, 0.0],
+    })
+
+
+def test_rules_flag_expected_rows():
+    errors = ChunkValidator().row_errors(make_frame())
+    assert errors[0] == []
+    assert errors[1] == ["Negative or unrealistic rainfall"]
+    assert errors[2] == ["Invalid date"]
+    assert errors[3] == ["temp_min > temp_max"]
+    # Row 1 was rejected, so its date is still free for row 4 to use
+    assert errors[4] == []
+    assert errors[5] == ["Invalid temp_max"]
+
+
+def test_rejects_csv_has_row_numbers_and_reasons():
+    buf = io.StringIO()
+    with ChunkValidator(rejects=buf) as v:
+        good = v.validate(make_frame())
+    assert list(good["date"]) == ["2025-01-01", "2025-01-02"]
+    assert v.checked == 6 and v.rejected == 4
+    rejects = pd.read_csv(io.StringIO(buf.getvalue()))
+    assert list(rejects["row"]) == [2, 3, 4, 6]
+    assert rejects.loc[0, "reason"] == "Negative or unrealistic rainfall"
+
+
+def test_duplicates_detected_across_chunks_and_per_farm():
+    frame = pd.DataFrame({
+        "farm_name": ["A", "B", "A", "B"],
+        "date": ["2025-01-01", "2025-01-01", "2025-01-02", "2025-01-01"],
+        "temp_max": [30.0] * 4,
+        "temp_min": [20.0] * 4,
+        "rainfall": [0.0] * 4,
+    })
+    buf = io.StringIO()
+    with ChunkValidator(rejects=buf) as v:
+        first = v.validate(frame.iloc[:2])
+        second = v.validate(frame.iloc[2:])
+    assert len(first) == 2
+    assert list(second["farm_name"]) == ["A"]
+    rejects = pd.read_csv(io.StringIO(buf.getvalue()))
+    assert list(rejects["row"]) == [4]
+    assert rejects.loc[0, "reason"] == "Duplicate date"
+
+
+def test_duplicates_keyed_by_farm_id():
+    frame = pd.DataFrame({
+        "farm_id": [1, 2, 1],
+        "date": ["2025-01-01"] * 3,
+        "temp_max": [30.0] * 3,
+        "temp_min": [20.0] * 3,
+        "rainfall": [0.0] * 3,
+    })
+    good, rejected = validate_frame(frame)
+    assert list(good["farm_id"]) == [1, 2] and rejected == 1
+
+
+def test_normalize_columns_maps_template_aliases():
+    frame = normalize_columns(pd.DataFrame(columns=[" Date", "EFF_RAIN", "cum_gdd"]))
+    assert list(frame.columns) == ["date", "effective_rainfall", "cumulative_gdd"]
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from virtual_table import TableModel, VirtualTable  # noqa: E402
+
+
+def _columns(n=50_000):
+    rng = np.random.default_rng(3)
+    values = rng.normal(20, 5, n).round(1)
+    values[::1000] = np.nan
+    return {"date": pd.date_range("1900-01-01", periods=n).to_numpy(), "temp_max": values,
+            "farm": [f"farm {i % 7}" for i in range(n)]}
+
+
+def test_model_sorts_by_index_array_and_formats_window():
+    model = TableModel(["date", "temp_max", "farm"])
+    columns = _columns()
+    model.set_data(columns)
+    assert len(model) == 50_000
+    assert model.texts(0, 2) == [("1900-01-01", "", "farm 0"), ("1900-01-02", str(columns["temp_max"][1]), "farm 1")]
+    model.sort("temp_max")
+    shown = columns["temp_max"][model.order]
+    assert np.all(np.diff(shown[:-50]) >= 0) and np.isnan(shown[-50:]).all()
+    model.sort("temp_max", descending=True)
+    shown = columns["temp_max"][model.order]
+    assert np.all(np.diff(shown[:-50]) <= 0) and np.isnan(shown[-50:]).all()
+    # Ties keep row order in both directions; strings sort as text
+    model.sort("farm", descending=True)
+    assert model.row(model.index(0))[2] == "farm 6" and model.index(0) < model.index(1)
+    # The data itself is never reordered, and the sort survives new data
+    assert model.row(0) == ["1900-01-01", None, "farm 0"]
+    model.set_data({"farm": ["b", None, "a"]})
+    assert [model.row(model.index(i))[2] for i in range(3)] == ["b", "a", None]
+    assert model.position(1) == 2
+
+
+def test_table_keeps_item_pool_fixed(tk_root):
+    table = VirtualTable(tk_root, [("date", "Date"), ("temp_max", "Max T"), ("farm", "Farm")], height=10,
+                         selectmode="extended")
+    table.set_data(_columns())
+    assert len(table.tree.get_children()) == 10
+    table.scroll_to(25_000)
+    first = table.tree.item(table.tree.get_children()[0], "values")
+    assert first[0] == str(np.datetime64("1900-01-01") + 25_000)
+    table.select([25_003, 40_000])
+    assert table.selected_indices() == [25_003, 40_000]
+    assert table.top <= table.model.position(25_003) < table.top + 10
+    table.sort_by("temp_max")
+    assert sorted(table.selected_indices()) == [25_003, 40_000]
+    assert len(table.tree.get_children()) == 10
+    table.clear()
+    assert table.selected_indices() == [] and table.tree.item(table.tree.get_children()[0], "values") == ""
+    table.destroy()
@@ -67,9 +67,11 @@ def test_visualization_plot_smoke():
         page.selected_farm_id = farm_id
         # Call plot
         page.plot()
-        # allow some time for scheduled UI updates
-        root.update_idletasks()
-        time.sleep(0.1)
+        # The fetch runs on a worker; pump the event loop until its result is drawn
+        deadline = time.time() + 5.0
+        while page._plot_job is not None and time.time() < deadline:
+            root.update()
+            time.sleep(0.01)
         # After plotting, df should be populated
         assert hasattr(page, 'df') and not page.df.empty, "VisualizationPage.df should be non-empty after plot()"
         root.destroy()